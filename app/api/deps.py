@@ -0,0 +1,14 @@
+import hmac
+from typing import Optional
+from fastapi import Header, HTTPException
+from app.core.config import settings
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dependency for admin-only endpoints: X-Admin-Token must match ADMIN_TOKEN.
+    Fails closed: while ADMIN_TOKEN is unset the endpoints are disabled, not open.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Admin token required")
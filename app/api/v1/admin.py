@@ -0,0 +1,30 @@
+import structlog
+from fastapi import APIRouter, Depends
+from app.api.deps import require_admin
+from app.core.policies import policy_manager
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+logger = structlog.get_logger()
+
+def _versions():
+    return {
+        policy_id: {"version": snapshot.version, "loaded_at": snapshot.loaded_at}
+        for policy_id, snapshot in policy_manager.snapshots.items()
+    }
+
+@router.get("/admin/policies")
+async def list_policies():
+    """
+    Lists the policy versions currently being served.
+    """
+    return {"policies": _versions()}
+
+@router.post("/admin/policies/reload")
+async def reload_policies():
+    """
+    Re-reads the policies directory and atomically swaps in changed policies.
+    In-flight requests finish on the version they started with.
+    """
+    changed = await policy_manager.reload()
+    logger.info("policy_reload_requested", changed=changed)
+    return {"changed": sorted(changed), "policies": _versions()}
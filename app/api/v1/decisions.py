@@ -1,91 +1,378 @@
+import asyncio
+import math
 import time
 import uuid
 import structlog
-from fastapi import APIRouter, HTTPException
-from app.core.schemas import DecisionRequest, DecisionTraceResponse
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from app.core.schemas import DecisionRequest, DecisionTraceResponse, BatchDecisionRequest, BatchDecisionItemResponse
+from app.core.config import settings
+from app.core.coalescing import decision_flights, idempotency_store, request_fingerprint
+from app.core.costs import DecisionBudget, cost_model
+from app.core.exceptions import IdempotencyKeyReusedError, RateLimitedError
+from app.core.rate_limit import Admission, rate_governor
 from app.evidence_planner.planner import evidence_planner
 from app.decision_engine.engine import decision_engine
+from app.decision_engine.pipeline import pipeline_planner
+from app.llm_gateway.client import llm_gateway
 from app.trace_store.store import trace_store
-from app.core.policies import policy_manager
-from app.core.hard_constraints import hard_constraints
-from app.observability.metrics import decisions_total, decision_latency_seconds, hard_constraint_violations_total
+from app.trace_store.writer import trace_writer
+from app.core.policies import policy_manager, PolicySnapshot
+from app.observability.metrics import decisions_total, decision_latency_seconds, hard_constraint_violations_total, decisions_coalesced_total, idempotent_replays_total
+from app.observability.tracing import span, stage, start_timings
 
 router = APIRouter()
 logger = structlog.get_logger()
 
-@router.post("/decide", response_model=DecisionTraceResponse)
-async def create_decision(request: DecisionRequest):
+# Rate-limit bucket for requests without an X-Tenant-ID header
+DEFAULT_TENANT = "default"
+
+def hard_constraint_abstain(trace_id: str, policy_id: str, rationale: str) -> Dict[str, Any]:
+    logger.warning("hard_constraint_violated", trace_id=trace_id, rationale=rationale)
+
+    # Record Metric
+    hard_constraint_violations_total.labels(policy_id=policy_id).inc()
+    decisions_total.labels(decision_outcome="ABSTAIN", policy_id=policy_id).inc()
+
+    return {
+        "decision": "ABSTAIN",
+        "confidence": 1.0,
+        "risk_factors": ["hard_constraint_violation"],
+        "missing_information": [],
+        "failure_modes": ["deterministic_block"],
+        "cost_estimate": {"tokens": 0, "latency_ms": 0},
+        "trace_id": trace_id,
+        "rationale": rationale
+    }
+
+def llm_failure_abstain(error: Exception) -> Dict[str, Any]:
+    return {
+        "decision": "ABSTAIN",
+        "confidence": 0.0,
+        "risk_factors": ["llm_stage_failure"],
+        "missing_information": [],
+        "failure_modes": ["system_error"],
+        "cost_estimate": {"tokens": 0, "latency_ms": 0},
+        "rationale": f"Decision failed: {error}"
+    }
+
+async def run_llm_stages(request: DecisionRequest, snapshot: PolicySnapshot) -> Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]], DecisionBudget]:
     """
-    Core entrypoint for the DecisionTrace pipeline.
+    Runs evidence planning and the decision engine under the policy's decision budget. Returns
+    (evidence_result, decision_result, llm_calls, budget), where llm_calls are the model calls made, with
+    their raw responses (see LLMGateway.record_calls), and budget holds what they spent.
+    Also used by the offline replay harness (app/replay), so replays run exactly this code.
     """
-    start_time = time.time()
-    trace_id = str(uuid.uuid4())
-    
-    # Resolve policy
-    policy_id = request.policy_id or "default"
-    policy = policy_manager.get_policy(policy_id)
-    if not policy:
-        raise HTTPException(status_code=404, detail=f"Policy {policy_id} not found")
-
-    logger.info("decision_requested", trace_id=trace_id, policy_id=policy_id)
-
-    # 0. Deterministic Hard Constraints (Shadow Policy)
-    is_safe, constraint_rationale = hard_constraints.check(request.context, request.signals, policy=policy)
-    if not is_safe:
-        logger.warning("hard_constraint_violated", trace_id=trace_id, rationale=constraint_rationale)
-        
-        # Record Metric
-        hard_constraint_violations_total.labels(policy_id=policy_id).inc()
-        decisions_total.labels(decision_outcome="ABSTAIN", policy_id=policy_id).inc()
-        
-        return {
-            "decision": "ABSTAIN",
-            "confidence": 1.0,
-            "risk_factors": ["hard_constraint_violation"],
-            "missing_information": [],
-            "failure_modes": ["deterministic_block"],
-            "cost_estimate": {"tokens": 0, "latency_ms": 0},
-            "trace_id": trace_id,
-            "rationale": constraint_rationale
-        }
+    policy = snapshot.body
+    policy_id = snapshot.policy_id
+    llm_calls = llm_gateway.record_calls()
+    budget = cost_model.start_budget(policy_id, policy)
 
     # 1. Evidence Planning
     evidence_result = await evidence_planner.plan(
         input_data={"context": request.context, "signals": request.signals},
-        constraints={"policy": policy}
-    )
-    
-    # 2. Decision Making
-    decision_result = await decision_engine.decide(
-        input_data={"context": request.context, "signals": request.signals},
-        evidence_assessment=evidence_result,
-        constraints={"policy": policy}
+        constraints={"policy": policy},
+        snapshot=snapshot
     )
 
-    # Record Metrics
-    latency = time.time() - start_time
-    decision_outcome = decision_result.get("decision", "ABSTAIN")
-    
-    decisions_total.labels(decision_outcome=decision_outcome, policy_id=policy_id).inc()
-    decision_latency_seconds.labels(policy_id=policy_id).observe(latency)
+    # 2. Decision Making (skipped when the planner's ABSTAIN is already final)
+    skip_reason = pipeline_planner.engine_skip_reason(policy, evidence_result)
+    if skip_reason:
+        decision_result = {
+            "decision": "ABSTAIN",
+            "confidence": 0.0,
+            "risk_factors": ["evidence_planner_abstain"],
+            "missing_information": evidence_result.get("missing_evidence", []),
+            "failure_modes": [skip_reason],
+            "cost_estimate": {"tokens": 0, "latency_ms": 0},
+            "rationale": evidence_result.get("risk_assessment", "Evidence planner abstained."),
+            "skipped_stages": [pipeline_planner.record_skip(policy_id, ["primary", "shadow"], skip_reason)]
+        }
+    else:
+        decision_result = await decision_engine.decide(
+            input_data={"context": request.context, "signals": request.signals},
+            evidence_assessment=evidence_result,
+            constraints={"policy": policy},
+            snapshot=snapshot
+        )
+
+    return evidence_result, decision_result, llm_calls, budget
 
-    # 3. Trace Logging (Immutable)
+async def _admit(policy_id: str, snapshot: PolicySnapshot, tenant_id: Optional[str], decisions: int = 1) -> Optional[Admission]:
     try:
-        await trace_store.log_trace(trace_id, {
-            "request": request.model_dump(),
-            "evidence_planning": evidence_result,
-            "decision": decision_result
-        })
-    except Exception as e:
-        logger.error("trace_logging_failed", error=str(e), trace_id=trace_id)
-        # CRITICAL: If trace persistence fails, we MUST revoke an ACT decision.
-        if decision_result.get("decision") == "ACT":
-             logger.warning("revoking_action_due_to_trace_failure", trace_id=trace_id)
-             decision_result["decision"] = "ABSTAIN"
-             decision_result["rationale"] += " (CRITICAL: Trace persistence failure. Action revoked for safety.)"
-             decision_result["risk_factors"].append("trace_persistence_failure")
-
-    # Include trace_id in response
-    decision_result["trace_id"] = trace_id
-    
+        return await rate_governor.admit(policy_id, snapshot.body, tenant_id or DEFAULT_TENANT, decisions)
+    except RateLimitedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(e.retry_after_s)))})
+
+def _trace_data(request: DecisionRequest, snapshot: PolicySnapshot, evidence_result: Dict[str, Any], decision_result: Dict[str, Any], llm_calls: List[Dict[str, Any]], timings: Dict[str, float], budget: Optional[DecisionBudget], coalesced_with: Optional[str] = None) -> Dict[str, Any]:
+    # `timings_ms` covers the stages up to here; the trace write itself is only in the span and histogram.
+    trace_data = {
+        "request": request.model_dump(),
+        "policy_version": snapshot.version,
+        "refs": snapshot.trace_refs,
+        "evidence_planning": evidence_result,
+        "decision": decision_result,
+        "timings_ms": dict(timings)
+    }
+    if budget is not None:
+        trace_data["budget"] = budget.summary()
+    if coalesced_with is not None:
+        # Shared the decision of this trace (which holds the model calls and the spend)
+        trace_data["coalesced_with"] = coalesced_with
+    if settings.TRACE_RECORD_LLM_CALLS:
+        trace_data["llm_calls"] = llm_calls
+    return trace_data
+
+def _revoke_act(decision_result: Dict[str, Any], trace_id: str):
+    """
+    CRITICAL: If trace persistence fails, we MUST revoke an ACT decision.
+    """
+    if decision_result.get("decision") == "ACT":
+        logger.warning("revoking_action_due_to_trace_failure", trace_id=trace_id)
+        decision_result["decision"] = "ABSTAIN"
+        decision_result["rationale"] += " (CRITICAL: Trace persistence failure. Action revoked for safety.)"
+        decision_result.setdefault("risk_factors", []).append("trace_persistence_failure")
+
+async def _decide(request: DecisionRequest, tenant_id: Optional[str], fingerprint: Optional[str]) -> Tuple[Dict[str, Any], bool]:
+    """
+    Runs one decision. Returns (decision_result, traced); traced is False if its trace could not be written.
+    """
+    start_time = time.perf_counter()
+    trace_id = str(uuid.uuid4())
+    timings = start_timings()
+    policy_id = request.policy_id or "default"
+
+    with span("decide", trace_id=trace_id, policy_id=policy_id):
+        # Resolve policy (the snapshot pins the version for the whole request)
+        with stage("policy_lookup"):
+            snapshot = policy_manager.get_snapshot(policy_id)
+        if not snapshot:
+            raise HTTPException(status_code=404, detail=f"Policy {policy_id} not found")
+
+        logger.info("decision_requested", trace_id=trace_id, policy_id=policy_id, policy_version=snapshot.version)
+
+        # 0. Deterministic Hard Constraints (Shadow Policy)
+        with stage("hard_constraints"):
+            is_safe, constraint_rationale = snapshot.hard_constraints.check(request.context, request.signals)
+        if not is_safe:
+            decision_latency_seconds.labels(policy_id=policy_id).observe(time.perf_counter() - start_time)
+            return hard_constraint_abstain(trace_id, policy_id, constraint_rationale), True
+
+        async def llm_stages():
+            # Token governor: admitted before any model call, settled with what the decision actually used
+            admission = await _admit(policy_id, snapshot, tenant_id)
+            try:
+                stages = await run_llm_stages(request, snapshot)
+            except BaseException:
+                # Failed or cancelled: there is no usage to settle, so the admitted tokens go back
+                await rate_governor.refund(admission)
+                raise
+            await rate_governor.settle(admission, stages[3].spent_tokens)
+            return stages
+
+        # 1-2. Evidence Planning and Decision Making. An identical request already in flight (same tenant,
+        # policy version, context and signals) is waited for instead of run again.
+        if fingerprint is None:
+            (evidence_result, decision_result, llm_calls, budget), leader_id = await llm_stages(), None
+        else:
+            key = f"{tenant_id or DEFAULT_TENANT}:{snapshot.version}:{fingerprint}"
+            (evidence_result, decision_result, llm_calls, budget), leader_id = await decision_flights.run(key, trace_id, llm_stages)
+        if leader_id is not None:
+            decisions_coalesced_total.labels(policy_id=policy_id).inc()
+            logger.info("decision_coalesced", trace_id=trace_id, leader_trace_id=leader_id)
+
+        # Record Metrics
+        decision_outcome = decision_result.get("decision", "ABSTAIN")
+        decisions_total.labels(decision_outcome=decision_outcome, policy_id=policy_id).inc()
+
+        # 3. Trace Logging (Immutable, write-behind). An ACT is only released once its batch has committed.
+        # A coalesced request gets its own trace, linked to the one holding the model calls.
+        traced = True
+        try:
+            with stage("trace_write"):
+                if leader_id is None:
+                    trace_data = _trace_data(request, snapshot, evidence_result, decision_result, llm_calls, timings, budget)
+                else:
+                    trace_data = _trace_data(request, snapshot, evidence_result, decision_result, [], timings, None, coalesced_with=leader_id)
+                committed = await trace_writer.submit(trace_id, trace_data, snapshot.version)
+                if decision_outcome == "ACT":
+                    await committed
+        except Exception as e:
+            logger.error("trace_logging_failed", error=str(e), trace_id=trace_id)
+            _revoke_act(decision_result, trace_id)
+            traced = False
+
+        # Latency includes the trace write, which ACTs wait for
+        decision_latency_seconds.labels(policy_id=policy_id).observe(time.perf_counter() - start_time)
+
+        # Include trace_id in response
+        decision_result["trace_id"] = trace_id
+
+        return decision_result, traced
+
+@router.post("/decide", response_model=DecisionTraceResponse)
+async def create_decision(
+    request: DecisionRequest,
+    response: Response,
+    tenant_id: Optional[str] = Header(None, alias="X-Tenant-ID"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Core entrypoint for the DecisionTrace pipeline.
+    Answers 429 (with Retry-After) when the policy/tenant token bucket cannot admit another decision.
+    With an Idempotency-Key, a retry of the same request gets the stored response (Idempotent-Replayed:
+    true) and reusing the key for a different request is refused with 422.
+    """
+    fingerprint = request_fingerprint(request) if settings.DECISION_COALESCING_ENABLED or idempotency_key else None
+    tenant = tenant_id or DEFAULT_TENANT
+    if idempotency_key:
+        try:
+            stored = await idempotency_store.get(tenant, idempotency_key, fingerprint)
+        except IdempotencyKeyReusedError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if stored is not None:
+            idempotent_replays_total.labels(policy_id=request.policy_id or "default").inc()
+            response.headers["Idempotent-Replayed"] = "true"
+            return stored
+
+    decision_result, traced = await _decide(request, tenant_id, fingerprint if settings.DECISION_COALESCING_ENABLED else None)
+    # Stored once its trace is written, so a retry after a trace failure decides again
+    if idempotency_key and traced:
+        await idempotency_store.set(tenant, idempotency_key, fingerprint, decision_result)
     return decision_result
+
+@router.post("/decide/batch")
+async def create_decisions_batch(batch: BatchDecisionRequest, tenant_id: Optional[str] = Header(None, alias="X-Tenant-ID")):
+    """
+    Batch entrypoint. Streams one BatchDecisionItemResponse per line (NDJSON) as items finish.
+
+    Policies are resolved once per batch and hard constraints run over every item before any LLM call.
+    Surviving items fan out to the LLM stages under a concurrency limit. All traces are persisted in a
+    single bulk write; ACT items are held back until that write commits and are revoked if it fails.
+    The surviving items are admitted by the token governor as a whole, or the batch is answered with 429.
+    An item whose LLM stages fail is answered (and traced) as ABSTAIN; the rest of the batch carries on.
+    """
+    start_time = time.perf_counter()
+
+    # Resolve every referenced policy once; the whole batch runs on these snapshots
+    policies: Dict[str, PolicySnapshot] = {}
+    with stage("policy_lookup"):
+        for item in batch.items:
+            policy_id = item.policy_id or "default"
+            if policy_id not in policies:
+                snapshot = policy_manager.get_snapshot(policy_id)
+                if not snapshot:
+                    raise HTTPException(status_code=404, detail=f"Policy {policy_id} not found")
+                policies[policy_id] = snapshot
+
+    trace_ids = [str(uuid.uuid4()) for _ in batch.items]
+    logger.info("batch_decision_requested", size=len(batch.items), policies=list(policies))
+
+    # 0. Deterministic Hard Constraints over the whole batch (vectorized per policy)
+    blocked: List[Tuple[int, Dict[str, Any]]] = []
+    surviving: List[int] = []
+    for policy_id, snapshot in policies.items():
+        indices = [i for i, item in enumerate(batch.items) if (item.policy_id or "default") == policy_id]
+        contexts = [batch.items[i].context for i in indices]
+        signals = [batch.items[i].signals for i in indices]
+        program = snapshot.hard_constraints
+        with stage("hard_constraints", policy_id=policy_id, items=len(indices)):
+            violations, rule_ids = program.check_batch(**program.columns_from_records(contexts, signals))
+        for offset, index in enumerate(indices):
+            if violations[offset]:
+                rationale = program.message(rule_ids[offset], contexts[offset], signals[offset])
+                blocked.append((index, hard_constraint_abstain(trace_ids[index], policy_id, rationale)))
+                decision_latency_seconds.labels(policy_id=policy_id).observe(time.perf_counter() - start_time)
+            else:
+                surviving.append(index)
+
+    # Token governor: every surviving item is admitted up front, per policy
+    admissions: Dict[str, Optional[Admission]] = {}
+    try:
+        for policy_id, snapshot in policies.items():
+            count = sum(1 for index in surviving if (batch.items[index].policy_id or "default") == policy_id)
+            if count:
+                admissions[policy_id] = await _admit(policy_id, snapshot, tenant_id, count)
+    except HTTPException:
+        for admission in admissions.values():
+            await rate_governor.refund(admission)
+        raise
+
+    def line(index: int, result: Dict[str, Any]) -> bytes:
+        result["trace_id"] = trace_ids[index]
+        item = BatchDecisionItemResponse(index=index, **result)
+        return (item.model_dump_json() + "\n").encode("utf-8")
+
+    async def stream():
+        for index, result in blocked:
+            yield line(index, result)
+
+        semaphore = asyncio.Semaphore(batch.max_concurrency)
+
+        async def run(index: int):
+            item = batch.items[index]
+            policy_id = item.policy_id or "default"
+            async with semaphore:
+                started = time.perf_counter()
+                timings = start_timings()
+                with span("decide", trace_id=trace_ids[index], policy_id=policy_id, batch_index=index):
+                    try:
+                        evidence_result, decision_result, llm_calls, budget = await run_llm_stages(item, policies[policy_id])
+                    except Exception as e:
+                        # One failed item must not abort the rest of the batch: it is answered (and traced) as ABSTAIN
+                        logger.error("batch_item_failed", trace_id=trace_ids[index], error=str(e))
+                        evidence_result, decision_result, llm_calls, budget = {}, llm_failure_abstain(e), [], None
+            decisions_total.labels(decision_outcome=decision_result.get("decision", "ABSTAIN"), policy_id=policy_id).inc()
+            return index, evidence_result, decision_result, llm_calls, timings, budget, started
+
+        tasks = [asyncio.create_task(run(index)) for index in surviving]
+        traces: List[Tuple[str, Dict[str, Any], str]] = []
+        held_acts: List[Tuple[int, Dict[str, Any]]] = []
+        started_at: Dict[int, float] = {}
+        used_tokens: Dict[str, int] = {policy_id: 0 for policy_id in policies}
+        completed: Dict[str, int] = {policy_id: 0 for policy_id in policies}
+        try:
+            # 1-2. LLM stages; non-ACT outcomes stream immediately
+            for finished in asyncio.as_completed(tasks):
+                index, evidence_result, decision_result, llm_calls, timings, budget, started_at[index] = await finished
+                policy_id = batch.items[index].policy_id or "default"
+                snapshot = policies[policy_id]
+                if budget is not None:
+                    used_tokens[policy_id] += budget.spent_tokens
+                    completed[policy_id] += 1
+                traces.append((trace_ids[index], _trace_data(batch.items[index], snapshot, evidence_result, decision_result, llm_calls, timings, budget), snapshot.version))
+                if decision_result.get("decision") == "ACT":
+                    held_acts.append((index, decision_result))
+                else:
+                    yield line(index, decision_result)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Failed items are left out of the settlement, so their admitted tokens go back
+            for policy_id, admission in admissions.items():
+                if completed[policy_id]:
+                    await rate_governor.settle(admission, used_tokens[policy_id], decisions=completed[policy_id])
+                else:
+                    await rate_governor.refund(admission)
+
+            # 3. Bulk Trace Logging (Immutable); ACTs are released only after it commits. Runs even when the
+            # stream is cut short (client gone), since the decisions sent so far must all be on record.
+            if traces:
+                try:
+                    with stage("trace_write", items=len(traces)):
+                        await trace_store.log_traces(traces)
+                except Exception as e:
+                    logger.error("batch_trace_logging_failed", error=str(e), count=len(traces))
+                    for index, decision_result in held_acts:
+                        _revoke_act(decision_result, trace_ids[index])
+
+        # Per item: from the start of its LLM stages until its trace is written
+        finished_at = time.perf_counter()
+        for index, started in started_at.items():
+            decision_latency_seconds.labels(policy_id=batch.items[index].policy_id or "default").observe(finished_at - started)
+
+        for index, decision_result in held_acts:
+            yield line(index, decision_result)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
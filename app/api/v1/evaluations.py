@@ -1,6 +1,11 @@
 import structlog
-from fastapi import APIRouter, Query
+from datetime import date
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from app.api.deps import require_admin
 from app.evaluation.calibration import calibration_loop, CalibrationMetrics
+from app.evaluation.reliability import reliability_evaluator, ReliabilityReport
+from app.evaluation.ingest import IngestReport, OutcomeFileError, iter_body_lines, outcome_ingestor
 
 router = APIRouter()
 logger = structlog.get_logger()
@@ -8,11 +13,54 @@ logger = structlog.get_logger()
 @router.get("/calibration", response_model=CalibrationMetrics)
 async def get_calibration_report(
     limit: int = Query(100, ge=1, le=1000),
+    start: Optional[date] = Query(None, description="First decision date (UTC) of the window"),
+    end: Optional[date] = Query(None, description="Last decision date (UTC) of the window, inclusive"),
+    policy_id: Optional[str] = None,
 ):
     """
     Triggers a calibration analysis on historical decision traces.
     Returns metrics on False ACT rates, confidence calibration, and overconfidence penalties.
+    With `start`/`end`, metrics cover every decision in that window and are served from the daily rollup;
+    otherwise they cover the `limit` most recently evaluated decisions.
     """
-    logger.info("calibration_report_requested", limit=limit)
-    metrics = await calibration_loop.run_calibration(limit=limit)
+    logger.info("calibration_report_requested", limit=limit, start=start, end=end, policy_id=policy_id)
+    if start or end:
+        start = start or date.min
+        end = end or date.max
+        if start > end:
+            raise HTTPException(status_code=422, detail="start must not be after end")
+        return await calibration_loop.window_calibration(start, end, policy_id=policy_id)
+    metrics = await calibration_loop.run_calibration(limit=limit, policy_id=policy_id)
     return metrics
+
+@router.get("/calibration/reliability", response_model=ReliabilityReport)
+async def get_reliability_report(
+    start: Optional[date] = Query(None, description="First decision date (UTC)"),
+    end: Optional[date] = Query(None, description="Last decision date (UTC), inclusive"),
+    policy_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, description="Most recent evaluated decisions only"),
+    bins: int = Query(10, ge=2, le=100),
+):
+    """
+    Reliability diagram and calibration errors (Brier, ECE, MCE), overall and per policy, model and decision.
+    """
+    logger.info("reliability_report_requested", start=start, end=end, policy_id=policy_id, limit=limit, bins=bins)
+    return await reliability_evaluator.run(n_bins=bins, start=start, end=end, policy_id=policy_id, limit=limit)
+
+@router.post("/outcomes/bulk", response_model=IngestReport, dependencies=[Depends(require_admin)])
+async def ingest_outcomes(
+    request: Request,
+    input_format: Optional[Literal["ndjson", "csv"]] = Query(None, alias="format", description="Default: csv for a text/csv body, otherwise ndjson"),
+    batch_size: Optional[int] = Query(None, ge=1, description="Records per transaction (default OUTCOME_INGEST_BATCH_SIZE)"),
+):
+    """
+    Ingests ground-truth outcomes streamed in the request body, one per line (NDJSON, or CSV with a header),
+    and updates the calibration rollup. See app/evaluation/ingest.py for the record fields.
+    Malformed records and unknown trace ids are rejected and listed in the report; the rest are ingested.
+    """
+    fmt = input_format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    logger.info("outcome_ingest_requested", format=fmt, batch_size=batch_size)
+    try:
+        return await outcome_ingestor.ingest(iter_body_lines(request.stream()), fmt, batch_size)
+    except OutcomeFileError as e:
+        raise HTTPException(status_code=422, detail=str(e))
@@ -0,0 +1,86 @@
+import structlog
+import uuid
+from datetime import datetime
+from typing import List, Literal, Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.core.schemas import DecisionOutcome, SimilarTrace, TraceRecord, TraceSearchResponse, TraceSummary
+from app.trace_store.search import semantic_search, audit_search
+from app.trace_store.store import trace_store
+
+router = APIRouter()
+logger = structlog.get_logger()
+
+@router.get("/traces/similar", response_model=List[SimilarTrace])
+async def find_similar_traces(
+    q: str = Query(..., min_length=1, description="Text to compare rationales against"),
+    k: int = Query(5, ge=1, le=100),
+    policy_id: Optional[str] = None,
+    decision: Optional[DecisionOutcome] = None,
+):
+    """
+    Top-k decision traces whose rationale is most similar to `q`, with similarity scores.
+    """
+    results = await semantic_search.find_similar_rationales(
+        q,
+        limit=k,
+        policy_id=policy_id,
+        decision=decision.value if decision else None
+    )
+    return [
+        SimilarTrace(
+            trace_id=str(r["id"]),
+            score=float(r["score"]),
+            decision=r["decision"],
+            policy_id=r["policy_id"],
+            rationale=r["rationale"],
+            created_at=r["created_at"]
+        )
+        for r in results
+    ]
+
+@router.get("/traces/search", response_model=TraceSearchResponse)
+async def search_traces(
+    q: Optional[str] = Query(None, min_length=1, description="Keyword(s) to find in the rationale"),
+    match: Literal["words", "substring"] = Query("words", description="words: full-text (stemmed, supports quotes/OR/-); substring: case-insensitive fragment"),
+    decision: Optional[DecisionOutcome] = None,
+    policy_id: Optional[str] = None,
+    start: Optional[datetime] = Query(None, description="Created at or after"),
+    end: Optional[datetime] = Query(None, description="Created before"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    """
+    Audit search over decision traces, newest first, with keyset pagination.
+    """
+    try:
+        page = await audit_search.search(
+            query=q,
+            match=match,
+            decision=decision.value if decision else None,
+            policy_id=policy_id,
+            start=start,
+            end=end,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return TraceSearchResponse(
+        items=[TraceSummary(trace_id=str(item.pop("id")), **item) for item in page["items"]],
+        next_cursor=page["next_cursor"]
+    )
+
+@router.get("/traces/{trace_id}", response_model=TraceRecord)
+async def get_trace(trace_id: uuid.UUID):
+    """
+    One full decision trace, from the hot table or the archive, with its policy and prompts rehydrated.
+    """
+    trace = await trace_store.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found")
+    return TraceRecord(
+        trace_id=str(trace["id"]),
+        created_at=trace["created_at"],
+        policy_version=trace["policy_version"],
+        trace_data=trace["trace_data"]
+    )
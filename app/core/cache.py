@@ -0,0 +1,137 @@
+import json
+import time
+import structlog
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+from app.observability.metrics import cache_requests_total, cache_evictions_total
+
+logger = structlog.get_logger()
+
+class LRUCache:
+    """
+    In-process cache tier: bounded by entry count (least-recently-used eviction) with per-entry TTL.
+    """
+
+    def __init__(self, name: str, max_entries: int):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            cache_evictions_total.labels(cache=self.name, tier="memory", reason="ttl").inc()
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: int):
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            cache_evictions_total.labels(cache=self.name, tier="memory", reason="lru").inc()
+
+    def delete_prefix(self, prefix: str) -> int:
+        doomed = [k for k in self._entries if k.startswith(prefix)]
+        for key in doomed:
+            del self._entries[key]
+        if doomed:
+            cache_evictions_total.labels(cache=self.name, tier="memory", reason="invalidation").inc(len(doomed))
+        return len(doomed)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class TieredCache:
+    """
+    Two-tier JSON cache: in-process LRU in front of Redis.
+    Redis is optional; on any Redis error the cache degrades to the in-process tier
+    and retries Redis after a cool-down, so a missing Redis never fails a request.
+    """
+
+    def __init__(self, name: str, max_entries: int, use_redis: bool = True, retry_after_s: float = 30.0):
+        self.name = name
+        self.memory = LRUCache(name, max_entries)
+        self.use_redis = use_redis
+        self.retry_after_s = retry_after_s
+        self._redis = None
+        self._redis_down_until = 0.0
+
+    def _client(self):
+        if not self.use_redis or time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                socket_connect_timeout=0.25,
+                socket_timeout=0.25
+            )
+        return self._redis
+
+    def _redis_failed(self, error: Exception):
+        logger.warning("cache_redis_unavailable", cache=self.name, error=str(error))
+        self._redis_down_until = time.monotonic() + self.retry_after_s
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.memory.get(key)
+        if value is not None:
+            cache_requests_total.labels(cache=self.name, tier="memory", result="hit").inc()
+            return value
+        cache_requests_total.labels(cache=self.name, tier="memory", result="miss").inc()
+
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            raw = await client.get(key)
+            ttl = await client.ttl(key) if raw is not None else -1
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+
+        if raw is None:
+            cache_requests_total.labels(cache=self.name, tier="redis", result="miss").inc()
+            return None
+        cache_requests_total.labels(cache=self.name, tier="redis", result="hit").inc()
+        value = json.loads(raw)
+        if ttl > 0:
+            self.memory.set(key, value, ttl)
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any], ttl_seconds: int):
+        self.memory.set(key, value, ttl_seconds)
+        client = self._client()
+        if client is None:
+            return
+        try:
+            await client.set(key, json.dumps(value), ex=ttl_seconds)
+        except Exception as e:
+            self._redis_failed(e)
+
+    async def delete_prefix(self, prefix: str) -> int:
+        removed = self.memory.delete_prefix(prefix)
+        client = self._client()
+        if client is None:
+            return removed
+        try:
+            keys = [key async for key in client.scan_iter(match=f"{prefix}*", count=500)]
+            if keys:
+                await client.unlink(*keys)
+                cache_evictions_total.labels(cache=self.name, tier="redis", reason="invalidation").inc(len(keys))
+            removed += len(keys)
+        except Exception as e:
+            self._redis_failed(e)
+        return removed
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
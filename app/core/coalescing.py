@@ -0,0 +1,100 @@
+import asyncio
+import copy
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from app.core.cache import TieredCache
+from app.core.config import settings
+from app.core.exceptions import IdempotencyKeyReusedError
+from app.core.prompts import compact_json
+from app.core.schemas import DecisionRequest
+
+KEY_PREFIX = "dt:idem"
+
+def request_fingerprint(request: DecisionRequest) -> str:
+    """
+    Canonical hash of what a decision depends on besides the policy: policy id, context and signals.
+    """
+    canonical = compact_json([request.policy_id or "default", request.context, request.signals])
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+@dataclass
+class Flight:
+    leader_id: str
+    future: asyncio.Future
+    followers: int = 0
+
+class SingleFlight:
+    """
+    At most one run per key at a time: callers arriving while a run is in flight wait for it and share its
+    result instead of starting their own. Keys are only held while in flight; nothing is cached afterwards.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def run(self, key: str, caller_id: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, Optional[str]]:
+        """
+        Returns (result, leader_id): leader_id is None if this caller ran `fn` itself, otherwise the id of the
+        caller whose run it shared, and the result is the caller's own deep copy. An exception raised by the
+        leader's run is raised to its followers too; if the leader is cancelled, a follower takes over.
+        """
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                break
+            flight.followers += 1
+            await asyncio.wait({flight.future})
+            if not flight.future.cancelled():
+                return copy.deepcopy(flight.future.result()), flight.leader_id
+
+        flight = self._flights[key] = Flight(caller_id, asyncio.get_running_loop().create_future())
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            flight.future.cancel()
+            raise
+        except BaseException as e:
+            flight.future.set_exception(e)
+            flight.future.exception()  # retrieved: followers re-raise it, none is no error
+            raise
+        finally:
+            del self._flights[key]
+        # Followers resume after the leader has gone on to change its result (trace_id, ACT revocation)
+        flight.future.set_result(copy.deepcopy(result) if flight.followers else result)
+        return result, None
+
+class IdempotencyStore:
+    """
+    Responses to requests sent with an Idempotency-Key header, per tenant, so that a client retry gets the
+    original answer (and trace_id) instead of a new decision. A key sent again with a different request is
+    refused with IdempotencyKeyReusedError.
+    """
+
+    def __init__(self):
+        self.store = TieredCache(
+            name="idempotency",
+            max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+            use_redis=settings.IDEMPOTENCY_BACKEND == "redis"
+        )
+
+    @staticmethod
+    def make_key(tenant: str, key: str) -> str:
+        return f"{KEY_PREFIX}:{tenant}:{hashlib.sha256(key.encode('utf-8')).hexdigest()}"
+
+    async def get(self, tenant: str, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        entry = await self.store.get(self.make_key(tenant, key))
+        if entry is None:
+            return None
+        if entry["fingerprint"] != fingerprint:
+            raise IdempotencyKeyReusedError(key)
+        return entry["response"]
+
+    async def set(self, tenant: str, key: str, fingerprint: str, response: Dict[str, Any]):
+        await self.store.set(self.make_key(tenant, key), {"fingerprint": fingerprint, "response": response}, settings.IDEMPOTENCY_TTL_SECONDS)
+
+decision_flights = SingleFlight()
+idempotency_store = IdempotencyStore()
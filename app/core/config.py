@@ -1,27 +1,153 @@
-from typing import Literal
+import os
+from pathlib import Path
+from typing import Dict, Literal, Optional, Tuple
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# Repository root: relative data directories are resolved against it rather than the working directory
+ROOT_DIR = str(Path(__file__).resolve().parents[2])
+
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "DecisionTrace"
     LOG_LEVEL: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = "INFO"
 
+    # Data directories; relative paths are taken from BASE_DIR (see `path`)
+    BASE_DIR: str = ROOT_DIR
+    POLICIES_DIR: str = "policies"
+    PROMPTS_DIR: str = "prompts"
+
+    # Serving processes (config/gunicorn.conf.py sets this to its worker count)
+    WEB_CONCURRENCY: int = 1
+
     POSTGRES_SERVER: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
     POSTGRES_PORT: int = 5432
+    # Connection pool (per API worker process)
+    DB_POOL_MIN_SIZE: int = 5
+    DB_POOL_MAX_SIZE: int = 20
+    # Connections all API workers may hold together; if set, each worker's pool is an equal share of it
+    # instead of DB_POOL_MAX_SIZE (see `db_pool_sizes`)
+    DB_MAX_CONNECTIONS: int = 0
+    DB_POOL_MAX_INACTIVE_LIFETIME_S: float = 300.0
+    DB_STATEMENT_CACHE_SIZE: int = 1024 # asyncpg's per-connection cache for ad-hoc statements
+    DB_COMMAND_TIMEOUT_S: float = 30.0
 
     REDIS_HOST: str
     REDIS_PORT: int = 6379
 
+    # LLM response cache (policies opt in via their `response_cache` section)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_BACKEND: Literal["redis", "memory"] = "redis"
+    LLM_CACHE_MAX_ENTRIES: int = 10000
+    LLM_CACHE_TTL_SECONDS: int = 300
+
+    # Duplicate decision requests: identical in-flight requests share one pipeline run, and results are
+    # stored per Idempotency-Key so client retries get the original answer
+    DECISION_COALESCING_ENABLED: bool = True
+    IDEMPOTENCY_BACKEND: Literal["redis", "memory"] = "redis"
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+
+    # Write-behind trace writer (group commit)
+    TRACE_WRITER_ENABLED: bool = True
+    TRACE_WRITER_QUEUE_SIZE: int = 10000
+    TRACE_WRITER_BATCH_SIZE: int = 500
+    TRACE_WRITER_FLUSH_INTERVAL_MS: int = 2
+    # Trace codec: free-text fields at least this long are stored zlib-compressed
+    TRACE_COMPRESS_MIN_CHARS: int = 1024
+    # Store each decision's raw model responses in its trace (`llm_calls`), so it can be replayed offline
+    TRACE_RECORD_LLM_CALLS: bool = True
+
+    # Time-partitioned traces: partition maintenance, retention and the cold archive
+    TRACE_PARTITION_INTERVAL: Literal["day", "month"] = "month"
+    TRACE_PARTITIONS_AHEAD: int = 3
+    TRACE_RETENTION_DAYS: int = 0 # partitions entirely older than this are archived, then dropped (0 keeps everything hot)
+    TRACE_ARCHIVE_DIR: str = "archive/decision_trace"
+    TRACE_ARCHIVE_FORMAT: Literal["jsonl", "parquet"] = "jsonl" # parquet requires pyarrow
+    TRACE_MAINTENANCE_INTERVAL_S: float = 3600.0 # 0 disables the maintenance worker; partitions must then be created on a schedule (migration 005)
+
+    # Rationale embeddings for semantic trace search (EMBEDDING_DIM must match the migration)
+    EMBEDDER: str = "hashing" # hashing | sentence_transformers
+    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2" # sentence_transformers only
+    EMBEDDING_DIM: int = 256
+    EMBEDDING_BACKFILL_BATCH_SIZE: int = 256
+    EMBEDDING_BACKFILL_INTERVAL_S: float = 5.0 # 0 disables the backfill worker
+    EMBEDDING_SWEEP_INTERVAL_S: float = 3600.0 # how often the worker also embeds traces missed by its incremental rounds (0 disables)
+
+    # Bulk outcome ingestion (app/evaluation/ingest.py): records per COPY + upsert transaction
+    OUTCOME_INGEST_BATCH_SIZE: int = 50000
+
+    # OpenTelemetry spans per decision stage, exported over OTLP/HTTP (requires the `tracing` extra); unset disables export
+    OTEL_EXPORTER_OTLP_ENDPOINT: Optional[str] = None # e.g. http://localhost:4318
+    OTEL_SERVICE_NAME: str = "decisiontrace"
+    OTEL_TRACES_SAMPLE_RATIO: float = 1.0
+
+    # Policy registry: poll interval for hot reload (0 disables the watcher)
+    POLICY_WATCH_INTERVAL_S: float = 5.0
+    # Required as X-Admin-Token on admin endpoints; they answer 403 while it is unset
+    ADMIN_TOKEN: Optional[str] = None
+
     # Default to a dummy key if not set, to allow app startup for basic testing
     ANTHROPIC_API_KEY: str = "sk-dummy"
+    # Override the provider endpoint (e.g. a proxy or a local fake server in tests)
+    ANTHROPIC_BASE_URL: Optional[str] = None
+
+    # LLM gateway: per-model concurrency, adaptive timeout, retry budget
+    LLM_MAX_CONCURRENCY: int = 32
+    LLM_MODEL_CONCURRENCY: Dict[str, int] = {} # per-model override, e.g. {"claude-3-5-haiku-20241022": 64}
+    LLM_TIMEOUT_DEFAULT_S: float = 10.0 # used until enough latency samples exist
+    LLM_TIMEOUT_MIN_S: float = 2.0
+    LLM_TIMEOUT_MAX_S: float = 30.0
+    LLM_TIMEOUT_P99_MULTIPLIER: float = 2.0
+    LLM_LATENCY_MIN_SAMPLES: int = 20
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BUDGET_RATIO: float = 0.1 # retries allowed per request, averaged over traffic
+    LLM_RETRY_BUDGET_MIN: float = 10.0
+    LLM_RETRY_BACKOFF_BASE_S: float = 0.2
+    LLM_RETRY_BACKOFF_MAX_S: float = 2.0
+
+    # Cost accounting: USD per million tokens per model, overriding app/core/costs.py, e.g.
+    # {"claude-3-5-haiku-20241022": {"input": 0.8, "output": 4.0, "cache_read": 0.08}}
+    LLM_PRICES: Dict[str, Dict[str, float]] = {}
+
+    # Token-bucket governor on LLM tokens per policy and tenant (X-Tenant-ID); policies can override
+    # the rate and burst in their `rate_limit` section
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: Literal["redis", "memory"] = "redis" # memory: per worker process
+    RATE_LIMIT_TOKENS_PER_MINUTE: int = 400000
+    RATE_LIMIT_BURST_TOKENS: int = 100000
+    RATE_LIMIT_DEFAULT_DECISION_TOKENS: int = 4000 # admission estimate until a policy's decisions have been observed
+
+    # "fake" replaces the provider with recorded responses, simulated latency and injected failures
+    # (app/llm_gateway/fake.py), for load tests and benchmarks without an API key
+    LLM_BACKEND: Literal["anthropic", "fake"] = "anthropic"
+    LLM_FAKE_RESPONSES: Optional[str] = None # JSON lines of recorded calls or exported traces
+    LLM_FAKE_LATENCY: str = "lognormal:800:0.5" # fixed:MS | uniform:LOW_MS:HIGH_MS | lognormal:MEDIAN_MS:SIGMA
+    LLM_FAKE_STAGE_LATENCY: Dict[str, str] = {} # per stage, e.g. {"shadow": "lognormal:400:0.5"}
+    LLM_FAKE_FAILURES: Dict[str, float] = {} # probability per kind, e.g. {"529": 0.02, "timeout": 0.005}
+    LLM_FAKE_SEED: Optional[int] = None
 
     model_config = SettingsConfigDict(
-        env_file=".env",
+        env_file=(os.path.join(ROOT_DIR, ".env"), ".env"),
         env_ignore_empty=True,
         extra="ignore",
     )
 
+    def path(self, directory: str) -> str:
+        """
+        `directory` made absolute against BASE_DIR (absolute paths are returned unchanged).
+        """
+        return os.path.join(self.BASE_DIR, directory)
+
+    def db_pool_sizes(self) -> Tuple[int, int]:
+        """
+        (min_size, max_size) of this process' connection pool.
+        """
+        max_size = self.DB_POOL_MAX_SIZE
+        if self.DB_MAX_CONNECTIONS:
+            max_size = max(1, self.DB_MAX_CONNECTIONS // max(1, self.WEB_CONCURRENCY))
+        return min(self.DB_POOL_MIN_SIZE, max_size), max_size
+
 settings = Settings()
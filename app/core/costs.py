@@ -0,0 +1,233 @@
+import math
+import re
+import time
+import structlog
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.exceptions import BudgetExceededError
+from app.observability.metrics import budget_exceeded_total, llm_cost_usd_total
+
+logger = structlog.get_logger()
+
+# USD per million tokens. Unknown models are priced as the most expensive entry, so a missing price
+# can only make a budget stricter. LLM_PRICES overrides or extends this table.
+DEFAULT_PRICES_PER_MTOK: Dict[str, Dict[str, float]] = {
+    "claude-3-5-sonnet-20240620": {"input": 3.0, "output": 15.0, "cache_read": 0.30},
+    "claude-3-5-sonnet-20241022": {"input": 3.0, "output": 15.0, "cache_read": 0.30},
+    "claude-3-5-haiku-20241022": {"input": 0.80, "output": 4.0, "cache_read": 0.08},
+    "claude-3-haiku-20240307": {"input": 0.25, "output": 1.25, "cache_read": 0.03},
+    "claude-3-opus-20240229": {"input": 15.0, "output": 75.0, "cache_read": 1.50},
+}
+
+# Expected output per call until a model has been observed (responses are one small JSON object).
+DEFAULT_OUTPUT_TOKENS = 300
+
+# BPE-style pre-tokenization: letter runs, up to three digits, punctuation runs, whitespace runs (a leading
+# space is merged into the following piece, as BPE vocabularies do). Each piece is roughly one token; long
+# words and non-ASCII characters are counted extra.
+_PIECES = re.compile(r" ?[A-Za-z]+| ?\d{1,3}| ?[^\sA-Za-z\d]+|\s+")
+_LONG_WORDS = re.compile(r"[A-Za-z]{8,}")
+_NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+class TokenCounter:
+    """
+    Local token count estimate for prompts, used to check budgets before a call. Claude's tokenizer is not
+    available offline, so this approximates its BPE from the pre-tokenized pieces. Estimation error only
+    decides whether a call is admitted: budgets are settled with the provider's reported usage.
+    """
+
+    @staticmethod
+    def count(text: Optional[str]) -> int:
+        if not text:
+            return 0
+        return len(_PIECES.findall(text)) + len(_LONG_WORDS.findall(text)) + len(_NON_ASCII.findall(text))
+
+    def count_static(self, text: Optional[str]) -> int:
+        """
+        `count` for text repeated across requests (system prompts, per-policy static prefixes).
+        """
+        return _count_static(text)
+
+# Module-level so the cache is keyed by the text alone and holds no reference to a counter instance
+@lru_cache(maxsize=512)
+def _count_static(text: Optional[str]) -> int:
+    return TokenCounter.count(text)
+
+class PriceTable:
+    def __init__(self, prices: Optional[Dict[str, Dict[str, float]]] = None):
+        self.prices = {**DEFAULT_PRICES_PER_MTOK, **(prices or {})}
+        self.fallback = max(self.prices.values(), key=lambda price: price["output"])
+
+    def price(self, model: str) -> Dict[str, float]:
+        return self.prices.get(model, self.fallback)
+
+    def cost_usd(self, model: str, input_tokens: int, output_tokens: int, cache_read_tokens: int = 0) -> float:
+        """
+        `input_tokens` excludes cache reads, as in the provider's usage report.
+        """
+        price = self.price(model)
+        return (
+            input_tokens * price["input"]
+            + output_tokens * price["output"]
+            + cache_read_tokens * price.get("cache_read", price["input"])
+        ) / 1_000_000
+
+@dataclass
+class Reservation:
+    budget: "DecisionBudget"
+    stage: str
+    tokens: int
+    cost_usd: float
+    settled: bool = False
+
+    def release(self):
+        """
+        Returns the reserved amount unused (the call failed or was cancelled). A no-op once settled.
+        """
+        if self.settled:
+            return
+        self.settled = True
+        self.budget.reserved_tokens -= self.tokens
+        self.budget.reserved_usd -= self.cost_usd
+
+    def settle(self, tokens: int, cost_usd: float):
+        """
+        Replaces the reservation with the call's actual usage.
+        """
+        self.release()
+        self.budget.spent_tokens += tokens
+        self.budget.spent_usd += cost_usd
+
+class DecisionBudget:
+    """
+    What one decision may spend across all of its stages, from the policy's `cost_limits`:
+    `max_tokens_per_decision`, `max_cost_usd` and `max_latency_ms` (each optional).
+
+    Every model call reserves its estimated tokens and cost before it is sent and is refused with
+    BudgetExceededError if the reservation, on top of what is spent or reserved, would break a limit;
+    the latency limit refuses a call once the decision has run for longer than the limit minus the
+    model's typical latency. Reservations are replaced by the actual usage when the call returns, so
+    concurrent stages (a concurrent shadow) are accounted for correctly.
+    """
+
+    def __init__(self, policy_id: str, max_tokens: Optional[int] = None, max_cost_usd: Optional[float] = None, max_latency_ms: Optional[float] = None):
+        self.policy_id = policy_id
+        self.max_tokens = max_tokens
+        self.max_cost_usd = max_cost_usd
+        self.max_latency_ms = max_latency_ms
+        self.started = time.perf_counter()
+        self.spent_tokens = 0
+        self.spent_usd = 0.0
+        self.reserved_tokens = 0
+        self.reserved_usd = 0.0
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def _refuse(self, stage: str, limit: str, detail: str):
+        budget_exceeded_total.labels(policy_id=self.policy_id, stage=stage, limit=limit).inc()
+        logger.warning("decision_budget_exceeded", policy_id=self.policy_id, stage=stage, limit=limit, detail=detail)
+        raise BudgetExceededError(stage, limit, detail)
+
+    def reserve(self, stage: str, tokens: int, cost_usd: float, expected_latency_ms: float = 0.0) -> Reservation:
+        if self.max_tokens is not None and self.spent_tokens + self.reserved_tokens + tokens > self.max_tokens:
+            self._refuse(stage, "tokens", f"{self.spent_tokens + self.reserved_tokens} spent or reserved + {tokens} estimated > {self.max_tokens}")
+        if self.max_cost_usd is not None and self.spent_usd + self.reserved_usd + cost_usd > self.max_cost_usd:
+            self._refuse(stage, "cost", f"${self.spent_usd + self.reserved_usd:.4f} spent or reserved + ${cost_usd:.4f} estimated > ${self.max_cost_usd}")
+        if self.max_latency_ms is not None and self.elapsed_ms() + expected_latency_ms > self.max_latency_ms:
+            self._refuse(stage, "latency", f"{self.elapsed_ms():.0f}ms elapsed + {expected_latency_ms:.0f}ms expected > {self.max_latency_ms}ms")
+        self.reserved_tokens += tokens
+        self.reserved_usd += cost_usd
+        return Reservation(self, stage, tokens, cost_usd)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "tokens": self.spent_tokens,
+            "cost_usd": round(self.spent_usd, 6),
+            "limits": {"tokens": self.max_tokens, "cost_usd": self.max_cost_usd, "latency_ms": self.max_latency_ms},
+        }
+
+_budget: ContextVar[Optional[DecisionBudget]] = ContextVar("decision_budget", default=None)
+
+class CostModel:
+    """
+    Token estimates, prices and per-decision budgets for the LLM stages.
+    """
+
+    def __init__(self, smoothing: float = 0.1):
+        self.tokens = TokenCounter()
+        self.prices = PriceTable(settings.LLM_PRICES)
+        self.smoothing = smoothing
+        # model -> running average of output tokens per call
+        self._output_tokens: Dict[str, float] = {}
+
+    def expected_output_tokens(self, model: str, max_tokens: int) -> int:
+        return min(max_tokens, math.ceil(self._output_tokens.get(model, DEFAULT_OUTPUT_TOKENS)))
+
+    def observe(self, model: str, input_tokens: int, output_tokens: int, cache_read_tokens: int = 0) -> float:
+        """
+        Folds a completed call into the output estimate and the cost counter. Returns its cost.
+        """
+        average = self._output_tokens.get(model)
+        self._output_tokens[model] = float(output_tokens) if average is None else average + self.smoothing * (output_tokens - average)
+        cost_usd = self.prices.cost_usd(model, input_tokens, output_tokens, cache_read_tokens)
+        llm_cost_usd_total.labels(model=model).inc(cost_usd)
+        return cost_usd
+
+    def estimate_call(self, model: str, system_prompt: str, static_prefix: Optional[str], prompt: str, max_tokens: int) -> Tuple[int, int, float]:
+        """
+        (input_tokens, output_tokens, cost_usd) expected for one call, priced without prompt caching.
+        """
+        input_tokens = self.tokens.count_static(system_prompt) + self.tokens.count_static(static_prefix) + self.tokens.count(prompt)
+        output_tokens = self.expected_output_tokens(model, max_tokens)
+        return input_tokens, output_tokens, self.prices.cost_usd(model, input_tokens, output_tokens)
+
+    def reserve(self, stage: str, model: str, system_prompt: str, static_prefix: Optional[str], prompt: str, max_tokens: int, expected_latency_ms: float = 0.0) -> Optional[Reservation]:
+        """
+        Reserves one call against the current decision's budget (raising BudgetExceededError if it does not
+        fit); None outside a budgeted decision.
+        """
+        budget = _budget.get()
+        if budget is None:
+            return None
+        input_tokens, output_tokens, cost_usd = self.estimate_call(model, system_prompt, static_prefix, prompt, max_tokens)
+        return budget.reserve(stage, input_tokens + output_tokens, cost_usd, expected_latency_ms)
+
+    def pipeline_cost_usd(self, policy: Optional[Dict[str, Any]], planner_model: str, input_tokens: int, max_tokens: int = 1000) -> float:
+        """
+        Expected cost of every model call a decision makes: the planner, the primary and (if enabled) the
+        shadow. The engine's prompt is taken to be the planner's plus the planner's output.
+        """
+        shadow = (policy or {}).get("asymmetric_shadow", {})
+        planner_output = self.expected_output_tokens(planner_model, max_tokens)
+        cost_usd = self.prices.cost_usd(planner_model, input_tokens, planner_output)
+        engine_models = [shadow.get("primary_model", "claude-3-5-sonnet-20240620")]
+        if shadow.get("enabled", True):
+            engine_models.append(shadow.get("shadow_model", "claude-3-5-haiku-20241022"))
+        for model in engine_models:
+            cost_usd += self.prices.cost_usd(model, input_tokens + planner_output, self.expected_output_tokens(model, max_tokens))
+        return cost_usd
+
+    @staticmethod
+    def start_budget(policy_id: str, policy: Optional[Dict[str, Any]]) -> DecisionBudget:
+        """
+        Starts the budget for the decision running in the current task (and the tasks it starts).
+        """
+        limits = (policy or {}).get("cost_limits", {})
+        budget = DecisionBudget(
+            policy_id,
+            max_tokens=limits.get("max_tokens_per_decision"),
+            max_cost_usd=limits.get("max_cost_usd"),
+            max_latency_ms=limits.get("max_latency_ms")
+        )
+        _budget.set(budget)
+        return budget
+
+    @staticmethod
+    def current_budget() -> Optional[DecisionBudget]:
+        return _budget.get()
+
+cost_model = CostModel()
@@ -13,3 +13,25 @@ class PolicyLoadError(DecisionTraceError):
 class TracePersistenceError(DecisionTraceError):
     """Raised when the decision trace cannot be written to immutable storage."""
     pass
+
+class BudgetExceededError(DecisionTraceError):
+    """Raised before a model call that would take a decision over its token, cost or latency budget."""
+
+    def __init__(self, stage: str, limit: str, detail: str):
+        super().__init__(f"{stage}: {limit} budget exceeded ({detail})")
+        self.stage = stage
+        self.limit = limit
+
+class RateLimitedError(DecisionTraceError):
+    """Raised when a policy/tenant token bucket cannot admit a decision."""
+
+    def __init__(self, retry_after_s: float):
+        super().__init__(f"Rate limited, retry after {retry_after_s:.1f}s")
+        self.retry_after_s = retry_after_s
+
+class IdempotencyKeyReusedError(DecisionTraceError):
+    """Raised when an Idempotency-Key is sent again with a different request."""
+
+    def __init__(self, key: str):
+        super().__init__(f"Idempotency-Key {key!r} was already used for a different request")
+        self.key = key
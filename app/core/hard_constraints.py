@@ -1,44 +1,288 @@
-from typing import Dict, Any, Optional, Tuple
+import math
+import operator
+from typing import Dict, Any, List, Optional, Tuple
 import structlog
+from app.core.exceptions import PolicyLoadError
 
 logger = structlog.get_logger()
 
-class HardConstraints:
+# Operators available to declared predicates. A predicate that evaluates True is a violation.
+PREDICATE_OPERATORS = {
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "lt": operator.lt,
+    "le": operator.le,
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "in": lambda a, b: a in b,
+    "not_in": lambda a, b: a not in b,
+}
+
+_MISSING = object()
+
+def _resolve(path: Tuple[str, str], context: Dict[str, Any], signals: Dict[str, Any]) -> Any:
+    source, key = path
+    return (context if source == "context" else signals).get(key, _MISSING)
+
+def _is_nan(value: Any) -> bool:
+    return isinstance(value, float) and math.isnan(value)
+
+def _is_amount(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and not _is_nan(value)
+
+def _region(value: Any) -> str:
+    # Regions are compared as text in both modes, so a list or dict in the request is just an unlisted region.
+    return "" if value is None else str(value)
+
+class Predicate:
     """
-    Enforces deterministic, code-based safety rules that bypass the LLM.
-    Guarantees safety for known high-risk invariants.
+    A declared rule from the policy: `{field: "signals.risk_score", op: "gt", value: 0.9, reason: "..."}`.
+    Fields must be addressed as `context.<key>` or `signals.<key>`. Use op `missing` to require a field.
+    """
+
+    def __init__(self, spec: Dict[str, Any], index: int):
+        field = spec.get("field", "")
+        source, _, key = field.partition(".")
+        if source not in ("context", "signals") or not key:
+            raise PolicyLoadError(f"Predicate {index}: field must be 'context.<key>' or 'signals.<key>', got {field!r}")
+        op = spec.get("op")
+        if op != "missing" and op not in PREDICATE_OPERATORS:
+            raise PolicyLoadError(f"Predicate {index}: unsupported op {op!r}")
+
+        self.rule_id = spec.get("id", f"predicate_{index}")
+        self.field = field
+        self.path = (source, key)
+        self.op = op
+        self.value = frozenset(spec["value"]) if op in ("in", "not_in") else spec.get("value")
+        self.reason = spec.get("reason", f"{field} {op} {spec.get('value')}")
+
+    def violated(self, context: Dict[str, Any], signals: Dict[str, Any]) -> bool:
+        return self.violated_by(_resolve(self.path, context, signals))
+
+    def violated_by(self, actual: Any) -> bool:
+        if self.op == "missing":
+            return actual is _MISSING or actual is None
+        if actual is _MISSING or actual is None:
+            return False
+        if _is_nan(actual):
+            # NaN compares False against everything, which would read as safe: fail closed.
+            return True
+        try:
+            return bool(PREDICATE_OPERATORS[self.op](actual, self.value))
+        except TypeError:
+            # Incomparable types cannot prove safety: fail closed.
+            return True
+
+class ConstraintProgram:
     """
-    
+    A policy's `hard_constraints` section compiled once into an ordered rule program.
+    Rules are evaluated in a fixed order and the first violation wins, in both scalar and batch mode.
+    """
+
+    AMOUNT_INVALID = "invalid_amount"
+    AMOUNT_UNVERIFIED = "max_transaction_unverified"
+    AMOUNT_VERIFIED = "max_transaction_verified"
+    RESTRICTED_REGION = "restricted_region"
+
+    def __init__(self, config: Dict[str, Any]):
+        try:
+            self.max_unverified = float(config.get("max_transaction_unverified", 10000))
+            self.max_verified = float(config.get("max_transaction_verified", 100000))
+        except (TypeError, ValueError) as e:
+            raise PolicyLoadError(f"Invalid transaction limit: {e}")
+        self.restricted_regions = frozenset(config.get("restricted_regions", ["COUNTRY_X", "COUNTRY_Y"]))
+        self.required_context = tuple(config.get("required_context_fields", ["user_id"]))
+        self.predicates = tuple(Predicate(spec, i) for i, spec in enumerate(config.get("predicates", [])))
+
+        self.rule_ids: List[str] = [self.AMOUNT_INVALID, self.AMOUNT_UNVERIFIED, self.AMOUNT_VERIFIED, self.RESTRICTED_REGION]
+        self.rule_ids += [f"missing_{field}" for field in self.required_context]
+        self.rule_ids += [p.rule_id for p in self.predicates]
+
     @staticmethod
-    def check(context: Dict[str, Any], signals: Dict[str, Any], policy: Optional[Dict[str, Any]] = None) -> Tuple[bool, Optional[str]]:
+    def _limit(value: float) -> str:
+        return f"{int(value)}" if value.is_integer() else f"{value}"
+
+    def message(self, rule_id: str, context: Dict[str, Any], signals: Dict[str, Any]) -> str:
         """
-        Returns (is_safe, failure_rationale)
+        Renders the human-readable rationale for a violated rule.
         """
-        config = (policy or {}).get("hard_constraints", {})
-        
-        # Rule 1: High-value transactions
         amount = signals.get("amount", 0)
-        is_verified = context.get("is_verified", False)
-        
-        max_unverified = config.get("max_transaction_unverified", 10000)
-        max_verified = config.get("max_transaction_verified", 100000)
-        
-        if not is_verified and amount > max_unverified:
-            return False, f"Hard Constraint: Transaction amount ${amount} exceeds max for unverified user (${max_unverified})."
-            
-        if is_verified and amount > max_verified:
-            return False, f"Hard Constraint: Transaction amount ${amount} exceeds absolute max allowed (${max_verified})."
-            
+        if rule_id == self.AMOUNT_INVALID:
+            return f"Hard Constraint: Transaction amount {amount!r} is not a number."
+        if rule_id == self.AMOUNT_UNVERIFIED:
+            return f"Hard Constraint: Transaction amount ${amount} exceeds max for unverified user (${self._limit(self.max_unverified)})."
+        if rule_id == self.AMOUNT_VERIFIED:
+            return f"Hard Constraint: Transaction amount ${amount} exceeds absolute max allowed (${self._limit(self.max_verified)})."
+        if rule_id == self.RESTRICTED_REGION:
+            return f"Hard Constraint: Operation blocked for restricted region: {context.get('region')}"
+        if rule_id.startswith("missing_") and rule_id[len("missing_"):] in self.required_context:
+            return f"Hard Constraint: Missing mandatory {rule_id[len('missing_'):]}."
+        for predicate in self.predicates:
+            if predicate.rule_id == rule_id:
+                return f"Hard Constraint: {predicate.reason}"
+        return f"Hard Constraint: {rule_id}"
+
+    def first_violation(self, context: Dict[str, Any], signals: Dict[str, Any]) -> Optional[str]:
+        """
+        Returns the id of the first violated rule, or None if every rule passes.
+        """
+        # Rule 1: High-value transactions. An absent amount is 0; a null, non-numeric or NaN one cannot be checked.
+        amount = signals.get("amount", 0)
+        if not _is_amount(amount):
+            return self.AMOUNT_INVALID
+        if context.get("is_verified", False):
+            if amount > self.max_verified:
+                return self.AMOUNT_VERIFIED
+        elif amount > self.max_unverified:
+            return self.AMOUNT_UNVERIFIED
+
         # Rule 2: Restricted Jurisdictions
-        restricted_regions = config.get("restricted_regions", ["COUNTRY_X", "COUNTRY_Y"])
-        region = context.get("region")
-        if region in restricted_regions:
-            return False, f"Hard Constraint: Operation blocked for restricted region: {region}"
+        if _region(context.get("region")) in self.restricted_regions:
+            return self.RESTRICTED_REGION
 
         # Rule 3: Missing Critical Identity
-        if not context.get("user_id"):
-            return False, "Hard Constraint: Missing mandatory user_id."
+        for field in self.required_context:
+            if not context.get(field):
+                return f"missing_{field}"
 
-        return True, None
+        # Rule 4: Declared predicates
+        for predicate in self.predicates:
+            if predicate.violated(context, signals):
+                return predicate.rule_id
+        return None
+
+    def check(self, context: Dict[str, Any], signals: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
+        rule_id = self.first_violation(context, signals)
+        if rule_id is None:
+            return True, None
+        return False, self.message(rule_id, context, signals)
+
+    def check_batch(
+        self,
+        amounts,
+        verified,
+        regions,
+        present: Optional[Dict[str, Any]] = None,
+        columns: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Vectorized evaluation over columnar NumPy arrays.
+
+        amounts: float array, NaN where the amount is invalid (see `columns_from_records`); verified: bool array; regions: str/object array.
+        present: optional `{context_field: bool array}` for required context fields (assumed present if omitted).
+        columns: optional `{"signals.risk_score": array}` for declared predicates. Predicates without a column
+        are evaluated as missing, which only trips `missing` predicates.
+
+        Returns (violation_mask, reasons), where reasons holds the first violated rule id per row (None if safe).
+        """
+        import numpy as np
+
+        amounts = np.asarray(amounts, dtype=np.float64)
+        verified = np.asarray(verified, dtype=bool)
+        regions = np.asarray(regions)
+        n = amounts.shape[0]
+        present = present or {}
+        columns = columns or {}
+
+        masks = [
+            np.isnan(amounts),
+            ~verified & (amounts > self.max_unverified),
+            verified & (amounts > self.max_verified),
+            np.isin(regions, list(self.restricted_regions)) if self.restricted_regions else np.zeros(n, dtype=bool),
+        ]
+        for field in self.required_context:
+            masks.append(~np.asarray(present[field], dtype=bool) if field in present else np.zeros(n, dtype=bool))
+        for predicate in self.predicates:
+            column = columns.get(predicate.field)
+            if column is None:
+                masks.append(np.full(n, predicate.op == "missing"))
+                continue
+            column = np.asarray(column)
+            if column.dtype == object:
+                missing = np.fromiter((v is None for v in column), dtype=bool, count=n)
+            elif column.dtype.kind == "f":
+                missing = np.isnan(column)
+            else:
+                missing = np.zeros(n, dtype=bool)
+
+            if predicate.op == "missing":
+                masks.append(missing)
+            elif column.dtype == object:
+                # Mixed-type column: fall back to the scalar predicate (same fail-closed semantics).
+                masks.append(np.fromiter((predicate.violated_by(v) for v in column), dtype=bool, count=n))
+            elif predicate.op in ("in", "not_in"):
+                hit = np.isin(column, list(predicate.value))
+                masks.append((hit if predicate.op == "in" else ~hit) & ~missing)
+            else:
+                with np.errstate(invalid="ignore"):
+                    masks.append(np.asarray(PREDICATE_OPERATORS[predicate.op](column, predicate.value), dtype=bool) & ~missing)
+
+        stacked = np.vstack(masks)
+        violation_mask = stacked.any(axis=0)
+        first_rule = np.where(violation_mask, stacked.argmax(axis=0), len(self.rule_ids))
+        labels = np.array(self.rule_ids + [None], dtype=object)
+        return violation_mask, labels[first_rule]
+
+    def columns_from_records(self, contexts: List[Dict[str, Any]], signals: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Builds `check_batch` keyword arguments from row-oriented request dicts.
+        Values are validated here, before any NumPy conversion, so that nothing is coerced that `first_violation`
+        would reject: invalid amounts become NaN, and predicate columns holding anything but plain numbers stay
+        object arrays evaluated with the scalar predicate.
+        """
+        import numpy as np
+
+        def column(path: Tuple[str, str]):
+            values = [_resolve(path, c, s) for c, s in zip(contexts, signals)]
+            values = [None if v is _MISSING else v for v in values]
+            if all(v is None or _is_amount(v) for v in values):
+                return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            return np.array(values, dtype=object)
+
+        amounts = [s.get("amount", 0) for s in signals]
+        return {
+            "amounts": np.array([a if _is_amount(a) else np.nan for a in amounts], dtype=np.float64),
+            "verified": np.array([bool(c.get("is_verified", False)) for c in contexts], dtype=bool),
+            "regions": np.array([_region(c.get("region")) for c in contexts]),
+            "present": {field: np.array([bool(c.get(field)) for c in contexts], dtype=bool) for field in self.required_context},
+            "columns": {p.field: column(p.path) for p in self.predicates},
+        }
+
+class HardConstraints:
+    """
+    Enforces deterministic, code-based safety rules that bypass the LLM.
+    Guarantees safety for known high-risk invariants.
+    """
+
+    def __init__(self):
+        # id(policy) -> (policy, program). Holding the policy keeps the id stable for the cache's lifetime.
+        self._programs: Dict[int, Tuple[Dict[str, Any], ConstraintProgram]] = {}
+
+    def compile(self, policy: Optional[Dict[str, Any]]) -> ConstraintProgram:
+        """
+        Compiles a policy's hard_constraints section. Raises PolicyLoadError on invalid rules.
+        """
+        return ConstraintProgram((policy or {}).get("hard_constraints", {}) or {})
+
+    def program_for(self, policy: Optional[Dict[str, Any]]) -> ConstraintProgram:
+        """
+        Returns the compiled program for a policy dict, compiling it on first use.
+        """
+        if policy is None:
+            return self.compile(None)
+        cached = self._programs.get(id(policy))
+        if cached is not None and cached[0] is policy:
+            return cached[1]
+        program = self.compile(policy)
+        if len(self._programs) >= 256:
+            self._programs.clear()
+        self._programs[id(policy)] = (policy, program)
+        return program
+
+    def check(self, context: Dict[str, Any], signals: Dict[str, Any], policy: Optional[Dict[str, Any]] = None) -> Tuple[bool, Optional[str]]:
+        """
+        Returns (is_safe, failure_rationale)
+        """
+        return self.program_for(policy).check(context, signals)
 
 hard_constraints = HardConstraints()
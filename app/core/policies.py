@@ -1,33 +1,171 @@
-import yaml
+import asyncio
+import hashlib
 import os
+import time
 import structlog
-from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.core.hard_constraints import hard_constraints, ConstraintProgram
+from app.core.prompts import prompt_assembler
+from app.trace_store.codec import trace_codec
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 logger = structlog.get_logger()
 
+class PolicySnapshot:
+    """
+    One immutable, versioned policy plus the artifacts derived from it at load time.
+    Requests hold on to the snapshot they started with, so a reload never changes a decision mid-flight.
+    """
+
+    def __init__(self, policy_id: str, body: Dict[str, Any], content_hash: str):
+        self.policy_id = policy_id
+        self.body = body
+        self.content_hash = content_hash
+        # Declared version plus content hash: edits that forget to bump `version` are still distinguishable.
+        self.version = f"{body.get('version', '0')}+{content_hash[:12]}"
+        self.loaded_at = time.time()
+
+        # Precompiled artifacts
+        self.hard_constraints: ConstraintProgram = hard_constraints.program_for(body)
+        conf_config = body.get("confidence_thresholds", {})
+        self.thresholds = {
+            "act_minimum": conf_config.get("act_minimum", 0.8),
+            "abstain_maximum": conf_config.get("abstain_maximum", 0.6),
+        }
+        # Static, provider-cacheable prompt prefix per stage, rendered once instead of per request.
+        self.prompt_prefixes = prompt_assembler.static_prefixes(body)
+        # Traces reference the policy body and prompt prefixes by content hash instead of repeating them.
+        self.trace_refs = trace_codec.static_refs(body, self.prompt_prefixes)
+
 class PolicyManager:
-    def __init__(self, policies_dir: str = "policies"):
-        self.policies_dir = policies_dir
-        self.policies: Dict[str, Any] = {}
-        self.load_policies()
+    """
+    Versioned policy registry. Policies are loaded from `policies_dir` into snapshots that are swapped
+    atomically on reload, either from the directory watcher or the admin reload endpoint.
+    """
+
+    def __init__(self, policies_dir: Optional[str] = None):
+        self.policies_dir = policies_dir or settings.path(settings.POLICIES_DIR)
+        self._snapshots: Optional[Dict[str, PolicySnapshot]] = None
+        self._listeners: List[Callable[[str], Awaitable[None]]] = []
+        self._fingerprint: Optional[tuple] = None
+        self._reload_lock = asyncio.Lock()
+        self._watch_task: Optional[asyncio.Task] = None
+
+    @property
+    def snapshots(self) -> Dict[str, PolicySnapshot]:
+        """
+        Served snapshots by policy id. The directory is read on first access (or `load_policies`), so
+        importing the registry costs no file I/O.
+        """
+        if self._snapshots is None:
+            self.load_policies()
+        return self._snapshots
+
+    @property
+    def policies(self) -> Dict[str, Any]:
+        return {policy_id: snapshot.body for policy_id, snapshot in self.snapshots.items()}
+
+    def add_change_listener(self, callback: Callable[[str], Awaitable[None]]):
+        """
+        Registers an async callback invoked with the policy id whenever a policy changes or is removed.
+        """
+        self._listeners.append(callback)
+
+    async def reload(self) -> List[str]:
+        """
+        Re-reads the policies directory and notifies listeners of every changed policy.
+        """
+        async with self._reload_lock:
+            changed = self.load_policies()
+        for policy_id in changed:
+            for callback in self._listeners:
+                try:
+                    await callback(policy_id)
+                except Exception as e:
+                    logger.error("policy_listener_failed", policy_id=policy_id, error=str(e))
+        return changed
+
+    def _directory_fingerprint(self) -> tuple:
+        entries = []
+        for filename in sorted(os.listdir(self.policies_dir)):
+            if filename.endswith(".yaml") or filename.endswith(".yml"):
+                stat = os.stat(os.path.join(self.policies_dir, filename))
+                entries.append((filename, stat.st_mtime_ns, stat.st_size))
+        return tuple(entries)
+
+    def load_policies(self) -> List[str]:
+        """
+        Loads every policy file and returns the ids whose content changed.
+        Unchanged policies keep their existing snapshot; a file that fails to load or compile
+        keeps serving its last good version.
+        """
+        import yaml
 
-    def load_policies(self):
         if not os.path.exists(self.policies_dir):
             os.makedirs(self.policies_dir)
-            return
+            self._snapshots = self._snapshots or {}
+            return []
 
+        previous = self._snapshots or {}
+        loaded: Dict[str, PolicySnapshot] = {}
+        self._fingerprint = self._directory_fingerprint()
         for filename in os.listdir(self.policies_dir):
             if filename.endswith(".yaml") or filename.endswith(".yml"):
                 policy_id = os.path.splitext(filename)[0]
                 with open(os.path.join(self.policies_dir, filename), "r") as f:
                     try:
-                        self.policies[policy_id] = yaml.safe_load(f)
+                        raw = f.read()
+                        content_hash = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+                        current = previous.get(policy_id)
+                        if current is not None and current.content_hash == content_hash:
+                            loaded[policy_id] = current
+                            continue
+                        loaded[policy_id] = PolicySnapshot(policy_id, yaml.safe_load(raw), content_hash)
                     except Exception as e:
                         logger.error("policy_load_failed", file=filename, error=str(e))
-        
-        logger.info("policies_loaded", count=len(self.policies))
+                        if policy_id in previous:
+                            loaded[policy_id] = previous[policy_id]
+
+        # Atomic swap: readers see either the old registry or the new one, never a mix.
+        self._snapshots = loaded
+        changed = [pid for pid in set(previous) | set(loaded) if previous.get(pid) is not loaded.get(pid)]
+        for policy_id in changed:
+            if policy_id in loaded:
+                logger.info("policy_version_loaded", policy_id=policy_id, version=loaded[policy_id].version)
+        logger.info("policies_loaded", count=len(loaded), changed=len(changed))
+        return changed
 
     def get_policy(self, policy_id: str) -> Optional[Dict[str, Any]]:
-        return self.policies.get(policy_id)
+        snapshot = self.snapshots.get(policy_id)
+        return snapshot.body if snapshot else None
+
+    def get_snapshot(self, policy_id: str) -> Optional[PolicySnapshot]:
+        return self.snapshots.get(policy_id)
+
+    async def _watch(self, interval_s: float):
+        while True:
+            await asyncio.sleep(interval_s)
+            try:
+                if self._directory_fingerprint() != self._fingerprint:
+                    await self.reload()
+            except Exception as e:
+                logger.error("policy_watch_failed", error=str(e))
+
+    def start_watching(self, interval_s: float):
+        """
+        Polls the policies directory and hot-reloads on any change.
+        """
+        if self._watch_task is None and interval_s > 0:
+            self._watch_task = asyncio.create_task(self._watch(interval_s))
+            logger.info("policy_watch_started", interval_s=interval_s)
+
+    async def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
 
 policy_manager = PolicyManager()
@@ -0,0 +1,87 @@
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+
+# Policy fields each stage's prompt actually needs. Model names, shadow settings, cost limits and
+# cache/pipeline settings are operational and never sent to the model.
+# A policy can override this with a `prompt_fields: {<stage>: [...]}` section.
+STAGE_POLICY_FIELDS = {
+    "evidence_planner": ["name", "description", "hard_constraints"],
+    "decision_engine": ["name", "description", "hard_constraints", "confidence_thresholds"],
+}
+
+def compact_json(value: Any) -> str:
+    """
+    Canonical, whitespace-free JSON: stable across runs so identical inputs produce identical prompts.
+    """
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def _prune(value: Any) -> Any:
+    # Drop empty containers and nulls; they cost tokens and carry no constraint.
+    if isinstance(value, dict):
+        pruned = {k: _prune(v) for k, v in value.items()}
+        return {k: v for k, v in pruned.items() if v not in (None, [], {}, "")}
+    if isinstance(value, list):
+        return [_prune(v) for v in value]
+    return value
+
+class PromptAssembler:
+    """
+    Builds stage prompts in two parts:
+    - a static prefix (instructions, output format, the stage's slice of the policy) that is identical for
+      every request under a policy version, sent as a cacheable system block;
+    - a dynamic part (request input, upstream stage output) in compact canonical JSON.
+    """
+
+    def __init__(self, prompts_dir: Optional[str] = None):
+        self.prompts_dir = prompts_dir or settings.path(settings.PROMPTS_DIR)
+        # Read and compiled on first use (see `load`)
+        self.static_templates: Optional[Dict[str, Any]] = None
+        self.dynamic_templates: Optional[Dict[str, Any]] = None
+
+    def load(self):
+        """
+        Reads and compiles the stage templates. Runs on first use rather than at import, so modules that only
+        import the assembler (the policy registry, CLI tools) pay for neither the file I/O nor jinja2.
+        """
+        from jinja2 import Template
+
+        static_templates, dynamic_templates = {}, {}
+        for stage in STAGE_POLICY_FIELDS:
+            with open(os.path.join(self.prompts_dir, f"{stage}_static.jinja"), "r") as f:
+                static_templates[stage] = Template(f.read())
+            with open(os.path.join(self.prompts_dir, f"{stage}.jinja"), "r") as f:
+                dynamic_templates[stage] = Template(f.read())
+        self.static_templates, self.dynamic_templates = static_templates, dynamic_templates
+
+    @staticmethod
+    def policy_constraints(stage: str, policy: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        policy = policy or {}
+        fields = policy.get("prompt_fields", {}).get(stage, STAGE_POLICY_FIELDS[stage])
+        return _prune({field: policy[field] for field in fields if field in policy})
+
+    def static_prefix(self, stage: str, policy: Optional[Dict[str, Any]]) -> str:
+        if self.static_templates is None:
+            self.load()
+        return self.static_templates[stage].render(
+            policy_constraints=compact_json(self.policy_constraints(stage, policy))
+        ).strip()
+
+    def static_prefixes(self, policy: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        return {stage: self.static_prefix(stage, policy) for stage in STAGE_POLICY_FIELDS}
+
+    def render(self, stage: str, policy: Optional[Dict[str, Any]], static_prefix: Optional[str] = None, **dynamic: Any) -> Tuple[str, str]:
+        """
+        Returns (static_prefix, prompt). Pass a precompiled `static_prefix` to skip re-rendering it.
+        """
+        if static_prefix is None:
+            static_prefix = self.static_prefix(stage, policy)
+        if self.dynamic_templates is None:
+            self.load()
+        prompt = self.dynamic_templates[stage].render(
+            **{name: compact_json(value) for name, value in dynamic.items()}
+        ).strip()
+        return static_prefix, prompt
+
+prompt_assembler = PromptAssembler()
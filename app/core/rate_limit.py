@@ -0,0 +1,195 @@
+import math
+import time
+import structlog
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.exceptions import RateLimitedError
+from app.observability.metrics import rate_limited_total, rate_governor_backend_errors_total
+
+logger = structlog.get_logger()
+
+KEY_PREFIX = "dt:rl"
+
+# Token bucket in one round trip. Redis' clock is used so every API worker refills the bucket alike.
+# ARGV: rate (tokens/s), capacity, cost, force. A forced cost (settling actual usage, or a refund when
+# negative) is applied even if it takes the bucket below zero; later requests then wait for the refill.
+# Returns {allowed, seconds until `cost` would be available}.
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local force = ARGV[4] == "1"
+local now_parts = redis.call("TIME")
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if force or tokens >= cost then
+  tokens = math.min(capacity, tokens - cost)
+  allowed = 1
+else
+  wait = (cost - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "ts", now)
+redis.call("PEXPIRE", KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+def bucket_key(policy_id: str, tenant: str) -> str:
+    return f"{KEY_PREFIX}:{policy_id}:{tenant}"
+
+class TokenBucket:
+    """
+    In-process token bucket with the same semantics as TOKEN_BUCKET_LUA.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, cost: float, force: bool = False) -> Tuple[bool, float]:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if force or self.tokens >= cost:
+            self.tokens = min(self.capacity, self.tokens - cost)
+            return True, 0.0
+        return False, (cost - self.tokens) / self.rate
+
+@dataclass
+class Admission:
+    """
+    A decision admitted by the governor, with the tokens actually taken for it up front.
+    """
+    policy_id: str
+    tenant: str
+    rate: float
+    capacity: float
+    tokens: int
+
+    @property
+    def key(self) -> str:
+        return bucket_key(self.policy_id, self.tenant)
+
+class RateGovernor:
+    """
+    Token buckets on LLM tokens per (policy, tenant), so one client's burst cannot use up the provider
+    rate limit shared by everyone.
+
+    A decision is admitted by taking its expected tokens (the policy's recent average per decision) from
+    its bucket before any model call, and rejected with RateLimitedError if the bucket cannot cover them. Once
+    the decision is done, `settle` corrects the bucket by the difference to what it actually used.
+
+    Buckets live in Redis, shared by all API workers; on any Redis error the governor falls back to
+    per-process buckets and retries Redis after a cool-down, so a missing Redis never fails a request.
+    """
+
+    def __init__(self, use_redis: bool = True, max_local_buckets: int = 10000, retry_after_s: float = 30.0, smoothing: float = 0.1):
+        self.use_redis = use_redis
+        self.max_local_buckets = max_local_buckets
+        self.retry_after_s = retry_after_s
+        self.smoothing = smoothing
+        self._local: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._redis = None
+        self._script = None
+        self._redis_down_until = 0.0
+        # policy_id -> running average of tokens per decision
+        self._decision_tokens: Dict[str, float] = {}
+
+    @staticmethod
+    def limits(policy: Optional[Dict[str, Any]]) -> Tuple[float, float]:
+        """
+        (tokens per second, burst capacity) for a policy.
+        """
+        config = (policy or {}).get("rate_limit", {})
+        per_minute = config.get("tokens_per_minute", settings.RATE_LIMIT_TOKENS_PER_MINUTE)
+        return per_minute / 60.0, float(config.get("burst_tokens", settings.RATE_LIMIT_BURST_TOKENS))
+
+    def expected_tokens(self, policy_id: str) -> int:
+        return max(1, math.ceil(self._decision_tokens.get(policy_id, settings.RATE_LIMIT_DEFAULT_DECISION_TOKENS)))
+
+    def _client(self):
+        if not self.use_redis or time.monotonic() < self._redis_down_until:
+            return None
+        if self._redis is None:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                socket_connect_timeout=0.25,
+                socket_timeout=0.25
+            )
+            self._script = self._redis.register_script(TOKEN_BUCKET_LUA)
+        return self._redis
+
+    def _local_bucket(self, key: str, rate: float, capacity: float) -> TokenBucket:
+        bucket = self._local.get(key)
+        if bucket is None or bucket.rate != rate or bucket.capacity != capacity:
+            bucket = self._local[key] = TokenBucket(rate, capacity)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_local_buckets:
+            self._local.popitem(last=False)
+        return bucket
+
+    async def _take(self, key: str, rate: float, capacity: float, cost: float, force: bool = False) -> Tuple[bool, float]:
+        if self._client() is not None:
+            try:
+                allowed, wait = await self._script(keys=[key], args=[rate, capacity, cost, "1" if force else "0"])
+                return bool(allowed), float(wait)
+            except Exception as e:
+                rate_governor_backend_errors_total.inc()
+                logger.warning("rate_governor_redis_unavailable", error=str(e))
+                self._redis_down_until = time.monotonic() + self.retry_after_s
+        return self._local_bucket(key, rate, capacity).take(cost, force)
+
+    async def admit(self, policy_id: str, policy: Optional[Dict[str, Any]], tenant: str, decisions: int = 1) -> Optional[Admission]:
+        """
+        Takes the expected tokens of `decisions` decisions from the (policy, tenant) bucket. Raises
+        RateLimitedError if it cannot cover them; returns None when the governor is disabled.
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return None
+        rate, capacity = self.limits(policy)
+        # Admissions larger than the whole bucket are admitted once the bucket is full; `settle` charges the rest.
+        tokens = min(self.expected_tokens(policy_id) * decisions, capacity)
+        allowed, wait = await self._take(bucket_key(policy_id, tenant), rate, capacity, tokens)
+        if not allowed:
+            rate_limited_total.labels(policy_id=policy_id).inc()
+            logger.warning("rate_limited", policy_id=policy_id, tenant=tenant, tokens=tokens, retry_after_s=round(wait, 2))
+            raise RateLimitedError(wait)
+        return Admission(policy_id, tenant, rate, capacity, tokens)
+
+    async def settle(self, admission: Optional[Admission], used_tokens: int, decisions: int = 1):
+        """
+        Charges (or refunds) the difference between the tokens taken at admission and those used by the
+        `decisions` that ran. The charge is not capped: usage beyond the bucket leaves it in debt.
+        """
+        if admission is None:
+            return
+        average = self._decision_tokens.get(admission.policy_id)
+        per_decision = used_tokens / decisions
+        self._decision_tokens[admission.policy_id] = per_decision if average is None else average + self.smoothing * (per_decision - average)
+        difference = used_tokens - admission.tokens
+        if difference:
+            await self._take(admission.key, admission.rate, admission.capacity, difference, force=True)
+
+    async def refund(self, admission: Optional[Admission]):
+        """
+        Returns an admission's tokens unused (the decisions were not run).
+        """
+        if admission is not None:
+            await self._take(admission.key, admission.rate, admission.capacity, -admission.tokens, force=True)
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+rate_governor = RateGovernor(use_redis=settings.RATE_LIMIT_BACKEND == "redis")
@@ -1,3 +1,4 @@
+from datetime import datetime
 from enum import Enum
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
@@ -9,7 +10,9 @@ class DecisionOutcome(str, Enum):
 
 class CostEstimate(BaseModel):
     tokens: int = 0
-    latency_ms: int = 0
+    cost_usd: float = 0.0  # From reported usage and the price table (app/core/costs.py)
+    latency_ms: int = 0  # Wall-clock time of the stage, not the sum of its calls
+    call_latency_ms: Dict[str, int] = Field(default_factory=dict)  # Per-call latency, e.g. primary/shadow
 
 class DecisionTraceResponse(BaseModel):
     decision: DecisionOutcome
@@ -25,3 +28,37 @@ class DecisionRequest(BaseModel):
     context: Dict[str, Any]
     signals: Dict[str, Any]
     policy_id: Optional[str] = "default"
+
+class BatchDecisionRequest(BaseModel):
+    items: List[DecisionRequest] = Field(..., min_length=1, max_length=1000)
+    max_concurrency: int = Field(8, ge=1, le=64)  # Items in the LLM stages at once
+
+class BatchDecisionItemResponse(DecisionTraceResponse):
+    index: int  # Position of the item in the request
+
+class SimilarTrace(BaseModel):
+    trace_id: str
+    score: float  # Cosine similarity of the rationale to the query
+    decision: Optional[str] = None
+    policy_id: str
+    rationale: Optional[str] = None
+    created_at: datetime
+
+class TraceSummary(BaseModel):
+    trace_id: str
+    created_at: datetime
+    policy_id: str
+    policy_version: Optional[str] = None
+    decision: Optional[str] = None
+    confidence: Optional[float] = None
+    rationale: Optional[str] = None
+
+class TraceSearchResponse(BaseModel):
+    items: List[TraceSummary] = Field(default_factory=list)
+    next_cursor: Optional[str] = None  # Pass back as `cursor` for the next page; null on the last page
+
+class TraceRecord(BaseModel):
+    trace_id: str
+    created_at: datetime
+    policy_version: Optional[str] = None
+    trace_data: Dict[str, Any]  # Full trace, with the referenced policy body and prompts inlined
@@ -1,7 +1,129 @@
 import json
-import re
 from typing import Any, Dict, Optional
 
+class IncrementalJSONParser:
+    """
+    Incremental parser for the first JSON object in a (streamed) model response.
+
+    Text before the opening brace (markdown fences, preamble) is skipped. As chunks arrive, each
+    top-level field is decoded as soon as its value is complete, so callers can act on early fields
+    (e.g. `decision`, `confidence`) before the rest of the object has been generated. `complete`
+    turns True once the object's closing brace arrives; anything after it is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self._pos = 0
+        self._start = -1
+        self._end = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # Top-level state: key -> colon -> value -> after -> key ...
+        self._mode = "key"
+        self._key: Optional[str] = None
+        self._token_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Consumes the next chunk of text. Returns True once the object is complete.
+        """
+        if self.complete:
+            return True
+        self.buffer += chunk
+        text = self.buffer
+
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._depth == 0:
+                if ch == "{":
+                    self._start = i
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._mode == "key":
+                        self._key = self._decode(text[self._token_start:i + 1])
+                        self._token_start = None
+                        self._mode = "colon"
+                    elif self._depth == 1 and self._mode == "value":
+                        self._commit(text[self._token_start:i + 1])
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._mode in ("key", "value") and self._token_start is None:
+                    self._token_start = i
+            elif ch in "{[":
+                if self._depth == 1 and self._mode == "value" and self._token_start is None:
+                    self._token_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._mode == "value":
+                    # A nested object/array value just closed.
+                    self._commit(text[self._token_start:i + 1])
+                elif self._depth == 0:
+                    if self._mode == "value" and self._token_start is not None:
+                        self._commit(text[self._token_start:i])
+                    self.complete = True
+                    self._end = i + 1
+                    self._pos = i + 1
+                    return True
+            elif self._depth == 1:
+                if self._mode == "colon" and ch == ":":
+                    self._mode = "value"
+                elif self._mode == "value":
+                    if ch == ",":
+                        if self._token_start is not None:
+                            self._commit(text[self._token_start:i])
+                        self._mode = "key"
+                    elif not ch.isspace() and self._token_start is None:
+                        self._token_start = i
+                elif self._mode == "after" and ch == ",":
+                    self._mode = "key"
+
+        self._pos = len(text)
+        return False
+
+    @staticmethod
+    def _decode(raw: str) -> Any:
+        try:
+            return json.loads(raw.strip())
+        except ValueError:
+            return None
+
+    def _commit(self, raw: str):
+        value = self._decode(raw)
+        if self._key is not None and (value is not None or raw.strip() == "null"):
+            self.fields[self._key] = value
+        self._key = None
+        self._token_start = None
+        self._mode = "after"
+
+    def has(self, *names: str) -> bool:
+        return all(name in self.fields for name in names)
+
+    def value(self) -> Optional[Dict[str, Any]]:
+        """
+        The fully parsed object, or None if it is incomplete or malformed.
+        """
+        if not self.complete:
+            return None
+        try:
+            parsed = json.loads(self.buffer[self._start:self._end])
+        except ValueError:
+            return None
+        return parsed if isinstance(parsed, dict) else None
+
 def extract_json(text: str) -> Optional[Dict[str, Any]]:
     """
     Extracts JSON from a string, handling potential LLM markdown artifacts.
@@ -10,11 +132,7 @@ def extract_json(text: str) -> Optional[Dict[str, Any]]:
         # Try direct parse
         return json.loads(text)
     except json.JSONDecodeError:
-        # Try finding JSON block
-        match = re.search(r'\{.*\}', text, re.DOTALL)
-        if match:
-            try:
-                return json.loads(match.group())
-            except json.JSONDecodeError:
-                return None
-    return None
+        # Fall back to the first balanced object (a greedy regex would also swallow trailing braces)
+        parser = IncrementalJSONParser()
+        parser.feed(text)
+        return parser.value()
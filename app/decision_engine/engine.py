@@ -1,53 +1,105 @@
+import asyncio
+import time
 import structlog
-from typing import Dict, Any
-from jinja2 import Template
+from typing import Dict, Any, Optional
 from app.llm_gateway.client import llm_gateway
 from app.core.utils import extract_json
-from app.core.exceptions import ModelTimeoutError
+from app.core.costs import cost_model
+from app.core.exceptions import BudgetExceededError, ModelTimeoutError
 from app.observability.metrics import shadow_vetoes_total
+from app.decision_engine.pipeline import pipeline_planner
+from app.core.policies import PolicySnapshot
+from app.core.prompts import prompt_assembler
+from app.observability.tracing import stage
 
 logger = structlog.get_logger()
 
-class DecisionEngine:
-    def __init__(self):
-        with open("prompts/decision_engine.jinja", "r") as f:
-            self.template = Template(f.read())
+PRIMARY_SYSTEM_PROMPT = "You are a safety-first Decision Engine."
+SHADOW_SYSTEM_PROMPT = "You are a safety shadow validator. Your goal is to find reasons NOT to act."
 
+class DecisionEngine:
     async def decide(
-        self, 
-        input_data: Dict[str, Any], 
+        self,
+        input_data: Dict[str, Any],
         evidence_assessment: Dict[str, Any],
-        constraints: Dict[str, Any]
+        constraints: Dict[str, Any],
+        snapshot: Optional[PolicySnapshot] = None
     ) -> Dict[str, Any]:
-        prompt = self.template.render(
-            input_data=input_data,
-            evidence_assessment=evidence_assessment,
-            constraints=constraints
-        )
-        
+        with stage("prompt_render"):
+            static_prefix, prompt = prompt_assembler.render(
+                "decision_engine",
+                constraints.get("policy"),
+                static_prefix=snapshot.prompt_prefixes["decision_engine"] if snapshot else None,
+                input_data=input_data,
+                evidence_assessment=evidence_assessment
+            )
+
         logger.info("decision_engine_start")
-        
+
         policy_config = constraints.get("policy") or {}
         shadow_config = policy_config.get("asymmetric_shadow", {})
         conf_config = policy_config.get("confidence_thresholds", {})
-        
+
         primary_model = shadow_config.get("primary_model", "claude-3-5-sonnet-20240620")
         shadow_model = shadow_config.get("shadow_model", "claude-3-5-haiku-20241022")
         shadow_enabled = shadow_config.get("enabled", True)
-        
-        act_min = conf_config.get("act_minimum", 0.8)
+        # "sequential": shadow is called after the primary returns.
+        # "concurrent": both calls start together; the shadow is cancelled once the pipeline no longer needs it.
+        concurrent = shadow_config.get("execution", "sequential") == "concurrent"
+        hedge_primary = shadow_config.get("hedge_primary", False)
+        # Streaming: act on `decision`/`confidence` as soon as they are generated (start the shadow early,
+        # or stop the primary once it has said ABSTAIN) and stop generation once the JSON object closes.
+        streaming_config = policy_config.get("streaming", {})
+        streaming = streaming_config.get("enabled", False)
+        abort_on_abstain = streaming_config.get("abort_on_abstain", False)
+
+        act_min = snapshot.thresholds["act_minimum"] if snapshot else conf_config.get("act_minimum", 0.8)
+        # The registry's id (the policy file name), which metrics, the planner and cache invalidation key on
+        policy_id = snapshot.policy_id if snapshot else policy_config.get("name", "default")
+        skipped_stages = []
+
+        start_time = time.perf_counter()
+        shadow_task: Optional[asyncio.Task] = None
+
+        def call_shadow():
+            return self._call_model(streaming, prompt=prompt, system_prompt=SHADOW_SYSTEM_PROMPT, model=shadow_model, static_prefix=static_prefix, policy=policy_config, policy_id=policy_id, stage="shadow")
+
+        def on_early_fields(fields: Dict[str, Any]) -> bool:
+            nonlocal shadow_task
+            decision = fields.get("decision")
+            confidence = fields.get("confidence")
+            # An ACT that clears the threshold will need the shadow: start it while the primary finishes.
+            if shadow_enabled and shadow_task is None and decision == "ACT" and isinstance(confidence, (int, float)) and confidence >= act_min:
+                shadow_task = asyncio.create_task(call_shadow())
+            # ABSTAIN is final (nothing downstream can turn it into ACT), so the rest of the output is not needed.
+            return abort_on_abstain and decision == "ABSTAIN"
 
         try:
-            # 1. Primary Model Call
-            primary_result = await llm_gateway.get_structured_decision(
+            # 1. Primary Model Call (the shadow starts alongside it in concurrent mode)
+            if shadow_enabled and concurrent:
+                shadow_task = asyncio.create_task(call_shadow())
+
+            primary_result = await self._call_model(
+                streaming,
+                on_early_fields=on_early_fields,
+                hedge=hedge_primary,
                 prompt=prompt,
-                system_prompt="You are a safety-first Decision Engine.",
-                model=primary_model
+                system_prompt=PRIMARY_SYSTEM_PROMPT,
+                model=primary_model,
+                static_prefix=static_prefix,
+                policy=policy_config,
+                policy_id=policy_id,
+                stage="primary"
             )
-            
-            primary_decision = extract_json(primary_result.get("raw_response", ""))
+
+            with stage("json_extraction"):
+                primary_decision = primary_result.get("parsed") or extract_json(primary_result.get("raw_response", ""))
             if not primary_decision:
-                return self._fail_abstain(primary_result, "Primary model failed to produce structured JSON.")
+                return self._fail_abstain(primary_result, "Primary model failed to produce structured JSON.", start_time)
+            if primary_result.get("stopped_early"):
+                primary_decision.setdefault("rationale", "Primary model abstained; generation stopped once the decision was known.")
+                for field in ("risk_factors", "missing_information", "failure_modes"):
+                    primary_decision.setdefault(field, [])
 
             # 2. Confidence Threshold Check
             confidence = primary_decision.get("confidence", 0.0)
@@ -59,35 +111,58 @@ class DecisionEngine:
 
             # 3. Asymmetric Safety Shadow Model Call
             total_tokens = primary_result.get("input_tokens", 0) + primary_result.get("output_tokens", 0)
-            total_latency = primary_result.get("latency_ms", 0)
-
-            if shadow_enabled:
-                shadow_result = await llm_gateway.get_structured_decision(
-                    prompt=prompt,
-                    system_prompt="You are a safety shadow validator. Your goal is to find reasons NOT to act.",
-                    model=shadow_model
-                )
-                shadow_decision = extract_json(shadow_result.get("raw_response", ""))
-                
-                total_tokens += shadow_result.get("input_tokens", 0) + shadow_result.get("output_tokens", 0)
-                total_latency += shadow_result.get("latency_ms", 0)
+            cost_usd = cost_model.prices.cost_usd(primary_model, primary_result.get("input_tokens", 0), primary_result.get("output_tokens", 0))
+            call_latency_ms = {"primary": primary_result.get("latency_ms", 0)}
+            pipeline_planner.observe(policy_id, "primary", total_tokens, call_latency_ms["primary"])
+
+            run_shadow = pipeline_planner.should_run_shadow(policy_config, primary_decision)
+
+            shadow_result = None
+            if shadow_task is not None:
+                if run_shadow:
+                    shadow_result = await shadow_task
+                elif shadow_task.done() and not shadow_task.cancelled() and shadow_task.exception() is None:
+                    # Already paid for; keep it for cost accounting but it cannot change a non-ACT outcome.
+                    shadow_result = shadow_task.result()
+                else:
+                    shadow_task.cancel()
+                    skipped_stages.append(pipeline_planner.record_skip(policy_id, ["shadow"], "primary_not_act"))
+            elif shadow_enabled and not run_shadow:
+                skipped_stages.append(pipeline_planner.record_skip(policy_id, ["shadow"], "primary_not_act"))
+            elif shadow_enabled:
+                shadow_result = await call_shadow()
+
+            if shadow_result is not None:
+                with stage("json_extraction"):
+                    shadow_decision = shadow_result.get("parsed") or extract_json(shadow_result.get("raw_response", ""))
+
+                shadow_tokens = shadow_result.get("input_tokens", 0) + shadow_result.get("output_tokens", 0)
+                total_tokens += shadow_tokens
+                cost_usd += cost_model.prices.cost_usd(shadow_model, shadow_result.get("input_tokens", 0), shadow_result.get("output_tokens", 0))
+                call_latency_ms["shadow"] = shadow_result.get("latency_ms", 0)
+                pipeline_planner.observe(policy_id, "shadow", shadow_tokens, call_latency_ms["shadow"])
 
                 # Shadow Veto Logic
                 if primary_decision.get("decision") == "ACT":
                     if not shadow_decision or shadow_decision.get("decision") != "ACT":
                         logger.warning("shadow_veto_triggered", primary=primary_decision.get("decision"), shadow=shadow_decision.get("decision") if shadow_decision else "FAIL")
                         # Record shadow veto metric
-                        shadow_vetoes_total.labels(policy_id=policy_config.get("name", "default")).inc()
-                        
+                        shadow_vetoes_total.labels(policy_id=policy_id).inc()
+
                         primary_decision["decision"] = "ABSTAIN"
                         primary_decision["rationale"] += " (Overridden by Asymmetric Safety Shadow: Unilateral veto triggered.)"
                         primary_decision["risk_factors"].append("shadow_veto")
 
+            # Recorded in the trace so calibration can be broken down per model.
+            primary_decision["model"] = primary_model
             primary_decision["cost_estimate"] = {
                 "tokens": total_tokens,
-                "latency_ms": total_latency
+                "cost_usd": round(cost_usd, 6),
+                "latency_ms": self._elapsed_ms(start_time),
+                "call_latency_ms": call_latency_ms
             }
-            
+            primary_decision["skipped_stages"] = skipped_stages
+
             return primary_decision
 
         except ModelTimeoutError as e:
@@ -98,18 +173,45 @@ class DecisionEngine:
                 "risk_factors": ["model_timeout"],
                 "missing_information": [],
                 "failure_modes": ["system_timeout"],
-                "cost_estimate": {"tokens": 0, "latency_ms": 0},
+                "cost_estimate": {"tokens": 0, "latency_ms": self._elapsed_ms(start_time)},
                 "rationale": f"System timeout / LLM failure: {str(e)}"
             }
+        except BudgetExceededError as e:
+            # Fail closed: a decision whose primary or shadow call cannot be afforded is not released.
+            return {
+                "decision": "ABSTAIN",
+                "confidence": 0.0,
+                "risk_factors": ["cost_budget_exceeded"],
+                "missing_information": [],
+                "failure_modes": ["budget_exceeded"],
+                "cost_estimate": {"tokens": 0, "latency_ms": self._elapsed_ms(start_time)},
+                "rationale": f"Decision budget exceeded: {str(e)}"
+            }
+        finally:
+            # Never leave a speculative shadow call running past the decision.
+            if shadow_task is not None and not shadow_task.done():
+                shadow_task.cancel()
+
+    @staticmethod
+    async def _call_model(streaming: bool, on_early_fields=None, hedge: bool = False, **request: Any) -> Dict[str, Any]:
+        # Hedging applies to non-streaming calls only; a streamed call already returns as soon as it can.
+        if streaming:
+            return await llm_gateway.stream_structured_decision(on_early_fields=on_early_fields, **request)
+        return await llm_gateway.get_structured_decision(hedge=hedge, **request)
+
+    @staticmethod
+    def _elapsed_ms(start_time: float) -> int:
+        return int((time.perf_counter() - start_time) * 1000)
 
-    def _fail_abstain(self, result: Dict[str, Any], message: str) -> Dict[str, Any]:
+    def _fail_abstain(self, result: Dict[str, Any], message: str, start_time: float) -> Dict[str, Any]:
         return {
             "decision": "ABSTAIN",
             "confidence": 0.0,
             "rationale": message,
             "cost_estimate": {
                 "tokens": result.get("input_tokens", 0) + result.get("output_tokens", 0),
-                "latency_ms": result.get("latency_ms", 0)
+                "latency_ms": self._elapsed_ms(start_time),
+                "call_latency_ms": {"primary": result.get("latency_ms", 0)}
             }
         }
 
@@ -0,0 +1,82 @@
+import structlog
+from typing import Dict, Any, List, Optional, Tuple
+from app.observability.metrics import (
+    pipeline_stages_skipped_total,
+    pipeline_skip_saved_tokens_total,
+    pipeline_skip_saved_ms_total,
+)
+
+logger = structlog.get_logger()
+
+# Planner abstain reasons that are deterministic and binding under the fail-closed rules.
+DEFAULT_ENGINE_SKIP_REASONS = ["voi_cost_gate", "planner_timeout", "budget_exceeded"]
+
+class PipelinePlanner:
+    """
+    Decides which LLM stages can be skipped because their result cannot change the final decision.
+    Driven by the `pipeline` section of a policy. Every skip is returned as a trace entry and counted in Prometheus.
+    """
+
+    def __init__(self, smoothing: float = 0.2):
+        self.smoothing = smoothing
+        # (policy_id, stage) -> (avg_tokens, avg_latency_ms); used to estimate what a skip saved.
+        self._observed: Dict[Tuple[str, str], Tuple[float, float]] = {}
+
+    @staticmethod
+    def _config(policy: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return (policy or {}).get("pipeline", {})
+
+    def engine_skip_reason(self, policy: Optional[Dict[str, Any]], evidence_result: Dict[str, Any]) -> Optional[str]:
+        """
+        Returns the reason the decision engine can be skipped, or None if it must run.
+        A deterministic planner ABSTAIN (VoI gate, timeout, exhausted budget) is final, so the engine cannot produce ACT.
+        """
+        if evidence_result.get("recommended_path") != "ABSTAIN":
+            return None
+        reason = evidence_result.get("abstain_reason")
+        skip_on = self._config(policy).get("skip_engine_on", DEFAULT_ENGINE_SKIP_REASONS)
+        return reason if reason in skip_on else None
+
+    def should_run_shadow(self, policy: Optional[Dict[str, Any]], primary_decision: Dict[str, Any]) -> bool:
+        """
+        The shadow can only veto an ACT; for ASK/ABSTAIN its answer is irrelevant.
+        """
+        if primary_decision.get("decision") == "ACT":
+            return True
+        return not self._config(policy).get("skip_shadow_on_non_act", True)
+
+    def observe(self, policy_id: str, stage: str, tokens: int, latency_ms: int):
+        """
+        Folds an executed stage's cost into the running estimate used for skip savings.
+        """
+        key = (policy_id, stage)
+        if key not in self._observed:
+            self._observed[key] = (float(tokens), float(latency_ms))
+            return
+        avg_tokens, avg_ms = self._observed[key]
+        a = self.smoothing
+        self._observed[key] = (avg_tokens + a * (tokens - avg_tokens), avg_ms + a * (latency_ms - avg_ms))
+
+    def record_skip(self, policy_id: str, stages: List[str], reason: str) -> Dict[str, Any]:
+        """
+        Records a skip of one or more stages and returns the trace entry describing it.
+        """
+        saved_tokens = 0
+        saved_ms = 0
+        for stage in stages:
+            avg_tokens, avg_ms = self._observed.get((policy_id, stage), (0.0, 0.0))
+            pipeline_stages_skipped_total.labels(policy_id=policy_id, stage=stage, reason=reason).inc()
+            pipeline_skip_saved_tokens_total.labels(policy_id=policy_id, stage=stage).inc(avg_tokens)
+            pipeline_skip_saved_ms_total.labels(policy_id=policy_id, stage=stage).inc(avg_ms)
+            saved_tokens += int(avg_tokens)
+            saved_ms += int(avg_ms)
+
+        logger.info("pipeline_stage_skipped", policy_id=policy_id, stages=stages, reason=reason)
+        return {
+            "stages": stages,
+            "reason": reason,
+            "estimated_saved_tokens": saved_tokens,
+            "estimated_saved_ms": saved_ms
+        }
+
+pipeline_planner = PipelinePlanner()
@@ -1,9 +1,8 @@
 import structlog
-import json
-from datetime import datetime
-from typing import Dict, Any, List, Optional
+from datetime import date, timezone
+from typing import Dict, Any, Optional
 from pydantic import BaseModel, Field
-from app.trace_store.store import trace_store
+from app.trace_store.store import register_statement, trace_store
 
 logger = structlog.get_logger()
 
@@ -27,63 +26,242 @@ class CalibrationMetrics(BaseModel):
         # Simple ratio of confidence vs correctness
         return (self.avg_confidence_correct - self.avg_confidence_incorrect)
 
+# Rollup counters, in column order. Everything is a sum so buckets can be added over any window.
+ROLLUP_COLUMNS = (
+    "total_evaluated",
+    "correct_decision_count",
+    "false_act_count",
+    "conservative_abstain_count",
+    "confidence_sum_correct",
+    "confidence_sum_incorrect",
+    "overconfidence_penalty_total",
+)
+
+# One row per evaluated decision, reduced to the fields calibration needs.
+EVALUATED_DECISIONS_SQL = """
+    SELECT
+        t.policy_id,
+        t.decision,
+        COALESCE(t.confidence, 0) AS confidence,
+        COALESCE((e.outcome_data->>'is_correct')::boolean, false) AS is_correct,
+        COALESCE((e.outcome_data->>'ground_truth_safe')::boolean, false) AS ground_truth_safe,
+        e.created_at
+    FROM evaluation_outcome e
+    JOIN decision_trace t ON t.id = e.trace_id
+"""
+
+# The same for decisions whose trace has been archived, from the facts kept at archive time (migration 007).
+EVALUATED_ARCHIVED_DECISIONS_SQL = """
+    SELECT
+        a.policy_id,
+        a.decision,
+        a.confidence,
+        COALESCE((e.outcome_data->>'is_correct')::boolean, false) AS is_correct,
+        COALESCE((e.outcome_data->>'ground_truth_safe')::boolean, false) AS ground_truth_safe,
+        e.created_at
+    FROM evaluation_outcome e
+    JOIN decision_trace_archived a ON a.trace_id = e.trace_id
+"""
+
+AGGREGATES_SQL = """
+    count(*) AS total_evaluated,
+    count(*) FILTER (WHERE is_correct) AS correct_decision_count,
+    count(*) FILTER (WHERE NOT is_correct AND decision = 'ACT') AS false_act_count,
+    count(*) FILTER (WHERE decision = 'ABSTAIN' AND ground_truth_safe) AS conservative_abstain_count,
+    COALESCE(sum(confidence) FILTER (WHERE is_correct), 0) AS confidence_sum_correct,
+    COALESCE(sum(confidence) FILTER (WHERE NOT is_correct), 0) AS confidence_sum_incorrect,
+    COALESCE(sum(confidence * confidence) FILTER (WHERE NOT is_correct), 0) AS overconfidence_penalty_total
+"""
+
+# Per-evaluation statements, prepared on every pool connection.
+register_statement("calibration_trace_facts", """
+    SELECT
+        policy_id,
+        (created_at AT TIME ZONE 'UTC')::date AS bucket_date,
+        decision,
+        COALESCE(confidence, 0) AS confidence
+    FROM decision_trace
+    WHERE id = $1
+    UNION ALL
+    SELECT policy_id, bucket_date, decision, confidence
+    FROM decision_trace_archived
+    WHERE trace_id = $1
+    LIMIT 1
+""")
+register_statement("calibration_rollup_upsert", f"""
+    INSERT INTO calibration_rollup (policy_id, bucket_date, {", ".join(ROLLUP_COLUMNS)})
+    VALUES ($1, $2, {", ".join(f"${i + 3}" for i in range(len(ROLLUP_COLUMNS)))})
+    ON CONFLICT (policy_id, bucket_date) DO UPDATE SET
+        {", ".join(f"{c} = calibration_rollup.{c} + EXCLUDED.{c}" for c in ROLLUP_COLUMNS)},
+        updated_at = CURRENT_TIMESTAMP
+""")
+
+def outcome_contribution(decision: Optional[str], confidence: float, is_correct: bool, ground_truth_safe: bool) -> Dict[str, float]:
+    """
+    What a single evaluated decision adds to its rollup bucket.
+    """
+    return {
+        "total_evaluated": 1,
+        "correct_decision_count": 1 if is_correct else 0,
+        "false_act_count": 1 if not is_correct and decision == "ACT" else 0,
+        "conservative_abstain_count": 1 if decision == "ABSTAIN" and ground_truth_safe else 0,
+        "confidence_sum_correct": confidence if is_correct else 0.0,
+        "confidence_sum_incorrect": 0.0 if is_correct else confidence,
+        # Overconfidence Penalty: Square the confidence to penalize "arrogant errors"
+        "overconfidence_penalty_total": 0.0 if is_correct else confidence ** 2,
+    }
+
+def contribution_sql(decision: str, confidence: str, is_correct: str, ground_truth_safe: str) -> Dict[str, str]:
+    """
+    `outcome_contribution` as SQL expressions over the given columns, for set-based rollup updates.
+    """
+    return {
+        "total_evaluated": "1",
+        "correct_decision_count": f"CASE WHEN {is_correct} THEN 1 ELSE 0 END",
+        "false_act_count": f"CASE WHEN NOT {is_correct} AND {decision} = 'ACT' THEN 1 ELSE 0 END",
+        "conservative_abstain_count": f"CASE WHEN {decision} = 'ABSTAIN' AND {ground_truth_safe} THEN 1 ELSE 0 END",
+        "confidence_sum_correct": f"CASE WHEN {is_correct} THEN {confidence} ELSE 0 END",
+        "confidence_sum_incorrect": f"CASE WHEN {is_correct} THEN 0 ELSE {confidence} END",
+        "overconfidence_penalty_total": f"CASE WHEN {is_correct} THEN 0 ELSE {confidence} * {confidence} END",
+    }
+
+def archived_trace_facts(trace: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The calibration fields of an archived trace, derived as the generated columns do for hot ones (migration 004).
+    """
+    decision = trace["trace_data"].get("decision") or {}
+    confidence = decision.get("confidence")
+    created_at = trace["created_at"]
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return {
+        "policy_id": (trace["trace_data"].get("request") or {}).get("policy_id") or "default",
+        "bucket_date": created_at.date(),
+        "decision": decision.get("decision"),
+        "confidence": float(confidence) if isinstance(confidence, (int, float)) and not isinstance(confidence, bool) else 0.0,
+    }
+
+def metrics_from_sums(row: Dict[str, Any]) -> CalibrationMetrics:
+    """
+    Builds metrics from rollup-style sums (Postgres returns SUM(bigint) as numeric, hence the casts).
+    """
+    sums = {name: row.get(name) or 0 for name in ROLLUP_COLUMNS}
+    metrics = CalibrationMetrics(
+        total_evaluated=int(sums["total_evaluated"]),
+        false_act_count=int(sums["false_act_count"]),
+        conservative_abstain_count=int(sums["conservative_abstain_count"]),
+        correct_decision_count=int(sums["correct_decision_count"]),
+        overconfidence_penalty_total=float(sums["overconfidence_penalty_total"])
+    )
+    incorrect = metrics.total_evaluated - metrics.correct_decision_count
+    if metrics.correct_decision_count:
+        metrics.avg_confidence_correct = float(sums["confidence_sum_correct"]) / metrics.correct_decision_count
+    if incorrect:
+        metrics.avg_confidence_incorrect = float(sums["confidence_sum_incorrect"]) / incorrect
+    return metrics
+
 class CalibrationLoop:
     """
     Analyzes historical decisions vs ground truth to measure calibration and regret.
+    Aggregation runs inside Postgres: either over the most recent outcomes, or over the
+    per-policy, per-day `calibration_rollup` buckets for a date window. Rollup buckets outlive
+    trace retention; outcomes whose trace has been archived use the facts kept when it was (migration 007).
     """
-    
-    async def run_calibration(self, limit: int = 100) -> CalibrationMetrics:
+
+    async def run_calibration(self, limit: int = 100, policy_id: Optional[str] = None) -> CalibrationMetrics:
+        """
+        Computes safety-first metrics over the `limit` most recently evaluated decisions.
+        Hot traces come first; if there are fewer than `limit`, the most recent outcomes of archived traces fill the rest.
+        """
+        async with trace_store.acquire() as conn:
+            async with trace_store.timed("run_calibration"):
+                row = await conn.fetchrow(
+                    f"""
+                    SELECT {AGGREGATES_SQL}
+                    FROM (
+                        {EVALUATED_DECISIONS_SQL}
+                        WHERE $2::text IS NULL OR t.policy_id = $2
+                        ORDER BY e.created_at DESC
+                        LIMIT $1
+                    ) recent
+                    """,
+                    limit,
+                    policy_id
+                )
+            sums = dict(row)
+            remaining = limit - int(sums["total_evaluated"])
+            if remaining > 0:
+                async with trace_store.timed("run_calibration_archived"):
+                    archived = await conn.fetchrow(
+                        f"""
+                        SELECT {AGGREGATES_SQL}
+                        FROM (
+                            {EVALUATED_ARCHIVED_DECISIONS_SQL}
+                            WHERE $2::text IS NULL OR a.policy_id = $2
+                            ORDER BY e.created_at DESC
+                            LIMIT $1
+                        ) recent
+                        """,
+                        remaining,
+                        policy_id
+                    )
+                sums = {name: (sums[name] or 0) + (archived[name] or 0) for name in ROLLUP_COLUMNS}
+        return self._completed(metrics_from_sums(sums))
+
+    async def window_calibration(self, start: date, end: date, policy_id: Optional[str] = None) -> CalibrationMetrics:
         """
-        Batch process traces that have evaluation outcomes and compute safety-first metrics.
+        Metrics for decisions made between `start` and `end` (inclusive), summed from the rollup.
+        Cost depends on the number of days and policies in the window, not the number of traces.
         """
-        await trace_store.connect()
-        async with trace_store.pool.acquire() as conn:
-            records = await conn.fetch(
-                """
-                SELECT t.id, t.trace_data, e.outcome_data 
-                FROM decision_trace t
-                JOIN evaluation_outcome e ON t.id = e.trace_id
-                ORDER BY e.created_at DESC
-                LIMIT $1
+        async with trace_store.acquire() as conn, trace_store.timed("window_calibration"):
+            row = await conn.fetchrow(
+                f"""
+                SELECT {", ".join(f"sum({c}) AS {c}" for c in ROLLUP_COLUMNS)}
+                FROM calibration_rollup
+                WHERE bucket_date BETWEEN $1 AND $2
+                  AND ($3::text IS NULL OR policy_id = $3)
                 """,
-                limit
+                start,
+                end,
+                policy_id
             )
-            
-            metrics = CalibrationMetrics(total_evaluated=len(records))
-            conf_correct = []
-            conf_incorrect = []
-            
-            for rec in records:
-                trace_data = rec['trace_data']
-                outcome_data = rec['outcome_data']
-                
-                decision = trace_data.get('decision', {}).get('decision')
-                confidence = trace_data.get('decision', {}).get('confidence', 0.0)
-                is_correct = outcome_data.get('is_correct', False)
-                
-                if is_correct:
-                    metrics.correct_decision_count += 1
-                    conf_correct.append(confidence)
-                else:
-                    conf_incorrect.append(confidence)
-                    # Overconfidence Penalty: Square the confidence to penalize "arrogant errors"
-                    metrics.overconfidence_penalty_total += (confidence ** 2)
-                    
-                    if decision == "ACT":
-                        metrics.false_act_count += 1
-                
-                if decision == "ABSTAIN" and outcome_data.get('ground_truth_safe', False):
-                    metrics.conservative_abstain_count += 1
-            
-            if conf_correct:
-                metrics.avg_confidence_correct = sum(conf_correct) / len(conf_correct)
-            if conf_incorrect:
-                metrics.avg_confidence_incorrect = sum(conf_incorrect) / len(conf_incorrect)
-            
-            logger.info("calibration_loop_completed", 
-                        false_act_rate=metrics.false_act_rate,
-                        overconfidence_penalty=metrics.overconfidence_penalty_total)
-            
-            return metrics
+        return self._completed(metrics_from_sums(dict(row)))
+
+    async def record_outcome(
+        self,
+        conn,
+        trace_id: str,
+        is_correct: bool,
+        ground_truth_safe: bool,
+        previous: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Applies one outcome to its rollup bucket. Must run in the transaction that writes the outcome.
+        `previous` is the outcome being replaced (is_correct, ground_truth_safe), whose contribution is backed out.
+        """
+        # Hot, or archived with its facts kept in decision_trace_archived; the archive files are never read here.
+        trace = await trace_store.run(conn, "calibration_trace_facts", trace_id, method="fetchrow")
+        if trace is None:
+            return
+
+        delta = outcome_contribution(trace["decision"], trace["confidence"], is_correct, ground_truth_safe)
+        if previous is not None:
+            old = outcome_contribution(trace["decision"], trace["confidence"], previous["is_correct"], previous["ground_truth_safe"])
+            delta = {name: delta[name] - old[name] for name in ROLLUP_COLUMNS}
+
+        await trace_store.run(
+            conn,
+            "calibration_rollup_upsert",
+            trace["policy_id"],
+            trace["bucket_date"],
+            *[delta[name] for name in ROLLUP_COLUMNS]
+        )
+
+    @staticmethod
+    def _completed(metrics: CalibrationMetrics) -> CalibrationMetrics:
+        logger.info("calibration_loop_completed",
+                    false_act_rate=metrics.false_act_rate,
+                    overconfidence_penalty=metrics.overconfidence_penalty_total)
+        return metrics
 
 calibration_loop = CalibrationLoop()
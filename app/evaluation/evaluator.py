@@ -1,14 +1,29 @@
 import structlog
 from typing import Dict, Any
-from app.trace_store.store import trace_store
+from app.trace_store.store import register_statement, trace_store
+from app.evaluation.calibration import calibration_loop
 
 logger = structlog.get_logger()
 
+register_statement("evaluation_previous_outcome", """
+    SELECT
+        COALESCE((outcome_data->>'is_correct')::boolean, false) AS is_correct,
+        COALESCE((outcome_data->>'ground_truth_safe')::boolean, false) AS ground_truth_safe
+    FROM evaluation_outcome
+    WHERE trace_id = $1
+""")
+register_statement("evaluation_upsert_outcome", """
+    INSERT INTO evaluation_outcome (trace_id, outcome_data, is_correct)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (trace_id) DO UPDATE SET outcome_data = $2, is_correct = $3
+""")
+
 class Evaluator:
     async def evaluate_decision(self, trace_id: str, actual_outcome: Dict[str, Any]):
         """
         Compares the system's decision against the actual ground truth outcome.
         Records calibration and regret metrics.
+        The outcome and its calibration rollup bucket are updated in one transaction.
         """
         logger.info("evaluation_start", trace_id=trace_id)
         
@@ -17,19 +32,26 @@ class Evaluator:
         # 2. Use an LLM or heuristic to compare Decision vs Actual
         # 3. Store result in evaluation_outcome table
         
-        await trace_store.connect()
-        async with trace_store.pool.acquire() as conn:
-            # Placeholder for evaluation logic
-            await conn.execute(
-                """
-                INSERT INTO evaluation_outcome (trace_id, outcome_data, is_correct)
-                VALUES ($1, $2, $3)
-                ON CONFLICT (trace_id) DO UPDATE SET outcome_data = $2, is_correct = $3
-                """,
-                trace_id,
-                actual_outcome,
-                actual_outcome.get("is_correct", True)
-            )
+        async with trace_store.acquire() as conn:
+            async with conn.transaction():
+                # Waits out a bulk ingestion (app/evaluation/ingest.py) rewriting outcomes, which would otherwise
+                # change the previous outcome read below before this one is written.
+                await conn.execute("LOCK TABLE evaluation_outcome IN ROW EXCLUSIVE MODE")
+                # Serialize evaluations of the same trace so its rollup delta is applied exactly once.
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1::text))", str(trace_id))
+                previous = await trace_store.run(conn, "evaluation_previous_outcome", trace_id, method="fetchrow")
+
+                # Placeholder for evaluation logic
+                await trace_store.run(conn, "evaluation_upsert_outcome", trace_id, actual_outcome, actual_outcome.get("is_correct", True))
+
+                # Calibration reads outcome_data, where a missing is_correct counts as incorrect (not the column default)
+                await calibration_loop.record_outcome(
+                    conn,
+                    trace_id,
+                    is_correct=actual_outcome.get("is_correct", False),
+                    ground_truth_safe=actual_outcome.get("ground_truth_safe", False),
+                    previous=dict(previous) if previous else None
+                )
         
         logger.info("evaluation_completed", trace_id=trace_id)
 
@@ -0,0 +1,441 @@
+"""
+Bulk ingestion of ground-truth outcomes, e.g. nightly files of chargeback and fraud labels.
+
+    python -m app.evaluation.ingest outcomes.ndjson
+    python -m app.evaluation.ingest labels.csv.gz --batch-size 100000 --report report.json
+    zcat labels.ndjson.gz | python -m app.evaluation.ingest - --format ndjson
+
+One outcome per line: NDJSON objects, or CSV with a header row (a quoted CSV field may span lines). Each record needs a `trace_id`; `is_correct`,
+`ground_truth_safe` (default false) and `corrected_decision` (ACT, ASK or ABSTAIN) are optional, and the whole
+record is kept as the outcome's `outcome_data`. As for single evaluations, a record without `is_correct` is stored
+with the column set to true but counts as incorrect in calibration, which reads `outcome_data`.
+
+Records are streamed in batches of OUTCOME_INGEST_BATCH_SIZE. Each batch is one transaction: a COPY into a
+staging table, a lookup of its traces (hot table, then the index of archived ones), and a single set-based statement
+that upserts the outcomes and applies their net change to the calibration rollup. A record is rejected,
+not fatal, if it is malformed or its trace is unknown; within a batch the last record for a trace wins.
+Batches already committed stay committed if a later one fails, and re-running a file is safe: a replaced
+outcome's rollup contribution is backed out before the new one is added.
+
+The CLI prints the JSON report and exits 1 if any record was rejected (the valid ones are still ingested).
+"""
+import argparse
+import asyncio
+import codecs
+import csv
+import gzip
+import sys
+import time
+import uuid
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+import orjson
+import structlog
+from pydantic import BaseModel, Field
+from app.core.config import settings
+from app.core.schemas import DecisionOutcome
+from app.evaluation.calibration import ROLLUP_COLUMNS, contribution_sql
+from app.trace_store.store import trace_store
+from app.observability.metrics import outcome_ingest_batch_seconds, outcome_ingests_in_progress, outcomes_ingested_total
+
+logger = structlog.get_logger()
+
+INGEST_FORMATS = ("ndjson", "csv")
+
+# Rejected records listed in the report; the count covers all of them.
+MAX_REPORTED_ERRORS = 100
+
+DECISIONS = {decision.value for decision in DecisionOutcome}
+
+# A quoted CSV field may contain newlines, up to this many lines per record; an unterminated quote beyond it
+# is rejected rather than swallowing the rest of the file.
+MAX_CSV_RECORD_LINES = 64
+
+_CSV_BOOLEANS = {"true": True, "t": True, "1": True, "yes": True, "false": False, "f": False, "0": False, "no": False}
+
+# The staging table lives for the session and is emptied at every commit, so batches neither create
+# catalog entries nor invalidate the statements that read it.
+STAGING_COLUMNS = ["line", "trace_id", "outcome_data", "is_correct", "ground_truth_safe", "corrected_decision"]
+STAGING_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS outcome_staging (
+        line BIGINT NOT NULL,
+        trace_id UUID NOT NULL,
+        outcome_data JSONB NOT NULL,
+        is_correct BOOLEAN, -- NULL when the record has none
+        ground_truth_safe BOOLEAN NOT NULL,
+        corrected_decision TEXT
+    ) ON COMMIT DELETE ROWS
+"""
+
+MISSING_TRACES_SQL = """
+    SELECT s.line, s.trace_id
+    FROM outcome_staging s
+    WHERE NOT EXISTS (SELECT 1 FROM decision_trace t WHERE t.id = s.trace_id)
+      AND NOT EXISTS (SELECT 1 FROM decision_trace_archived a WHERE a.trace_id = s.trace_id)
+"""
+
+_NEW = contribution_sql("f.decision", "f.confidence", "COALESCE(f.is_correct, false)", "f.ground_truth_safe")
+_OLD = contribution_sql("f.decision", "f.confidence", "p.is_correct", "p.ground_truth_safe")
+
+# Every CTE reads the snapshot taken before the statement, so `previous` holds the outcomes being replaced.
+# corrected_decision, unless given, is the trace's own decision if it was correct, otherwise ACT for safe
+# ground truth and ABSTAIN for unsafe. A missing is_correct is stored as true in the column (as single evaluations
+# do) and counted as false in calibration (which reads outcome_data->>'is_correct').
+UPSERT_OUTCOMES_SQL = f"""
+    WITH latest AS (
+        SELECT DISTINCT ON (trace_id) trace_id, outcome_data, is_correct, ground_truth_safe, corrected_decision
+        FROM outcome_staging
+        ORDER BY trace_id, line DESC
+    ),
+    facts AS (
+        SELECT l.*, t.policy_id, (t.created_at AT TIME ZONE 'UTC')::date AS bucket_date, t.decision, COALESCE(t.confidence, 0) AS confidence
+        FROM latest l
+        JOIN decision_trace t ON t.id = l.trace_id
+        UNION ALL
+        SELECT l.*, a.policy_id, a.bucket_date, a.decision, a.confidence
+        FROM latest l
+        JOIN decision_trace_archived a ON a.trace_id = l.trace_id
+    ),
+    previous AS (
+        SELECT
+            e.trace_id,
+            COALESCE((e.outcome_data->>'is_correct')::boolean, false) AS is_correct,
+            COALESCE((e.outcome_data->>'ground_truth_safe')::boolean, false) AS ground_truth_safe
+        FROM evaluation_outcome e
+        JOIN latest l ON l.trace_id = e.trace_id
+    ),
+    written AS (
+        INSERT INTO evaluation_outcome (trace_id, outcome_data, is_correct, corrected_decision)
+        SELECT
+            trace_id,
+            outcome_data,
+            COALESCE(is_correct, true),
+            COALESCE(corrected_decision, CASE WHEN is_correct THEN decision WHEN ground_truth_safe THEN 'ACT' ELSE 'ABSTAIN' END)
+        FROM facts
+        ON CONFLICT (trace_id) DO UPDATE SET
+            outcome_data = EXCLUDED.outcome_data,
+            is_correct = EXCLUDED.is_correct,
+            corrected_decision = EXCLUDED.corrected_decision
+        RETURNING (xmax = 0) AS inserted
+    ),
+    rolled_up AS (
+        INSERT INTO calibration_rollup (policy_id, bucket_date, {", ".join(ROLLUP_COLUMNS)})
+        SELECT
+            f.policy_id,
+            f.bucket_date,
+            {", ".join(f"sum({_NEW[c]} - CASE WHEN p.trace_id IS NULL THEN 0 ELSE {_OLD[c]} END)" for c in ROLLUP_COLUMNS)}
+        FROM facts f
+        LEFT JOIN previous p ON p.trace_id = f.trace_id
+        GROUP BY f.policy_id, f.bucket_date
+        ON CONFLICT (policy_id, bucket_date) DO UPDATE SET
+            {", ".join(f"{c} = calibration_rollup.{c} + EXCLUDED.{c}" for c in ROLLUP_COLUMNS)},
+            updated_at = CURRENT_TIMESTAMP
+    )
+    SELECT
+        count(*) FILTER (WHERE inserted) AS inserted,
+        count(*) FILTER (WHERE NOT inserted) AS updated
+    FROM written
+"""
+
+class OutcomeRecordError(ValueError):
+    """A malformed record; it is rejected and the rest of the input is still ingested."""
+
+class OutcomeFileError(ValueError):
+    """Input that cannot be ingested at all (e.g. a CSV header without trace_id)."""
+
+class IngestError(BaseModel):
+    line: int
+    reason: str
+
+class IngestReport(BaseModel):
+    format: str
+    rows_read: int = 0  # records, not counting blank lines or the CSV header
+    inserted: int = 0
+    updated: int = 0
+    rejected: int = 0
+    unknown_traces: int = 0  # rejected because no hot or archived trace has the id
+    duplicates: int = 0  # superseded by a later record for the same trace in the same batch
+    batches: int = 0
+    seconds: float = 0.0
+    rows_per_second: float = 0.0
+    errors: List[IngestError] = Field(default_factory=list)
+
+def detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+def _boolean(record: Dict[str, Any], name: str, default: Optional[bool]) -> Optional[bool]:
+    value = record.get(name)
+    if value is None:
+        return default
+    if not isinstance(value, bool):
+        raise OutcomeRecordError(f"{name} must be a boolean, got {value!r}")
+    return value
+
+class OutcomeParser:
+    """
+    Turns input lines into staging rows (see STAGING_COLUMNS): one record per NDJSON line, one per CSV
+    record. A CSV record whose quoted field spans lines is buffered until the quote closes; `line` is
+    the first line of the record last parsed.
+    """
+
+    def __init__(self, fmt: str):
+        if fmt not in INGEST_FORMATS:
+            raise OutcomeFileError(f"unsupported format {fmt!r}, expected one of {', '.join(INGEST_FORMATS)}")
+        self.fmt = fmt
+        self.header: Optional[List[str]] = None
+        self.line = 0
+        self._partial: List[str] = []
+
+    def parse(self, line_number: int, line: str) -> Optional[Tuple]:
+        """
+        The staging row for one line; None for blank lines, the CSV header and lines that continue a quoted
+        CSV field. Raises OutcomeRecordError.
+        """
+        if line_number == 1:
+            line = line.lstrip("\ufeff")
+        if self.fmt == "csv":
+            fields = self._csv_fields(line_number, line.rstrip("\r\n"))
+            if fields is None:
+                return None
+            if self.header is None:
+                self.header = [name.strip() for name in fields]
+                if "trace_id" not in self.header:
+                    raise OutcomeFileError("CSV header has no trace_id column")
+                return None
+            if len(fields) != len(self.header):
+                raise OutcomeRecordError(f"expected {len(self.header)} fields, got {len(fields)}")
+            record = self._csv_record(fields)
+        else:
+            if not line.strip():
+                return None
+            self.line = line_number
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                raise OutcomeRecordError(f"invalid JSON: {e}") from e
+            if not isinstance(record, dict):
+                raise OutcomeRecordError("expected a JSON object")
+        return self._row(self.line, record)
+
+    def finish(self):
+        """
+        Call at the end of the input: raises OutcomeRecordError if a quoted CSV field was never closed.
+        """
+        if self._partial:
+            self._partial = []
+            raise OutcomeRecordError("unterminated quoted field")
+
+    def _csv_fields(self, line_number: int, line: str) -> Optional[List[str]]:
+        if not self._partial:
+            if not line.strip():
+                return None
+            self.line = line_number
+        self._partial.append(line)
+        text = "\n".join(self._partial)
+        # Quotes, escaped ones included, come in pairs once every quoted field is closed
+        if text.count('"') % 2:
+            if len(self._partial) < MAX_CSV_RECORD_LINES:
+                return None
+            self._partial = []
+            raise OutcomeRecordError(f"unterminated quoted field (more than {MAX_CSV_RECORD_LINES} lines)")
+        self._partial = []
+        return next(csv.reader([text]))
+
+    def _csv_record(self, fields: List[str]) -> Dict[str, Any]:
+        record: Dict[str, Any] = {}
+        for name, value in zip(self.header, fields):
+            value = value.strip()
+            if not value:
+                continue
+            if name in ("is_correct", "ground_truth_safe"):
+                if value.lower() not in _CSV_BOOLEANS:
+                    raise OutcomeRecordError(f"{name} must be a boolean, got {value!r}")
+                record[name] = _CSV_BOOLEANS[value.lower()]
+            else:
+                record[name] = value
+        return record
+
+    @staticmethod
+    def _row(line_number: int, record: Dict[str, Any]) -> Tuple:
+        outcome = dict(record)
+        raw_trace_id = outcome.pop("trace_id", None)
+        if raw_trace_id is None:
+            raise OutcomeRecordError("missing trace_id")
+        try:
+            trace_id = uuid.UUID(str(raw_trace_id))
+        except ValueError:
+            raise OutcomeRecordError(f"trace_id is not a UUID: {raw_trace_id!r}") from None
+        corrected = outcome.get("corrected_decision")
+        if corrected is not None and corrected not in DECISIONS:
+            raise OutcomeRecordError(f"corrected_decision must be one of {', '.join(sorted(DECISIONS))}, got {corrected!r}")
+        return (
+            line_number,
+            trace_id,
+            outcome,
+            _boolean(outcome, "is_correct", None),
+            _boolean(outcome, "ground_truth_safe", False),
+            corrected,
+        )
+
+class OutcomeIngestor:
+    """
+    Streams outcome records into evaluation_outcome and calibration_rollup, a batch per transaction.
+    While a batch is being written, the next one is parsed.
+    """
+
+    async def ingest(self, lines: AsyncIterable[str], fmt: str = "ndjson", batch_size: Optional[int] = None) -> IngestReport:
+        batch_size = batch_size or settings.OUTCOME_INGEST_BATCH_SIZE
+        parser = OutcomeParser(fmt)
+        report = IngestReport(format=fmt)
+        started = time.perf_counter()
+        pending: Optional[asyncio.Task] = None
+        batch: List[Tuple] = []
+        line_number = 0
+        logger.info("outcome_ingest_started", format=fmt, batch_size=batch_size)
+        outcome_ingests_in_progress.inc()
+        try:
+            async for line in lines:
+                line_number += 1
+                try:
+                    row = parser.parse(line_number, line)
+                except OutcomeRecordError as e:
+                    report.rows_read += 1
+                    self._reject(report, parser.line, str(e))
+                    continue
+                if row is None:
+                    continue
+                report.rows_read += 1
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    if pending is not None:
+                        await pending
+                    pending = asyncio.create_task(self._load(batch, report, started))
+                    batch = []
+            try:
+                parser.finish()
+            except OutcomeRecordError as e:
+                report.rows_read += 1
+                self._reject(report, parser.line, str(e))
+            if pending is not None:
+                await pending
+            if batch:
+                await self._load(batch, report, started)
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+            outcome_ingests_in_progress.dec()
+        report.seconds = round(time.perf_counter() - started, 3)
+        report.rows_per_second = round(report.rows_read / report.seconds, 1) if report.seconds else 0.0
+        logger.info("outcome_ingest_completed", **report.model_dump(exclude={"errors"}))
+        return report
+
+    @staticmethod
+    def _reject(report: IngestReport, line: int, reason: str):
+        report.rejected += 1
+        outcomes_ingested_total.labels(result="rejected").inc()
+        if len(report.errors) < MAX_REPORTED_ERRORS:
+            report.errors.append(IngestError(line=line, reason=reason))
+
+    async def _load(self, batch: List[Tuple], report: IngestReport, started: float):
+        start = time.perf_counter()
+        async with trace_store.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(STAGING_DDL)
+                async with trace_store.timed("copy_outcomes"):
+                    await conn.copy_records_to_table("outcome_staging", records=batch, columns=STAGING_COLUMNS)
+                unknown = [(row["line"], row["trace_id"]) for row in await conn.fetch(MISSING_TRACES_SQL)]
+                # Blocks single evaluations (and other ingestions) until commit, so the outcomes this batch
+                # replaces cannot change under it; readers are not blocked.
+                await conn.execute("LOCK TABLE evaluation_outcome IN SHARE ROW EXCLUSIVE MODE")
+                async with trace_store.timed("upsert_outcomes"):
+                    written = await conn.fetchrow(UPSERT_OUTCOMES_SQL)
+        elapsed = time.perf_counter() - start
+        outcome_ingest_batch_seconds.observe(elapsed)
+
+        for line, trace_id in unknown:
+            self._reject(report, line, f"unknown trace_id {trace_id}")
+        report.unknown_traces += len(unknown)
+        report.inserted += written["inserted"]
+        report.updated += written["updated"]
+        report.duplicates += len(batch) - len(unknown) - written["inserted"] - written["updated"]
+        report.batches += 1
+        outcomes_ingested_total.labels(result="inserted").inc(written["inserted"])
+        outcomes_ingested_total.labels(result="updated").inc(written["updated"])
+        logger.info(
+            "outcome_batch_ingested",
+            batch=report.batches,
+            rows=len(batch),
+            inserted=written["inserted"],
+            updated=written["updated"],
+            unknown_traces=len(unknown),
+            batch_ms=round(elapsed * 1000, 1),
+            rows_read=report.rows_read,
+            rows_per_second=round(report.rows_read / (time.perf_counter() - started), 1)
+        )
+
+async def iter_body_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """
+    Lines of a streamed UTF-8 body (e.g. Starlette's `request.stream()`).
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+async def iter_file_lines(path: str, block_bytes: int = 1 << 20) -> AsyncIterator[str]:
+    """
+    Lines of a (possibly gzipped) file, or stdin for "-". Read a block at a time in a thread, so a batch
+    being written makes progress meanwhile.
+    """
+    if path == "-":
+        stream = sys.stdin
+    else:
+        opener = gzip.open if path.endswith(".gz") else open
+        stream = opener(path, "rt", encoding="utf-8", newline="")
+    try:
+        while True:
+            lines = await asyncio.to_thread(stream.readlines, block_bytes)
+            if not lines:
+                break
+            for line in lines:
+                yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+outcome_ingestor = OutcomeIngestor()
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.evaluation.ingest", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="outcomes file (.ndjson, .jsonl or .csv, optionally .gz), or - for stdin")
+    parser.add_argument("--format", choices=INGEST_FORMATS, default=None, help="input format (default: from the file extension; ndjson for stdin)")
+    parser.add_argument("--batch-size", type=int, default=None, help="records per transaction (default OUTCOME_INGEST_BATCH_SIZE)")
+    parser.add_argument("--report", default=None, help="also write the JSON report here")
+    args = parser.parse_args(argv)
+
+    async def run() -> IngestReport:
+        try:
+            return await outcome_ingestor.ingest(iter_file_lines(args.input), args.format or detect_format(args.input), args.batch_size)
+        finally:
+            await trace_store.disconnect()
+
+    try:
+        report = asyncio.run(run())
+    except OutcomeFileError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    output = report.model_dump_json(indent=2)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+    return 1 if report.rejected else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+import structlog
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+from app.trace_store.store import trace_store
+
+logger = structlog.get_logger()
+
+class ReliabilityBin(BaseModel):
+    lower: float
+    upper: float
+    count: int = 0
+    avg_confidence: float = 0.0
+    accuracy: float = 0.0
+    gap: float = 0.0  # |accuracy - avg_confidence|
+
+class ReliabilitySummary(BaseModel):
+    count: int = 0
+    accuracy: float = 0.0
+    avg_confidence: float = 0.0
+    brier_score: float = 0.0  # mean (confidence - is_correct)^2
+    ece: float = 0.0  # expected calibration error: count-weighted mean bin gap
+    mce: float = 0.0  # maximum calibration error: worst non-empty bin gap
+    bins: List[ReliabilityBin] = Field(default_factory=list)
+
+class ReliabilityReport(BaseModel):
+    n_bins: int
+    overall: ReliabilitySummary
+    by_policy: Dict[str, ReliabilitySummary] = Field(default_factory=dict)
+    by_model: Dict[str, ReliabilitySummary] = Field(default_factory=dict)
+    by_decision: Dict[str, ReliabilitySummary] = Field(default_factory=dict)
+
+def grouped_summaries(group_index, n_groups: int, confidence, correct, n_bins: int = 10) -> List[ReliabilitySummary]:
+    """
+    Reliability statistics for every group in a single vectorized pass.
+
+    group_index: int array mapping each row to a group in [0, n_groups); confidence: float array in [0, 1];
+    correct: bool array. Rows are binned by confidence into `n_bins` equal-width bins.
+    """
+    import numpy as np
+
+    group_index = np.asarray(group_index, dtype=np.int64)
+    confidence = np.clip(np.asarray(confidence, dtype=np.float64), 0.0, 1.0)
+    correct = np.asarray(correct, dtype=np.float64)
+
+    bins = np.minimum((confidence * n_bins).astype(np.int64), n_bins - 1)
+    cell = group_index * n_bins + bins
+    size = n_groups * n_bins
+    counts = np.bincount(cell, minlength=size).reshape(n_groups, n_bins)
+    conf_sums = np.bincount(cell, weights=confidence, minlength=size).reshape(n_groups, n_bins)
+    correct_sums = np.bincount(cell, weights=correct, minlength=size).reshape(n_groups, n_bins)
+    squared_error = np.bincount(group_index, weights=(confidence - correct) ** 2, minlength=n_groups)
+
+    totals = counts.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bin_conf = np.where(counts > 0, conf_sums / counts, 0.0)
+        bin_acc = np.where(counts > 0, correct_sums / counts, 0.0)
+        gaps = np.abs(bin_acc - bin_conf)
+        safe_totals = np.maximum(totals, 1)
+        ece = (counts * gaps).sum(axis=1) / safe_totals
+        brier = squared_error / safe_totals
+        accuracy = correct_sums.sum(axis=1) / safe_totals
+        avg_confidence = conf_sums.sum(axis=1) / safe_totals
+    mce = np.where(counts > 0, gaps, 0.0).max(axis=1)
+
+    edges = np.linspace(0.0, 1.0, n_bins + 1)
+    summaries = []
+    for g in range(n_groups):
+        summaries.append(ReliabilitySummary(
+            count=int(totals[g]),
+            accuracy=float(accuracy[g]),
+            avg_confidence=float(avg_confidence[g]),
+            brier_score=float(brier[g]),
+            ece=float(ece[g]),
+            mce=float(mce[g]),
+            bins=[
+                ReliabilityBin(
+                    lower=float(edges[b]),
+                    upper=float(edges[b + 1]),
+                    count=int(counts[g, b]),
+                    avg_confidence=float(bin_conf[g, b]),
+                    accuracy=float(bin_acc[g, b]),
+                    gap=float(gaps[g, b])
+                )
+                for b in range(n_bins)
+            ]
+        ))
+    return summaries
+
+def _factorize(labels):
+    """
+    Maps labels to dense integer codes. Labels are low-cardinality (policies, models, decisions), so a
+    dict lookup per row is much cheaper than the sort np.unique would do on object arrays.
+    """
+    import numpy as np
+
+    index: Dict[Any, int] = {}
+    codes = np.fromiter((index.setdefault(label, len(index)) for label in labels), dtype=np.int64, count=len(labels))
+    return [str(key) for key in index], codes
+
+def breakdown(labels, confidence, correct, n_bins: int = 10) -> Dict[str, ReliabilitySummary]:
+    """
+    Per-label reliability summaries, e.g. labels = policy id per row.
+    """
+    keys, group_index = _factorize(labels)
+    summaries = grouped_summaries(group_index, len(keys), confidence, correct, n_bins)
+    return dict(sorted(zip(keys, summaries), key=lambda item: item[0]))
+
+def reliability_report(columns: Dict[str, Any], n_bins: int = 10) -> ReliabilityReport:
+    """
+    Builds the full report from columnar arrays: confidence, is_correct, policy_id, model, decision.
+    """
+    import numpy as np
+
+    confidence = np.asarray(columns["confidence"], dtype=np.float64)
+    correct = np.asarray(columns["is_correct"], dtype=bool)
+    overall = grouped_summaries(np.zeros(len(confidence), dtype=np.int64), 1, confidence, correct, n_bins)[0]
+    return ReliabilityReport(
+        n_bins=n_bins,
+        overall=overall,
+        by_policy=breakdown(columns["policy_id"], confidence, correct, n_bins),
+        by_model=breakdown(columns["model"], confidence, correct, n_bins),
+        by_decision=breakdown(columns["decision"], confidence, correct, n_bins),
+    )
+
+def _utc_midnight(day: Optional[date]) -> Optional[datetime]:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc) if day is not None else None
+
+class ReliabilityEvaluator:
+    """
+    Loads evaluated decisions as columns (one array per field, aggregated in Postgres) and computes
+    Brier score, ECE/MCE and reliability-diagram bins overall and per policy, model and decision.
+    """
+
+    async def load_columns(
+        self,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        policy_id: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        import numpy as np
+
+        # Days are UTC, as in the calibration rollup, whatever the session time zone. Bounded on the bare partition
+        # key so the window prunes decision_trace partitions and can use its created_at index.
+        start_at = _utc_midnight(start)
+        end_before = _utc_midnight(end + timedelta(days=1) if end is not None else None)
+
+        async with trace_store.acquire() as conn, trace_store.timed("reliability_columns"):
+            row = await conn.fetchrow(
+                """
+                SELECT
+                    array_agg(confidence) AS confidence,
+                    array_agg(is_correct) AS is_correct,
+                    array_agg(policy_id) AS policy_id,
+                    array_agg(model) AS model,
+                    array_agg(decision) AS decision
+                FROM (
+                    SELECT
+                        COALESCE(t.confidence, 0) AS confidence,
+                        COALESCE((e.outcome_data->>'is_correct')::boolean, false) AS is_correct,
+                        t.policy_id,
+                        COALESCE(t.trace_data->'decision'->>'model', 'unknown') AS model,
+                        COALESCE(t.decision, 'unknown') AS decision
+                    FROM evaluation_outcome e
+                    JOIN decision_trace t ON t.id = e.trace_id
+                    WHERE t.created_at >= COALESCE($1::timestamptz, '-infinity')
+                      AND t.created_at < COALESCE($2::timestamptz, 'infinity')
+                      AND ($3::text IS NULL OR t.policy_id = $3)
+                    ORDER BY e.created_at DESC
+                    LIMIT $4
+                ) evaluated
+                """,
+                start_at,
+                end_before,
+                policy_id,
+                limit
+            )
+        return {
+            "confidence": np.asarray(row["confidence"] or [], dtype=np.float64),
+            "is_correct": np.asarray(row["is_correct"] or [], dtype=bool),
+            "policy_id": np.asarray(row["policy_id"] or [], dtype=object),
+            "model": np.asarray(row["model"] or [], dtype=object),
+            "decision": np.asarray(row["decision"] or [], dtype=object),
+        }
+
+    async def run(self, n_bins: int = 10, **filters: Any) -> ReliabilityReport:
+        columns = await self.load_columns(**filters)
+        report = reliability_report(columns, n_bins)
+        logger.info("reliability_report_completed", count=report.overall.count, ece=report.overall.ece, brier=report.overall.brier_score)
+        return report
+
+reliability_evaluator = ReliabilityEvaluator()
@@ -1,32 +1,38 @@
 import structlog
-from typing import Dict, Any
-from jinja2 import Template
+from typing import Dict, Any, Optional
 from app.llm_gateway.client import llm_gateway
 from app.core.utils import extract_json
 
-from app.core.exceptions import ModelTimeoutError
+from app.core.costs import cost_model
+from app.core.exceptions import BudgetExceededError, ModelTimeoutError
+from app.core.policies import PolicySnapshot
+from app.core.prompts import prompt_assembler
+from app.observability.tracing import stage
 
 logger = structlog.get_logger()
 
+PLANNER_SYSTEM_PROMPT = "You are a safety-first evidence planner."
+PLANNER_MODEL = "claude-3-5-sonnet-20240620"
+
 class EvidencePlanner:
-    def __init__(self):
-        with open("prompts/evidence_planner.jinja", "r") as f:
-            self.template = Template(f.read())
-
-    async def plan(self, input_data: Dict[str, Any], constraints: Dict[str, Any]) -> Dict[str, Any]:
-        prompt = self.template.render(
-            input_data=input_data,
-            constraints=constraints
-        )
+    async def plan(self, input_data: Dict[str, Any], constraints: Dict[str, Any], snapshot: Optional[PolicySnapshot] = None) -> Dict[str, Any]:
+        with stage("prompt_render"):
+            static_prefix, prompt = prompt_assembler.render(
+                "evidence_planner",
+                constraints.get("policy"),
+                static_prefix=snapshot.prompt_prefixes["evidence_planner"] if snapshot else None,
+                input_data=input_data
+            )
         
         # 0. Initial Cost Estimate (Threshold Check)
         config = (constraints.get("policy") or {}).get("cost_limits", {})
         voi_threshold_ratio = config.get("voi_threshold_ratio", 0.001)
         voi_max_usd = config.get("voi_max_usd", 5.0)
 
-        estimated_input_tokens = len(prompt) // 4
-        estimated_cost_usd = (estimated_input_tokens + 1000) * 0.00001 
-        
+        # Whole pipeline: the planner and the engine calls that follow, at each model's price
+        estimated_input_tokens, _, _ = cost_model.estimate_call(PLANNER_MODEL, PLANNER_SYSTEM_PROMPT, static_prefix, prompt, max_tokens=1000)
+        estimated_cost_usd = cost_model.pipeline_cost_usd(constraints.get("policy"), PLANNER_MODEL, estimated_input_tokens)
+
         signals = input_data.get("signals", {})
         transaction_value = signals.get("amount", 0)
         
@@ -35,17 +41,24 @@ class EvidencePlanner:
              return {
                  "recommended_path": "ABSTAIN",
                  "risk_assessment": f"Value of Information (VoI) too low. Cost ${estimated_cost_usd:.2f} relative to value ${transaction_value:.2f}.",
-                 "missing_evidence": []
+                 "missing_evidence": [],
+                 "abstain_reason": "voi_cost_gate"
              }
 
         logger.info("evidence_planning_start")
         try:
             result = await llm_gateway.get_structured_decision(
                 prompt=prompt,
-                system_prompt="You are a safety-first evidence planner."
+                system_prompt=PLANNER_SYSTEM_PROMPT,
+                model=PLANNER_MODEL,
+                static_prefix=static_prefix,
+                policy=constraints.get("policy"),
+                policy_id=snapshot.policy_id if snapshot else None,
+                stage="evidence_planner"
             )
             
-            planned_data = extract_json(result.get("raw_response", "")) or {}
+            with stage("json_extraction"):
+                planned_data = extract_json(result.get("raw_response", "")) or {}
             planned_data["vo_info_assessment"] = {"estimated_cost": estimated_cost_usd}
             
             return planned_data
@@ -54,7 +67,15 @@ class EvidencePlanner:
             return {
                 "recommended_path": "ABSTAIN",
                 "risk_assessment": f"Evidence planning failed due to system timeout: {str(e)}",
-                "missing_evidence": ["all"]
+                "missing_evidence": ["all"],
+                "abstain_reason": "planner_timeout"
+            }
+        except BudgetExceededError as e:
+            return {
+                "recommended_path": "ABSTAIN",
+                "risk_assessment": f"Decision budget exhausted before evidence planning: {str(e)}",
+                "missing_evidence": [],
+                "abstain_reason": "budget_exceeded"
             }
 
 evidence_planner = EvidencePlanner()
@@ -0,0 +1,61 @@
+import hashlib
+import json
+import structlog
+from typing import Any, Dict, Optional
+from app.core.cache import TieredCache
+from app.core.config import settings
+from app.core.policies import policy_manager
+
+logger = structlog.get_logger()
+
+KEY_PREFIX = "dt:llm"
+
+class ResponseCache:
+    """
+    Caches LLM gateway responses keyed by a canonical hash of (model, system prompt, rendered prompt).
+    Policies opt in through their `response_cache` section; keys are namespaced per policy so a
+    policy change can invalidate everything derived from it.
+    """
+
+    def __init__(self):
+        self.store = TieredCache(
+            name="llm_response",
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            use_redis=settings.LLM_CACHE_BACKEND == "redis"
+        )
+
+    @staticmethod
+    def config_for(policy: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the policy's cache config if it has opted in, otherwise None.
+        """
+        if not settings.LLM_CACHE_ENABLED:
+            return None
+        config = (policy or {}).get("response_cache", {})
+        return config if config.get("enabled", False) else None
+
+    @staticmethod
+    def make_key(policy_id: str, model: str, system_prompt: str, static_prefix: Optional[str], prompt: str, max_tokens: int) -> str:
+        canonical = json.dumps(
+            {"model": model, "system": system_prompt, "prefix": static_prefix, "prompt": prompt, "max_tokens": max_tokens},
+            sort_keys=True,
+            separators=(",", ":")
+        )
+        digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:{policy_id}:{digest}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await self.store.get(key)
+
+    async def set(self, key: str, result: Dict[str, Any], ttl_seconds: int):
+        await self.store.set(key, result, ttl_seconds)
+
+    async def invalidate_policy(self, policy_id: str):
+        """
+        Policy change hook: drops every cached response produced under the policy.
+        """
+        removed = await self.store.delete_prefix(f"{KEY_PREFIX}:{policy_id}:")
+        logger.info("llm_cache_invalidated", policy_id=policy_id, removed=removed)
+
+response_cache = ResponseCache()
+policy_manager.add_change_listener(response_cache.invalidate_policy)
@@ -1,69 +1,455 @@
+import asyncio
+import threading
 import time
 import structlog
-from typing import Any, Dict
-from anthropic import AsyncAnthropic
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from app.core.config import settings
-import anthropic
+from app.core.costs import cost_model
 from app.core.exceptions import ModelTimeoutError
-from app.observability.metrics import tokens_consumed_total, llm_latency_seconds
+from app.core.utils import IncrementalJSONParser, extract_json
+from app.llm_gateway.cache import response_cache
+from app.llm_gateway.limits import ModelLane, RetryBudget, backoff_s
+from app.observability import tracing
+from app.observability.metrics import (
+    tokens_consumed_total,
+    llm_latency_seconds,
+    llm_retries_total,
+    llm_retry_budget_exhausted_total,
+    llm_hedged_requests_total,
+)
 
 logger = structlog.get_logger()
 
+# Status codes worth retrying: request timeout, conflict, rate limit and any server error (incl. 529 overloaded).
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+# Completed calls of the current request (task), for its trace; see LLMGateway.record_calls.
+_call_log: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("llm_call_log", default=None)
+
+def _sdk():
+    """
+    The anthropic package, imported on first use: it is by far the slowest import in the app, and code that
+    never calls the provider (hard constraints, CLI tools, offline replays) should not pay for it.
+    """
+    import anthropic
+    return anthropic
+
+def _transport_errors() -> Tuple[type, ...]:
+    sdk = _sdk()
+    return (sdk.APITimeoutError, sdk.APIConnectionError)
+
+def is_retryable(error: Exception) -> bool:
+    sdk = _sdk()
+    if isinstance(error, sdk.APIConnectionError):
+        return True
+    if isinstance(error, sdk.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    return False
+
+def _retry_reason(error: Exception) -> str:
+    sdk = _sdk()
+    if isinstance(error, sdk.APITimeoutError):
+        return "timeout"
+    if isinstance(error, sdk.APIStatusError):
+        return str(error.status_code)
+    return "connection"
+
 class LLMGateway:
-    def __init__(self):
-        self.client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+    def __init__(self, base_url: Optional[str] = None, max_concurrency: Optional[int] = None):
+        self.base_url = base_url
+        self._client = None
+        # `warm_up` may run in a thread while a request asks for the client
+        self._client_lock = threading.Lock()
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.lanes: Dict[str, ModelLane] = {}
+        self.retry_budget = RetryBudget(settings.LLM_RETRY_BUDGET_RATIO, settings.LLM_RETRY_BUDGET_MIN)
+
+    @property
+    def client(self):
+        """
+        The provider client, created on first use (or by `warm_up`). Replaceable, e.g. by the fake backend.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    # Retries are owned by the gateway (budgeted and jittered), so the SDK's own retries are disabled.
+                    self._client = _sdk().AsyncAnthropic(
+                        api_key=settings.ANTHROPIC_API_KEY,
+                        base_url=self.base_url or settings.ANTHROPIC_BASE_URL,
+                        max_retries=0
+                    )
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def warm_up(self):
+        """
+        Creates the provider client (importing its SDK) ahead of the first request. Thread-safe, so it can
+        run off the event loop.
+        """
+        return self.client
+
+    def lane(self, model: str) -> ModelLane:
+        lane = self.lanes.get(model)
+        if lane is None:
+            limit = settings.LLM_MODEL_CONCURRENCY.get(model, self.max_concurrency)
+            lane = self.lanes[model] = ModelLane(model, limit)
+        return lane
 
     async def get_structured_decision(
-        self, 
-        prompt: str, 
+        self,
+        prompt: str,
         system_prompt: str,
         model: str = "claude-3-5-sonnet-20240620",
-        max_tokens: int = 1000
+        max_tokens: int = 1000,
+        policy: Optional[Dict[str, Any]] = None,
+        static_prefix: Optional[str] = None,
+        hedge: bool = False,
+        stage: Optional[str] = None,
+        policy_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Calls the LLM and enforces structured output.
         Logs every request/response for auditability.
+        Responses are served from the response cache when the policy has opted in; they are keyed by `policy_id`
+        (the registry's id, which invalidation uses), and not cached without one.
+        `static_prefix` (per-policy instructions) is sent as a system block marked for provider prompt caching.
+        `hedge` sends a second, identical request if the first is slower than the model's recent p95.
+        `stage` names the pipeline stage making the call in the request's call log (see `record_calls`).
+        """
+        with tracing.stage(f"llm_{stage}" if stage else "llm", stage=stage, model=model):
+            start_time = time.time()
+
+            cache_config, cache_key, cached = await self._cache_lookup(policy, policy_id, model, system_prompt, static_prefix, prompt, max_tokens, start_time)
+            if cached is not None:
+                self._log_call(stage, model, cached)
+                return cached
+
+            logger.info("llm_request_start", model=model, system_prompt=system_prompt[:100])
+
+            request = self._request(prompt, system_prompt, model, max_tokens, static_prefix)
+            # Fails closed (BudgetExceededError) before anything is sent if the call does not fit the decision's budget.
+            reservation = cost_model.reserve(stage or "llm", model, system_prompt, static_prefix, prompt, max_tokens, self._typical_latency_ms(model))
+
+            try:
+                response = await self._call_with_retries(self.lane(model), request, hedge)
+
+                latency_ms = int((time.time() - start_time) * 1000)
+                content = response.content[0].text
+
+                logger.info(
+                    "llm_request_success",
+                    latency_ms=latency_ms,
+                    input_tokens=response.usage.input_tokens,
+                    output_tokens=response.usage.output_tokens
+                )
+
+                # Record Metrics
+                cache_read_tokens = getattr(response.usage, "cache_read_input_tokens", None) or 0
+                cost_usd = self._record_usage(model, response.usage.input_tokens, response.usage.output_tokens, cache_read_tokens, latency_ms)
+                if reservation:
+                    reservation.settle(response.usage.input_tokens + response.usage.output_tokens, cost_usd)
+
+                result = {
+                    "raw_response": content,
+                    "input_tokens": response.usage.input_tokens,
+                    "output_tokens": response.usage.output_tokens,
+                    "latency_ms": latency_ms
+                }
+                if cache_key:
+                    await response_cache.set(cache_key, result, cache_config.get("ttl_seconds", settings.LLM_CACHE_TTL_SECONDS))
+                self._log_call(stage, model, result)
+                return result
+
+            except _transport_errors() as e:
+                logger.error("llm_request_timeout", error=str(e))
+                raise ModelTimeoutError(f"LLM provider timeout or connection issue: {str(e)}")
+            except Exception as e:
+                logger.error("llm_request_failed", error=str(e))
+                raise ModelTimeoutError(f"Unexpected LLM error: {str(e)}")
+            finally:
+                if reservation:
+                    reservation.release()
+
+    async def stream_structured_decision(
+        self,
+        prompt: str,
+        system_prompt: str,
+        model: str = "claude-3-5-sonnet-20240620",
+        max_tokens: int = 1000,
+        policy: Optional[Dict[str, Any]] = None,
+        static_prefix: Optional[str] = None,
+        early_fields: Tuple[str, ...] = ("decision", "confidence"),
+        on_early_fields: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        stage: Optional[str] = None,
+        policy_id: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
-        start_time = time.time()
-        
-        logger.info("llm_request_start", model=model, system_prompt=system_prompt[:100])
-        
+        Streaming variant of get_structured_decision, parsed incrementally as tokens arrive.
+        Generation stops as soon as the JSON object is complete, so trailing text is never paid for.
+        `on_early_fields` is called once with the top-level fields parsed so far as soon as all
+        `early_fields` have arrived; if it returns True, generation stops there and the result is
+        marked `stopped_early`. The result adds `parsed`: the full object, or the partial fields when
+        stopped early.
+        """
+        with tracing.stage(f"llm_{stage}" if stage else "llm", stage=stage, model=model):
+            start_time = time.time()
+
+            cache_config, cache_key, cached = await self._cache_lookup(policy, policy_id, model, system_prompt, static_prefix, prompt, max_tokens, start_time)
+            if cached is not None:
+                parsed = extract_json(cached.get("raw_response", ""))
+                if parsed and on_early_fields and all(name in parsed for name in early_fields):
+                    on_early_fields(dict(parsed))
+                self._log_call(stage, model, cached)
+                return {**cached, "parsed": parsed, "stopped_early": False}
+
+            logger.info("llm_stream_start", model=model, system_prompt=system_prompt[:100])
+
+            request = self._request(prompt, system_prompt, model, max_tokens, static_prefix)
+            # Fails closed (BudgetExceededError) before anything is sent if the call does not fit the decision's budget.
+            reservation = cost_model.reserve(stage or "llm", model, system_prompt, static_prefix, prompt, max_tokens, self._typical_latency_ms(model))
+            # The early callback fires at most once per call, even across retries.
+            signalled = [False]
+
+            async def attempt(lane: ModelLane, request: Dict[str, Any]):
+                return await self._stream_attempt(lane, request, early_fields, on_early_fields, signalled)
+
+            try:
+                streamed = await self._call_with_retries(self.lane(model), request, hedge=False, call=attempt)
+
+                latency_ms = int((time.time() - start_time) * 1000)
+                parser = streamed["parser"]
+                parsed = dict(parser.fields) if streamed["stopped_early"] else parser.value()
+
+                logger.info(
+                    "llm_stream_success",
+                    latency_ms=latency_ms,
+                    input_tokens=streamed["input_tokens"],
+                    output_tokens=streamed["output_tokens"],
+                    stopped_early=streamed["stopped_early"]
+                )
+                cost_usd = self._record_usage(model, streamed["input_tokens"], streamed["output_tokens"], streamed["cache_read_tokens"], latency_ms)
+                if reservation:
+                    reservation.settle(streamed["input_tokens"] + streamed["output_tokens"], cost_usd)
+
+                result = {
+                    "raw_response": parser.buffer,
+                    "input_tokens": streamed["input_tokens"],
+                    "output_tokens": streamed["output_tokens"],
+                    "latency_ms": latency_ms
+                }
+                if cache_key and parser.complete and not streamed["stopped_early"]:
+                    await response_cache.set(cache_key, result, cache_config.get("ttl_seconds", settings.LLM_CACHE_TTL_SECONDS))
+                self._log_call(stage, model, {**result, "stopped_early": streamed["stopped_early"]})
+                return {**result, "parsed": parsed, "stopped_early": streamed["stopped_early"]}
+
+            except _transport_errors() as e:
+                logger.error("llm_request_timeout", error=str(e))
+                raise ModelTimeoutError(f"LLM provider timeout or connection issue: {str(e)}")
+            except Exception as e:
+                logger.error("llm_request_failed", error=str(e))
+                raise ModelTimeoutError(f"Unexpected LLM error: {str(e)}")
+            finally:
+                if reservation:
+                    reservation.release()
+
+    @staticmethod
+    def record_calls() -> List[Dict[str, Any]]:
+        """
+        Starts a call log for the current task and returns it. Every call made with a `stage` from this task
+        (and the tasks it starts) is appended with its raw response and token usage, so the decision can be
+        replayed offline against recorded responses (app/replay).
+        """
+        calls: List[Dict[str, Any]] = []
+        _call_log.set(calls)
+        return calls
+
+    @staticmethod
+    def _log_call(stage: Optional[str], model: str, result: Dict[str, Any]):
+        calls = _call_log.get()
+        if calls is None or stage is None:
+            return
+        calls.append({
+            "stage": stage,
+            "model": model,
+            "raw_response": result.get("raw_response", ""),
+            "input_tokens": result.get("input_tokens", 0),
+            "output_tokens": result.get("output_tokens", 0),
+            "cached": result.get("cached", False),
+            "stopped_early": result.get("stopped_early", False),
+        })
+
+    async def _cache_lookup(self, policy, policy_id, model, system_prompt, static_prefix, prompt, max_tokens, start_time):
+        """
+        Returns (cache_config, cache_key, cached_result); cache_config is None if the policy has not opted in.
+        Entries are namespaced by the registry's policy id so `invalidate_policy` finds them; without an id
+        nothing is cached, since nothing could invalidate it.
+        """
+        cache_config = response_cache.config_for(policy)
+        if not cache_config or policy_id is None:
+            return None, None, None
+        cache_key = response_cache.make_key(policy_id, model, system_prompt, static_prefix, prompt, max_tokens)
+        cached = await response_cache.get(cache_key)
+        if cached is None:
+            return cache_config, cache_key, None
+        logger.info("llm_cache_hit", model=model)
+        # No provider tokens were consumed for a cache hit.
+        return cache_config, cache_key, {
+            **cached,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "latency_ms": int((time.time() - start_time) * 1000),
+            "cached": True
+        }
+
+    def _request(self, prompt: str, system_prompt: str, model: str, max_tokens: int, static_prefix: Optional[str]) -> Dict[str, Any]:
+        return {
+            "model": model,
+            "max_tokens": max_tokens,
+            "system": self._system_blocks(system_prompt, static_prefix),
+            "messages": [{"role": "user", "content": prompt}],
+        }
+
+    def _typical_latency_ms(self, model: str) -> float:
+        # Only needed for a latency budget; the quantile sorts the lane's latency window.
+        budget = cost_model.current_budget()
+        if budget is None or budget.max_latency_ms is None:
+            return 0.0
+        typical_s = self.lane(model).quantile(0.5)
+        return typical_s * 1000 if typical_s else 0.0
+
+    @staticmethod
+    def _record_usage(model: str, input_tokens: int, output_tokens: int, cache_read_tokens: int, latency_ms: int) -> float:
+        """
+        Records the call's tokens, latency and cost; returns the cost in USD.
+        """
+        tokens_consumed_total.labels(model=model, type="input").inc(input_tokens)
+        tokens_consumed_total.labels(model=model, type="output").inc(output_tokens)
+        if cache_read_tokens:
+            tokens_consumed_total.labels(model=model, type="cache_read").inc(cache_read_tokens)
+        llm_latency_seconds.labels(model=model).observe(latency_ms / 1000.0)
+        return cost_model.observe(model, input_tokens, output_tokens, cache_read_tokens)
+
+    async def _call_with_retries(self, lane: ModelLane, request: Dict[str, Any], hedge: bool, call=None):
+        """
+        Retries retryable errors with full-jitter backoff, within both the per-call limit and the
+        gateway-wide retry budget. Non-retryable errors (bad request, auth, ...) surface immediately.
+        `call(lane, request)` performs one attempt; it defaults to a plain (or hedged) messages.create.
+        """
+        call = call or (self._hedged_attempt if hedge else self._attempt)
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                return await call(lane, request)
+            except Exception as e:
+                if not is_retryable(e) or attempt >= settings.LLM_MAX_RETRIES:
+                    raise
+                if not self.retry_budget.withdraw():
+                    llm_retry_budget_exhausted_total.labels(model=lane.model).inc()
+                    logger.warning("llm_retry_budget_exhausted", model=lane.model)
+                    raise
+                attempt += 1
+                reason = _retry_reason(e)
+                llm_retries_total.labels(model=lane.model, reason=reason).inc()
+                delay = backoff_s(attempt)
+                logger.warning("llm_request_retry", model=lane.model, attempt=attempt, reason=reason, delay_s=round(delay, 3))
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, lane: ModelLane, request: Dict[str, Any]):
+        async with lane.admit():
+            start = time.perf_counter()
+            response = await self.client.messages.create(**request, timeout=lane.timeout_s())
+            lane.observe(time.perf_counter() - start)
+            return response
+
+    async def _stream_attempt(
+        self,
+        lane: ModelLane,
+        request: Dict[str, Any],
+        early_fields: Tuple[str, ...],
+        on_early_fields: Optional[Callable[[Dict[str, Any]], bool]],
+        signalled: List[bool]
+    ) -> Dict[str, Any]:
+        parser = IncrementalJSONParser()
+        input_tokens = output_tokens = cache_read_tokens = 0
+        stopped_early = False
+        async with lane.admit():
+            start = time.perf_counter()
+            # Leaving the stream context closes the connection, which stops generation upstream.
+            async with self.client.messages.stream(**request, timeout=lane.timeout_s()) as stream:
+                async for event in stream:
+                    if event.type == "message_start":
+                        input_tokens = event.message.usage.input_tokens
+                        cache_read_tokens = getattr(event.message.usage, "cache_read_input_tokens", None) or 0
+                    elif event.type == "message_delta":
+                        output_tokens = event.usage.output_tokens
+                    elif event.type == "content_block_delta" and getattr(event.delta, "type", None) == "text_delta":
+                        complete = parser.feed(event.delta.text)
+                        if on_early_fields and not signalled[0] and parser.has(*early_fields):
+                            signalled[0] = True
+                            if on_early_fields(dict(parser.fields)):
+                                stopped_early = True
+                                break
+                        if complete:
+                            break
+            if not stopped_early:
+                lane.observe(time.perf_counter() - start)
+
+        # Final usage only arrives with the last event; estimate output tokens when we stopped first.
+        output_tokens = max(output_tokens, len(parser.buffer) // 4)
+        return {
+            "parser": parser,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cache_read_tokens": cache_read_tokens,
+            "stopped_early": stopped_early
+        }
+
+    async def _hedged_attempt(self, lane: ModelLane, request: Dict[str, Any]):
+        """
+        Starts one request and, if it has not finished within the model's recent p95, a second identical
+        one; the first to succeed wins and the other is cancelled. No hedge is sent without enough latency
+        history or while the lane is saturated, so hedging never adds queueing.
+        """
+        delay = lane.quantile(0.95)
+        first = asyncio.create_task(self._attempt(lane, request))
+        if delay is None:
+            return await first
+
+        tasks = {first}
         try:
-            response = await self.client.messages.create(
-                model=model,
-                max_tokens=max_tokens,
-                system=system_prompt,
-                messages=[{"role": "user", "content": prompt}],
-                timeout=10.0  # Set explicit timeout
-            )
-            
-            latency_ms = int((time.time() - start_time) * 1000)
-            content = response.content[0].text
-            
-            logger.info(
-                "llm_request_success", 
-                latency_ms=latency_ms, 
-                input_tokens=response.usage.input_tokens,
-                output_tokens=response.usage.output_tokens
-            )
-            
-            # Record Metrics
-            tokens_consumed_total.labels(model=model, type="input").inc(response.usage.input_tokens)
-            tokens_consumed_total.labels(model=model, type="output").inc(response.usage.output_tokens)
-            llm_latency_seconds.labels(model=model).observe(latency_ms / 1000.0)
-
-            return {
-                "raw_response": content,
-                "input_tokens": response.usage.input_tokens,
-                "output_tokens": response.usage.output_tokens,
-                "latency_ms": latency_ms
-            }
-            
-        except (anthropic.APITimeoutError, anthropic.APIConnectionError) as e:
-            logger.error("llm_request_timeout", error=str(e))
-            raise ModelTimeoutError(f"LLM provider timeout or connection issue: {str(e)}")
-        except Exception as e:
-            logger.error("llm_request_failed", error=str(e))
-            raise ModelTimeoutError(f"Unexpected LLM error: {str(e)}")
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or lane.saturated:
+                return await first
+
+            second = asyncio.create_task(self._attempt(lane, request))
+            tasks.add(second)
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        llm_hedged_requests_total.labels(model=lane.model, outcome="hedge_won" if task is second else "primary_won").inc()
+                        return task.result()
+                    error = task.exception()
+            llm_hedged_requests_total.labels(model=lane.model, outcome="both_failed").inc()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _system_blocks(system_prompt: str, static_prefix: Optional[str]):
+        if not static_prefix:
+            return system_prompt
+        # Everything up to and including the cache_control block is eligible for provider prompt caching.
+        return [
+            {"type": "text", "text": system_prompt},
+            {"type": "text", "text": static_prefix, "cache_control": {"type": "ephemeral"}}
+        ]
 
 llm_gateway = LLMGateway()
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import math
+import random
+import anthropic
+import httpx
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.replay.recorded import MessageStream, STREAM_CHUNK_CHARS, message_response, request_stage, stream_events
+from app.trace_store.codec import trace_codec
+
+# Share of a call's latency spent before the first token; the rest is spread over the streamed chunks.
+FIRST_TOKEN_FRACTION = 0.3
+
+_FAKE_REQUEST = httpx.Request("POST", "https://fake-llm.invalid/v1/messages")
+
+def _verdict(decision: str, confidence: float, rationale: str) -> str:
+    return json.dumps({"decision": decision, "confidence": confidence, "rationale": rationale, "risk_factors": [], "missing_information": [], "failure_modes": []})
+
+# Used for stages without recorded responses: a plausible, passing decision path.
+DEFAULT_RESPONSES: Dict[str, List[Dict[str, Any]]] = {
+    "evidence_planner": [{"raw_response": json.dumps({
+        "required_evidence": ["identity_verification", "transaction_history"],
+        "missing_evidence": [],
+        "risk_assessment": "Verified account with a consistent transaction history; no anomalies in the submitted signals.",
+        "recommended_path": "PROCEED",
+    }), "input_tokens": 900, "output_tokens": 60}],
+    "primary": [{"raw_response": _verdict("ACT", 0.92, "Identity verified and amount within the account's usual range."), "input_tokens": 1200, "output_tokens": 70}],
+    "shadow": [{"raw_response": _verdict("ACT", 0.9, "No reason to block found."), "input_tokens": 1200, "output_tokens": 50}],
+}
+
+class LatencyModel:
+    """
+    Per-call latency distribution, parsed from a spec:
+
+        fixed:MS                    every call takes MS
+        uniform:LOW_MS:HIGH_MS
+        lognormal:MEDIAN_MS:SIGMA   long right tail; sigma 0.5 puts p99 at ~3.2x the median
+    """
+
+    def __init__(self, kind: str, params: Tuple[float, ...]):
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"unknown latency distribution: {kind}")
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        kind, *params = spec.split(":")
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}.get(kind)
+        if expected is None or len(params) != expected:
+            raise ValueError(f"invalid latency spec: {spec!r}")
+        return cls(kind, tuple(float(p) for p in params))
+
+    def sample_s(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.params)
+        else:
+            median_ms, sigma = self.params
+            ms = median_ms * math.exp(rng.gauss(0.0, sigma))
+        return max(ms, 0.0) / 1000.0
+
+def load_responses(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Recorded responses per stage from a JSON-lines file of either recorded calls (`llm_calls` entries) or
+    exported traces (archive rows or trace_data objects), whose `llm_calls` are used.
+    """
+    responses: Dict[str, List[Dict[str, Any]]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "stage" in record:
+                calls = [record]
+            else:
+                calls = trace_codec.decode(record.get("trace_data", record)).get("llm_calls", [])
+            for call in calls:
+                responses.setdefault(call["stage"], []).append(call)
+    return responses
+
+class _FakeMessages:
+    def __init__(self, client: "FakeLLMClient"):
+        self._client = client
+
+    async def create(self, timeout: Optional[float] = None, **request: Any):
+        call, latency_s, failure = self._client.draw(request)
+        await self._client.wait(latency_s, timeout)
+        return message_response(self._client.apply(call, failure))
+
+    def stream(self, timeout: Optional[float] = None, **request: Any) -> MessageStream:
+        return MessageStream(self._client.stream_events(request, timeout))
+
+class FakeLLMClient:
+    """
+    Stand-in for AsyncAnthropic that replays recorded responses with simulated latency and injected failures,
+    so the pipeline (templating, gateway retries and timeouts, JSON extraction, metrics, trace writes) can be
+    load-tested and benchmarked without an API key. Install it as `llm_gateway.client` (LLM_BACKEND=fake).
+
+    - `responses`: recorded calls per stage (see `load_responses`); stages without any use DEFAULT_RESPONSES.
+    - `latency` / `stage_latency`: LatencyModel for every call, or per stage. A call slower than the gateway's
+      timeout raises a timeout after that timeout, like the SDK.
+    - `failures`: probability per failure kind: an HTTP status ("429", "529", "500", ...), "timeout",
+      "connection" or "malformed" (a 200 whose text is not JSON).
+    - `seed`: makes latencies, failures and response choice reproducible.
+    """
+
+    def __init__(
+        self,
+        responses: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        latency: Optional[LatencyModel] = None,
+        stage_latency: Optional[Dict[str, LatencyModel]] = None,
+        failures: Optional[Dict[str, float]] = None,
+        seed: Optional[int] = None
+    ):
+        self.responses = {**DEFAULT_RESPONSES, **(responses or {})}
+        self.latency = latency or LatencyModel("fixed", (0.0,))
+        self.stage_latency = stage_latency or {}
+        self.failures = failures or {}
+        if sum(self.failures.values()) > 1.0:
+            raise ValueError("failure probabilities add up to more than 1")
+        self.rng = random.Random(seed)
+        self.messages = _FakeMessages(self)
+        self.requests = 0
+        self.injected: Counter = Counter()
+
+    @classmethod
+    def from_settings(cls) -> "FakeLLMClient":
+        return cls(
+            responses=load_responses(settings.LLM_FAKE_RESPONSES) if settings.LLM_FAKE_RESPONSES else None,
+            latency=LatencyModel.parse(settings.LLM_FAKE_LATENCY),
+            stage_latency={stage: LatencyModel.parse(spec) for stage, spec in settings.LLM_FAKE_STAGE_LATENCY.items()},
+            failures=settings.LLM_FAKE_FAILURES,
+            seed=settings.LLM_FAKE_SEED
+        )
+
+    def draw(self, request: Dict[str, Any]) -> Tuple[Dict[str, Any], float, Optional[str]]:
+        """
+        Picks the response, latency and injected failure (or None) for one request.
+        """
+        self.requests += 1
+        stage = request_stage(request) or "primary"
+        call = self.rng.choice(self.responses.get(stage) or DEFAULT_RESPONSES["primary"])
+        latency_s = self.stage_latency.get(stage, self.latency).sample_s(self.rng)
+        failure = None
+        roll = self.rng.random()
+        for kind, probability in self.failures.items():
+            roll -= probability
+            if roll < 0:
+                failure = kind
+                self.injected[kind] += 1
+                break
+        return call, latency_s, failure
+
+    @staticmethod
+    async def wait(latency_s: float, timeout: Optional[float]):
+        if timeout is not None and latency_s > timeout:
+            await asyncio.sleep(timeout)
+            raise anthropic.APITimeoutError(request=_FAKE_REQUEST)
+        if latency_s:
+            await asyncio.sleep(latency_s)
+
+    @staticmethod
+    def apply(call: Dict[str, Any], failure: Optional[str]) -> Dict[str, Any]:
+        """
+        Raises the injected failure, if any; returns the call to serve otherwise.
+        """
+        if failure is None:
+            return call
+        if failure == "malformed":
+            return {**call, "raw_response": "I cannot provide a structured answer to that."}
+        if failure == "connection":
+            raise anthropic.APIConnectionError(request=_FAKE_REQUEST)
+        if failure == "timeout":
+            raise anthropic.APITimeoutError(request=_FAKE_REQUEST)
+        status = int(failure)
+        raise anthropic.APIStatusError(f"injected status {status}", response=httpx.Response(status, request=_FAKE_REQUEST), body=None)
+
+    async def stream_events(self, request: Dict[str, Any], timeout: Optional[float]):
+        call, latency_s, failure = self.draw(request)
+        first_token_s = latency_s * FIRST_TOKEN_FRACTION
+        await self.wait(first_token_s, timeout)
+        call = self.apply(call, failure)
+        chunks = max(1, math.ceil(len(call.get("raw_response", "")) / STREAM_CHUNK_CHARS))
+        async for event in stream_events(call, chunk_delay_s=(latency_s - first_token_s) / chunks):
+            yield event
@@ -0,0 +1,97 @@
+import asyncio
+import collections
+import math
+import random
+from contextlib import asynccontextmanager
+from typing import Deque, Optional
+from app.core.config import settings
+from app.observability.metrics import llm_queue_depth, llm_inflight_requests
+
+class ModelLane:
+    """
+    Admission control and latency tracking for one model.
+
+    A semaphore caps in-flight requests so traffic bursts queue locally instead of overloading the
+    provider. Successful call latencies feed a sliding window used for the adaptive timeout and the
+    hedge delay.
+    """
+
+    def __init__(self, model: str, max_concurrency: int, window: int = 512):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.latencies: Deque[float] = collections.deque(maxlen=window)
+        self.waiting = 0
+        self.inflight = 0
+
+    @property
+    def saturated(self) -> bool:
+        return self.inflight >= self.max_concurrency
+
+    @asynccontextmanager
+    async def admit(self):
+        self.waiting += 1
+        llm_queue_depth.labels(model=self.model).set(self.waiting)
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+            llm_queue_depth.labels(model=self.model).set(self.waiting)
+        self.inflight += 1
+        llm_inflight_requests.labels(model=self.model).set(self.inflight)
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            llm_inflight_requests.labels(model=self.model).set(self.inflight)
+            self.semaphore.release()
+
+    def observe(self, latency_s: float):
+        self.latencies.append(latency_s)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Latency quantile over the window, or None until enough samples have been seen.
+        """
+        if len(self.latencies) < settings.LLM_LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+    def timeout_s(self) -> float:
+        """
+        Adaptive per-attempt timeout: p99 of recent latency times a multiplier, clamped.
+        Falls back to the static default until the window has enough samples.
+        """
+        p99 = self.quantile(0.99)
+        if p99 is None:
+            return settings.LLM_TIMEOUT_DEFAULT_S
+        return min(settings.LLM_TIMEOUT_MAX_S, max(settings.LLM_TIMEOUT_MIN_S, p99 * settings.LLM_TIMEOUT_P99_MULTIPLIER))
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of request volume so retries cannot amplify a provider outage.
+    Every request deposits `ratio` tokens; every retry withdraws one. The balance starts at, and is
+    capped by, `min_tokens`, which allows a small number of retries at low traffic.
+    """
+
+    def __init__(self, ratio: float, min_tokens: float):
+        self.ratio = ratio
+        self.cap = max(min_tokens, 1.0)
+        self.balance = self.cap
+
+    def deposit(self):
+        self.balance = min(self.cap, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.balance < 1.0:
+            return False
+        self.balance -= 1.0
+        return True
+
+def backoff_s(attempt: int) -> float:
+    """
+    Full-jitter exponential backoff for the given retry attempt (1-based).
+    """
+    ceiling = min(settings.LLM_RETRY_BACKOFF_MAX_S, settings.LLM_RETRY_BACKOFF_BASE_S * (2 ** (attempt - 1)))
+    return random.uniform(0, ceiling)
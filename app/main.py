@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 import structlog
 from fastapi import FastAPI
@@ -5,22 +6,75 @@ from prometheus_fastapi_instrumentator import Instrumentator
 from app.core.config import settings
 from app.api.v1.decisions import router as decisions_router
 from app.api.v1.evaluations import router as evaluations_router
+from app.api.v1.admin import router as admin_router
+from app.api.v1.traces import router as traces_router
+from app.core.policies import policy_manager
 from app.trace_store.store import trace_store
+from app.trace_store.writer import trace_writer
+from app.trace_store.embeddings import embedding_backfill
+from app.trace_store.partitions import partition_manager
+from app.llm_gateway.cache import response_cache
+from app.llm_gateway.client import llm_gateway
+from app.core.rate_limit import rate_governor
+from app.core.coalescing import idempotency_store
 from app.observability.metrics import decisions_total, decision_latency_seconds, hard_constraint_violations_total
+from app.observability.tracing import configure_tracing, shutdown_tracing
 
 logger = structlog.get_logger()
 
+if settings.LLM_BACKEND == "fake":
+    from app.llm_gateway.fake import FakeLLMClient
+
+    llm_gateway.client = FakeLLMClient.from_settings()
+    logger.warning("llm_backend_fake", latency=settings.LLM_FAKE_LATENCY, failures=settings.LLM_FAKE_FAILURES)
+
+def preload(llm_client: bool = True):
+    """
+    Does the work the first request would otherwise pay for: reads and compiles the policies (and their
+    prompt prefixes) and, with `llm_client`, creates the LLM client, importing its SDK. Called by the gunicorn
+    master before forking (config/gunicorn.conf.py) so workers inherit it, and by lifespan; a no-op once done.
+    """
+    if not policy_manager.snapshots:
+        logger.warning("no_policies_loaded", policies_dir=policy_manager.policies_dir)
+    if llm_client:
+        llm_gateway.warm_up()
+
+async def warm_up_llm_client():
+    # The SDK import takes over a second and nothing but a model call needs it, so it runs in a thread
+    # while the app already serves (health checks, hard-constraint blocks).
+    try:
+        await asyncio.to_thread(llm_gateway.warm_up)
+    except Exception as e:
+        logger.error("llm_client_warm_up_failed", error=str(e))
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Connect to DB pool
+    preload(llm_client=False)
+    llm_warm_up = asyncio.create_task(warm_up_llm_client())
+    configure_tracing()
+    # Startup: Open and warm the DB pool (connections opened, statements prepared)
     try:
-        await trace_store.connect()
+        await trace_store.warm_up()
         logger.info("startup_db_connected")
     except Exception as e:
         logger.error("startup_db_failed", error=str(e))
+    if settings.TRACE_WRITER_ENABLED:
+        await trace_writer.start()
+    policy_manager.start_watching(settings.POLICY_WATCH_INTERVAL_S)
+    embedding_backfill.start(settings.EMBEDDING_BACKFILL_INTERVAL_S)
+    partition_manager.start(settings.TRACE_MAINTENANCE_INTERVAL_S)
     yield
-    # Shutdown: Close DB pool
+    # Shutdown: Drain queued traces, then close DB pool and cache connections
+    await llm_warm_up
+    await partition_manager.stop()
+    await embedding_backfill.stop()
+    await policy_manager.stop_watching()
+    await trace_writer.stop()
     await trace_store.disconnect()
+    await response_cache.store.close()
+    await rate_governor.close()
+    await idempotency_store.store.close()
+    shutdown_tracing()
     logger.info("shutdown_db_disconnected")
 
 app = FastAPI(
@@ -34,6 +88,8 @@ Instrumentator().instrument(app).expose(app)
 
 app.include_router(decisions_router, prefix=settings.API_V1_STR, tags=["decisions"])
 app.include_router(evaluations_router, prefix=settings.API_V1_STR, tags=["evaluations"])
+app.include_router(traces_router, prefix=settings.API_V1_STR, tags=["traces"])
+app.include_router(admin_router, prefix=settings.API_V1_STR, tags=["admin"])
 
 @app.get("/health")
 async def health_check():
@@ -1,4 +1,7 @@
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
+
+# Under gunicorn (config/gunicorn.conf.py) every worker writes its samples to PROMETHEUS_MULTIPROC_DIR and
+# /metrics aggregates them: counters and histograms are summed, gauges as declared by `multiprocess_mode`.
 
 # Decision Metrics
 decisions_total = Counter(
@@ -9,9 +12,16 @@ decisions_total = Counter(
 
 decision_latency_seconds = Histogram(
     "decisiontrace_decision_latency_seconds",
-    "End-to-end decision latency",
+    "End-to-end decision latency, including the trace write (and hard-constraint blocks, which make no LLM call)",
     ["policy_id"],
-    buckets=[0.1, 0.5, 1.0, 2.0, 5.0, 10.0]
+    buckets=[0.001, 0.005, 0.025, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0]
+)
+
+decision_stage_seconds = Histogram(
+    "decisiontrace_decision_stage_seconds",
+    "Latency of one pipeline stage of a decision (see app/observability/tracing.py)",
+    ["stage"], # policy_lookup/hard_constraints/prompt_render/llm_<stage>/json_extraction/trace_write
+    buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0]
 )
 
 # Safety Metrics
@@ -31,7 +41,7 @@ hard_constraint_violations_total = Counter(
 tokens_consumed_total = Counter(
     "decisiontrace_tokens_total",
     "Total LLM tokens consumed",
-    ["model", "type"] # type: input/output
+    ["model", "type"] # type: input/output/cache_read
 )
 
 llm_latency_seconds = Histogram(
@@ -40,3 +50,178 @@ llm_latency_seconds = Histogram(
     ["model"],
     buckets=[0.1, 0.5, 1.0, 2.0, 5.0]
 )
+
+llm_cost_usd_total = Counter(
+    "decisiontrace_llm_cost_usd_total",
+    "Estimated LLM spend in USD, from reported usage and the price table (app/core/costs.py)",
+    ["model"]
+)
+
+budget_exceeded_total = Counter(
+    "decisiontrace_budget_exceeded_total",
+    "Model calls refused because they would exceed the decision's budget",
+    ["policy_id", "stage", "limit"] # limit: tokens/cost/latency
+)
+
+rate_limited_total = Counter(
+    "decisiontrace_rate_limited_total",
+    "Decision requests rejected (429) by the per-policy/tenant token governor",
+    ["policy_id"]
+)
+
+decisions_coalesced_total = Counter(
+    "decisiontrace_decisions_coalesced_total",
+    "Decision requests answered by an identical in-flight decision instead of their own LLM stages",
+    ["policy_id"]
+)
+
+idempotent_replays_total = Counter(
+    "decisiontrace_idempotent_replays_total",
+    "Decision requests answered with the stored result for their Idempotency-Key",
+    ["policy_id"]
+)
+
+rate_governor_backend_errors_total = Counter(
+    "decisiontrace_rate_governor_backend_errors_total",
+    "Redis errors in the rate governor; buckets fall back to process memory"
+)
+
+# LLM Gateway Admission Metrics
+llm_queue_depth = Gauge(
+    "decisiontrace_llm_queue_depth",
+    "LLM requests waiting for a per-model concurrency slot",
+    ["model"],
+    multiprocess_mode="livesum"
+)
+
+llm_inflight_requests = Gauge(
+    "decisiontrace_llm_inflight_requests",
+    "LLM requests currently in flight",
+    ["model"],
+    multiprocess_mode="livesum"
+)
+
+llm_retries_total = Counter(
+    "decisiontrace_llm_retries_total",
+    "LLM request retries",
+    ["model", "reason"] # reason: timeout/connection/<status code>
+)
+
+llm_retry_budget_exhausted_total = Counter(
+    "decisiontrace_llm_retry_budget_exhausted_total",
+    "Retryable LLM failures not retried because the retry budget was empty",
+    ["model"]
+)
+
+llm_hedged_requests_total = Counter(
+    "decisiontrace_llm_hedged_requests_total",
+    "Hedged LLM requests by outcome; hedge win rate = hedge_won / all outcomes",
+    ["model", "outcome"] # outcome: primary_won/hedge_won/both_failed
+)
+
+# Pipeline Short-Circuit Metrics
+pipeline_stages_skipped_total = Counter(
+    "decisiontrace_pipeline_stages_skipped_total",
+    "Count of LLM stages skipped because they could not change the final decision",
+    ["policy_id", "stage", "reason"]
+)
+
+pipeline_skip_saved_tokens_total = Counter(
+    "decisiontrace_pipeline_skip_saved_tokens_total",
+    "Estimated LLM tokens saved by skipped stages",
+    ["policy_id", "stage"]
+)
+
+pipeline_skip_saved_ms_total = Counter(
+    "decisiontrace_pipeline_skip_saved_ms_total",
+    "Estimated LLM milliseconds saved by skipped stages",
+    ["policy_id", "stage"]
+)
+
+# Cache Metrics
+cache_requests_total = Counter(
+    "decisiontrace_cache_requests_total",
+    "Cache lookups by tier and result",
+    ["cache", "tier", "result"] # result: hit/miss
+)
+
+cache_evictions_total = Counter(
+    "decisiontrace_cache_evictions_total",
+    "Cache entries removed by tier and reason",
+    ["cache", "tier", "reason"] # reason: lru/ttl/invalidation
+)
+
+# Trace Writer Metrics
+trace_writer_queue_depth = Gauge(
+    "decisiontrace_trace_writer_queue_depth",
+    "Traces waiting in the write-behind queue",
+    multiprocess_mode="livesum"
+)
+
+trace_writer_enqueue_wait_seconds = Histogram(
+    "decisiontrace_trace_writer_enqueue_wait_seconds",
+    "Time spent waiting for queue space (backpressure)",
+    buckets=[0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0]
+)
+
+trace_writer_batch_size = Histogram(
+    "decisiontrace_trace_writer_batch_size",
+    "Traces written per group commit",
+    buckets=[1, 5, 10, 25, 50, 100, 250, 500, 1000]
+)
+
+trace_writer_flush_seconds = Histogram(
+    "decisiontrace_trace_writer_flush_seconds",
+    "Latency of a group commit",
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0]
+)
+
+trace_writer_flush_failures_total = Counter(
+    "decisiontrace_trace_writer_flush_failures_total",
+    "Group commits that failed to persist"
+)
+
+# Outcome Ingestion Metrics (app/evaluation/ingest.py); rate(outcomes_ingested_total) is the ingest throughput
+outcomes_ingested_total = Counter(
+    "decisiontrace_outcomes_ingested_total",
+    "Outcome records processed by bulk ingestion",
+    ["result"] # inserted/updated/rejected
+)
+
+outcome_ingest_batch_seconds = Histogram(
+    "decisiontrace_outcome_ingest_batch_seconds",
+    "Latency of one ingestion batch: COPY to staging, trace lookup, outcome upsert and rollup update",
+    buckets=[0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+)
+
+outcome_ingests_in_progress = Gauge(
+    "decisiontrace_outcome_ingests_in_progress",
+    "Bulk outcome ingestions currently running",
+    multiprocess_mode="livesum"
+)
+
+# Database Pool Metrics
+db_pool_acquire_seconds = Histogram(
+    "decisiontrace_db_pool_acquire_seconds",
+    "Time spent waiting for a pooled Postgres connection",
+    buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0]
+)
+
+db_pool_connections_in_use = Gauge(
+    "decisiontrace_db_pool_connections_in_use",
+    "Pooled Postgres connections currently acquired",
+    multiprocess_mode="livesum"
+)
+
+db_pool_size = Gauge(
+    "decisiontrace_db_pool_size",
+    "Open Postgres connections in the pool (idle and in use)",
+    multiprocess_mode="livesum"
+)
+
+db_query_seconds = Histogram(
+    "decisiontrace_db_query_seconds",
+    "Postgres statement latency by statement name",
+    ["statement"],
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+)
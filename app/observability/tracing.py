@@ -0,0 +1,95 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+import structlog
+from app.core.config import settings
+from app.observability.metrics import decision_stage_seconds
+
+logger = structlog.get_logger()
+
+# Stage timings (ms) of the current decision; see start_timings.
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+# Set by configure_tracing. Until then `span` creates nothing: even a no-op OpenTelemetry span costs ~15us,
+# and a decision runs about ten stages.
+_tracer = None
+_provider = None
+
+def configure_tracing():
+    """
+    Exports spans over OTLP/HTTP to OTEL_EXPORTER_OTLP_ENDPOINT (e.g. a local collector on :4318), if set.
+    Without an endpoint no spans are created; stage histograms and trace timings are recorded either way.
+    """
+    global _provider, _tracer
+    if not settings.OTEL_EXPORTER_OTLP_ENDPOINT:
+        return
+    try:
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBasedTraceIdRatio
+    except ImportError as e:
+        raise RuntimeError("OTEL_EXPORTER_OTLP_ENDPOINT requires the opentelemetry-sdk and opentelemetry-exporter-otlp-proto-http packages (pip install .[tracing])") from e
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.OTEL_SERVICE_NAME}),
+        sampler=ParentBasedTraceIdRatio(settings.OTEL_TRACES_SAMPLE_RATIO)
+    )
+    _provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=f"{settings.OTEL_EXPORTER_OTLP_ENDPOINT.rstrip('/')}/v1/traces")))
+    otel_trace.set_tracer_provider(_provider)
+    _tracer = otel_trace.get_tracer("decisiontrace")
+    logger.info("tracing_configured", endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT, sample_ratio=settings.OTEL_TRACES_SAMPLE_RATIO)
+
+def shutdown_tracing():
+    """
+    Flushes spans still queued for export.
+    """
+    global _provider, _tracer
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+        _tracer = None
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    An OpenTelemetry span around the block, or None while tracing is not configured. Attributes that are
+    None are left out.
+    """
+    if _tracer is None:
+        yield None
+        return
+    attributes = {f"decisiontrace.{key}": value for key, value in attributes.items() if value is not None}
+    with _tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+def start_timings() -> Dict[str, float]:
+    """
+    Starts collecting stage timings for the current task (and the tasks it starts) and returns them:
+    milliseconds per stage, summed when a stage runs more than once (e.g. prompt_render for the planner and
+    the engine). Stages can overlap (a concurrent shadow runs alongside the primary), so they need not add up
+    to the decision's latency.
+    """
+    timings: Dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+@contextmanager
+def stage(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    Times one pipeline stage: a span, an observation in decisiontrace_decision_stage_seconds and an entry
+    in the current decision's timings. Failures are timed too.
+    """
+    start = time.perf_counter()
+    try:
+        with span(name, **attributes) as current:
+            yield current
+    finally:
+        elapsed = time.perf_counter() - start
+        decision_stage_seconds.labels(stage=name).observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = round(timings.get(name, 0.0) + elapsed * 1000, 3)
@@ -0,0 +1,76 @@
+"""
+Replays stored decisions against a candidate policy and writes the diff report.
+
+    python -m app.replay --candidate candidate/default.yaml --since 7d --workers 8 --output replay.json
+    python -m app.replay --candidate candidate/ --input export.jsonl.gz
+    python -m app.replay --candidate candidate/default.yaml --archive --start 2024-01-01 --end 2024-02-01
+
+Traces come from decision_trace (default), the cold archive (--archive) or exported files (--input). The LLM
+is answered from each trace's recorded responses, so a replay is deterministic and makes no provider calls.
+"""
+import argparse
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from app.replay.report import ReplayReport
+from app.replay.runner import run_replay
+from app.replay.sources import iter_archived_traces, iter_db_traces, iter_file_traces
+
+_DURATION = re.compile(r"^(\d+)([hd])$")
+
+def _timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def _duration(value: str) -> timedelta:
+    match = _DURATION.match(value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"expected a duration like 24h or 7d, got {value!r}")
+    amount, unit = int(match.group(1)), match.group(2)
+    return timedelta(hours=amount) if unit == "h" else timedelta(days=amount)
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.replay", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidate", required=True, help="candidate policy file (replaces the policy it is named after) or policies directory")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--input", nargs="+", metavar="FILE", help="exported traces (.jsonl, .jsonl.gz, .parquet)")
+    source.add_argument("--archive", action="store_true", help="read the cold archive (TRACE_ARCHIVE_DIR) instead of decision_trace")
+    parser.add_argument("--since", type=_duration, default=None, help="replay traces from this long ago until --end (default 7d for the database)")
+    parser.add_argument("--start", type=_timestamp, default=None)
+    parser.add_argument("--end", type=_timestamp, default=None)
+    parser.add_argument("--policy-id", default=None, help="only replay traces of this policy")
+    parser.add_argument("--limit", type=int, default=None, help="at most this many traces (database only)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=200, help="traces per work unit sent to a worker")
+    parser.add_argument("--output", default="replay_report.json", help="JSON report: summary, per-policy breakdown and every flipped trace")
+    parser.add_argument("--rows", default=None, help="also write every per-trace result here, as JSON lines")
+    args = parser.parse_args(argv)
+
+    end = args.end
+    start = args.start
+    if args.since is not None:
+        start = (end or datetime.now(timezone.utc)) - args.since
+
+    if args.input:
+        rows = iter_file_traces(args.input, start, end, args.policy_id)
+    elif args.archive:
+        rows = iter_archived_traces(start, end, args.policy_id)
+    else:
+        end = end or datetime.now(timezone.utc)
+        rows = iter_db_traces(start or end - timedelta(days=7), end, args.policy_id, args.limit)
+
+    rows_file = open(args.rows, "w", encoding="utf-8") if args.rows else None
+    try:
+        report = run_replay(rows, args.candidate, workers=args.workers, chunk_size=args.chunk_size, report=ReplayReport(args.candidate, rows_file))
+    finally:
+        if rows_file is not None:
+            rows_file.close()
+    report.write(args.output)
+    print(report.format_summary())
+    print(f"report: {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
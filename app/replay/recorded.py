@@ -0,0 +1,185 @@
+import asyncio
+import json
+import re
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from app.decision_engine.engine import PRIMARY_SYSTEM_PROMPT, SHADOW_SYSTEM_PROMPT
+from app.evidence_planner.planner import PLANNER_SYSTEM_PROMPT
+
+# The gateway only sees the request, so the stage is recognised by its system prompt.
+STAGE_SYSTEM_PROMPTS = {
+    PLANNER_SYSTEM_PROMPT: "evidence_planner",
+    PRIMARY_SYSTEM_PROMPT: "primary",
+    SHADOW_SYSTEM_PROMPT: "shadow",
+}
+
+# Planner abstains that never reached the model.
+_PLANNER_NO_CALL = {"voi_cost_gate", "planner_timeout", "budget_exceeded"}
+# Annotations the engine appends when it overrides the primary model; removed to recover what the model said.
+_SHADOW_VETO_NOTE = " (Overridden by Asymmetric Safety Shadow: Unilateral veto triggered.)"
+_DOWNGRADE_NOTE = re.compile(r" \(Downgraded: Confidence .* below policy threshold .*\.\)")
+_ENGINE_FIELDS = ("model", "cost_estimate", "skipped_stages", "trace_id")
+
+STREAM_CHUNK_CHARS = 16
+
+class RecordingMissing(LookupError):
+    """
+    The replayed pipeline called a stage the original decision never called, so there is no response to serve.
+    The gateway treats it like any other model failure: the stage fails closed.
+    """
+
+@dataclass
+class ReplayState:
+    """
+    Recorded responses for the trace being replayed, and what the replay made of them.
+    """
+    recordings: Dict[str, Dict[str, Any]]
+    reconstructed: bool = False
+    missing: List[str] = field(default_factory=list)
+    # Stages served a response recorded for a different model than the candidate policy asks for.
+    stale: List[str] = field(default_factory=list)
+
+_replay_state: ContextVar[Optional[ReplayState]] = ContextVar("replay_state", default=None)
+
+def request_stage(request: Dict[str, Any]) -> Optional[str]:
+    """
+    The pipeline stage a gateway request comes from, recognised by its system prompt.
+    """
+    system = request.get("system")
+    if isinstance(system, list):
+        system = system[0]["text"] if system else ""
+    return STAGE_SYSTEM_PROMPTS.get(system)
+
+def _call(stage: str, model: Optional[str], text: str, input_tokens: int = 0, output_tokens: int = 0) -> Dict[str, Any]:
+    return {"stage": stage, "model": model, "raw_response": text, "input_tokens": input_tokens, "output_tokens": output_tokens}
+
+def _reconstruct(trace_data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Best-effort model outputs for a trace recorded before `llm_calls`, rebuilt from the stage results it kept.
+    Token usage was only kept as a total, so all of it is attributed to the primary call.
+    """
+    calls: Dict[str, Dict[str, Any]] = {}
+    evidence = dict(trace_data.get("evidence_planning") or {})
+    if evidence and evidence.get("abstain_reason") not in _PLANNER_NO_CALL:
+        evidence.pop("vo_info_assessment", None)
+        calls["evidence_planner"] = _call("evidence_planner", None, json.dumps(evidence))
+
+    decision = trace_data.get("decision") or {}
+    skipped = {stage for entry in decision.get("skipped_stages") or [] for stage in entry.get("stages", [])}
+    if not decision or "primary" in skipped or "system_timeout" in (decision.get("failure_modes") or []):
+        return calls
+
+    primary = {key: value for key, value in decision.items() if key not in _ENGINE_FIELDS}
+    risk_factors = list(primary.get("risk_factors") or [])
+    rationale = primary.get("rationale", "")
+    vetoed = "shadow_veto" in risk_factors
+    if vetoed or "low_confidence_override" in risk_factors:
+        primary["decision"] = "ACT"
+    rationale = _DOWNGRADE_NOTE.sub("", rationale.replace(_SHADOW_VETO_NOTE, ""))
+    primary["rationale"] = rationale
+    primary["risk_factors"] = [r for r in risk_factors if r not in ("shadow_veto", "low_confidence_override")]
+    tokens = (decision.get("cost_estimate") or {}).get("tokens", 0)
+    calls["primary"] = _call("primary", decision.get("model"), json.dumps(primary), output_tokens=tokens)
+
+    if vetoed:
+        shadow_decision = "ABSTAIN"
+    elif decision.get("decision") == "ACT" and "shadow" not in skipped:
+        shadow_decision = "ACT"
+    else:
+        return calls
+    shadow = {"decision": shadow_decision, "confidence": primary.get("confidence", 0.0), "rationale": "Reconstructed shadow verdict."}
+    calls["shadow"] = _call("shadow", None, json.dumps(shadow))
+    return calls
+
+def replay_state(trace_data: Dict[str, Any]) -> ReplayState:
+    """
+    The responses to serve when replaying a trace: its recorded `llm_calls`, or a reconstruction for older traces.
+    """
+    if "llm_calls" in trace_data:
+        return ReplayState({call["stage"]: call for call in trace_data["llm_calls"]})
+    return ReplayState(_reconstruct(trace_data), reconstructed=True)
+
+def activate(state: ReplayState):
+    """
+    Serves `state` to every call the current task (and the tasks it starts) makes through a RecordedClient.
+    """
+    _replay_state.set(state)
+
+def message_response(call: Dict[str, Any]) -> SimpleNamespace:
+    """
+    A recorded call in the shape of an SDK `Message`, as far as the gateway reads it.
+    """
+    return SimpleNamespace(
+        content=[SimpleNamespace(type="text", text=call.get("raw_response", ""))],
+        usage=SimpleNamespace(input_tokens=call.get("input_tokens", 0), output_tokens=call.get("output_tokens", 0), cache_read_input_tokens=0)
+    )
+
+async def stream_events(call: Dict[str, Any], first_token_s: float = 0.0, chunk_delay_s: float = 0.0):
+    """
+    A recorded call as SDK stream events: its text in STREAM_CHUNK_CHARS deltas, optionally paced.
+    """
+    if first_token_s:
+        await asyncio.sleep(first_token_s)
+    yield SimpleNamespace(type="message_start", message=SimpleNamespace(usage=SimpleNamespace(input_tokens=call.get("input_tokens", 0), cache_read_input_tokens=0)))
+    text = call.get("raw_response", "")
+    for i in range(0, len(text), STREAM_CHUNK_CHARS):
+        if chunk_delay_s:
+            await asyncio.sleep(chunk_delay_s)
+        yield SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="text_delta", text=text[i:i + STREAM_CHUNK_CHARS]))
+    yield SimpleNamespace(type="message_delta", usage=SimpleNamespace(output_tokens=call.get("output_tokens", 0)))
+
+class MessageStream:
+    """
+    The async context manager returned by `messages.stream`, over an async iterator of events.
+    """
+
+    def __init__(self, events):
+        self._events = events
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._events.aclose()
+        return False
+
+    def __aiter__(self):
+        return self._events
+
+class _Messages:
+    def __init__(self, client: "RecordedClient"):
+        self._client = client
+
+    async def create(self, **request: Any):
+        return message_response(self._client.lookup(request))
+
+    def stream(self, **request: Any) -> MessageStream:
+        return MessageStream(stream_events(self._client.lookup(request)))
+
+class RecordedClient:
+    """
+    Stand-in for AsyncAnthropic that answers from the recorded responses of the trace being replayed (see
+    `activate`), so a replay is deterministic and makes no provider calls. Installed as `llm_gateway.client`.
+
+    Responses are matched by stage, not by prompt: a candidate policy with different prompts or thresholds is
+    replayed against what the model actually said. A stage the original decision never called raises
+    RecordingMissing; a response recorded for another model than the candidate asks for is served and
+    reported as stale.
+    """
+
+    def __init__(self):
+        self.messages = _Messages(self)
+
+    def lookup(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        state = _replay_state.get()
+        stage = request_stage(request)
+        call = state.recordings.get(stage) if state is not None and stage else None
+        if call is None:
+            if state is not None and stage not in state.missing:
+                state.missing.append(stage)
+            raise RecordingMissing(f"no recorded response for stage {stage}")
+        if call.get("model") and call["model"] != request.get("model") and stage not in state.stale:
+            state.stale.append(stage)
+        return call
@@ -0,0 +1,121 @@
+import json
+from collections import Counter
+from typing import Any, Dict, IO, List, Optional
+
+def _row_order(result: Dict[str, Any]):
+    return str(result.get("created_at")), result["trace_id"]
+
+class _Tally:
+    def __init__(self):
+        self.traces = 0
+        self.replayed = 0
+        self.skipped = 0
+        self.errors = 0
+        self.flipped = 0
+        self.transitions: Counter = Counter()
+        self.baseline_tokens = 0
+        self.candidate_tokens = 0
+        self.hard_constraint_blocks = 0
+        self.reconstructed = 0
+        self.missing_recordings = 0
+        self.stale_recordings = 0
+
+    def add(self, result: Dict[str, Any]):
+        self.traces += 1
+        if result.get("error"):
+            self.errors += 1
+            return
+        if result.get("skipped"):
+            self.skipped += 1
+            return
+        self.replayed += 1
+        baseline, candidate = result["baseline"], result["candidate"]
+        self.transitions[f"{baseline}->{candidate}"] += 1
+        self.flipped += baseline != candidate
+        self.baseline_tokens += result["baseline_tokens"]
+        self.candidate_tokens += result["candidate_tokens"]
+        self.hard_constraint_blocks += result["hard_constraint"]
+        self.reconstructed += result["reconstructed"]
+        self.missing_recordings += bool(result["missing"])
+        self.stale_recordings += bool(result["stale"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traces": self.traces,
+            "replayed": self.replayed,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "flipped": self.flipped,
+            "act_to_abstain": self.transitions["ACT->ABSTAIN"],
+            "abstain_to_act": self.transitions["ABSTAIN->ACT"],
+            "transitions": dict(sorted(self.transitions.items())),
+            "tokens": {
+                "baseline": self.baseline_tokens,
+                "candidate": self.candidate_tokens,
+                "delta": self.candidate_tokens - self.baseline_tokens,
+            },
+            "hard_constraint_blocks": self.hard_constraint_blocks,
+            "reconstructed": self.reconstructed,
+            "missing_recordings": self.missing_recordings,
+            "stale_recordings": self.stale_recordings,
+        }
+
+class ReplayReport:
+    """
+    Diff of a replay against the original decisions: transitions (e.g. ACT->ABSTAIN), flipped traces and token
+    deltas, overall and per policy. Aggregates are streamed, so only flipped traces are kept in memory; every
+    per-trace result can also be written to `rows_file` as JSON lines.
+
+    Traces blocked by hard constraints at the time were never persisted, so every replayed trace originally
+    passed them; `hard_constraint_blocks` counts those the candidate's constraints now block.
+    """
+
+    def __init__(self, candidate: str, rows_file: Optional[IO[str]] = None):
+        self.candidate = candidate
+        self.rows_file = rows_file
+        self.overall = _Tally()
+        self.by_policy: Dict[str, _Tally] = {}
+        self.flips: List[Dict[str, Any]] = []
+        self.errors: List[Dict[str, Any]] = []
+
+    def add(self, result: Dict[str, Any]):
+        self.overall.add(result)
+        self.by_policy.setdefault(result.get("policy_id") or "unknown", _Tally()).add(result)
+        if result.get("error"):
+            self.errors.append(result)
+        elif not result.get("skipped") and result["baseline"] != result["candidate"]:
+            self.flips.append(result)
+        if self.rows_file is not None:
+            self.rows_file.write(json.dumps(result, default=str) + "\n")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "candidate": self.candidate,
+            "summary": self.overall.to_dict(),
+            "by_policy": {policy_id: tally.to_dict() for policy_id, tally in sorted(self.by_policy.items())},
+            "flips": sorted(self.flips, key=_row_order),
+            "errors": sorted(self.errors, key=_row_order),
+        }
+
+    def write(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+
+    def format_summary(self) -> str:
+        summary = self.overall.to_dict()
+        tokens = summary["tokens"]
+        change = f"{tokens['delta'] / tokens['baseline']:+.1%}" if tokens["baseline"] else "n/a"
+        lines = [
+            f"candidate: {self.candidate}",
+            f"traces: {summary['traces']} (replayed {summary['replayed']}, skipped {summary['skipped']}, errors {summary['errors']})",
+            f"flipped: {summary['flipped']} (ACT->ABSTAIN {summary['act_to_abstain']}, ABSTAIN->ACT {summary['abstain_to_act']})",
+            f"tokens: {tokens['baseline']} -> {tokens['candidate']} ({change})",
+        ]
+        for transition, count in summary["transitions"].items():
+            lines.append(f"  {transition:<16} {count}")
+        if summary["reconstructed"] or summary["missing_recordings"] or summary["stale_recordings"]:
+            lines.append(
+                f"recordings: {summary['reconstructed']} reconstructed from pre-recording traces, "
+                f"{summary['missing_recordings']} missing a stage, {summary['stale_recordings']} recorded for another model"
+            )
+        return "\n".join(lines)
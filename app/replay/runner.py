@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import structlog
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from app.api.v1.decisions import hard_constraint_abstain, run_llm_stages
+from app.core.config import settings
+from app.core.policies import PolicySnapshot
+from app.core.schemas import DecisionRequest
+from app.llm_gateway.client import llm_gateway
+from app.replay.recorded import RecordedClient, activate, replay_state
+from app.replay.report import ReplayReport
+from app.replay.sources import load_candidate
+from app.trace_store.codec import trace_codec
+
+# Traces replayed concurrently within one worker process; recorded responses return immediately,
+# so this only bounds memory, not provider load.
+REPLAY_CONCURRENCY = 64
+
+# Per worker process: the candidate policies and the event loop every chunk runs on.
+_snapshots: Dict[str, PolicySnapshot] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _tokens(calls: List[Dict[str, Any]]) -> int:
+    return sum(call.get("input_tokens", 0) + call.get("output_tokens", 0) for call in calls)
+
+def _failed(evidence_result: Dict[str, Any], decision_result: Dict[str, Any]) -> bool:
+    return evidence_result.get("abstain_reason") == "planner_timeout" or "system_timeout" in (decision_result.get("failure_modes") or [])
+
+async def replay_trace(row: Dict[str, Any], snapshots: Dict[str, PolicySnapshot]) -> Dict[str, Any]:
+    """
+    Re-runs one stored decision (hard constraints, evidence planner, decision engine) against the candidate
+    snapshot of its policy, with the LLM answered from the trace's recorded responses. Must run in its own
+    task: the recordings are bound to the current context.
+    """
+    trace_data = trace_codec.decode(row["trace_data"])
+    request = DecisionRequest(**trace_data["request"])
+    policy_id = request.policy_id or "default"
+    baseline = trace_data.get("decision") or {}
+    result: Dict[str, Any] = {
+        "trace_id": str(row["id"]),
+        "created_at": row["created_at"].isoformat() if row.get("created_at") else None,
+        "policy_id": policy_id,
+        "baseline": baseline.get("decision", "ABSTAIN"),
+        "baseline_confidence": baseline.get("confidence"),
+        "baseline_version": trace_data.get("policy_version") or row.get("policy_version"),
+        "baseline_tokens": _tokens(trace_data["llm_calls"]) if "llm_calls" in trace_data else (baseline.get("cost_estimate") or {}).get("tokens", 0),
+    }
+    if trace_data.get("coalesced_with"):
+        # A duplicate request that shared another trace's decision; that trace is replayed instead
+        return {**result, "skipped": "coalesced"}
+    snapshot = snapshots.get(policy_id)
+    if snapshot is None:
+        return {**result, "skipped": "policy_not_in_candidate"}
+
+    state = replay_state(trace_data)
+    activate(state)
+    is_safe, rationale = snapshot.hard_constraints.check(request.context, request.signals)
+    if is_safe:
+        evidence_result, decision_result, calls, _ = await run_llm_stages(request, snapshot)
+    else:
+        evidence_result, decision_result, calls = {}, hard_constraint_abstain(result["trace_id"], policy_id, rationale), []
+
+    return {
+        **result,
+        "candidate": decision_result.get("decision", "ABSTAIN"),
+        "candidate_confidence": decision_result.get("confidence"),
+        "candidate_version": snapshot.version,
+        "candidate_tokens": _tokens(calls),
+        "candidate_rationale": decision_result.get("rationale"),
+        "hard_constraint": not is_safe,
+        "reconstructed": state.reconstructed,
+        # A stage without a recording only matters if the candidate pipeline actually failed on it.
+        "missing": state.missing if _failed(evidence_result, decision_result) else [],
+        "stale": state.stale,
+    }
+
+async def _replay_rows(rows: List[Dict[str, Any]], snapshots: Dict[str, PolicySnapshot]) -> List[Dict[str, Any]]:
+    semaphore = asyncio.Semaphore(REPLAY_CONCURRENCY)
+
+    async def guarded(row: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await replay_trace(row, snapshots)
+            except Exception as e:
+                return {"trace_id": str(row.get("id")), "created_at": str(row.get("created_at")), "error": str(e)}
+
+    # gather wraps each coroutine in its own task, so every trace gets its own recordings and call log.
+    return list(await asyncio.gather(*(guarded(row) for row in rows)))
+
+def _install(candidate: str):
+    """
+    Points this process at the candidate policies and the recorded responses. Responses are never served from
+    (or written to) the shared response cache: it would bypass the recordings.
+    """
+    global _snapshots, _loop
+    settings.LLM_CACHE_ENABLED = False
+    llm_gateway.client = RecordedClient()
+    _snapshots = load_candidate(candidate)
+    _loop = asyncio.new_event_loop()
+
+def _init_worker(candidate: str):
+    # Every replayed decision logs like a live one; keep worker output to errors.
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.ERROR))
+    logging.getLogger("asyncio").setLevel(logging.CRITICAL)
+    _install(candidate)
+
+def _replay_chunk(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return _loop.run_until_complete(_replay_rows(rows, _snapshots))
+
+def _chunks(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+def run_replay(rows: Iterable[Dict[str, Any]], candidate: str, workers: int = 1, chunk_size: int = 200, report: Optional[ReplayReport] = None) -> ReplayReport:
+    """
+    Replays stored traces (dicts with id, created_at, policy_version and trace_data, as read by app.replay.sources)
+    against the candidate policies at `candidate` and returns the diff report.
+
+    Traces are replayed independently, so results do not depend on `workers` or `chunk_size`. With more than
+    one worker, chunks are spread over a process pool, at most two chunks per worker in flight so a large
+    source streams through. With one worker the replay runs in this process, which temporarily swaps the
+    gateway's client for the recorded one.
+    """
+    report = report or ReplayReport(candidate)
+    if workers <= 1:
+        previous = llm_gateway.client, settings.LLM_CACHE_ENABLED
+        _install(candidate)
+        try:
+            for chunk in _chunks(rows, chunk_size):
+                for result in _replay_chunk(chunk):
+                    report.add(result)
+        finally:
+            _loop.close()
+            llm_gateway.client, settings.LLM_CACHE_ENABLED = previous
+        return report
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(candidate,)) as pool:
+        pending = set()
+        for chunk in _chunks(rows, chunk_size):
+            pending.add(pool.submit(_replay_chunk, chunk))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for result in future.result():
+                        report.add(result)
+        for future in pending:
+            for result in future.result():
+                report.add(result)
+    return report
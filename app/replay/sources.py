@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+import os
+import yaml
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from app.core.policies import PolicyManager, PolicySnapshot
+from app.trace_store.archive import read_archive_file, trace_archive
+from app.trace_store.store import trace_store
+
+REPLAY_PAGE_SIZE = 1000
+
+def load_candidate(path: str) -> Dict[str, PolicySnapshot]:
+    """
+    Candidate policies to replay against: a policies directory (like `policies/`), or a single policy file
+    that stands in for the policy named after it (`candidate/default.yaml` replaces `default`).
+    """
+    if os.path.isdir(path):
+        return dict(PolicyManager(path).snapshots)
+    with open(path, "r") as f:
+        raw = f.read()
+    policy_id = os.path.splitext(os.path.basename(path))[0]
+    return {policy_id: PolicySnapshot(policy_id, yaml.safe_load(raw), hashlib.sha256(raw.encode("utf-8")).hexdigest())}
+
+def _in_range(row: Dict[str, Any], start: Optional[datetime], end: Optional[datetime]) -> bool:
+    return (start is None or row["created_at"] >= start) and (end is None or row["created_at"] < end)
+
+def _policy_of(row: Dict[str, Any]) -> Optional[str]:
+    trace_data = row["trace_data"]
+    return trace_data.get("request", {}).get("policy_id") if isinstance(trace_data, dict) else None
+
+def iter_file_traces(paths: List[str], start: Optional[datetime] = None, end: Optional[datetime] = None, policy_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Traces from exported files: archive files (`.jsonl.gz`, `.parquet`) or JSON lines of the same rows, such as
+    `GET /api/v1/traces/{id}` responses (`trace_id` is accepted for `id`).
+    """
+    for path in paths:
+        for row in read_archive_file(path):
+            if "id" not in row:
+                row["id"] = row.pop("trace_id")
+            if _in_range(row, start, end) and (policy_id is None or _policy_of(row) == policy_id):
+                yield row
+
+def iter_archived_traces(start: Optional[datetime] = None, end: Optional[datetime] = None, policy_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    for row in trace_archive.iter_traces(start, end):
+        if policy_id is None or _policy_of(row) == policy_id:
+            yield row
+
+async def _fetch_page(start: datetime, end: datetime, policy_id: Optional[str], after: Optional[tuple], limit: int) -> List[Dict[str, Any]]:
+    conditions = ["created_at >= $1", "created_at < $2", "($3::text IS NULL OR policy_id = $3)"]
+    args: List[Any] = [start, end, policy_id]
+    if after is not None:
+        conditions.append("(created_at, id) > ($4, $5)")
+        args.extend(after)
+    async with trace_store.acquire() as conn, trace_store.timed("replay_traces"):
+        rows = await conn.fetch(
+            f"""
+            SELECT id, created_at, policy_version, trace_data
+            FROM decision_trace
+            WHERE {" AND ".join(conditions)}
+            ORDER BY created_at, id
+            LIMIT {int(limit)}
+            """,
+            *args
+        )
+    return [dict(row) for row in rows]
+
+def iter_db_traces(start: datetime, end: datetime, policy_id: Optional[str] = None, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Hot traces created in [start, end), oldest first, read in keyset-paginated pages so a week of traffic
+    streams through without being held in memory. Runs its own event loop: the replay runner is synchronous.
+    """
+    loop = asyncio.new_event_loop()
+    after = None
+    remaining = limit
+    try:
+        while remaining is None or remaining > 0:
+            page_size = REPLAY_PAGE_SIZE if remaining is None else min(REPLAY_PAGE_SIZE, remaining)
+            rows = loop.run_until_complete(_fetch_page(start, end, policy_id, after, page_size))
+            yield from rows
+            if len(rows) < page_size:
+                break
+            after = (rows[-1]["created_at"], rows[-1]["id"])
+            if remaining is not None:
+                remaining -= len(rows)
+    finally:
+        loop.run_until_complete(trace_store.disconnect())
+        loop.close()
@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import json
+import os
+import orjson
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from app.core.config import settings
+
+class ArchiveWriter:
+    """
+    Writes one exported partition to `<dir>/<partition>.jsonl.gz` (or `.parquet`), via a temporary file that is
+    renamed into place on close, so a crashed export never leaves a truncated archive behind.
+    """
+
+    def __init__(self, directory: str, partition: str, fmt: str):
+        if fmt not in ("jsonl", "parquet"):
+            raise ValueError(f"unsupported archive format: {fmt}")
+        self.format = fmt
+        self.filename = f"{partition}.jsonl.gz" if fmt == "jsonl" else f"{partition}.parquet"
+        self.path = os.path.join(directory, self.filename)
+        self.rows = 0
+        self._tmp_path = self.path + ".tmp"
+        if fmt == "jsonl":
+            self._file = gzip.open(self._tmp_path, "wt", encoding="utf-8")
+        else:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError as e:
+                raise RuntimeError("TRACE_ARCHIVE_FORMAT=parquet requires the pyarrow package") from e
+            self._schema = pa.schema([
+                ("id", pa.string()),
+                ("created_at", pa.timestamp("us", tz="UTC")),
+                ("policy_version", pa.string()),
+                ("trace_data", pa.string()),
+            ])
+            self._file = pq.ParquetWriter(self._tmp_path, self._schema, compression="zstd")
+
+    def write(self, rows: Iterable[Dict[str, Any]]):
+        """
+        Appends rows with id, created_at, policy_version and trace_data (JSON text or an already decoded dict).
+        """
+        rows = [
+            (str(row["id"]), row["created_at"], row["policy_version"], _json_text(row["trace_data"]))
+            for row in rows
+        ]
+        if self.format == "jsonl":
+            for trace_id, created_at, policy_version, trace_data in rows:
+                # trace_data is spliced in as-is: it is already JSON, so there is no decode/encode round trip.
+                self._file.write(
+                    f'{{"id": {json.dumps(trace_id)}, "created_at": {json.dumps(created_at.isoformat())}, '
+                    f'"policy_version": {json.dumps(policy_version)}, "trace_data": {trace_data}}}\n'
+                )
+        else:
+            import pyarrow as pa
+            self._file.write_table(pa.Table.from_arrays([list(column) for column in zip(*rows)], schema=self._schema) if rows else self._schema.empty_table())
+        self.rows += len(rows)
+
+    def close(self) -> str:
+        """
+        Finishes the file and moves it into place. Returns its sha256.
+        """
+        self._file.close()
+        digest = hashlib.sha256()
+        with open(self._tmp_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+            os.fsync(f.fileno())
+        os.replace(self._tmp_path, self.path)
+        return digest.hexdigest()
+
+    def abort(self):
+        try:
+            self._file.close()
+        finally:
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+
+def _json_text(trace_data: Any) -> str:
+    # Rows read through the pool's jsonb codec arrive decoded; re-encode without the stdlib json overhead.
+    return trace_data if isinstance(trace_data, str) else orjson.dumps(trace_data).decode("utf-8")
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+def _contains(entry: Dict[str, Any], at: datetime) -> bool:
+    lower, upper = _parse_time(entry["lower"]), _parse_time(entry["upper"])
+    return (lower is None or lower <= at) and (upper is None or at < upper)
+
+def read_archive_file(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Rows (id, created_at, policy_version, trace_data) of an archive file: `.parquet`, or JSON lines, optionally gzipped.
+    trace_data is returned as stored, i.e. still in the trace codec's format.
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches():
+            for row in batch.to_pylist():
+                row["trace_data"] = json.loads(row["trace_data"])
+                yield row
+        return
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+                yield row
+
+class TraceArchive:
+    """
+    Cold tier for decision traces: partitions past retention, exported to compressed files on local disk.
+    `manifest.jsonl` lists one entry per archived partition with its time range, so reads only open the
+    files whose range can contain what they are looking for.
+
+    File I/O is blocking; call from a thread (asyncio.to_thread) on the request path.
+    """
+    MANIFEST = "manifest.jsonl"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, self.MANIFEST)
+
+    def open_writer(self, partition: str, fmt: str = "jsonl") -> ArchiveWriter:
+        os.makedirs(self.directory, exist_ok=True)
+        return ArchiveWriter(self.directory, partition, fmt)
+
+    def add_entry(self, partition: str, lower: Optional[datetime], upper: Optional[datetime], writer: ArchiveWriter, sha256: str) -> Dict[str, Any]:
+        """
+        Records a finished export in the manifest. A partition archived twice (an export retried after a failed
+        drop) keeps only its latest entry.
+        """
+        entry = {
+            "partition": partition,
+            "lower": lower.isoformat() if lower else None,
+            "upper": upper.isoformat() if upper else None,
+            "file": writer.filename,
+            "format": writer.format,
+            "rows": writer.rows,
+            "sha256": sha256,
+            "archived_at": datetime.now(timezone.utc).isoformat(),
+        }
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return entry
+
+    def entries(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.manifest_path):
+            return []
+        latest: Dict[str, Dict[str, Any]] = {}
+        with open(self.manifest_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    latest[entry["partition"]] = entry
+        return sorted(latest.values(), key=lambda e: e["upper"] or "")
+
+    def _overlapping(self, start: Optional[datetime], end: Optional[datetime]) -> List[Dict[str, Any]]:
+        selected = []
+        for entry in self.entries():
+            lower, upper = _parse_time(entry["lower"]), _parse_time(entry["upper"])
+            if start is not None and upper is not None and upper <= start:
+                continue
+            if end is not None and lower is not None and lower >= end:
+                continue
+            selected.append(entry)
+        return selected
+
+    def _read(self, entry: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        return read_archive_file(os.path.join(self.directory, entry["file"]))
+
+    def iter_traces(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Archived traces created in [start, end), as dicts with id, created_at, policy_version and trace_data.
+        """
+        for entry in self._overlapping(start, end):
+            for row in self._read(entry):
+                if (start is None or row["created_at"] >= start) and (end is None or row["created_at"] < end):
+                    yield row
+
+    def find(self, trace_ids: Iterable[str], created_at: datetime) -> Dict[str, Dict[str, Any]]:
+        """
+        Looks up traces created at `created_at` by id, reading only the file whose range covers it. The time
+        comes from the archive index (decision_trace_archived, see TraceStore.get_trace).
+        """
+        wanted = {str(trace_id) for trace_id in trace_ids}
+        found: Dict[str, Dict[str, Any]] = {}
+        if not wanted:
+            return found
+        for entry in [e for e in self.entries() if _contains(e, created_at)]:
+            for row in self._read(entry):
+                if row["id"] in wanted:
+                    found[row["id"]] = row
+                    if len(found) == len(wanted):
+                        return found
+        return found
+
+trace_archive = TraceArchive(settings.path(settings.TRACE_ARCHIVE_DIR))
@@ -0,0 +1,148 @@
+import base64
+import hashlib
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+import orjson
+from app.core.config import settings
+
+# Traces written before the codec carry no "codec" key and decode as-is.
+CODEC_VERSION = 2
+COMPRESSED = "$z"
+
+# Read in SQL (generated columns in migration 004, reliability and calibration queries), so never compressed.
+PLAIN_PATHS = {
+    ("request", "policy_id"),
+    ("decision", "decision"),
+    ("decision", "confidence"),
+    ("decision", "rationale"),
+    ("decision", "model"),
+}
+
+class RawJSON(str):
+    """
+    Text that is already JSON. The connection's json/jsonb codecs send it as-is instead of encoding it again.
+    """
+
+class TraceCodec:
+    """
+    Compact storage format for decision traces.
+
+    - Static data (the policy body, each stage's static prompt prefix) is stored once in `trace_blob`,
+      content-addressed by sha256; a trace only carries `refs` to it.
+    - Free-text values of at least `compress_min_chars` characters are zlib-compressed and stored as
+      {"$z": "<base64>"} when that is actually smaller.
+    - Encoding uses orjson.
+
+    The stored value is still a JSON object, so the JSONB columns, generated columns and indexes keep working.
+    """
+
+    def __init__(self, compress_min_chars: int = 1024, compress_level: int = 1):
+        self.compress_min_chars = compress_min_chars
+        self.compress_level = compress_level
+        self._blobs: Dict[str, Tuple[str, Any]] = {}
+
+    @staticmethod
+    def content_hash(content: Any) -> str:
+        return hashlib.sha256(orjson.dumps(content, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    def register_blob(self, kind: str, content: Any) -> str:
+        """
+        Makes static content available to the trace writer. Returns its hash, for use in a trace's `refs`.
+        """
+        digest = self.content_hash(content)
+        self._blobs.setdefault(digest, (kind, content))
+        return digest
+
+    def blob(self, digest: str) -> Optional[Tuple[str, Any]]:
+        return self._blobs.get(digest)
+
+    def static_refs(self, policy_body: Dict[str, Any], prompt_prefixes: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Registers a policy version's static content and returns the `refs` its traces carry.
+        """
+        return {
+            "policy": self.register_blob("policy", policy_body),
+            "prompts": {stage: self.register_blob("prompt", prefix) for stage, prefix in prompt_prefixes.items()},
+        }
+
+    @staticmethod
+    def ref_hashes(trace_data: Dict[str, Any]) -> List[str]:
+        refs = trace_data.get("refs") or {}
+        hashes = [refs["policy"]] if refs.get("policy") else []
+        return hashes + list((refs.get("prompts") or {}).values())
+
+    def _long_strings(self, value: Any, path: Tuple[Any, ...], found: List[Tuple[Any, ...]]) -> List[Tuple[Any, ...]]:
+        # Paths (dict keys / list indices) of strings worth compressing. Exact type checks keep this cheap: it runs per trace.
+        items = value.items() if type(value) is dict else enumerate(value)
+        for key, item in items:
+            kind = type(item)
+            if kind is str:
+                if len(item) >= self.compress_min_chars and path + (key,) not in PLAIN_PATHS:
+                    found.append(path + (key,))
+            elif kind is dict or kind is list:
+                self._long_strings(item, path + (key,), found)
+        return found
+
+    def _pack(self, text: str) -> Optional[Dict[str, str]]:
+        raw = text.encode("utf-8")
+        packed = base64.b64encode(zlib.compress(raw, self.compress_level)).decode("ascii")
+        return {COMPRESSED: packed} if len(packed) < len(raw) else None
+
+    @staticmethod
+    def _replace(container: Any, path: Tuple[Any, ...], value: Any) -> Any:
+        # Copy-on-write along `path` only; the caller's trace is never mutated.
+        copy = dict(container) if type(container) is dict else list(container)
+        copy[path[0]] = value if len(path) == 1 else TraceCodec._replace(container[path[0]], path[1:], value)
+        return copy
+
+    def encode(self, trace_data: Dict[str, Any]) -> RawJSON:
+        """
+        Stored form of a trace, as JSON text for the JSONB column.
+        """
+        compact = trace_data
+        for path in self._long_strings(trace_data, (), []):
+            text = trace_data
+            for key in path:
+                text = text[key]
+            packed = self._pack(text)
+            if packed is not None:
+                compact = self._replace(compact, path, packed)
+        return RawJSON(orjson.dumps({**compact, "codec": CODEC_VERSION}).decode("utf-8"))
+
+    def _expand(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            if len(value) == 1 and COMPRESSED in value:
+                return zlib.decompress(base64.b64decode(value[COMPRESSED])).decode("utf-8")
+            return {key: self._expand(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self._expand(item) for item in value]
+        return value
+
+    def decode(self, stored: Any) -> Dict[str, Any]:
+        """
+        Inverse of `encode`: accepts the stored JSON text or an already parsed object. References are kept as-is.
+        """
+        if isinstance(stored, str):
+            trace_data = orjson.loads(str(stored))  # orjson rejects str subclasses such as RawJSON
+        elif isinstance(stored, bytes):
+            trace_data = orjson.loads(stored)
+        else:
+            trace_data = dict(stored)
+        if trace_data.pop("codec", None) is None:
+            return trace_data
+        return self._expand(trace_data)
+
+    def rehydrate(self, trace_data: Dict[str, Any], blobs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Inlines referenced static content (`policy`, `prompts`) into a decoded trace. `blobs` maps hash -> content.
+        """
+        refs = trace_data.get("refs")
+        if not refs:
+            return trace_data
+        full = dict(trace_data)
+        if refs.get("policy") in blobs:
+            full["policy"] = blobs[refs["policy"]]
+        full["prompts"] = {stage: blobs[digest] for stage, digest in (refs.get("prompts") or {}).items() if digest in blobs}
+        return full
+
+trace_codec = TraceCodec(settings.TRACE_COMPRESS_MIN_CHARS)
@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import math
+import re
+import structlog
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+from app.core.config import settings
+from app.trace_store.store import trace_store
+
+logger = structlog.get_logger()
+
+_TOKEN = re.compile(r"[a-z0-9$]+")
+
+# Taken for a backfill round; workers that cannot get it skip the round.
+BACKFILL_LOCK_KEY = 0x44544542  # "DTEB"
+
+# Traces are written behind (app/trace_store/writer.py), so one can commit shortly after a newer one has been
+# embedded. The pending scan starts this far before the newest embedded trace to pick such stragglers up; traces
+# written behind by longer (writer retries, an outage) are picked up by the periodic sweep of the whole hot table.
+PENDING_LOOKBACK = timedelta(minutes=5)
+
+PENDING_TRACES_SQL = """
+    SELECT t.id, t.created_at, t.policy_id, t.decision, t.rationale
+    FROM decision_trace t
+    WHERE t.created_at > COALESCE((SELECT max(created_at) FROM decision_trace_embedding), '-infinity') - $2::interval
+      AND NOT EXISTS (
+          SELECT 1 FROM decision_trace_embedding e WHERE e.trace_id = t.id AND e.created_at = t.created_at
+      )
+    ORDER BY t.created_at
+    LIMIT $1
+"""
+
+# Keyset-paged from $2 (the created_at of the previous page's last trace), so a sweep reads each trace once.
+SWEEP_TRACES_SQL = """
+    SELECT t.id, t.created_at, t.policy_id, t.decision, t.rationale
+    FROM decision_trace t
+    WHERE ($2::timestamptz IS NULL OR t.created_at >= $2)
+      AND NOT EXISTS (
+          SELECT 1 FROM decision_trace_embedding e WHERE e.trace_id = t.id AND e.created_at = t.created_at
+      )
+    ORDER BY t.created_at
+    LIMIT $1
+"""
+
+INSERT_EMBEDDINGS_SQL = """
+    INSERT INTO decision_trace_embedding (trace_id, created_at, policy_id, decision, model, embedding)
+    VALUES ($1, $2, $3, $4, $5, $6::vector)
+    ON CONFLICT (trace_id, created_at) DO NOTHING
+"""
+
+class Embedder(ABC):
+    """
+    Turns rationales into fixed-size vectors. `dim` must match the `embedding` column (migration 003).
+    """
+    name = "base"
+    dim = 0
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Returns one L2-normalized vector per text, or None for text with nothing to embed.
+        """
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic, dependency-free embedder: signed feature hashing of word unigrams and bigrams.
+    Captures lexical overlap only, but needs no model download, so it works offline and in tests.
+    """
+    name = "hashing"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _vector(self, text: str) -> Optional[List[float]]:
+        tokens = _TOKEN.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        if not features:
+            return None
+        vector = [0.0] * self.dim
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else None
+
+    async def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        return [self._vector(text or "") for text in texts]
+
+class SentenceTransformerEmbedder(Embedder):
+    """
+    Semantic embeddings from a local sentence-transformers model (optional dependency).
+    """
+    name = "sentence_transformers"
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError("EMBEDDER=sentence_transformers requires the sentence-transformers package") from e
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    async def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        vectors = await asyncio.to_thread(self.model.encode, [text or "" for text in texts], normalize_embeddings=True)
+        return [vector.tolist() if text else None for text, vector in zip(texts, vectors)]
+
+EMBEDDERS: Dict[str, Callable[[], Embedder]] = {
+    "hashing": lambda: HashingEmbedder(settings.EMBEDDING_DIM),
+    "sentence_transformers": lambda: SentenceTransformerEmbedder(settings.EMBEDDING_MODEL),
+}
+
+def register_embedder(name: str, factory: Callable[[], Embedder]):
+    EMBEDDERS[name] = factory
+
+_embedder: Optional[Embedder] = None
+
+def get_embedder() -> Embedder:
+    """
+    The configured embedder (settings.EMBEDDER), created on first use.
+    """
+    global _embedder
+    if _embedder is None:
+        _embedder = EMBEDDERS[settings.EMBEDDER]()
+        if _embedder.dim != settings.EMBEDDING_DIM:
+            raise RuntimeError(f"Embedder {_embedder.name} produces {_embedder.dim}-d vectors; EMBEDDING_DIM is {settings.EMBEDDING_DIM}")
+    return _embedder
+
+def vector_literal(vector: List[float]) -> str:
+    """
+    pgvector text format; bound as text and cast with ::vector, so no client-side codec is needed.
+    """
+    return "[" + ",".join(f"{v:.6g}" for v in vector) + "]"
+
+class EmbeddingBackfill:
+    """
+    Background worker that embeds the rationale of new traces into decision_trace_embedding (migration 003).
+    The trace log itself is never updated. One API worker runs a round at a time (advisory lock).
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._swept_at: Optional[float] = None
+
+    async def run_once(self, batch_size: Optional[int] = None) -> int:
+        """
+        Embeds one batch of pending traces. Returns the number of traces processed.
+        """
+        rows = await self._embed_batch(PENDING_TRACES_SQL, batch_size or settings.EMBEDDING_BACKFILL_BATCH_SIZE, PENDING_LOOKBACK)
+        return len(rows)
+
+    async def sweep(self, batch_size: Optional[int] = None) -> int:
+        """
+        Embeds every trace in the hot table that has no embedding yet, oldest first, regardless of PENDING_LOOKBACK.
+        Returns the number of traces processed.
+        """
+        batch_size = batch_size or settings.EMBEDDING_BACKFILL_BATCH_SIZE
+        total, after = 0, None
+        while True:
+            rows = await self._embed_batch(SWEEP_TRACES_SQL, batch_size, after)
+            total += len(rows)
+            if len(rows) < batch_size:
+                return total
+            after = rows[-1]["created_at"]
+
+    async def _embed_batch(self, query: str, *params) -> list:
+        embedder = get_embedder()
+        async with trace_store.acquire() as conn:
+            async with conn.transaction():
+                if not await conn.fetchval("SELECT pg_try_advisory_xact_lock($1)", BACKFILL_LOCK_KEY):
+                    return []
+                rows = await conn.fetch(query, *params)
+                if not rows:
+                    return []
+                vectors = await embedder.embed([row["rationale"] or "" for row in rows])
+                # Traces with nothing to embed still get a row (without a vector) so they are not picked up again.
+                await conn.executemany(
+                    INSERT_EMBEDDINGS_SQL,
+                    [
+                        (row["id"], row["created_at"], row["policy_id"], row["decision"], embedder.name, vector_literal(vector) if vector else None)
+                        for row, vector in zip(rows, vectors)
+                    ]
+                )
+        logger.info("embedding_backfill_batch", count=len(rows), embedder=embedder.name)
+        return rows
+
+    def _sweep_due(self) -> bool:
+        interval_s = settings.EMBEDDING_SWEEP_INTERVAL_S
+        return interval_s > 0 and (self._swept_at is None or time.monotonic() - self._swept_at >= interval_s)
+
+    async def _run(self, interval_s: float):
+        while True:
+            try:
+                # Drain the backlog, then wait for new traces.
+                while await self.run_once() >= settings.EMBEDDING_BACKFILL_BATCH_SIZE:
+                    pass
+                if self._sweep_due():
+                    count = await self.sweep()
+                    self._swept_at = time.monotonic()
+                    if count:
+                        logger.warning("embedding_backfill_sweep_found_stragglers", count=count)
+            except Exception as e:
+                logger.error("embedding_backfill_failed", error=str(e))
+            await asyncio.sleep(interval_s)
+
+    def start(self, interval_s: float):
+        if self._task is None and interval_s > 0:
+            self._task = asyncio.create_task(self._run(interval_s))
+            logger.info("embedding_backfill_started", interval_s=interval_s)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+embedding_backfill = EmbeddingBackfill()
@@ -0,0 +1,224 @@
+import asyncio
+import os
+import re
+import uuid
+import structlog
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.evaluation.calibration import archived_trace_facts
+from app.trace_store.archive import read_archive_file, trace_archive
+from app.trace_store.store import trace_store
+
+logger = structlog.get_logger()
+
+# Taken by whichever API worker runs maintenance; the others skip that round.
+MAINTENANCE_LOCK_KEY = 0x44545041  # "DTPA"
+EXPORT_BATCH_SIZE = 5000
+
+# decision_trace_archived (migration 007): where each archived trace went, and its calibration facts.
+ARCHIVED_COLUMNS = ("trace_id", "created_at", "partition_name", "policy_id", "bucket_date", "decision", "confidence")
+
+_RANGE_BOUND = re.compile(r"FOR VALUES FROM \((.+)\) TO \((.+)\)")
+
+@dataclass
+class TracePartition:
+    name: str
+    lower: Optional[datetime]  # None: MINVALUE
+    upper: Optional[datetime]  # None: MAXVALUE
+    is_default: bool = False
+    detach_pending: bool = False  # an earlier DETACH ... CONCURRENTLY was interrupted
+
+def _bound_value(value: str) -> Optional[datetime]:
+    value = value.strip()
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+def _bound_sql(value: Optional[datetime], unbounded: str) -> str:
+    return unbounded if value is None else f"'{value.isoformat()}'"
+
+def parse_partition(name: str, bound: str, detach_pending: bool = False) -> TracePartition:
+    """
+    Parses pg_get_expr(relpartbound) output, e.g. "FOR VALUES FROM ('2024-01-01 00:00:00+00') TO (...)" or "DEFAULT".
+    """
+    if bound.strip() == "DEFAULT":
+        return TracePartition(name, None, None, is_default=True, detach_pending=detach_pending)
+    match = _RANGE_BOUND.match(bound.strip())
+    if not match:
+        raise ValueError(f"unexpected partition bound for {name}: {bound}")
+    return TracePartition(name, _bound_value(match.group(1)), _bound_value(match.group(2)), detach_pending=detach_pending)
+
+def expired_partitions(partitions: List[TracePartition], cutoff: datetime) -> List[TracePartition]:
+    """
+    Partitions whose whole range ends at or before `cutoff`, oldest first. The default partition never expires.
+    """
+    expired = [p for p in partitions if not p.is_default and p.upper is not None and p.upper <= cutoff]
+    return sorted(expired, key=lambda p: p.upper)
+
+def _archived_record(partition: str, row: Dict[str, Any]) -> Tuple:
+    facts = archived_trace_facts(row)
+    return (uuid.UUID(row["id"]), row["created_at"], partition, facts["policy_id"], facts["bucket_date"], facts["decision"], facts["confidence"])
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+class PartitionManager:
+    """
+    Maintains the time-partitioned decision_trace table (migration 005): creates upcoming partitions ahead of
+    time and moves partitions past retention to the cold archive (export, verify, detach, drop).
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    async def list_partitions(self, conn) -> List[TracePartition]:
+        rows = await conn.fetch(
+            """
+            SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound, i.inhdetachpending AS detach_pending
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'decision_trace'::regclass
+            """
+        )
+        return [parse_partition(row["name"], row["bound"], row["detach_pending"]) for row in rows]
+
+    async def ensure_partitions(self, conn) -> List[str]:
+        rows = await conn.fetch(
+            "SELECT ensure_decision_trace_partitions($1, $2) AS name",
+            settings.TRACE_PARTITION_INTERVAL,
+            settings.TRACE_PARTITIONS_AHEAD
+        )
+        created = [row["name"] for row in rows]
+        if created:
+            logger.info("trace_partitions_created", partitions=created)
+        return created
+
+    async def archive_partition(self, conn, partition: TracePartition) -> int:
+        """
+        Exports a partition to the archive, then detaches and drops it, along with its traces' embeddings. The drop
+        only happens once the archive file and its manifest entry are durable and the row count matches, and in the
+        transaction that indexes the partition's trace ids. Returns the number of rows archived.
+
+        The detach runs CONCURRENTLY, outside any transaction: it waits for queries still using the partition
+        instead of holding an ACCESS EXCLUSIVE lock on decision_trace (and so every trace write) meanwhile.
+        """
+        table = _quote_ident(partition.name)
+        writer = trace_archive.open_writer(partition.name, settings.TRACE_ARCHIVE_FORMAT)
+        try:
+            async with conn.transaction():
+                cursor = await conn.cursor(f"SELECT id, created_at, policy_version, trace_data FROM {table} ORDER BY created_at")
+                while rows := await cursor.fetch(EXPORT_BATCH_SIZE):
+                    await asyncio.to_thread(writer.write, rows)
+            sha256 = await asyncio.to_thread(writer.close)
+        except BaseException:
+            writer.abort()
+            raise
+        await asyncio.to_thread(trace_archive.add_entry, partition.name, partition.lower, partition.upper, writer, sha256)
+
+        # An interrupted concurrent detach leaves the partition pending; it can only be finalized.
+        mode = "FINALIZE" if partition.detach_pending else "CONCURRENTLY"
+        await conn.execute(f"ALTER TABLE decision_trace DETACH PARTITION {table} {mode}")
+        # Once detached, nothing writes to the table, so the count cannot change before the drop.
+        count = await conn.fetchval(f"SELECT count(*) FROM {table}")
+        if count != writer.rows:
+            # Rows the export did not see: put the partition back rather than lose them.
+            await conn.execute(
+                f"ALTER TABLE decision_trace ATTACH PARTITION {table} "
+                f"FOR VALUES FROM ({_bound_sql(partition.lower, 'MINVALUE')}) TO ({_bound_sql(partition.upper, 'MAXVALUE')})"
+            )
+            raise RuntimeError(f"partition {partition.name} has {count} rows, archive has {writer.rows}; reattached, not dropped")
+        async with conn.transaction():
+            # Indexed before the drop, so every trace stays findable by id (see migration 007)
+            await conn.execute(
+                f"""
+                INSERT INTO decision_trace_archived ({", ".join(ARCHIVED_COLUMNS)})
+                SELECT id, created_at, $1, policy_id, (created_at AT TIME ZONE 'UTC')::date, decision, COALESCE(confidence, 0)
+                FROM {table}
+                ON CONFLICT DO NOTHING
+                """,
+                partition.name
+            )
+            await conn.execute(f"DROP TABLE {table}")
+            await conn.execute(
+                """
+                DELETE FROM decision_trace_embedding
+                WHERE ($1::timestamptz IS NULL OR created_at >= $1) AND ($2::timestamptz IS NULL OR created_at < $2)
+                """,
+                partition.lower,
+                partition.upper
+            )
+        logger.info("trace_partition_archived", partition=partition.name, rows=writer.rows, file=writer.path)
+        return writer.rows
+
+    async def index_archive(self, conn) -> List[str]:
+        """
+        Indexes archived partitions that have no rows in decision_trace_archived (archived before migration 007).
+        Returns their names.
+        """
+        indexed = []
+        for entry in trace_archive.entries():
+            if not entry["rows"] or await conn.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM decision_trace_archived WHERE partition_name = $1)", entry["partition"]
+            ):
+                continue
+            path = os.path.join(trace_archive.directory, entry["file"])
+            records = await asyncio.to_thread(lambda: [_archived_record(entry["partition"], row) for row in read_archive_file(path)])
+            await conn.copy_records_to_table("decision_trace_archived", records=records, columns=list(ARCHIVED_COLUMNS))
+            indexed.append(entry["partition"])
+        if indexed:
+            logger.info("trace_archive_indexed", partitions=indexed)
+        return indexed
+
+    async def apply_retention(self, conn, now: Optional[datetime] = None) -> List[str]:
+        """
+        Archives every partition that lies entirely beyond TRACE_RETENTION_DAYS. Returns their names.
+        """
+        if settings.TRACE_RETENTION_DAYS <= 0:
+            return []
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=settings.TRACE_RETENTION_DAYS)
+        archived = []
+        for partition in expired_partitions(await self.list_partitions(conn), cutoff):
+            await self.archive_partition(conn, partition)
+            archived.append(partition.name)
+        return archived
+
+    async def run_once(self) -> bool:
+        """
+        One maintenance round. Returns False when another worker holds the maintenance lock.
+        """
+        async with trace_store.acquire() as conn:
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", MAINTENANCE_LOCK_KEY):
+                return False
+            try:
+                await self.ensure_partitions(conn)
+                await self.index_archive(conn)
+                await self.apply_retention(conn)
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", MAINTENANCE_LOCK_KEY)
+        return True
+
+    async def _run(self, interval_s: float):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("trace_partition_maintenance_failed", error=str(e))
+            await asyncio.sleep(interval_s)
+
+    def start(self, interval_s: float):
+        if self._task is None and interval_s > 0:
+            self._task = asyncio.create_task(self._run(interval_s))
+            logger.info("trace_partition_maintenance_started", interval_s=interval_s)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+partition_manager = PartitionManager()
@@ -1,38 +1,151 @@
-import os
+import base64
 import structlog
-from typing import List, Dict, Any
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 from app.trace_store.store import trace_store
+from app.trace_store.embeddings import get_embedder, vector_literal
 
 logger = structlog.get_logger()
 
 class SemanticSearch:
     """
-    Initial skeleton for Semantic Trace Search.
-    Note: Requires pgvector extension in Postgres to be fully functional.
+    Semantic Trace Search over rationale embeddings (pgvector, HNSW cosine index).
+    Traces become searchable once the embedding backfill worker has processed them.
     """
     
-    async def find_similar_rationales(self, query: str, limit: int = 5):
+    async def find_similar_rationales(
+        self,
+        query: str,
+        limit: int = 5,
+        policy_id: Optional[str] = None,
+        decision: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """
         Finds decision traces with rationales conceptually similar to the query.
+        Returns the top `limit` traces with a cosine similarity `score` (1.0 = identical direction).
         """
-        # This is a placeholder for the pgvector implementation.
-        # In a real setup, we would vectorize the query and use:
-        # SELECT id, rationale FROM decision_trace ORDER BY embedding <=> $1 LIMIT $2
-        logger.info("semantic_search_requested", query=query)
-        
-        # For now, we fallback to a simple ILIKE search as a gap-filler
-        await trace_store.connect()
-        async with trace_store.pool.acquire() as conn:
-            results = await conn.fetch(
-                """
-                SELECT id, trace_data->'decision'->>'rationale' as rationale
+        logger.info("semantic_search_requested", query=query, policy_id=policy_id, decision=decision)
+        vector = (await get_embedder().embed([query]))[0]
+        if vector is None:
+            return []
+
+        # Filters are applied to the index's candidate list, so widen it when filtering.
+        ef_search = min(1000, max(40, limit * (10 if policy_id or decision else 2)))
+
+        async with trace_store.acquire() as conn, trace_store.timed("similar_rationales"):
+            async with conn.transaction():
+                await conn.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+                # Nearest neighbours from the embedding table's index, then their rationales from the trace log
+                results = await conn.fetch(
+                    """
+                    SELECT t.id, t.rationale, t.decision, t.policy_id, t.created_at, 1 - nearest.distance AS score
+                    FROM (
+                        SELECT trace_id, created_at, embedding <=> $1::vector AS distance
+                        FROM decision_trace_embedding
+                        WHERE embedding IS NOT NULL
+                          AND ($3::text IS NULL OR policy_id = $3)
+                          AND ($4::text IS NULL OR decision = $4)
+                        ORDER BY embedding <=> $1::vector
+                        LIMIT $2
+                    ) nearest
+                    JOIN decision_trace t ON t.id = nearest.trace_id AND t.created_at = nearest.created_at
+                    ORDER BY nearest.distance
+                    """,
+                    vector_literal(vector),
+                    limit,
+                    policy_id,
+                    decision
+                )
+            return [dict(r) for r in results]
+
+semantic_search = SemanticSearch()
+
+def encode_cursor(created_at: datetime, trace_id: Any) -> str:
+    raw = f"{created_at.isoformat()}|{trace_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """
+    Raises ValueError for a cursor that was not produced by encode_cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, trace_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), uuid.UUID(trace_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class AuditSearch:
+    """
+    Filtered, paginated trace listing for auditors, newest first.
+    Runs on the generated columns (see migrations/004) so every filter is index-backed:
+    full-text (`match="words"`) or trigram substring (`match="substring"`) keyword search, and
+    keyset pagination on (created_at, id), which costs the same on page 1000 as on page 1.
+    """
+
+    async def search(
+        self,
+        query: Optional[str] = None,
+        match: str = "words",
+        decision: Optional[str] = None,
+        policy_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Returns {"items": [...], "next_cursor": str | None}. Pass `next_cursor` back to get the next page.
+        """
+        conditions: List[str] = []
+        params: List[Any] = []
+
+        def param(value: Any) -> str:
+            params.append(value)
+            return f"${len(params)}"
+
+        if query:
+            if match == "substring":
+                conditions.append(f"rationale ILIKE {param('%' + _escape_like(query) + '%')}")
+            else:
+                conditions.append(f"rationale_tsv @@ websearch_to_tsquery('english', {param(query)})")
+        if decision:
+            conditions.append(f"decision = {param(decision)}")
+        if policy_id:
+            conditions.append(f"policy_id = {param(policy_id)}")
+        if start:
+            conditions.append(f"created_at >= {param(start)}")
+        if end:
+            conditions.append(f"created_at < {param(end)}")
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            conditions.append(f"(created_at, id) < ({param(cursor_created_at)}, {param(cursor_id)})")
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        logger.info("audit_search_requested", query=query, match=match, decision=decision, policy_id=policy_id)
+
+        async with trace_store.acquire() as conn, trace_store.timed("audit_search"):
+            # Fetch one extra row to know whether there is a next page.
+            rows = await conn.fetch(
+                f"""
+                SELECT id, created_at, policy_id, policy_version, decision, confidence, rationale
                 FROM decision_trace
-                WHERE trace_data->'decision'->>'rationale' ILIKE $1
-                LIMIT $2
+                {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT {param(limit + 1)}
                 """,
-                f"%{query}%",
-                limit
+                *params
             )
-            return [dict(r) for r in results]
 
-semantic_search = SemanticSearch()
+        items = [dict(r) for r in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+        return {"items": items, "next_cursor": next_cursor}
+
+audit_search = AuditSearch()
@@ -1,12 +1,80 @@
-import json
+import asyncio
+import time
 import structlog
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 import asyncpg
+import orjson
+from asyncpg.prepared_stmt import PreparedStatement
 from app.core.config import settings
+from app.trace_store.archive import trace_archive
+from app.trace_store.codec import RawJSON, trace_codec
+from app.observability.metrics import (
+    db_pool_acquire_seconds,
+    db_pool_connections_in_use,
+    db_pool_size,
+    db_query_seconds,
+)
 
 logger = structlog.get_logger()
 
+# Hot-path statements, prepared on every pool connection when it is opened (see TraceConnection).
+# Other modules add theirs with register_statement() at import time.
+STATEMENTS: Dict[str, str] = {
+    "insert_trace": """
+        INSERT INTO decision_trace (id, trace_data, created_at, policy_version)
+        VALUES ($1, $2, $3, $4)
+    """,
+    "insert_blob": """
+        INSERT INTO trace_blob (hash, kind, content)
+        VALUES ($1, $2, $3)
+        ON CONFLICT (hash) DO NOTHING
+    """,
+    "get_trace": """
+        SELECT id, created_at, policy_version, trace_data
+        FROM decision_trace
+        WHERE id = $1
+    """,
+    "get_archived_trace": """
+        SELECT created_at
+        FROM decision_trace_archived
+        WHERE trace_id = $1
+        LIMIT 1
+    """,
+}
+
+def register_statement(name: str, query: str):
+    STATEMENTS[name] = query
+
+def encode_jsonb(value: Any) -> bytes:
+    # jsonb binary format: a version byte, then the JSON text. RawJSON is already encoded (e.g. by the trace codec).
+    return b"\x01" + (value.encode("utf-8") if isinstance(value, RawJSON) else orjson.dumps(value))
+
+def decode_jsonb(data: bytes) -> Any:
+    return orjson.loads(data[1:])
+
+def encode_json(value: Any) -> str:
+    return value if isinstance(value, RawJSON) else orjson.dumps(value).decode("utf-8")
+
+class TraceConnection(asyncpg.Connection):
+    """
+    Pool connection that keeps the hot-path statements prepared for its lifetime.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements: Dict[str, PreparedStatement] = {}
+
+async def init_connection(conn: TraceConnection):
+    """
+    Per-connection setup: JSON codecs (parameters are Python objects, no manual json.dumps) and prepared statements.
+    """
+    await conn.set_type_codec("jsonb", encoder=encode_jsonb, decoder=decode_jsonb, schema="pg_catalog", format="binary")
+    await conn.set_type_codec("json", encoder=encode_json, decoder=orjson.loads, schema="pg_catalog")
+    for name, query in STATEMENTS.items():
+        conn.statements[name] = await conn.prepare(query)
+
 class TraceStore:
     def __init__(self):
         self.dsn = (
@@ -14,31 +82,173 @@ class TraceStore:
             f"{settings.POSTGRES_SERVER}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
         )
         self.pool = None
+        # Concurrent first requests must not each create a pool.
+        self._connect_lock = asyncio.Lock()
+        # Static blobs already persisted to trace_blob by this process; they are immutable, so never re-sent.
+        self._persisted_blobs = set()
 
     async def connect(self):
-        if not self.pool:
-            self.pool = await asyncpg.create_pool(dsn=self.dsn)
+        if self.pool:
+            return
+        async with self._connect_lock:
+            if not self.pool:
+                min_size, max_size = settings.db_pool_sizes()
+                self.pool = await asyncpg.create_pool(
+                    dsn=self.dsn,
+                    min_size=min_size,
+                    max_size=max_size,
+                    max_inactive_connection_lifetime=settings.DB_POOL_MAX_INACTIVE_LIFETIME_S,
+                    statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+                    command_timeout=settings.DB_COMMAND_TIMEOUT_S,
+                    connection_class=TraceConnection,
+                    init=init_connection,
+                )
+                db_pool_size.set(self.pool.get_size())
+                logger.info("db_pool_created", min_size=min_size, max_size=max_size, workers=settings.WEB_CONCURRENCY)
+
+    async def warm_up(self):
+        """
+        Creates the pool (opening DB_POOL_MIN_SIZE connections, each with its statements prepared) and
+        round-trips every one of them, so the first requests neither connect nor prepare.
+        """
+        await self.connect()
+
+        async def ping():
+            async with self.acquire() as conn:
+                await conn.fetchval("SELECT 1")
+
+        await asyncio.gather(*(ping() for _ in range(settings.DB_POOL_MIN_SIZE)))
+        logger.info("db_pool_warmed", size=self.pool.get_size())
 
     async def disconnect(self):
         if self.pool:
             await self.pool.close()
 
-    async def log_trace(self, trace_id: str, trace_data: Dict[str, Any]):
+    @asynccontextmanager
+    async def acquire(self):
         """
-        Logs a decision trace to Postgres JSONB.
-        Immutable log pattern.
+        A pooled connection, with acquire wait time and connections in use recorded.
         """
         await self.connect()
+        start = time.perf_counter()
         async with self.pool.acquire() as conn:
-            await conn.execute(
-                """
-                INSERT INTO decision_trace (id, trace_data, created_at)
-                VALUES ($1, $2, $3)
-                """,
-                trace_id,
-                json.dumps(trace_data),
-                datetime.utcnow()
-            )
+            db_pool_acquire_seconds.observe(time.perf_counter() - start)
+            db_pool_connections_in_use.inc()
+            try:
+                yield conn
+            finally:
+                db_pool_connections_in_use.dec()
+                db_pool_size.set(self.pool.get_size())
+
+    @asynccontextmanager
+    async def timed(self, statement: str):
+        """
+        Records the latency of an ad-hoc query (or COPY) under `statement`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            db_query_seconds.labels(statement=statement).observe(time.perf_counter() - start)
+
+    async def run(self, conn, statement: str, *args: Any, method: str = "fetch"):
+        """
+        Runs a registered statement with its per-connection prepared statement, timed by name.
+        `method` is a PreparedStatement method: fetch, fetchrow, fetchval or executemany.
+        """
+        prepared = conn.statements.get(statement)
+        if prepared is None:
+            # Registered after this connection was opened.
+            prepared = conn.statements[statement] = await conn.prepare(STATEMENTS[statement])
+        async with self.timed(statement):
+            return await getattr(prepared, method)(*args)
+
+    async def _persist_blobs(self, conn, traces: Iterable[Dict[str, Any]]):
+        """
+        Stores the static content referenced by `traces` (policy body, prompt prefixes) once, content-addressed.
+        """
+        pending = {digest for trace_data in traces for digest in trace_codec.ref_hashes(trace_data)} - self._persisted_blobs
+        rows = []
+        for digest in pending:
+            blob = trace_codec.blob(digest)
+            if blob is None:
+                raise ValueError(f"Trace references unknown blob {digest}")
+            kind, content = blob
+            rows.append((digest, kind, content))
+        if rows:
+            await self.run(conn, "insert_blob", rows, method="executemany")
+            self._persisted_blobs.update(pending)
+
+    async def log_trace(self, trace_id: str, trace_data: Dict[str, Any], policy_version: Optional[str] = None):
+        """
+        Logs a decision trace to Postgres JSONB, in the compact trace codec format.
+        Immutable log pattern.
+        """
+        async with self.acquire() as conn:
+            await self._persist_blobs(conn, [trace_data])
+            await self.run(conn, "insert_trace", trace_id, trace_codec.encode(trace_data), datetime.utcnow(), policy_version)
         logger.info("trace_logged", trace_id=trace_id)
 
+    async def log_traces(self, traces: List[Tuple[str, Dict[str, Any], Optional[str]]]):
+        """
+        Logs many (trace_id, trace_data, policy_version) traces in a single COPY.
+        All-or-nothing: either every trace in the batch is persisted or none is.
+        """
+        created_at = datetime.utcnow()
+        records = [
+            (trace_id, trace_codec.encode(trace_data), created_at, policy_version)
+            for trace_id, trace_data, policy_version in traces
+        ]
+        async with self.acquire() as conn:
+            await self._persist_blobs(conn, [trace_data for _, trace_data, _ in traces])
+            async with self.timed("copy_traces"):
+                await conn.copy_records_to_table(
+                    "decision_trace",
+                    records=records,
+                    columns=["id", "trace_data", "created_at", "policy_version"]
+                )
+        logger.info("traces_logged", count=len(records))
+
+    async def get_blobs(self, hashes: Iterable[str]) -> Dict[str, Any]:
+        """
+        Static content by hash: from this process's registry when possible, otherwise from trace_blob.
+        """
+        blobs, missing = {}, []
+        for digest in set(hashes):
+            blob = trace_codec.blob(digest)
+            if blob is None:
+                missing.append(digest)
+            else:
+                blobs[digest] = blob[1]
+        if missing:
+            async with self.acquire() as conn, self.timed("get_blobs"):
+                rows = await conn.fetch("SELECT hash, content FROM trace_blob WHERE hash = ANY($1::text[])", missing)
+            blobs.update({row["hash"]: row["content"] for row in rows})
+        return blobs
+
+    async def get_trace(self, trace_id: str, rehydrate: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Fetches one trace (id, created_at, policy_version, trace_data) from the hot table, falling back to
+        archived partitions. The archive index (migration 007) narrows the fallback to the one file holding the
+        trace; ids it does not know are not looked for in the archive at all.
+        trace_data is decoded and, with `rehydrate`, has its referenced policy and prompts inlined.
+        """
+        async with self.acquire() as conn:
+            row = await self.run(conn, "get_trace", trace_id, method="fetchrow")
+            archived_at = None if row is not None else await self.run(conn, "get_archived_trace", trace_id, method="fetchval")
+        if row is not None:
+            trace = dict(row)
+        else:
+            if archived_at is None:
+                return None
+            archived = await asyncio.to_thread(trace_archive.find, [str(trace_id)], archived_at)
+            trace = archived.get(str(trace_id))
+            if trace is None:
+                return None
+        trace["trace_data"] = trace_codec.decode(trace["trace_data"])
+        if rehydrate:
+            blobs = await self.get_blobs(trace_codec.ref_hashes(trace["trace_data"]))
+            trace["trace_data"] = trace_codec.rehydrate(trace["trace_data"], blobs)
+        return trace
+
 trace_store = TraceStore()
@@ -0,0 +1,197 @@
+import asyncio
+import time
+import structlog
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.exceptions import TracePersistenceError
+from app.trace_store.store import trace_store
+from app.observability.metrics import (
+    trace_writer_queue_depth,
+    trace_writer_enqueue_wait_seconds,
+    trace_writer_batch_size,
+    trace_writer_flush_seconds,
+    trace_writer_flush_failures_total,
+)
+
+logger = structlog.get_logger()
+
+QueueItem = Tuple[str, Dict[str, Any], Optional[str], asyncio.Future]
+
+def _consume_exception(future: asyncio.Future):
+    # Callers only await the future for ACT decisions; mark failures as retrieved so
+    # un-awaited futures don't warn. Failures are logged by the writer itself.
+    if not future.cancelled():
+        future.exception()
+
+class TraceWriter:
+    """
+    Write-behind trace persistence with group commit.
+
+    `submit` enqueues a trace and returns a future that resolves once the batch containing it has
+    committed (or fails with TracePersistenceError). A single background task drains the bounded queue
+    and writes each batch with one COPY; if the COPY fails, the batch is retried one trace at a time so a
+    single bad trace fails only its own future. When the queue is full, `submit` waits (backpressure).
+    When the writer is not running or is shutting down, traces are written inline so the guarantees
+    still hold: nothing is enqueued behind the shutdown sentinel.
+    """
+
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        # Set whenever the writer takes items off the queue (or starts closing); `submit` waits on it when full
+        self._space: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._closing
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self.queue = asyncio.Queue(maxsize=settings.TRACE_WRITER_QUEUE_SIZE)
+        self._space = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+        logger.info("trace_writer_started", queue_size=settings.TRACE_WRITER_QUEUE_SIZE)
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        Graceful drain: stops accepting queued work, flushes everything already queued, then exits.
+        Submissions from then on, including those waiting for queue space, are written inline.
+        """
+        if self._task is None:
+            return
+        self._closing = True
+        self._space.set()
+        try:
+            await asyncio.wait_for(self._stop_and_drain(), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            await asyncio.wait({self._task})
+        # Anything the writer did not get to (it timed out or died) must not be left pending.
+        self._fail_pending("Trace writer shut down before the trace was flushed.")
+        self._task = None
+        logger.info("trace_writer_stopped")
+
+    async def _stop_and_drain(self):
+        # Nothing is enqueued once closing, so the sentinel is the last item; wait for room if needed.
+        while True:
+            try:
+                self.queue.put_nowait(None)
+                break
+            except asyncio.QueueFull:
+                if self._task.done():
+                    return
+                self._space.clear()
+                await self._space.wait()
+        await asyncio.wait({self._task})
+
+    async def submit(self, trace_id: str, trace_data: Dict[str, Any], policy_version: Optional[str] = None) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_exception)
+
+        start = time.perf_counter()
+        if self.running and await self._enqueue((trace_id, trace_data, policy_version, future)):
+            trace_writer_enqueue_wait_seconds.observe(time.perf_counter() - start)
+            trace_writer_queue_depth.set(self.queue.qsize())
+            return future
+
+        try:
+            await trace_store.log_trace(trace_id, trace_data, policy_version)
+            future.set_result(None)
+        except Exception as e:
+            future.set_exception(TracePersistenceError(str(e)))
+        return future
+
+    async def _enqueue(self, item: QueueItem) -> bool:
+        """
+        Queues `item`, waiting while the queue is full. False if the writer started closing first.
+        """
+        while not self._closing:
+            try:
+                self.queue.put_nowait(item)
+                return True
+            except asyncio.QueueFull:
+                self._space.clear()
+                await self._space.wait()
+        return False
+
+    async def _run(self):
+        linger_s = settings.TRACE_WRITER_FLUSH_INTERVAL_MS / 1000.0
+        stopping = False
+        while not stopping:
+            item = await self.queue.get()
+            self._space.set()
+            if item is None:
+                break
+            batch: List[QueueItem] = [item]
+
+            # Group commit: take whatever queued up during the previous flush, lingering briefly for more.
+            deadline = time.monotonic() + linger_s
+            while len(batch) < settings.TRACE_WRITER_BATCH_SIZE:
+                try:
+                    item = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                self._space.set()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+            trace_writer_queue_depth.set(self.queue.qsize())
+
+    async def _flush(self, batch: List[QueueItem]):
+        start = time.perf_counter()
+        try:
+            try:
+                await trace_store.log_traces([item[:3] for item in batch])
+            except Exception as e:
+                trace_writer_flush_failures_total.inc()
+                logger.error("trace_writer_flush_failed", error=str(e), batch_size=len(batch))
+                await self._write_each(batch)
+            else:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+        except asyncio.CancelledError:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(TracePersistenceError("Trace writer cancelled mid-flush."))
+            raise
+        trace_writer_batch_size.observe(len(batch))
+        trace_writer_flush_seconds.observe(time.perf_counter() - start)
+
+    async def _write_each(self, batch: List[QueueItem]):
+        """
+        Retries a failed batch one trace at a time: a trace the database rejects fails only its own future,
+        rather than revoking the ACTs (and dropping the traces) of everything it was batched with.
+        """
+        for trace_id, trace_data, policy_version, future in batch:
+            if future.done():
+                continue
+            try:
+                await trace_store.log_trace(trace_id, trace_data, policy_version)
+            except Exception as e:
+                logger.error("trace_write_failed", trace_id=trace_id, error=str(e))
+                future.set_exception(TracePersistenceError(str(e)))
+            else:
+                future.set_result(None)
+
+    def _fail_pending(self, message: str):
+        if self.queue is None:
+            return
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is not None and not item[-1].done():
+                item[-1].set_exception(TracePersistenceError(message))
+
+trace_writer = TraceWriter()
@@ -0,0 +1,55 @@
+"""
+Multi-process serving: gunicorn -c config/gunicorn.conf.py app.main:app
+
+The app is imported once in the master before the workers are forked (preload_app), and `on_starting` loads
+what the app otherwise defers to first use (policies and prompt templates, the LLM client and its SDK, the
+embedding model), so this happens a single time and is shared copy-on-write.
+Workers share nothing else: each opens its own DB pool (a share of DB_MAX_CONNECTIONS, if set), LLM client
+connections and background tasks, and keeps its own in-process cache tiers and token buckets (shared state
+goes through Redis and Postgres). Prometheus samples from all workers are aggregated through
+PROMETHEUS_MULTIPROC_DIR.
+"""
+import glob
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+# Requests wait on the LLM (bounded by LLM_TIMEOUT_MAX_S and retries) and shutdown drains the trace writer
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = None
+
+# Must be set before prometheus_client is imported, i.e. before the app is preloaded. gunicorn may read this
+# file more than once, so the default directory is fixed per master process.
+_default_metrics_dir = os.path.join(tempfile.gettempdir(), f"decisiontrace-metrics-{os.getpid()}")
+_metrics_dir_owned = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", _default_metrics_dir) == _default_metrics_dir
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+def on_starting(server):
+    # Runs once, after the preload and before any fork: workers size their DB pools by the actual worker
+    # count (which `-w` may have overridden).
+    from app.core.config import settings
+    from app.main import preload
+    from app.trace_store.embeddings import get_embedder
+
+    os.environ["WEB_CONCURRENCY"] = str(server.cfg.workers)
+    settings.WEB_CONCURRENCY = server.cfg.workers
+    preload()
+    get_embedder()
+    # Samples left over from an earlier run would be aggregated into this one's
+    for stale in glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        os.remove(stale)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+def on_exit(server):
+    if _metrics_dir_owned:
+        shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
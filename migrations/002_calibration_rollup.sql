@@ -0,0 +1,47 @@
+-- Per-policy, per-day calibration aggregates, bucketed by the decision's date.
+-- Maintained incrementally by Evaluator.evaluate_decision; sums (not averages) so buckets add up over any window.
+CREATE TABLE IF NOT EXISTS calibration_rollup (
+    policy_id TEXT NOT NULL,
+    bucket_date DATE NOT NULL,
+    total_evaluated BIGINT NOT NULL DEFAULT 0,
+    correct_decision_count BIGINT NOT NULL DEFAULT 0,
+    false_act_count BIGINT NOT NULL DEFAULT 0,
+    conservative_abstain_count BIGINT NOT NULL DEFAULT 0,
+    confidence_sum_correct DOUBLE PRECISION NOT NULL DEFAULT 0,
+    confidence_sum_incorrect DOUBLE PRECISION NOT NULL DEFAULT 0,
+    overconfidence_penalty_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (policy_id, bucket_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_calibration_rollup_bucket_date ON calibration_rollup(bucket_date);
+CREATE INDEX IF NOT EXISTS idx_evaluation_outcome_created_at ON evaluation_outcome(created_at);
+
+-- Backfill from outcomes recorded before the rollup existed.
+INSERT INTO calibration_rollup (
+    policy_id, bucket_date, total_evaluated, correct_decision_count, false_act_count,
+    conservative_abstain_count, confidence_sum_correct, confidence_sum_incorrect, overconfidence_penalty_total
+)
+SELECT
+    policy_id,
+    bucket_date,
+    count(*),
+    count(*) FILTER (WHERE is_correct),
+    count(*) FILTER (WHERE NOT is_correct AND decision = 'ACT'),
+    count(*) FILTER (WHERE decision = 'ABSTAIN' AND ground_truth_safe),
+    COALESCE(sum(confidence) FILTER (WHERE is_correct), 0),
+    COALESCE(sum(confidence) FILTER (WHERE NOT is_correct), 0),
+    COALESCE(sum(confidence * confidence) FILTER (WHERE NOT is_correct), 0)
+FROM (
+    SELECT
+        COALESCE(t.trace_data->'request'->>'policy_id', 'default') AS policy_id,
+        (t.created_at AT TIME ZONE 'UTC')::date AS bucket_date,
+        t.trace_data->'decision'->>'decision' AS decision,
+        COALESCE((t.trace_data->'decision'->>'confidence')::double precision, 0) AS confidence,
+        COALESCE((e.outcome_data->>'is_correct')::boolean, false) AS is_correct,
+        COALESCE((e.outcome_data->>'ground_truth_safe')::boolean, false) AS ground_truth_safe
+    FROM evaluation_outcome e
+    JOIN decision_trace t ON t.id = e.trace_id
+) evaluated
+GROUP BY policy_id, bucket_date
+ON CONFLICT (policy_id, bucket_date) DO NOTHING;
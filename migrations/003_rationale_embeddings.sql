@@ -0,0 +1,25 @@
+-- Semantic search over decision rationales (requires the pgvector extension).
+-- The vector dimension must match the configured embedder (EMBEDDING_DIM, 256 for the hashing embedder).
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- Vectors live beside the trace log rather than in it: decision_trace rows are written once and never updated.
+-- One row per processed trace, keyed like the partitioned trace table (migration 005). `embedding` is
+-- NULL when the rationale had nothing to embed; the row still marks the trace as processed. policy_id and
+-- decision are copied from the trace so that filtered searches are answered from this table's index scan.
+CREATE TABLE IF NOT EXISTS decision_trace_embedding (
+    trace_id UUID NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    policy_id TEXT,
+    decision TEXT,
+    model TEXT NOT NULL,
+    embedding vector(256),
+    PRIMARY KEY (trace_id, created_at)
+);
+
+CREATE INDEX IF NOT EXISTS idx_decision_trace_embedding
+    ON decision_trace_embedding USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+-- The backfill worker resumes from the newest processed trace.
+CREATE INDEX IF NOT EXISTS idx_decision_trace_embedding_created_at
+    ON decision_trace_embedding (created_at);
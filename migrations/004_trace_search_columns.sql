@@ -0,0 +1,28 @@
+-- Audit search: typed columns generated from trace_data, plus trigram, full-text and keyset indexes.
+-- Note: adding STORED generated columns rewrites the table; on a large table run this in a maintenance window.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE decision_trace
+    ADD COLUMN IF NOT EXISTS decision TEXT
+        GENERATED ALWAYS AS (trace_data->'decision'->>'decision') STORED,
+    -- Guarded cast: a malformed confidence must never make a trace insert fail.
+    ADD COLUMN IF NOT EXISTS confidence DOUBLE PRECISION
+        GENERATED ALWAYS AS (
+            CASE WHEN jsonb_typeof(trace_data->'decision'->'confidence') = 'number'
+                 THEN (trace_data->'decision'->>'confidence')::double precision END
+        ) STORED,
+    ADD COLUMN IF NOT EXISTS policy_id TEXT
+        GENERATED ALWAYS AS (COALESCE(trace_data->'request'->>'policy_id', 'default')) STORED,
+    ADD COLUMN IF NOT EXISTS rationale TEXT
+        GENERATED ALWAYS AS (trace_data->'decision'->>'rationale') STORED,
+    ADD COLUMN IF NOT EXISTS rationale_tsv TSVECTOR
+        GENERATED ALWAYS AS (to_tsvector('english', COALESCE(trace_data->'decision'->>'rationale', ''))) STORED;
+
+-- Keyword search: full-text (word/stem matches) and trigram (substring ILIKE).
+CREATE INDEX IF NOT EXISTS idx_decision_trace_rationale_tsv ON decision_trace USING gin (rationale_tsv);
+CREATE INDEX IF NOT EXISTS idx_decision_trace_rationale_trgm ON decision_trace USING gin (rationale gin_trgm_ops);
+
+-- Keyset pagination, newest first, optionally narrowed by policy or decision.
+CREATE INDEX IF NOT EXISTS idx_decision_trace_keyset ON decision_trace (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_decision_trace_policy_keyset ON decision_trace (policy_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_decision_trace_decision_keyset ON decision_trace (decision, created_at DESC, id DESC);
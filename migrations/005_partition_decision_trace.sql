@@ -0,0 +1,94 @@
+-- Range-partition decision_trace by created_at so old traces can be archived and dropped a partition at a time.
+-- The existing table becomes the first partition (MINVALUE up to the start of next month); newer partitions are
+-- created ahead of time by ensure_decision_trace_partitions(), called here and by the maintenance worker
+-- (app/trace_store/partitions.py).
+-- There is deliberately no default partition. Rows would collect in it whenever the worker fell behind, and the
+-- partition for their range could then no longer be created, so they would never be archived. Retention also
+-- detaches with DETACH PARTITION ... CONCURRENTLY, which Postgres refuses while a default partition exists.
+-- A trace outside every partition fails to insert instead (an ACT is then revoked); with the maintenance worker
+-- disabled, call ensure_decision_trace_partitions() on a schedule.
+-- Note: attaching the old table builds an index on (id, created_at); on a large table run this in a maintenance window.
+BEGIN;
+
+-- A primary key on a partitioned table must include the partition key, so trace ids are no longer referenceable
+-- by a foreign key. Outcomes may also outlive their trace's partition (it is archived, not deleted).
+ALTER TABLE evaluation_outcome DROP CONSTRAINT IF EXISTS evaluation_outcome_trace_id_fkey;
+
+ALTER TABLE decision_trace RENAME TO decision_trace_legacy;
+DO $$
+DECLARE
+    idx RECORD;
+BEGIN
+    FOR idx IN
+        SELECT indexname FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = 'decision_trace_legacy'
+    LOOP
+        EXECUTE format('ALTER INDEX %I RENAME TO %I', idx.indexname, left(idx.indexname, 55) || '_legacy');
+    END LOOP;
+END $$;
+ALTER TABLE decision_trace_legacy ALTER COLUMN created_at SET NOT NULL;
+
+-- Same columns, defaults and generated columns (migration 004) as before.
+CREATE TABLE decision_trace (
+    LIKE decision_trace_legacy INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING STORAGE,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+DO $$
+DECLARE
+    upper_bound TIMESTAMPTZ;
+BEGIN
+    SELECT (date_trunc('month', greatest(max(created_at), now()), 'UTC') AT TIME ZONE 'UTC' + interval '1 month') AT TIME ZONE 'UTC'
+    INTO upper_bound
+    FROM decision_trace_legacy;
+    EXECUTE format(
+        'ALTER TABLE decision_trace ATTACH PARTITION decision_trace_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+        upper_bound
+    );
+END $$;
+
+-- Indexes on the parent cascade to every partition; the legacy partition's equivalent indexes are attached, not rebuilt.
+CREATE INDEX IF NOT EXISTS idx_decision_trace_created_at ON decision_trace (created_at);
+CREATE INDEX IF NOT EXISTS idx_decision_trace_rationale_tsv ON decision_trace USING gin (rationale_tsv);
+CREATE INDEX IF NOT EXISTS idx_decision_trace_rationale_trgm ON decision_trace USING gin (rationale gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_decision_trace_keyset ON decision_trace (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_decision_trace_policy_keyset ON decision_trace (policy_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_decision_trace_decision_keyset ON decision_trace (decision, created_at DESC, id DESC);
+
+-- Creates the partitions covering the current period and the next `p_ahead` periods ('day' or 'month', UTC).
+-- Periods already covered (e.g. by the legacy partition) are skipped. Returns the names of partitions created.
+CREATE OR REPLACE FUNCTION ensure_decision_trace_partitions(p_interval TEXT DEFAULT 'month', p_ahead INT DEFAULT 3)
+RETURNS SETOF TEXT
+LANGUAGE plpgsql AS $$
+DECLARE
+    step INTERVAL := ('1 ' || p_interval)::interval;
+    period_start TIMESTAMP := date_trunc(p_interval, now() AT TIME ZONE 'UTC');
+    partition_name TEXT;
+BEGIN
+    IF p_interval NOT IN ('day', 'month') THEN
+        RAISE EXCEPTION 'unsupported partition interval: %', p_interval;
+    END IF;
+    FOR i IN 0..p_ahead LOOP
+        partition_name := 'decision_trace_p' || to_char(period_start, CASE p_interval WHEN 'day' THEN 'YYYYMMDD' ELSE 'YYYYMM' END);
+        IF to_regclass(partition_name) IS NULL THEN
+            BEGIN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF decision_trace FOR VALUES FROM (%L) TO (%L)',
+                    partition_name,
+                    period_start AT TIME ZONE 'UTC',
+                    (period_start + step) AT TIME ZONE 'UTC'
+                );
+                RETURN NEXT partition_name;
+            EXCEPTION
+                -- Overlaps an existing partition (e.g. the legacy one covers part of this period).
+                WHEN invalid_object_definition THEN
+                    RAISE NOTICE 'skipping partition %: %', partition_name, SQLERRM;
+            END;
+        END IF;
+        period_start := period_start + step;
+    END LOOP;
+END $$;
+
+SELECT ensure_decision_trace_partitions('month', 3);
+
+COMMIT;
@@ -0,0 +1,9 @@
+-- Static content referenced by decision traces (policy bodies, static prompt prefixes), stored once and
+-- content-addressed by the sha256 of its canonical JSON. Traces carry the hashes in trace_data->'refs'.
+-- Rows are immutable and shared across partitions, so trace retention never drops them.
+CREATE TABLE IF NOT EXISTS trace_blob (
+    hash TEXT PRIMARY KEY,
+    kind TEXT NOT NULL, -- policy | prompt
+    content JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,18 @@
+-- Where each archived trace went: one row per trace of every partition moved to the cold archive, written by
+-- PartitionManager (app/trace_store/partitions.py) before the partition is dropped. Trace lookups that miss the
+-- hot table consult this index and open only the archive file covering the trace's created_at, so an unknown
+-- id costs one index probe instead of a scan of the whole archive.
+-- The trace's calibration facts (as in the generated columns of migration 004, bucketed by UTC day) are kept
+-- alongside, so outcomes recorded after their trace was archived are rolled up without reading the archive.
+CREATE TABLE IF NOT EXISTS decision_trace_archived (
+    trace_id UUID NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    partition_name TEXT NOT NULL,
+    policy_id TEXT NOT NULL,
+    bucket_date DATE NOT NULL,
+    decision TEXT,
+    confidence DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (trace_id, created_at)
+);
+
+CREATE INDEX IF NOT EXISTS idx_decision_trace_archived_partition ON decision_trace_archived (partition_name);
@@ -0,0 +1,193 @@
+"""
+Benchmark: end-to-end pipeline overhead, with the LLM replaced by the fake backend (app/llm_gateway/fake.py).
+
+Requests go through the ASGI app in-process (routing, validation, templating, gateway, JSON extraction,
+metrics, trace encoding), so the numbers are the pipeline's own cost plus whatever latency the fake adds
+(none by default). Scenarios, each at a fixed concurrency:
+
+  hard_constraints   /decide requests blocked by hard constraints: no LLM call, no trace
+  single_decide      /decide through the planner, primary and shadow; trace via the write-behind writer
+  batch_decide       /decide/batch of --batch-size items (throughput in items/s)
+  trace_log          trace_store.log_trace, one INSERT per trace (Postgres only)
+  trace_writer       trace_writer.submit until committed, group commit (Postgres only)
+
+Trace persistence runs against the Postgres configured by the POSTGRES_* settings. Without one, trace writes in
+the decide scenarios are replaced by a no-op and the persistence scenarios are skipped; the output says so.
+Results can be saved (--json) and compared against a saved baseline (--compare): throughput down or p95 up by
+more than --tolerance is reported as a regression and exits non-zero.
+
+Usage: PYTHONPATH=. python tests/benchmarks/bench_pipeline.py [--requests 2000] [--concurrency 32]
+           [--latency fixed:0] [--failures '{"529": 0.01}'] [--json results.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+import uuid
+
+import httpx
+import numpy as np
+import structlog
+
+from app.core.config import settings
+from app.llm_gateway.client import llm_gateway
+from app.llm_gateway.fake import FakeLLMClient, LatencyModel
+from app.main import app
+from app.trace_store.store import trace_store
+from app.trace_store.writer import trace_writer
+
+def payload(rng: random.Random, blocked: bool = False):
+    return {
+        "context": {"user_id": f"user_{rng.randrange(10**6)}", "is_verified": True, "region": "COUNTRY_X" if blocked else "US", "account_age_days": rng.randrange(2000)},
+        "signals": {"action_type": "fund_transfer", "amount": rng.randrange(1000, 5000), "velocity_1h": rng.randrange(5)},
+        "policy_id": "default",
+    }
+
+async def measure(name: str, requests: int, concurrency: int, op):
+    """
+    Runs `op(i)` for i in range(requests) on `concurrency` workers. `op` returns the number of units it processed
+    (requests, or items for a batch) or raises on failure.
+    """
+    latencies = []
+    errors = 0
+    units = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors, units
+        for i in pending:
+            start = time.perf_counter()
+            try:
+                processed = await op(i)
+                units += processed
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "scenario": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput": units / elapsed,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "errors": errors,
+    }
+
+async def database_available() -> bool:
+    try:
+        await asyncio.wait_for(trace_store.warm_up(), timeout=3)
+        return True
+    except Exception:
+        trace_store.pool = None
+        return False
+
+async def no_op(*args, **kwargs):
+    return None
+
+async def run(args):
+    rng = random.Random(args.seed)
+    settings.LLM_CACHE_ENABLED = False  # identical fake prompts would otherwise be served from the response cache
+    settings.RATE_LIMIT_ENABLED = False  # every request comes from one tenant; the governor would throttle it to the provider quota
+    llm_gateway.client = FakeLLMClient(latency=LatencyModel.parse(args.latency), failures=json.loads(args.failures), seed=args.seed)
+
+    has_db = await database_available()
+    if has_db:
+        await trace_writer.start()
+    else:
+        trace_store.log_trace = no_op
+        trace_store.log_traces = no_op
+
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60) as client:
+        async def decide(i, blocked=False):
+            response = await client.post("/api/v1/decide", json=payload(rng, blocked))
+            response.raise_for_status()
+            return 1
+
+        async def decide_batch(i):
+            items = [payload(rng) for _ in range(args.batch_size)]
+            response = await client.post("/api/v1/decide/batch", json={"items": items, "max_concurrency": 16})
+            response.raise_for_status()
+            return len(response.text.splitlines())
+
+        # Warm-up: policy snapshots, prompt templates, adaptive timeouts
+        await measure("warmup", 50, 8, decide)
+
+        results.append(await measure("hard_constraints", args.requests, args.concurrency, lambda i: decide(i, blocked=True)))
+        results.append(await measure("single_decide", args.requests, args.concurrency, decide))
+        results.append(await measure("batch_decide", max(1, args.requests // args.batch_size), max(1, args.concurrency // 8), decide_batch))
+
+    if has_db:
+        trace = {"request": payload(rng), "policy_version": "bench", "decision": {"decision": "ABSTAIN", "confidence": 0.5, "rationale": "benchmark trace"}}
+
+        async def log_one(i):
+            await trace_store.log_trace(str(uuid.uuid4()), trace, "bench")
+            return 1
+
+        async def write_behind(i):
+            await (await trace_writer.submit(str(uuid.uuid4()), trace, "bench"))
+            return 1
+
+        results.append(await measure("trace_log", args.requests, args.concurrency, log_one))
+        results.append(await measure("trace_writer", args.requests, args.concurrency, write_behind))
+        await trace_writer.stop()
+        await trace_store.disconnect()
+
+    return results, has_db, llm_gateway.client
+
+def compare(results, baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = {row["scenario"]: row for row in json.load(f)["results"]}
+    ok = True
+    print(f"\nvs {baseline_path} (tolerance {tolerance:.0%})")
+    for row in results:
+        before = baseline.get(row["scenario"])
+        if before is None:
+            continue
+        throughput = row["throughput"] / before["throughput"] - 1
+        p95 = row["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        regressed = throughput < -tolerance or p95 > tolerance
+        ok &= not regressed
+        print(f"{row['scenario']:<18} throughput {throughput:+.1%}  p95 {p95:+.1%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--latency", default="fixed:0", help="fake LLM latency per call (see LatencyModel)")
+    parser.add_argument("--failures", default="{}", help='fake LLM failure probabilities, e.g. {"529": 0.01}')
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="save results here")
+    parser.add_argument("--compare", help="baseline results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.ERROR))
+    results, has_db, fake = asyncio.run(run(args))
+
+    print(f"fake LLM latency {args.latency}, failures {args.failures}; {fake.requests} LLM calls, injected {dict(fake.injected)}")
+    if not has_db:
+        print("no database: trace writes stubbed, persistence scenarios skipped")
+    print(f"{'scenario':<18}{'requests':>9}{'conc':>6}{'throughput/s':>14}{'p50_ms':>9}{'p95_ms':>9}{'p99_ms':>9}{'errors':>8}")
+    for row in results:
+        print(f"{row['scenario']:<18}{row['requests']:>9}{row['concurrency']:>6}{row['throughput']:>14.1f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}{row['errors']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "database": has_db, "results": results}, f, indent=2)
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
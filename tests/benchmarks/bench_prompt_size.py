@@ -0,0 +1,98 @@
+"""
+Benchmark: prompt size per policy, legacy repr-interpolated templates vs the compact prompt assembler.
+
+Reports characters and the planner's chars/4 token estimate for each stage, split into the static
+(provider-cacheable) prefix and the per-request dynamic part.
+Usage: python tests/benchmarks/bench_prompt_size.py
+"""
+from jinja2 import Template
+
+from app.core.policies import policy_manager
+from app.core.prompts import prompt_assembler
+
+# The templates as they were before the prompt-assembly layer: the whole policy dict and the inputs
+# were interpolated as Python reprs.
+LEGACY_TEMPLATES = {
+    "evidence_planner": """You are the DecisionTrace Evidence Planner.
+Your goal is to determine what information is required to make a safe decision.
+
+Input:
+{{ input_data }}
+
+Constraints:
+{{ constraints }}
+
+Evaluate:
+1. What evidence is required?
+2. What evidence is missing?
+3. What is the risk of proceeding with missing evidence?
+4. What is the cheapest safe path to resolution?
+
+Output exactly in JSON format:
+{
+  "required_evidence": [],
+  "missing_evidence": [],
+  "risk_assessment": "...",
+  "recommended_path": "COLLECT | ESCALATE | PROCEED"
+}""",
+    "decision_engine": """You are the DecisionTrace Engine.
+Your goal is to output exactly one of ACT, ASK, or ABSTAIN.
+
+Input:
+{{ input_data }}
+
+Evidence Assessment:
+{{ evidence_assessment }}
+
+Constraints:
+{{ constraints }}
+
+Rules:
+- ACT: Proceed only if evidence is sufficient and risk is low.
+- ASK: Request more information if key evidence is missing but could resolve uncertainty.
+- ABSTAIN: Refuse to decide if risk is high, policy is violated, or uncertainty is unresolvable.
+
+Output exactly in JSON format:
+{
+  "decision": "ACT | ASK | ABSTAIN",
+  "confidence": 0.0,
+  "risk_factors": [],
+  "missing_information": [],
+  "failure_modes": [],
+  "rationale": "..."
+}""",
+}
+
+INPUT = {
+    "context": {"user_id": "user_123", "is_verified": True, "region": "US", "request_type": "high_risk_operation"},
+    "signals": {"action_type": "fund_transfer", "amount": 5000, "currency": "USD", "risk_flags": ["incomplete_data"]},
+}
+EVIDENCE = {
+    "required_evidence": ["identity_verification", "transaction_history"],
+    "missing_evidence": ["transaction_history"],
+    "risk_assessment": "Moderate risk: amount is within limits but history is unavailable.",
+    "recommended_path": "COLLECT",
+}
+
+def main():
+    print(f"{'policy':<12}{'stage':<18}{'legacy':>8}{'static':>8}{'dynamic':>9}{'total':>8}{'saved':>8}{'tok/req before->after':>24}")
+    for policy_id, snapshot in sorted(policy_manager.snapshots.items()):
+        for stage, legacy in LEGACY_TEMPLATES.items():
+            legacy_prompt = Template(legacy).render(
+                input_data=INPUT, evidence_assessment=EVIDENCE, constraints={"policy": snapshot.body}
+            )
+            dynamic = {"input_data": INPUT}
+            if stage == "decision_engine":
+                dynamic["evidence_assessment"] = EVIDENCE
+            static_prefix, prompt = prompt_assembler.render(
+                stage, snapshot.body, static_prefix=snapshot.prompt_prefixes[stage], **dynamic
+            )
+            total = len(static_prefix) + len(prompt)
+            saved = 1 - total / len(legacy_prompt)
+            print(
+                f"{policy_id:<12}{stage:<18}{len(legacy_prompt):>8}{len(static_prefix):>8}{len(prompt):>9}{total:>8}{saved:>8.0%}"
+                f"{len(legacy_prompt) // 4:>14} -> {total // 4}"
+            )
+
+if __name__ == "__main__":
+    main()
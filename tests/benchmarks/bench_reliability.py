@@ -0,0 +1,34 @@
+"""
+Benchmark: vectorized reliability report (Brier, ECE/MCE, bins, per-policy/model/decision breakdowns).
+
+Usage: python tests/benchmarks/bench_reliability.py [rows]
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.evaluation.reliability import reliability_report
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(0)
+    confidence = rng.beta(5, 2, size=rows)
+    columns = {
+        "confidence": confidence,
+        "is_correct": rng.random(rows) < confidence * 0.9,
+        "policy_id": rng.choice(np.array(["default", "strict", "payments", "onboarding"], dtype=object), size=rows),
+        "model": rng.choice(np.array(["claude-3-5-sonnet-20240620", "claude-3-5-haiku-20241022"], dtype=object), size=rows),
+        "decision": rng.choice(np.array(["ACT", "ASK", "ABSTAIN"], dtype=object), size=rows),
+    }
+
+    start = time.perf_counter()
+    report = reliability_report(columns, n_bins=10)
+    elapsed = time.perf_counter() - start
+
+    print(f"rows: {rows:,}")
+    print(f"report: {elapsed * 1000:.0f} ms ({rows / elapsed / 1e6:.1f}M rows/s)")
+    print(f"overall: brier={report.overall.brier_score:.4f} ece={report.overall.ece:.4f} mce={report.overall.mce:.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark: sequential vs concurrent primary/shadow execution in DecisionEngine.decide.
+
+Runs against a stubbed gateway with log-normal call latencies, so no API key is needed.
+Usage: python tests/benchmarks/bench_shadow_concurrency.py [iterations]
+"""
+import asyncio
+import json
+import logging
+import random
+import statistics
+import sys
+import time
+
+import structlog
+
+from app.decision_engine import engine as engine_module
+from app.decision_engine.engine import DecisionEngine, SHADOW_SYSTEM_PROMPT
+
+# Median per-call latency (seconds) for each role; sigma controls the tail.
+LATENCY_MEDIAN_S = {"primary": 0.060, "shadow": 0.030}
+LATENCY_SIGMA = 0.5
+
+class StubGateway:
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+
+    async def get_structured_decision(self, prompt, system_prompt, model="", max_tokens=1000, policy=None, static_prefix=None, hedge=False, stage=None, policy_id=None):
+        role = "shadow" if system_prompt == SHADOW_SYSTEM_PROMPT else "primary"
+        delay = self.rng.lognormvariate(0, LATENCY_SIGMA) * LATENCY_MEDIAN_S[role]
+        await asyncio.sleep(delay)
+        body = {"decision": "ACT", "confidence": 0.9, "risk_factors": [], "missing_information": [], "failure_modes": [], "rationale": "ok"}
+        return {"raw_response": json.dumps(body), "input_tokens": 500, "output_tokens": 80, "latency_ms": int(delay * 1000)}
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def run(execution: str, iterations: int):
+    engine_module.llm_gateway = StubGateway(seed=42)
+    engine = DecisionEngine()
+    constraints = {"policy": {"name": "bench", "asymmetric_shadow": {"enabled": True, "execution": execution}}}
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await engine.decide({"context": {}, "signals": {}}, {}, constraints)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def main():
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    results = {mode: asyncio.run(run(mode, iterations)) for mode in ("sequential", "concurrent")}
+
+    print(f"{'mode':<12}{'p50_ms':>10}{'p99_ms':>10}{'mean_ms':>10}")
+    for mode, samples in results.items():
+        print(f"{mode:<12}{percentile(samples, 0.50):>10.1f}{percentile(samples, 0.99):>10.1f}{statistics.mean(samples):>10.1f}")
+
+    seq, conc = results["sequential"], results["concurrent"]
+    print(f"p50 improvement: {1 - percentile(conc, 0.5) / percentile(seq, 0.5):.0%}")
+    print(f"p99 improvement: {1 - percentile(conc, 0.99) / percentile(seq, 0.99):.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark: cold start. Two measurements, each in fresh interpreters and repeated --runs times (median kept):
+
+  import breakdown   wall time to import each entry module (hard constraints, policy registry, gateway, the
+                     app), and `python -X importtime` cumulative time of the slowest third-party packages it
+                     pulls in
+  first /health      from spawning `uvicorn app.main:app` to the first 200 on /health: imports, lifespan
+                     (policy load, LLM client creation, DB pool warm-up) and the first request
+
+Without a Postgres the DB warm-up fails as it would at a real startup with the database down (logged, not
+fatal), after its connect timeout; the output says so, and numbers from such runs are comparable with each
+other but not with runs against a database. Results can be saved (--json) and compared against a saved
+baseline (--compare): any time up by more than --tolerance is reported as a regression and exits non-zero.
+
+Usage: PYTHONPATH=. python tests/benchmarks/bench_startup.py [--runs 5] [--port 8791] [--json results.json]
+           [--compare baseline.json] [--tolerance 0.2]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENTRY_MODULES = [
+    "app.core.hard_constraints",
+    "app.core.policies",
+    "app.llm_gateway.client",
+    "app.main",
+]
+
+# Packages reported in the breakdown, when imported
+PACKAGES = [
+    "anthropic", "asyncpg", "fastapi", "httpx", "jinja2", "numpy", "prometheus_client",
+    "prometheus_fastapi_instrumentator", "pydantic", "pydantic_settings", "redis", "structlog", "yaml",
+]
+
+def environment():
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    # Background tasks would only add noise to the first request
+    env.update({"EMBEDDING_BACKFILL_INTERVAL_S": "0", "TRACE_MAINTENANCE_INTERVAL_S": "0", "POLICY_WATCH_INTERVAL_S": "0"})
+    return env
+
+def import_ms(module: str) -> float:
+    code = f"import time; start = time.perf_counter(); import {module}; print((time.perf_counter() - start) * 1000)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=environment(), capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+def package_breakdown(module: str) -> dict:
+    """
+    Cumulative import time (ms) of each top-level package in PACKAGES imported by `module`.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, env=environment(), capture_output=True, text=True, check=True)
+    breakdown = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if name in PACKAGES and name not in breakdown:
+            breakdown[name] = int(cumulative) / 1000
+    return breakdown
+
+def first_health_ms(port: int, timeout_s: float = 60.0) -> float:
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=environment(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = start + timeout_s
+        while time.perf_counter() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with {server.returncode}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    return (time.perf_counter() - start) * 1000
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError("server did not become ready")
+    finally:
+        server.terminate()
+        server.wait(30)
+
+def database_available() -> bool:
+    code = "import asyncio; from app.trace_store.store import trace_store; asyncio.run(asyncio.wait_for(trace_store.warm_up(), timeout=3))"
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=environment(), capture_output=True).returncode == 0
+
+def compare(results, baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    ok = True
+    print(f"\nvs {baseline_path} (tolerance {tolerance:.0%})")
+    for name, ms in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        change = ms / before - 1
+        regressed = change > tolerance
+        ok &= not regressed
+        print(f"{name:<28} {change:+.1%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8791)
+    parser.add_argument("--json", help="save results here")
+    parser.add_argument("--compare", help="baseline results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.20)
+    args = parser.parse_args()
+
+    results = {}
+    for module in ENTRY_MODULES:
+        results[f"import {module}"] = statistics.median(import_ms(module) for _ in range(args.runs))
+    has_db = database_available()
+    results["first /health"] = statistics.median(first_health_ms(args.port) for _ in range(args.runs))
+    breakdown = package_breakdown("app.main")
+
+    print(f"median of {args.runs} runs")
+    if not has_db:
+        print("no database: first /health includes the failed DB warm-up")
+    print(f"{'':<36}{'ms':>9}")
+    for name, ms in results.items():
+        print(f"{name:<36}{ms:>9.1f}")
+    print("\npackages imported by app.main (cumulative ms)")
+    for name, ms in sorted(breakdown.items(), key=lambda item: -item[1]):
+        print(f"  {name:<34}{ms:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "database": has_db, "results": results, "packages": breakdown}, f, indent=2)
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
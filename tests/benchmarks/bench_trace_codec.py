@@ -0,0 +1,95 @@
+"""
+Benchmark: stored trace size and encode time, json.dumps (before) vs the compact trace codec (after).
+
+Traces are built like the /decide endpoint builds them, against the loaded policies. "Self-contained"
+is the plain format with the policy body and static prompts inlined, i.e. what an auditable trace costs
+without content addressing. Sizes are of the JSON text handed to Postgres (JSONB adds a small, similar
+overhead to each; TOAST may further compress large rows on both sides).
+Usage: python tests/benchmarks/bench_trace_codec.py [traces]
+"""
+import json
+import random
+import sys
+import time
+
+from app.core.policies import policy_manager
+from app.trace_store.codec import TraceCodec, trace_codec
+
+WORDS = (
+    "velocity anomaly device fingerprint mismatch account age region transfer limit verified identity "
+    "chargeback history merchant category beneficiary new first-time pattern deviation session ip risk "
+    "elevated moderate insufficient evidence requires manual review threshold exceeded recent"
+).split()
+
+def _prose(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def make_trace(rng: random.Random, snapshot):
+    return {
+        "request": {
+            "context": {"user_id": f"user_{rng.randrange(10**6)}", "is_verified": rng.random() < 0.8, "region": "US", "account_age_days": rng.randrange(2000)},
+            "signals": {"action_type": "fund_transfer", "amount": rng.randrange(1, 20000), "velocity_1h": rng.randrange(10)},
+            "policy_id": snapshot.policy_id,
+        },
+        "policy_version": snapshot.version,
+        "refs": snapshot.trace_refs,
+        "evidence_planning": {
+            "required_evidence": ["identity_verification", "transaction_history"],
+            "missing_evidence": ["device_fingerprint"],
+            "risk_assessment": _prose(rng, 220),
+            "recommended_path": "PROCEED",
+            "vo_info_assessment": {"estimated_cost": 0.002},
+        },
+        "decision": {
+            "decision": "ACT",
+            "confidence": round(rng.random(), 3),
+            "rationale": _prose(rng, 60),
+            "risk_factors": ["new_device"],
+            "missing_information": [],
+            "failure_modes": [],
+            "model": "claude-3-5-sonnet-20240620",
+            "cost_estimate": {"tokens": 1830, "latency_ms": 912, "call_latency_ms": {"primary": 640, "shadow": 590}},
+            "skipped_stages": [],
+        },
+    }
+
+def measure(encode, traces):
+    start = time.perf_counter()
+    encoded = [encode(trace) for trace in traces]
+    elapsed = time.perf_counter() - start
+    size = sum(len(text.encode("utf-8")) for text in encoded) / len(traces)
+    return size, elapsed / len(traces) * 1e6
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rng = random.Random(0)
+    snapshots = list(policy_manager.snapshots.values())
+    traces = [make_trace(rng, snapshots[i % len(snapshots)]) for i in range(n)]
+
+    def plain(trace):
+        # The format before the codec: no refs.
+        return json.dumps({key: value for key, value in trace.items() if key != "refs"})
+
+    def self_contained(trace):
+        snapshot = policy_manager.get_snapshot(trace["request"]["policy_id"])
+        return plain({**trace, "policy": snapshot.body, "prompts": snapshot.prompt_prefixes})
+
+    rows = [
+        ("before: json.dumps", measure(plain, traces)),
+        ("before: json.dumps, self-contained", measure(self_contained, traces)),
+        ("after: trace codec, no compression", measure(TraceCodec(compress_min_chars=sys.maxsize).encode, traces)),
+        ("after: trace codec", measure(trace_codec.encode, traces)),
+    ]
+    print(f"traces: {n:,} over {len(snapshots)} policies")
+    print(f"{'format':<38} {'bytes/trace':>12} {'encode us/trace':>16}")
+    for name, (size, micros) in rows:
+        print(f"{name:<38} {size:>12.0f} {micros:>16.1f}")
+
+    stored = trace_codec.encode(traces[0])
+    start = time.perf_counter()
+    for _ in range(n):
+        trace_codec.decode(stored)
+    print(f"decode: {(time.perf_counter() - start) / n * 1e6:.1f} us/trace")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Benchmark: /decide throughput as the number of gunicorn workers grows (config/gunicorn.conf.py), with the LLM
+replaced by the fake backend (app/llm_gateway/fake.py).
+
+For each worker count the app is served by gunicorn on a local port with the production config (preloaded
+app, uvicorn workers, Prometheus multiprocess metrics) and driven over real HTTP by --clients load-generator
+processes for --duration seconds. With the default zero fake latency a decision is pure pipeline CPU, so
+throughput should scale with workers until the machine's cores (shared with the load generators) run out;
+with a realistic --latency, one worker is bound by its LLM concurrency limits instead, and extra workers add
+concurrency rather than CPU. Both shapes are worth recording for a deployment's core count.
+
+Trace persistence runs against the Postgres configured by the POSTGRES_* settings; without one, trace writes
+are replaced by a no-op in each worker and the output says so. Rate limiting and the response cache are off.
+
+Usage: PYTHONPATH=. python tests/benchmarks/bench_workers.py [--workers 1,2,4] [--duration 10] [--clients 2]
+           [--concurrency 32] [--latency fixed:0] [--json results.json]
+Requires the serve extra (pip install .[serve]).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import runpy
+import sys
+import time
+
+import httpx
+import numpy as np
+import structlog
+
+CONFIG = os.path.join(os.path.dirname(__file__), "..", "..", "config", "gunicorn.conf.py")
+
+def payload(rng: random.Random):
+    return {
+        "context": {"user_id": f"user_{rng.randrange(10**6)}", "is_verified": True, "region": "US", "account_age_days": rng.randrange(2000)},
+        "signals": {"action_type": "fund_transfer", "amount": rng.randrange(1000, 5000), "velocity_1h": rng.randrange(5)},
+        "policy_id": "default",
+    }
+
+def no_op_traces(worker):
+    from app.trace_store.store import trace_store
+
+    async def no_op(*args, **kwargs):
+        return None
+
+    trace_store.log_trace = no_op
+    trace_store.log_traces = no_op
+
+def serve(workers: int, bind: str, stub_traces: bool):
+    from gunicorn.app.base import BaseApplication
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.ERROR))
+
+    class BenchServer(BaseApplication):
+        def load_config(self):
+            for key, value in runpy.run_path(CONFIG).items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+            self.cfg.set("workers", workers)
+            self.cfg.set("bind", [bind])
+            self.cfg.set("loglevel", "warning")
+            if stub_traces:
+                self.cfg.set("post_worker_init", no_op_traces)
+
+        def load(self):
+            from app.main import app
+            return app
+
+    BenchServer().run()
+
+def database_available() -> bool:
+    from app.trace_store.store import trace_store
+
+    async def probe():
+        try:
+            await asyncio.wait_for(trace_store.warm_up(), timeout=3)
+            await trace_store.disconnect()
+            return True
+        except Exception:
+            return False
+
+    return asyncio.run(probe())
+
+def wait_ready(url: str, timeout_s: float = 60.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not become ready")
+
+def load(url: str, duration: float, concurrency: int, seed: int):
+    """
+    One load-generator process: `concurrency` connections posting /decide until `duration` elapses.
+    Returns (completed, errors, latencies_ms).
+    """
+    async def run():
+        rng = random.Random(seed)
+        latencies, errors = [], 0
+        deadline = time.perf_counter() + duration
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+            async def worker():
+                nonlocal errors
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.post("/api/v1/decide", json=payload(rng))
+                        response.raise_for_status()
+                        latencies.append((time.perf_counter() - start) * 1000)
+                    except Exception:
+                        errors += 1
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return len(latencies), errors, latencies
+
+    return asyncio.run(run())
+
+def measure(workers: int, args, stub_traces: bool, port: int):
+    bind = f"127.0.0.1:{port}"
+    url = f"http://{bind}"
+    server = multiprocessing.get_context("spawn").Process(target=serve, args=(workers, bind, stub_traces), daemon=True)
+    server.start()
+    try:
+        wait_ready(url)
+        load(url, 2.0, args.concurrency, seed=-1)  # warm-up: connections, adaptive timeouts
+        with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+            start = time.perf_counter()
+            runs = pool.starmap(load, [(url, args.duration, args.concurrency, args.seed + i) for i in range(args.clients)])
+            elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.join(30)
+
+    latencies = [latency for _, _, run in runs for latency in run]
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0.0, 0.0, 0.0)
+    return {
+        "workers": workers,
+        "throughput": sum(completed for completed, _, _ in runs) / elapsed,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "errors": sum(errors for _, errors, _ in runs),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per worker count")
+    parser.add_argument("--clients", type=int, default=2, help="load-generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per load-generator process")
+    parser.add_argument("--latency", default="fixed:0", help="fake LLM latency per call (see LatencyModel)")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="save results here")
+    args = parser.parse_args()
+
+    # Read by the server processes' settings
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "LLM_FAKE_LATENCY": args.latency,
+        "LLM_CACHE_ENABLED": "false",
+        "RATE_LIMIT_ENABLED": "false",
+        "EMBEDDING_BACKFILL_INTERVAL_S": "0",
+    })
+    has_db = database_available()
+    if not has_db:
+        os.environ.update({"TRACE_WRITER_ENABLED": "false", "TRACE_MAINTENANCE_INTERVAL_S": "0"})
+
+    results = [measure(int(workers), args, not has_db, args.port + i) for i, workers in enumerate(args.workers.split(","))]
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} load generators x {args.concurrency} connections, fake LLM latency {args.latency}")
+    if not has_db:
+        print("no database: trace writes stubbed")
+    base = results[0]["throughput"] / results[0]["workers"] if results and results[0]["throughput"] else 0.0
+    print(f"{'workers':>8}{'throughput/s':>14}{'per worker':>12}{'efficiency':>12}{'p50_ms':>9}{'p95_ms':>9}{'p99_ms':>9}{'errors':>8}")
+    for row in results:
+        per_worker = row["throughput"] / row["workers"]
+        efficiency = per_worker / base if base else 0.0
+        print(f"{row['workers']:>8}{row['throughput']:>14.1f}{per_worker:>12.1f}{efficiency:>12.0%}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}{row['errors']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "cpus": os.cpu_count(), "database": has_db, "results": results}, f, indent=2)
+    if any(row["errors"] for row in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
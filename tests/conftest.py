@@ -1,8 +1,10 @@
+from typing import Optional
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient
 from app.main import app
 from app.trace_store.store import trace_store
+from fake_postgres import FakeConnection, FakePool
 
 @pytest_asyncio.fixture
 async def client():
@@ -15,5 +17,35 @@ async def mock_db(mocker):
     mocker.patch("app.trace_store.store.trace_store.connect", return_value=None)
     mocker.patch("app.trace_store.store.trace_store.disconnect", return_value=None)
     mocker.patch("app.trace_store.store.trace_store.log_trace", return_value=None)
+    mocker.patch("app.trace_store.store.trace_store.log_traces", return_value=None)
+    # Token buckets and idempotency keys in process memory rather than Redis
+    mocker.patch("app.core.rate_limit.rate_governor.use_redis", False)
+    mocker.patch("app.core.coalescing.idempotency_store.store.use_redis", False)
     yield
 
+@pytest.fixture
+def admin_headers(mocker):
+    mocker.patch("app.core.config.settings.ADMIN_TOKEN", "test-admin-token")
+    return {"X-Admin-Token": "test-admin-token"}
+
+@pytest.fixture
+def fake_db(mocker):
+    """
+    Installs a fake connection as trace_store's pool: `fake_db(rows=..., row=..., value=...)` builds one,
+    `fake_db(conn)` installs a prepared (e.g. subclassed) one. Returns the connection.
+    """
+    def install(conn: Optional[FakeConnection] = None, **results):
+        conn = conn or FakeConnection(**results)
+        mocker.patch.object(trace_store, "pool", FakePool(conn))
+        return conn
+    return install
+
+@pytest.fixture
+def fake_anthropic():
+    # Imported lazily: only gateway tests need a real HTTP server
+    from fake_anthropic import FakeAnthropicServer
+
+    server = FakeAnthropicServer()
+    server.start()
+    yield server
+    server.stop()
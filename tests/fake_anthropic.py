@@ -0,0 +1,126 @@
+"""
+A local stand-in for the Anthropic Messages API, for exercising the LLM gateway over real HTTP.
+
+Responses are scripted per request, in arrival order:
+
+    server.enqueue(status=529)                 # first request: overloaded
+    server.enqueue(delay_s=1.0)                # second request: slow success
+    server.default = FakeResponse(text="...")  # everything after
+
+Streaming requests (`stream: true`) receive the text as server-sent events, `chunk_size` characters
+per delta with `chunk_delay_s` between deltas; `chunks_sent` shows how far generation got.
+"""
+import asyncio
+import json
+import socket
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_TEXT = json.dumps({"decision": "ACT", "confidence": 0.9, "rationale": "fake", "risk_factors": []})
+
+@dataclass
+class FakeResponse:
+    status: int = 200
+    delay_s: float = 0.0
+    text: str = DEFAULT_TEXT
+    chunk_size: int = 8
+    chunk_delay_s: float = 0.0
+
+class FakeAnthropicServer:
+    def __init__(self):
+        self.script: Deque[FakeResponse] = deque()
+        self.default = FakeResponse()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chunks_sent = 0
+        self.port = self._free_port()
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self.app = FastAPI()
+        self.app.post("/v1/messages")(self._messages)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def enqueue(self, status: int = 200, delay_s: float = 0.0, text: str = DEFAULT_TEXT, chunk_size: int = 8, chunk_delay_s: float = 0.0):
+        self.script.append(FakeResponse(status, delay_s, text, chunk_size, chunk_delay_s))
+
+    async def _messages(self, request: Request):
+        body = await request.json()
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        response = self.script.popleft() if self.script else self.default
+        try:
+            await asyncio.sleep(response.delay_s)
+        finally:
+            self.in_flight -= 1
+
+        if response.status != 200:
+            return JSONResponse(
+                {"type": "error", "error": {"type": "api_error", "message": f"fake status {response.status}"}},
+                status_code=response.status
+            )
+        if body.get("stream"):
+            return self._stream(body.get("model", "fake"), response)
+        return {
+            "id": f"msg_fake_{self.requests}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "fake"),
+            "content": [{"type": "text", "text": response.text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 10, "output_tokens": 5},
+        }
+
+    def _stream(self, model: str, response: FakeResponse) -> StreamingResponse:
+        def event(name: str, data: dict) -> str:
+            return f"event: {name}\ndata: {json.dumps({'type': name, **data})}\n\n"
+
+        async def events():
+            yield event("message_start", {"message": {
+                "id": f"msg_fake_{self.requests}", "type": "message", "role": "assistant", "model": model,
+                "content": [], "stop_reason": None, "stop_sequence": None,
+                "usage": {"input_tokens": 10, "output_tokens": 1},
+            }})
+            yield event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+            for i in range(0, len(response.text), response.chunk_size):
+                await asyncio.sleep(response.chunk_delay_s)
+                self.chunks_sent += 1
+                yield event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": response.text[i:i + response.chunk_size]}})
+            yield event("content_block_stop", {"index": 0})
+            yield event("message_delta", {"delta": {"stop_reason": "end_turn", "stop_sequence": None}, "usage": {"output_tokens": len(response.text) // 4}})
+            yield event("message_stop", {})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            return s.getsockname()[1]
+
+    def start(self):
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.time() + 5
+        while not self._server.started:
+            if time.time() > deadline:
+                raise RuntimeError("fake Anthropic server did not start")
+            time.sleep(0.01)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
@@ -0,0 +1,128 @@
+"""
+An in-process stand-in for an asyncpg connection and pool, for unit tests of code that talks to Postgres
+through trace_store. Nothing is parsed or executed; every call is recorded and answered from fixed results:
+
+    conn = fake_db(rows=[...], value=3)   # fetch/cursor return `rows`, fetchval returns `value`
+    ...
+    query, params = conn.queries("fetch")[0]
+
+Subclass FakeConnection and override a method where a test needs results that depend on the query.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class FakeCursor:
+    def __init__(self, rows: Sequence[Any]):
+        self.rows = list(rows)
+
+    async def fetch(self, n: int) -> List[Any]:
+        batch, self.rows = self.rows[:n], self.rows[n:]
+        return batch
+
+class FakePrepared:
+    """
+    A prepared statement: runs as its query on the owning connection, and records its arguments.
+    """
+
+    def __init__(self, conn: "FakeConnection", query: str):
+        self.conn = conn
+        self.query = query
+        self.calls: List[Tuple] = []
+
+    async def fetch(self, *args):
+        self.calls.append(args)
+        return await self.conn.fetch(self.query, *args)
+
+    async def fetchrow(self, *args):
+        self.calls.append(args)
+        return await self.conn.fetchrow(self.query, *args)
+
+    async def fetchval(self, *args):
+        self.calls.append(args)
+        return await self.conn.fetchval(self.query, *args)
+
+    async def executemany(self, args):
+        self.calls.append(tuple(args))
+        return await self.conn.executemany(self.query, args)
+
+class FakeConnection:
+    def __init__(self, rows: Sequence[Any] = (), row: Any = None, value: Any = None):
+        self.rows = list(rows)  # fetch and cursor results
+        self.row = row  # fetchrow result
+        self.value = value  # fetchval result
+        self.calls: List[Tuple[str, str, Tuple]] = []  # (method, query, params)
+        self.copied: Dict[str, List[List[Tuple]]] = {}  # table: batches of COPYed records
+        self.codecs: List[str] = []
+        self.statements: Dict[str, FakePrepared] = {}
+
+    def queries(self, method: str) -> List[Tuple[str, Tuple]]:
+        """
+        The (query, params) of every call made with `method`, in order.
+        """
+        return [(query, params) for called, query, params in self.calls if called == method]
+
+    @property
+    def executed(self) -> List[str]:
+        return [query for query, _ in self.queries("execute")]
+
+    def transaction(self) -> FakeTransaction:
+        return FakeTransaction()
+
+    async def execute(self, query: str, *params):
+        self.calls.append(("execute", query, params))
+
+    async def executemany(self, query: str, args):
+        self.calls.append(("executemany", query, tuple(args)))
+
+    async def fetch(self, query: str, *params):
+        self.calls.append(("fetch", query, params))
+        return self.rows
+
+    async def fetchrow(self, query: str, *params):
+        self.calls.append(("fetchrow", query, params))
+        return self.row
+
+    async def fetchval(self, query: str, *params):
+        self.calls.append(("fetchval", query, params))
+        return self.value
+
+    async def cursor(self, query: str, *params) -> FakeCursor:
+        self.calls.append(("cursor", query, params))
+        return FakeCursor(self.rows)
+
+    async def copy_records_to_table(self, table: str, records, columns: Optional[Sequence[str]] = None):
+        self.copied.setdefault(table, []).append(list(records))
+
+    async def set_type_codec(self, typename: str, **kwargs):
+        self.codecs.append(typename)
+
+    async def prepare(self, query: str) -> FakePrepared:
+        return FakePrepared(self, query)
+
+class FakePool:
+    """
+    A pool of one connection, handed out to every acquire().
+    """
+
+    def __init__(self, conn: FakeConnection):
+        self.conn = conn
+
+    def get_size(self) -> int:
+        return 1
+
+    def acquire(self):
+        pool = self
+
+        class _Acquire:
+            async def __aenter__(self):
+                return pool.conn
+
+            async def __aexit__(self, *exc):
+                return False
+        return _Acquire()
@@ -0,0 +1,21 @@
+import pytest
+from httpx import AsyncClient
+
+@pytest.mark.asyncio
+async def test_admin_endpoints_are_closed_without_a_configured_token(client: AsyncClient, mocker):
+    mocker.patch("app.core.config.settings.ADMIN_TOKEN", None)
+
+    response = await client.get("/api/v1/admin/policies", headers={"X-Admin-Token": ""})
+
+    assert response.status_code == 403
+    assert "ADMIN_TOKEN" in response.json()["detail"]
+
+@pytest.mark.asyncio
+async def test_admin_endpoints_require_the_configured_token(client: AsyncClient, admin_headers):
+    assert (await client.get("/api/v1/admin/policies")).status_code == 403
+    assert (await client.get("/api/v1/admin/policies", headers={"X-Admin-Token": "wrong"})).status_code == 403
+
+    response = await client.get("/api/v1/admin/policies", headers=admin_headers)
+
+    assert response.status_code == 200
+    assert "default" in response.json()["policies"]
@@ -0,0 +1,115 @@
+import json
+import pytest
+from httpx import AsyncClient
+
+def _item(user_id: str, amount: int, region: str = "US"):
+    return {
+        "context": {"user_id": user_id, "is_verified": True, "region": region},
+        "signals": {"action_type": "fund_transfer", "amount": amount},
+        "policy_id": "default"
+    }
+
+def _decision(decision: str):
+    return {
+        "decision": decision,
+        "confidence": 0.9,
+        "risk_factors": [],
+        "missing_information": [],
+        "failure_modes": [],
+        "cost_estimate": {"tokens": 10, "latency_ms": 5},
+        "rationale": f"{decision} rationale"
+    }
+
+@pytest.fixture
+def llm_stages(mocker):
+    mocker.patch("app.api.v1.decisions.evidence_planner.plan", return_value={"recommended_path": "PROCEED"})
+
+    async def decide(input_data, evidence_assessment, constraints, snapshot=None):
+        return _decision("ACT" if input_data["context"]["user_id"] == "actor" else "ASK")
+
+    return mocker.patch("app.api.v1.decisions.decision_engine.decide", side_effect=decide)
+
+async def _post_batch(client: AsyncClient, items):
+    response = await client.post("/api/v1/decide/batch", json={"items": items, "max_concurrency": 2})
+    assert response.status_code == 200
+    return {row["index"]: row for row in map(json.loads, response.text.splitlines())}
+
+@pytest.mark.asyncio
+async def test_batch_streams_every_item_and_bulk_logs_traces(client: AsyncClient, llm_stages, mocker):
+    """
+    Test that hard constraints run up front, survivors reach the LLM stages, and traces are written in one bulk call.
+    """
+    log_traces = mocker.patch("app.api.v1.decisions.trace_store.log_traces")
+    rows = await _post_batch(client, [_item("blocked", 100, "COUNTRY_X"), _item("actor", 100), _item("asker", 100)])
+
+    assert rows[0]["decision"] == "ABSTAIN"
+    assert "hard_constraint_violation" in rows[0]["risk_factors"]
+    assert rows[1]["decision"] == "ACT"
+    assert rows[2]["decision"] == "ASK"
+    assert llm_stages.call_count == 2
+
+    log_traces.assert_called_once()
+    logged_ids = {trace_id for trace_id, _, _ in log_traces.call_args.args[0]}
+    assert logged_ids == {rows[1]["trace_id"], rows[2]["trace_id"]}
+
+@pytest.mark.asyncio
+async def test_batch_revokes_act_when_bulk_trace_write_fails(client: AsyncClient, llm_stages, mocker):
+    """
+    Test the no-untraced-ACT guarantee: a failed bulk write downgrades every held ACT to ABSTAIN.
+    """
+    mocker.patch("app.api.v1.decisions.trace_store.log_traces", side_effect=RuntimeError("db down"))
+    rows = await _post_batch(client, [_item("actor", 100), _item("asker", 100)])
+
+    assert rows[0]["decision"] == "ABSTAIN"
+    assert "trace_persistence_failure" in rows[0]["risk_factors"]
+    assert rows[1]["decision"] == "ASK"
+
+@pytest.mark.asyncio
+async def test_failed_item_abstains_without_aborting_the_batch(client: AsyncClient, mocker):
+    """
+    Test that an item whose LLM stages raise is answered and traced as ABSTAIN, and the others still complete.
+    """
+    mocker.patch("app.api.v1.decisions.evidence_planner.plan", return_value={"recommended_path": "PROCEED"})
+
+    async def decide(input_data, evidence_assessment, constraints, snapshot=None):
+        if input_data["context"]["user_id"] == "broken":
+            raise RuntimeError("provider exploded")
+        return _decision("ACT" if input_data["context"]["user_id"] == "actor" else "ASK")
+
+    mocker.patch("app.api.v1.decisions.decision_engine.decide", side_effect=decide)
+    log_traces = mocker.patch("app.api.v1.decisions.trace_store.log_traces")
+    rows = await _post_batch(client, [_item("broken", 100), _item("actor", 100), _item("asker", 100)])
+
+    assert rows[0]["decision"] == "ABSTAIN"
+    assert "llm_stage_failure" in rows[0]["risk_factors"]
+    assert [rows[1]["decision"], rows[2]["decision"]] == ["ACT", "ASK"]
+    logged_ids = {trace_id for trace_id, _, _ in log_traces.call_args.args[0]}
+    assert logged_ids == {row["trace_id"] for row in rows.values()}
+
+@pytest.mark.asyncio
+async def test_streamed_decisions_are_traced_when_the_client_goes_away(mocker):
+    """
+    Test that closing the stream early (a disconnected client) still writes the traces of the decisions already sent.
+    """
+    import asyncio
+    from app.api.v1.decisions import create_decisions_batch
+    from app.core.schemas import BatchDecisionRequest
+
+    mocker.patch("app.api.v1.decisions.evidence_planner.plan", return_value={"recommended_path": "PROCEED"})
+
+    async def decide(input_data, evidence_assessment, constraints, snapshot=None):
+        if input_data["context"]["user_id"] == "slow":
+            await asyncio.sleep(60)
+        return _decision("ASK")
+
+    mocker.patch("app.api.v1.decisions.decision_engine.decide", side_effect=decide)
+    log_traces = mocker.patch("app.api.v1.decisions.trace_store.log_traces")
+    batch = BatchDecisionRequest(items=[_item("slow", 100), _item("asker", 100)], max_concurrency=2)
+
+    response = await create_decisions_batch(batch, tenant_id=None)
+    first = json.loads(await response.body_iterator.__anext__())
+    await response.body_iterator.aclose()
+
+    assert first["decision"] == "ASK"
+    log_traces.assert_called_once()
+    assert [trace_id for trace_id, _, _ in log_traces.call_args.args[0]] == [first["trace_id"]]
@@ -1,5 +1,10 @@
+import asyncio
 import pytest
 from httpx import AsyncClient
+from collections import OrderedDict
+from prometheus_client import REGISTRY
+from app.core.config import settings
+from app.core.rate_limit import rate_governor
 
 @pytest.mark.asyncio
 async def test_high_value_unverified_abstain(client: AsyncClient):
@@ -67,3 +72,197 @@ async def test_malformed_policy_returns_404(client: AsyncClient):
     
     response = await client.post("/api/v1/decide", json=payload)
     assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_planner_cost_gate_skips_decision_engine(client: AsyncClient, mocker):
+    """
+    Test that a VoI cost-gate ABSTAIN from the planner is final and the LLM decision stages are skipped.
+    """
+    mocker.patch(
+        "app.api.v1.decisions.evidence_planner.plan",
+        return_value={
+            "recommended_path": "ABSTAIN",
+            "risk_assessment": "Value of Information (VoI) too low.",
+            "missing_evidence": [],
+            "abstain_reason": "voi_cost_gate"
+        }
+    )
+    decide = mocker.patch("app.api.v1.decisions.decision_engine.decide")
+    log_trace = mocker.patch("app.api.v1.decisions.trace_store.log_trace")
+
+    payload = {
+        "context": {"user_id": "user_123", "is_verified": True, "region": "US"},
+        "signals": {"action_type": "fund_transfer", "amount": 1},
+        "policy_id": "default"
+    }
+
+    response = await client.post("/api/v1/decide", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+
+    assert data["decision"] == "ABSTAIN"
+    assert "voi_cost_gate" in data["failure_modes"]
+    decide.assert_not_called()
+
+    trace = log_trace.call_args.args[1]
+    assert trace["decision"]["skipped_stages"][0]["stages"] == ["primary", "shadow"]
+    assert set(trace["refs"]) == {"policy", "prompts"}
+    assert {"policy_lookup", "hard_constraints"} <= set(trace["timings_ms"])
+
+@pytest.mark.asyncio
+async def test_hard_constraint_block_records_latency(client: AsyncClient):
+    """
+    Test that decisions blocked before any LLM call still count towards decision latency.
+    """
+    labels = {"policy_id": "default"}
+    before = REGISTRY.get_sample_value("decisiontrace_decision_latency_seconds_count", labels) or 0.0
+    payload = {
+        "context": {"user_id": "user_123", "is_verified": True, "region": "COUNTRY_X"},
+        "signals": {"action_type": "fund_transfer", "amount": 100},
+        "policy_id": "default"
+    }
+
+    response = await client.post("/api/v1/decide", json=payload)
+
+    assert response.json()["decision"] == "ABSTAIN"
+    assert REGISTRY.get_sample_value("decisiontrace_decision_latency_seconds_count", labels) == before + 1
+
+@pytest.mark.asyncio
+async def test_similar_traces_endpoint_passes_filters(client: AsyncClient, mocker):
+    search = mocker.patch(
+        "app.api.v1.traces.semantic_search.find_similar_rationales",
+        return_value=[{
+            "id": "3f1c2b9e-0000-0000-0000-000000000000",
+            "score": 0.83,
+            "decision": "ABSTAIN",
+            "policy_id": "default",
+            "rationale": "Identity verification missing.",
+            "created_at": "2024-01-01T00:00:00Z"
+        }]
+    )
+    response = await client.get("/api/v1/traces/similar", params={"q": "identity", "k": 3, "decision": "ABSTAIN"})
+
+    assert response.status_code == 200
+    assert response.json()[0]["score"] == 0.83
+    search.assert_called_once_with("identity", limit=3, policy_id=None, decision="ABSTAIN")
+
+@pytest.mark.asyncio
+async def test_get_trace_endpoint(client: AsyncClient, mocker):
+    trace_id = "3f1c2b9e-0000-0000-0000-000000000000"
+    get_trace = mocker.patch(
+        "app.api.v1.traces.trace_store.get_trace",
+        return_value={
+            "id": trace_id,
+            "created_at": "2024-01-01T00:00:00Z",
+            "policy_version": "1.0+abc",
+            "trace_data": {"decision": {"decision": "ABSTAIN"}, "policy": {"name": "default"}}
+        }
+    )
+    response = await client.get(f"/api/v1/traces/{trace_id}")
+
+    assert response.status_code == 200
+    assert response.json()["trace_data"]["policy"] == {"name": "default"}
+
+    get_trace.return_value = None
+    assert (await client.get(f"/api/v1/traces/{trace_id}")).status_code == 404
+
+@pytest.mark.asyncio
+async def test_rate_limited_tenant_gets_429(client: AsyncClient, mocker):
+    """
+    Test that a tenant whose token bucket is empty is rejected before any model call, without affecting other tenants.
+    """
+    plan = mocker.patch(
+        "app.api.v1.decisions.evidence_planner.plan",
+        return_value={"recommended_path": "ABSTAIN", "risk_assessment": "VoI too low.", "missing_evidence": [], "abstain_reason": "voi_cost_gate"}
+    )
+    mocker.patch.object(settings, "RATE_LIMIT_TOKENS_PER_MINUTE", 60)
+    mocker.patch.object(settings, "RATE_LIMIT_BURST_TOKENS", 1000)
+    mocker.patch.object(rate_governor, "_local", OrderedDict())
+    mocker.patch.object(rate_governor, "_decision_tokens", {}) # forget the per-decision usage learned by earlier tests
+    await rate_governor.admit("default", None, "noisy") # a decision larger than the bucket empties it
+
+    payload = {
+        "context": {"user_id": "user_123", "is_verified": True, "region": "US"},
+        "signals": {"action_type": "fund_transfer", "amount": 1},
+        "policy_id": "default"
+    }
+    limited = await client.post("/api/v1/decide", json=payload, headers={"X-Tenant-ID": "noisy"})
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) > 60
+    plan.assert_not_called()
+
+    assert (await client.post("/api/v1/decide", json=payload, headers={"X-Tenant-ID": "quiet"})).status_code == 200
+
+@pytest.mark.asyncio
+async def test_duplicate_requests_share_one_decision(client: AsyncClient, mocker):
+    """
+    Test that identical concurrent requests run the LLM stages once, each with its own trace linked to the shared one.
+    """
+    async def plan(**kwargs):
+        await asyncio.sleep(0.05)
+        return {"recommended_path": "ABSTAIN", "risk_assessment": "VoI too low.", "missing_evidence": [], "abstain_reason": "voi_cost_gate"}
+
+    planner = mocker.patch("app.api.v1.decisions.evidence_planner.plan", side_effect=plan)
+    log_trace = mocker.patch("app.api.v1.decisions.trace_store.log_trace")
+    payload = {
+        "context": {"user_id": "user_dup", "is_verified": True, "region": "US"},
+        "signals": {"action_type": "fund_transfer", "amount": 1},
+        "policy_id": "default"
+    }
+
+    responses = await asyncio.gather(*(client.post("/api/v1/decide", json=payload) for _ in range(3)))
+
+    assert planner.call_count == 1
+    trace_ids = [response.json()["trace_id"] for response in responses]
+    assert len(set(trace_ids)) == 3
+    traces = {call.args[0]: call.args[1] for call in log_trace.call_args_list}
+    leaders = [trace_id for trace_id in trace_ids if "coalesced_with" not in traces[trace_id]]
+    assert len(leaders) == 1
+    assert all(traces[trace_id]["coalesced_with"] == leaders[0] for trace_id in trace_ids if trace_id != leaders[0])
+
+@pytest.mark.asyncio
+async def test_idempotency_key_replays_stored_response(client: AsyncClient, mocker):
+    """
+    Test that a retry with the same Idempotency-Key gets the original response without deciding again.
+    """
+    planner = mocker.patch(
+        "app.api.v1.decisions.evidence_planner.plan",
+        return_value={"recommended_path": "ABSTAIN", "risk_assessment": "VoI too low.", "missing_evidence": [], "abstain_reason": "voi_cost_gate"}
+    )
+    payload = {
+        "context": {"user_id": "user_retry", "is_verified": True, "region": "US"},
+        "signals": {"action_type": "fund_transfer", "amount": 1},
+        "policy_id": "default"
+    }
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = await client.post("/api/v1/decide", json=payload, headers=headers)
+    retry = await client.post("/api/v1/decide", json=payload, headers=headers)
+
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert planner.call_count == 1
+
+    payload["signals"]["amount"] = 2
+    assert (await client.post("/api/v1/decide", json=payload, headers=headers)).status_code == 422
+
+@pytest.mark.asyncio
+async def test_failed_decision_refunds_its_admission(client: AsyncClient, mocker):
+    """
+    Test that tokens admitted for a decision whose LLM stages raise are returned to the tenant's bucket.
+    """
+    mocker.patch("app.api.v1.decisions.evidence_planner.plan", side_effect=RuntimeError("planner crashed"))
+    refund = mocker.spy(rate_governor, "refund")
+    settle = mocker.spy(rate_governor, "settle")
+    payload = {
+        "context": {"user_id": "user_refund", "is_verified": True, "region": "US"},
+        "signals": {"action_type": "fund_transfer", "amount": 1},
+        "policy_id": "default"
+    }
+
+    with pytest.raises(RuntimeError):
+        await client.post("/api/v1/decide", json=payload, headers={"X-Tenant-ID": "refunded"})
+
+    refund.assert_called_once()
+    assert refund.call_args.args[0].tenant == "refunded"
+    settle.assert_not_called()
@@ -0,0 +1,45 @@
+import pytest
+from httpx import AsyncClient
+from app.evaluation.ingest import IngestReport
+
+TRACE_ID = "6f1c1a52-8a55-4b43-9d1e-0c4c1b1f0a01"
+
+@pytest.mark.asyncio
+async def test_bulk_outcomes_endpoint_streams_csv_body(client: AsyncClient, admin_headers, mocker):
+    """
+    A text/csv body is read as CSV and handed to the ingestor line by line.
+    """
+    seen = {}
+
+    async def ingest(lines, fmt, batch_size):
+        seen["lines"] = [line async for line in lines]
+        seen["format"], seen["batch_size"] = fmt, batch_size
+        return IngestReport(format=fmt, rows_read=1, inserted=1, batches=1)
+
+    mocker.patch("app.api.v1.evaluations.outcome_ingestor.ingest", side_effect=ingest)
+    body = f"trace_id,is_correct\n{TRACE_ID},false\n"
+
+    response = await client.post("/api/v1/outcomes/bulk?batch_size=500", content=body, headers={**admin_headers, "Content-Type": "text/csv"})
+
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 1
+    assert seen == {"lines": ["trace_id,is_correct", f"{TRACE_ID},false"], "format": "csv", "batch_size": 500}
+
+@pytest.mark.asyncio
+async def test_bulk_outcomes_endpoint_rejects_csv_without_trace_ids(client: AsyncClient, admin_headers, mocker):
+    mocker.patch("app.evaluation.ingest.trace_store.acquire", side_effect=AssertionError("nothing to write"))
+
+    response = await client.post("/api/v1/outcomes/bulk", params={"format": "csv"}, content="id,is_correct\nx,true\n", headers=admin_headers)
+
+    assert response.status_code == 422
+    assert "trace_id" in response.json()["detail"]
+
+@pytest.mark.asyncio
+async def test_bulk_outcomes_endpoint_requires_the_admin_token(client: AsyncClient, mocker):
+    mocker.patch("app.core.config.settings.ADMIN_TOKEN", None)
+    ingest = mocker.patch("app.api.v1.evaluations.outcome_ingestor.ingest")
+
+    response = await client.post("/api/v1/outcomes/bulk", content=f'{{"trace_id": "{TRACE_ID}"}}\n')
+
+    assert response.status_code == 403
+    ingest.assert_not_called()
@@ -0,0 +1,74 @@
+import itertools
+import sqlite3
+import pytest
+from decimal import Decimal
+from app.evaluation.calibration import ROLLUP_COLUMNS, CalibrationLoop, contribution_sql, outcome_contribution, metrics_from_sums
+from fake_postgres import FakeConnection
+
+def test_reevaluation_delta_moves_a_decision_between_counters():
+    """
+    Re-evaluating a false ACT as correct backs out its old contribution.
+    """
+    old = outcome_contribution("ACT", 0.9, is_correct=False, ground_truth_safe=False)
+    new = outcome_contribution("ACT", 0.9, is_correct=True, ground_truth_safe=True)
+    delta = {name: new[name] - old[name] for name in ROLLUP_COLUMNS}
+
+    assert delta["total_evaluated"] == 0
+    assert delta["false_act_count"] == -1
+    assert delta["correct_decision_count"] == 1
+    assert delta["overconfidence_penalty_total"] == pytest.approx(-0.81)
+
+def test_metrics_from_rollup_sums():
+    rows = [
+        outcome_contribution("ACT", 0.9, is_correct=True, ground_truth_safe=True),
+        outcome_contribution("ACT", 0.8, is_correct=False, ground_truth_safe=False),
+        outcome_contribution("ABSTAIN", 0.4, is_correct=False, ground_truth_safe=True),
+    ]
+    # Postgres returns SUM(bigint) as numeric
+    sums = {name: Decimal(str(sum(row[name] for row in rows))) for name in ROLLUP_COLUMNS}
+
+    metrics = metrics_from_sums(sums)
+
+    assert metrics.total_evaluated == 3
+    assert metrics.false_act_count == 1
+    assert metrics.conservative_abstain_count == 1
+    assert metrics.avg_confidence_correct == pytest.approx(0.9)
+    assert metrics.avg_confidence_incorrect == pytest.approx(0.6)
+    assert metrics.overconfidence_penalty_total == pytest.approx(0.8)
+
+def test_empty_window_yields_zeroes():
+    metrics = metrics_from_sums({name: None for name in ROLLUP_COLUMNS})
+    assert metrics.total_evaluated == 0
+    assert metrics.false_act_rate == 0.0
+
+def test_sql_contribution_matches_python():
+    """
+    The set-based rollup update (bulk ingestion) counts an outcome exactly as a single evaluation does.
+    """
+    expressions = contribution_sql(":decision", ":confidence", ":is_correct", ":ground_truth_safe")
+    query = f"SELECT {', '.join(expressions[name] for name in ROLLUP_COLUMNS)}"
+    db = sqlite3.connect(":memory:")
+    for decision, is_correct, ground_truth_safe in itertools.product(["ACT", "ASK", "ABSTAIN", None], [True, False], [True, False]):
+        params = {"decision": decision, "confidence": 0.7, "is_correct": is_correct, "ground_truth_safe": ground_truth_safe}
+        row = db.execute(query, params).fetchone()
+        assert dict(zip(ROLLUP_COLUMNS, row)) == pytest.approx(outcome_contribution(decision, 0.7, is_correct, ground_truth_safe))
+
+@pytest.mark.asyncio
+async def test_archived_outcomes_fill_up_from_the_archive_index(fake_db, mocker):
+    class Connection(FakeConnection):
+        async def fetchrow(self, query, *params):
+            await super().fetchrow(query, *params)
+            archived = "decision_trace_archived" in query
+            return {name: (3 if archived else 2) if name == "total_evaluated" else 0 for name in ROLLUP_COLUMNS}
+
+    conn = fake_db(Connection())
+    archive_reads = mocker.patch("app.trace_store.archive.TraceArchive.find")
+
+    metrics = await CalibrationLoop().run_calibration(limit=5, policy_id="default")
+
+    assert metrics.total_evaluated == 5
+    (_, hot), (query, archived) = conn.queries("fetchrow")
+    assert hot == (5, "default")
+    # Only the 3 outcomes still missing are taken from the facts kept at archive time
+    assert "JOIN decision_trace_archived a" in query and archived == (3, "default")
+    assert archive_reads.call_count == 0
@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from app.core.coalescing import IdempotencyStore, SingleFlight, request_fingerprint
+from app.core.exceptions import IdempotencyKeyReusedError
+from app.core.schemas import DecisionRequest
+
+def test_fingerprint_is_canonical():
+    first = DecisionRequest(context={"a": 1, "b": [1, 2]}, signals={"x": "y"})
+    reordered = DecisionRequest(context={"b": [1, 2], "a": 1}, signals={"x": "y"}, policy_id="default")
+
+    assert request_fingerprint(first) == request_fingerprint(reordered)
+    assert request_fingerprint(first) != request_fingerprint(DecisionRequest(context={"a": 2, "b": [1, 2]}, signals={"x": "y"}))
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_run():
+    flights = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"decision": "ACT"}
+
+    results = await asyncio.gather(*(flights.run("k", f"t{i}", work) for i in range(5)))
+
+    assert calls == 1
+    assert [leader for _, leader in results] == [None, "t0", "t0", "t0", "t0"]
+    assert all(result == {"decision": "ACT"} for result, _ in results)
+    assert len({id(result) for result, _ in results}) == 5 # every caller gets its own copy
+    assert len(flights) == 0
+
+@pytest.mark.asyncio
+async def test_leader_failure_reaches_followers_and_cancellation_hands_over():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(flights.run("k", "t0", fail), flights.run("k", "t1", fail), return_exceptions=True)
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    leader = asyncio.create_task(flights.run("k", "t0", slow))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flights.run("k", "t1", slow))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == ("done", None) # ran it itself once the leader was gone
+
+@pytest.mark.asyncio
+async def test_idempotency_key_is_bound_to_its_request():
+    store = IdempotencyStore()
+    store.store.use_redis = False
+
+    await store.set("tenant", "key-1", "fingerprint", {"trace_id": "t0"})
+
+    assert await store.get("tenant", "key-1", "fingerprint") == {"trace_id": "t0"}
+    assert await store.get("other-tenant", "key-1", "fingerprint") is None
+    with pytest.raises(IdempotencyKeyReusedError):
+        await store.get("tenant", "key-1", "other-fingerprint")
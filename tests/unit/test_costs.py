@@ -0,0 +1,123 @@
+import json
+import pytest
+from prometheus_client import REGISTRY
+from app.core.config import settings
+from app.core.costs import CostModel, DecisionBudget, PriceTable, TokenCounter
+from app.core.exceptions import BudgetExceededError, RateLimitedError
+from app.core.rate_limit import RateGovernor, TokenBucket
+from app.decision_engine.engine import DecisionEngine
+from app.llm_gateway.client import LLMGateway
+from app.llm_gateway.fake import FakeLLMClient
+
+def test_token_counter_tracks_text_and_json_size():
+    counter = TokenCounter()
+    prose = "The account was verified two years ago and the amount is within its usual range."
+    payload = json.dumps({"context": {"user_id": "user_123", "is_verified": True}, "signals": {"amount": 2500}}, separators=(",", ":"))
+
+    assert counter.count("") == 0
+    assert 14 <= counter.count(prose) <= 20
+    assert 15 <= counter.count(payload) <= 30
+    assert counter.count(prose * 10) >= 9 * counter.count(prose)
+
+def test_static_counts_are_cached_across_counters():
+    from app.core.costs import _count_static
+
+    _count_static.cache_clear()
+    prefix = "Policy: never act on unverified transfers above the limit."
+
+    assert TokenCounter().count_static(prefix) == TokenCounter().count_static(prefix) == TokenCounter.count(prefix)
+    assert _count_static.cache_info().hits == 1
+
+def test_unknown_models_are_priced_as_the_most_expensive():
+    prices = PriceTable()
+
+    assert prices.cost_usd("claude-3-5-haiku-20241022", 1_000_000, 0) == pytest.approx(0.80)
+    assert prices.cost_usd("claude-3-5-sonnet-20240620", 0, 1000, cache_read_tokens=1000) == pytest.approx(0.0153)
+    assert prices.cost_usd("some-new-model", 0, 1_000_000) == prices.cost_usd("claude-3-opus-20240229", 0, 1_000_000)
+
+def test_budget_reserves_settles_and_refuses():
+    budget = DecisionBudget("default", max_tokens=1000, max_cost_usd=0.01)
+    planner = budget.reserve("evidence_planner", 400, 0.002)
+    primary = budget.reserve("primary", 400, 0.002)
+
+    with pytest.raises(BudgetExceededError) as refused:
+        budget.reserve("shadow", 400, 0.001)
+    assert refused.value.limit == "tokens"
+    assert REGISTRY.get_sample_value("decisiontrace_budget_exceeded_total", {"policy_id": "default", "stage": "shadow", "limit": "tokens"}) >= 1
+
+    planner.settle(150, 0.001)
+    primary.release()
+    primary.release()
+    assert (budget.spent_tokens, budget.reserved_tokens) == (150, 0)
+
+    with pytest.raises(BudgetExceededError, match="cost"):
+        budget.reserve("primary", 100, 0.02)
+    with pytest.raises(BudgetExceededError, match="latency"):
+        DecisionBudget("default", max_latency_ms=100).reserve("primary", 10, 0.0, expected_latency_ms=200)
+
+@pytest.mark.asyncio
+async def test_engine_abstains_when_the_shadow_does_not_fit_the_budget(mocker):
+    gateway = LLMGateway()
+    gateway.client = FakeLLMClient(seed=1)
+    mocker.patch("app.decision_engine.engine.llm_gateway", gateway)
+    mocker.patch("app.llm_gateway.client.cost_model", CostModel())
+    mocker.patch.object(settings, "LLM_CACHE_ENABLED", False)
+    policy = {
+        "name": "default",
+        "asymmetric_shadow": {"enabled": True, "execution": "sequential"},
+        "cost_limits": {"max_tokens_per_decision": 1500},
+    }
+
+    budget = CostModel.start_budget("default", policy)
+    result = await DecisionEngine().decide({"context": {}, "signals": {}}, {}, {"policy": policy})
+
+    # The primary (1270 tokens reported by the fake) fits, the shadow's reservation does not: no unvetted ACT.
+    assert result["decision"] == "ABSTAIN"
+    assert result["failure_modes"] == ["budget_exceeded"]
+    assert budget.spent_tokens == 1270 and budget.reserved_tokens == 0
+
+def test_token_bucket_refills_and_can_go_into_debt(mocker):
+    clock = mocker.patch("app.core.rate_limit.time.monotonic", return_value=0.0)
+    bucket = TokenBucket(rate=100.0, capacity=1000.0)
+
+    assert bucket.take(800) == (True, 0.0)
+    allowed, wait = bucket.take(400)
+    assert not allowed and wait == pytest.approx(2.0)
+
+    bucket.take(500, force=True)
+    clock.return_value = 5.0
+    assert bucket.take(100) == (True, 0.0)
+
+@pytest.mark.asyncio
+async def test_governor_limits_each_tenant_and_learns_decision_size(mocker):
+    mocker.patch.object(settings, "RATE_LIMIT_DEFAULT_DECISION_TOKENS", 4000)
+    governor = RateGovernor(use_redis=False)
+    policy = {"rate_limit": {"tokens_per_minute": 60, "burst_tokens": 10000}}
+
+    first = await governor.admit("default", policy, "noisy", decisions=2)
+    with pytest.raises(RateLimitedError) as limited:
+        await governor.admit("default", policy, "noisy")
+    assert limited.value.retry_after_s > 60
+    assert await governor.admit("default", policy, "quiet") is not None
+
+    # The two decisions used far less than the default estimate: refunded, and later admissions take less.
+    await governor.settle(first, used_tokens=1000, decisions=2)
+    assert governor.expected_tokens("default") == 500
+    assert await governor.admit("default", policy, "noisy") is not None
+
+@pytest.mark.asyncio
+async def test_batch_larger_than_the_bucket_is_charged_in_full(mocker):
+    mocker.patch.object(settings, "RATE_LIMIT_DEFAULT_DECISION_TOKENS", 4000)
+    governor = RateGovernor(use_redis=False)
+    policy = {"rate_limit": {"tokens_per_minute": 60, "burst_tokens": 10000}}
+
+    # 100 decisions expected at 4000 tokens: only the full bucket can be taken up front
+    admission = await governor.admit("default", policy, "batch", decisions=100)
+    assert admission.tokens == 10000
+
+    await governor.settle(admission, used_tokens=400000, decisions=100)
+    bucket = governor._local["dt:rl:default:batch"]
+    assert bucket.tokens < -389000
+    with pytest.raises(RateLimitedError) as limited:
+        await governor.admit("default", policy, "batch")
+    assert limited.value.retry_after_s > 390000
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import pytest
+from app.decision_engine.engine import DecisionEngine, SHADOW_SYSTEM_PROMPT
+
+class StubGateway:
+    """
+    Minimal stand-in for LLMGateway: returns a canned decision per role after a fixed delay.
+    """
+    def __init__(self, primary: str, shadow: str, primary_delay_s: float = 0.05, shadow_delay_s: float = 0.05):
+        self.decisions = {"primary": primary, "shadow": shadow}
+        self.delays = {"primary": primary_delay_s, "shadow": shadow_delay_s}
+        self.calls = []
+        self.cancelled = []
+
+    async def get_structured_decision(self, prompt, system_prompt, model="", max_tokens=1000, policy=None, static_prefix=None, hedge=False, stage=None, policy_id=None):
+        role = "shadow" if system_prompt == SHADOW_SYSTEM_PROMPT else "primary"
+        self.calls.append(role)
+        try:
+            await asyncio.sleep(self.delays[role])
+        except asyncio.CancelledError:
+            self.cancelled.append(role)
+            raise
+        body = {
+            "decision": self.decisions[role],
+            "confidence": 0.95,
+            "risk_factors": [],
+            "missing_information": [],
+            "failure_modes": [],
+            "rationale": f"{role} rationale"
+        }
+        return {"raw_response": json.dumps(body), "input_tokens": 100, "output_tokens": 20, "latency_ms": int(self.delays[role] * 1000)}
+
+    async def stream_structured_decision(self, prompt, system_prompt, model="", max_tokens=1000, policy=None, static_prefix=None, early_fields=("decision", "confidence"), on_early_fields=None, stage=None, policy_id=None):
+        # Early fields are "generated" immediately; the rest of the object takes the role's full delay.
+        role = "shadow" if system_prompt == SHADOW_SYSTEM_PROMPT else "primary"
+        early = {"decision": self.decisions[role], "confidence": 0.95}
+        if on_early_fields and on_early_fields(dict(early)):
+            self.calls.append(role)
+            return {"raw_response": "", "parsed": early, "stopped_early": True, "input_tokens": 100, "output_tokens": 5, "latency_ms": 0}
+        result = await self.get_structured_decision(prompt, system_prompt, model, max_tokens, policy, static_prefix)
+        return {**result, "parsed": json.loads(result["raw_response"]), "stopped_early": False}
+
+def _policy(execution: str, streaming: bool = False):
+    return {"policy": {
+        "name": "default",
+        "asymmetric_shadow": {"enabled": True, "execution": execution},
+        "streaming": {"enabled": streaming, "abort_on_abstain": True}
+    }}
+
+async def _decide(mocker, stub, execution, streaming=False):
+    mocker.patch("app.decision_engine.engine.llm_gateway", stub)
+    engine = DecisionEngine()
+    return await engine.decide({"context": {}, "signals": {}}, {}, _policy(execution, streaming))
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("execution", ["sequential", "concurrent"])
+async def test_shadow_veto_is_identical_in_both_modes(mocker, execution):
+    """
+    A primary ACT vetoed by the shadow must ABSTAIN regardless of execution mode.
+    """
+    stub = StubGateway(primary="ACT", shadow="ABSTAIN")
+    result = await _decide(mocker, stub, execution)
+
+    assert result["decision"] == "ABSTAIN"
+    assert "shadow_veto" in result["risk_factors"]
+    assert result["cost_estimate"]["tokens"] == 240
+    assert set(result["cost_estimate"]["call_latency_ms"]) == {"primary", "shadow"}
+
+@pytest.mark.asyncio
+async def test_concurrent_mode_reports_wall_clock_latency(mocker):
+    """
+    Concurrent calls overlap, so reported latency is below the sum of the per-call latencies.
+    """
+    stub = StubGateway(primary="ACT", shadow="ACT", primary_delay_s=0.1, shadow_delay_s=0.1)
+    result = await _decide(mocker, stub, "concurrent")
+
+    cost = result["cost_estimate"]
+    assert result["decision"] == "ACT"
+    assert cost["latency_ms"] < sum(cost["call_latency_ms"].values())
+
+@pytest.mark.asyncio
+async def test_concurrent_shadow_cancelled_when_primary_does_not_act(mocker):
+    """
+    The speculative shadow call is cancelled once the primary returns a non-ACT decision.
+    """
+    stub = StubGateway(primary="ASK", shadow="ACT", primary_delay_s=0.01, shadow_delay_s=0.5)
+    result = await _decide(mocker, stub, "concurrent")
+    await asyncio.sleep(0)
+
+    assert result["decision"] == "ASK"
+    assert stub.cancelled == ["shadow"]
+    assert "shadow" not in result["cost_estimate"]["call_latency_ms"]
+
+@pytest.mark.asyncio
+async def test_sequential_mode_skips_shadow_for_non_act(mocker):
+    """
+    In sequential mode the shadow is never called for a non-ACT primary, and the skip is recorded.
+    """
+    stub = StubGateway(primary="ABSTAIN", shadow="ACT")
+    result = await _decide(mocker, stub, "sequential")
+
+    assert result["decision"] == "ABSTAIN"
+    assert stub.calls == ["primary"]
+    assert result["skipped_stages"][0]["stages"] == ["shadow"]
+    assert result["skipped_stages"][0]["reason"] == "primary_not_act"
+
+@pytest.mark.asyncio
+async def test_streaming_starts_shadow_before_primary_finishes(mocker):
+    """
+    In sequential mode, an early ACT starts the shadow while the primary is still generating.
+    """
+    stub = StubGateway(primary="ACT", shadow="ACT", primary_delay_s=0.1, shadow_delay_s=0.1)
+    result = await _decide(mocker, stub, "sequential", streaming=True)
+
+    assert result["decision"] == "ACT"
+    assert result["cost_estimate"]["latency_ms"] < 180
+
+@pytest.mark.asyncio
+async def test_streaming_abstain_stops_primary_and_skips_shadow(mocker):
+    stub = StubGateway(primary="ABSTAIN", shadow="ACT", primary_delay_s=0.5)
+    result = await _decide(mocker, stub, "sequential", streaming=True)
+
+    assert result["decision"] == "ABSTAIN"
+    assert stub.calls == ["primary"]
+    assert result["rationale"]
+    assert result["cost_estimate"]["latency_ms"] < 100
+    assert result["skipped_stages"][0]["stages"] == ["shadow"]
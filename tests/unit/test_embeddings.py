@@ -0,0 +1,81 @@
+import math
+import uuid
+import pytest
+from datetime import datetime, timezone
+from app.trace_store import embeddings
+from app.trace_store.embeddings import EmbeddingBackfill, HashingEmbedder, vector_literal
+
+def _cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+@pytest.mark.asyncio
+async def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dim=64)
+    first, second = await embedder.embed(["High risk transfer to new account", "High risk transfer to new account"])
+
+    assert first == second
+    assert len(first) == 64
+    assert math.isclose(math.sqrt(sum(v * v for v in first)), 1.0)
+
+@pytest.mark.asyncio
+async def test_lexically_similar_rationales_score_higher():
+    embedder = HashingEmbedder()
+    query, near, far = await embedder.embed([
+        "missing identity verification for large transfer",
+        "large transfer blocked: identity verification missing",
+        "low risk repeat purchase from trusted merchant",
+    ])
+    assert _cosine(query, near) > _cosine(query, far)
+
+@pytest.mark.asyncio
+async def test_empty_rationale_has_no_vector():
+    assert await HashingEmbedder().embed(["", "  ...  "]) == [None, None]
+
+def test_vector_literal_is_pgvector_text_format():
+    assert vector_literal([0.5, -0.25, 0.0]) == "[0.5,-0.25,0]"
+
+@pytest.mark.asyncio
+async def test_backfill_writes_vectors_beside_the_trace_log(fake_db, mocker):
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    conn = fake_db(value=True, rows=[
+        {"id": uuid.UUID(int=1), "created_at": created_at, "policy_id": "default", "decision": "ABSTAIN", "rationale": "identity missing"},
+        {"id": uuid.UUID(int=2), "created_at": created_at, "policy_id": "default", "decision": "ACT", "rationale": None},
+    ])
+    mocker.patch.object(embeddings, "_embedder", HashingEmbedder())
+
+    assert await EmbeddingBackfill().run_once(batch_size=10) == 2
+
+    query, args = conn.queries("executemany")[0]
+    # The trace log is never updated; a trace with nothing to embed gets a row without a vector
+    assert query.strip().startswith("INSERT INTO decision_trace_embedding")
+    assert [(a[0], a[4], a[5] is None) for a in args] == [(uuid.UUID(int=1), "hashing", False), (uuid.UUID(int=2), "hashing", True)]
+
+    # Another worker holds the round
+    busy = fake_db(rows=conn.rows, value=False)
+    assert await EmbeddingBackfill().run_once() == 0
+    assert busy.queries("fetch") == []
+
+@pytest.mark.asyncio
+async def test_sweep_pages_through_the_whole_hot_table(fake_db, mocker):
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    conn = fake_db(value=True, rows=[
+        {"id": uuid.UUID(int=i), "created_at": created_at, "policy_id": "default", "decision": "ACT", "rationale": "ok"}
+        for i in range(2)
+    ])
+    mocker.patch.object(embeddings, "_embedder", HashingEmbedder())
+    mocker.patch.object(conn, "fetch", side_effect=[conn.rows, conn.rows[:1]])
+
+    assert await EmbeddingBackfill().sweep(batch_size=2) == 3
+
+    # No lookback cutoff: the first page starts at the oldest trace, the next one after the last trace seen
+    assert [call.args for call in conn.fetch.call_args_list] == [
+        (embeddings.SWEEP_TRACES_SQL, 2, None),
+        (embeddings.SWEEP_TRACES_SQL, 2, created_at),
+    ]
+
+def test_embedder_must_implement_embed():
+    class Incomplete(embeddings.Embedder):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,74 @@
+import json
+import random
+import pytest
+from app.core.config import settings
+from app.core.exceptions import ModelTimeoutError
+from app.core.policies import policy_manager
+from app.decision_engine.engine import DecisionEngine, PRIMARY_SYSTEM_PROMPT
+from app.llm_gateway.client import LLMGateway
+from app.llm_gateway.fake import FakeLLMClient, LatencyModel, load_responses
+
+@pytest.fixture(autouse=True)
+def fast_backoff(mocker):
+    mocker.patch.object(settings, "LLM_RETRY_BACKOFF_BASE_S", 0.01)
+    mocker.patch.object(settings, "LLM_RETRY_BACKOFF_MAX_S", 0.01)
+
+def _gateway(client: FakeLLMClient) -> LLMGateway:
+    gateway = LLMGateway()
+    gateway.client = client
+    return gateway
+
+def test_latency_models_are_seeded_and_validated():
+    model = LatencyModel.parse("lognormal:100:0.5")
+    first = [model.sample_s(random.Random(7)) for _ in range(3)]
+    assert first == [model.sample_s(random.Random(7)) for _ in range(3)]
+
+    samples = sorted(model.sample_s(random.Random(i)) for i in range(2000))
+    assert 0.09 < samples[1000] < 0.11
+    assert LatencyModel.parse("uniform:10:20").sample_s(random.Random(0)) <= 0.02
+    with pytest.raises(ValueError):
+        LatencyModel.parse("gamma:1:2")
+
+@pytest.mark.asyncio
+async def test_injected_overload_goes_through_gateway_retries():
+    client = FakeLLMClient(failures={"529": 1.0}, seed=1)
+
+    with pytest.raises(ModelTimeoutError):
+        await _gateway(client).get_structured_decision("prompt", PRIMARY_SYSTEM_PROMPT, model="m")
+
+    assert client.requests == 1 + settings.LLM_MAX_RETRIES
+    assert client.injected["529"] == client.requests
+
+@pytest.mark.asyncio
+async def test_call_slower_than_timeout_times_out(mocker):
+    mocker.patch.object(settings, "LLM_TIMEOUT_DEFAULT_S", 0.02)
+    mocker.patch.object(settings, "LLM_MAX_RETRIES", 0)
+    client = FakeLLMClient(latency=LatencyModel.parse("fixed:500"))
+
+    with pytest.raises(ModelTimeoutError, match="timeout"):
+        await _gateway(client).get_structured_decision("prompt", PRIMARY_SYSTEM_PROMPT, model="m")
+
+@pytest.mark.asyncio
+async def test_engine_runs_end_to_end_on_the_fake(mocker):
+    mocker.patch.object(settings, "LLM_CACHE_ENABLED", False)
+    snapshot = policy_manager.get_snapshot("default")
+    engine = DecisionEngine()
+
+    mocker.patch("app.decision_engine.engine.llm_gateway", _gateway(FakeLLMClient(latency=LatencyModel.parse("fixed:5"), seed=3)))
+    result = await engine.decide({"context": {}, "signals": {}}, {}, {"policy": snapshot.body}, snapshot)
+    assert result["decision"] == "ACT"
+    assert result["cost_estimate"]["call_latency_ms"]["primary"] >= 5
+
+    mocker.patch("app.decision_engine.engine.llm_gateway", _gateway(FakeLLMClient(failures={"malformed": 1.0})))
+    result = await engine.decide({"context": {}, "signals": {}}, {}, {"policy": snapshot.body}, snapshot)
+    assert result["decision"] == "ABSTAIN"
+
+def test_responses_load_from_calls_and_exported_traces(tmp_path):
+    call = {"stage": "primary", "model": "m", "raw_response": json.dumps({"decision": "ASK"}), "input_tokens": 1, "output_tokens": 1}
+    trace = {"id": "t1", "trace_data": {"llm_calls": [{**call, "stage": "shadow"}]}}
+    path = tmp_path / "calls.jsonl"
+    path.write_text(json.dumps(call) + "\n" + json.dumps(trace) + "\n")
+
+    responses = load_responses(str(path))
+
+    assert [c["stage"] for c in responses["primary"] + responses["shadow"]] == ["primary", "shadow"]
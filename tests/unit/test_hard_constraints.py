@@ -0,0 +1,113 @@
+import random
+import numpy as np
+import pytest
+from app.core.exceptions import PolicyLoadError
+from app.core.hard_constraints import hard_constraints
+
+POLICY = {
+    "hard_constraints": {
+        "max_transaction_unverified": 10000,
+        "max_transaction_verified": 100000,
+        "restricted_regions": ["COUNTRY_X", "COUNTRY_Y"],
+        "predicates": [
+            {"id": "risk_ceiling", "field": "signals.risk_score", "op": "gt", "value": 0.9, "reason": "Risk score above ceiling."},
+            {"id": "blocked_channel", "field": "context.channel", "op": "in", "value": ["tor"], "reason": "Blocked channel."},
+        ]
+    }
+}
+
+def _random_rows(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    contexts, signals = [], []
+    for _ in range(n):
+        context = {"is_verified": rng.random() < 0.7, "region": rng.choice(["US", "UK", "COUNTRY_X", None])}
+        if rng.random() < 0.95:
+            context["user_id"] = f"user_{rng.randint(1, 100)}"
+        if rng.random() < 0.5:
+            context["channel"] = rng.choice(["web", "tor"])
+        signal = {"amount": rng.choice([50, 5000, 15000, 150000])}
+        if rng.random() < 0.5:
+            signal["risk_score"] = rng.random()
+        contexts.append(context)
+        signals.append(signal)
+    return contexts, signals
+
+def test_batch_mode_matches_scalar_mode():
+    """
+    The vectorized program must agree with the scalar path row-for-row, including which rule fired first.
+    """
+    program = hard_constraints.program_for(POLICY)
+    contexts, signals = _random_rows(2000)
+
+    mask, rule_ids = program.check_batch(**program.columns_from_records(contexts, signals))
+
+    for i, (context, signal) in enumerate(zip(contexts, signals)):
+        expected = program.first_violation(context, signal)
+        assert bool(mask[i]) == (expected is not None)
+        assert rule_ids[i] == expected
+
+def test_declared_predicate_blocks_and_explains():
+    is_safe, rationale = hard_constraints.check(
+        {"user_id": "u1", "is_verified": True, "region": "US"},
+        {"amount": 10, "risk_score": 0.97},
+        policy=POLICY
+    )
+    assert not is_safe
+    assert rationale == "Hard Constraint: Risk score above ceiling."
+
+def test_program_is_compiled_once_per_policy():
+    assert hard_constraints.program_for(POLICY) is hard_constraints.program_for(POLICY)
+
+def test_invalid_predicate_is_rejected_at_compile_time():
+    with pytest.raises(PolicyLoadError):
+        hard_constraints.compile({"hard_constraints": {"predicates": [{"field": "amount", "op": "gt", "value": 1}]}})
+
+def test_batch_mode_accepts_plain_columns():
+    program = hard_constraints.program_for(POLICY)
+    mask, rule_ids = program.check_batch(
+        amounts=np.array([100.0, 20000.0, 100.0]),
+        verified=np.array([True, False, True]),
+        regions=np.array(["US", "US", "COUNTRY_Y"])
+    )
+    assert mask.tolist() == [False, True, True]
+    assert rule_ids.tolist() == [None, "max_transaction_unverified", "restricted_region"]
+
+def test_invalid_values_are_rejected_identically_in_both_modes():
+    """
+    Values NumPy would coerce (None to NaN, "99999999" to a float) must not slip through the batch path.
+    """
+    program = hard_constraints.program_for(POLICY)
+    context = {"user_id": "u1", "is_verified": True, "region": "US"}
+    signals = [
+        {"amount": None},
+        {"amount": "99999999"},
+        {"amount": float("nan")},
+        {"amount": True},
+        {},
+        {"amount": 10, "risk_score": float("nan")},
+        {"amount": 10, "risk_score": "0.95"},
+        {"amount": 10, "risk_score": None},
+    ]
+    contexts = [context] * len(signals)
+
+    mask, rule_ids = program.check_batch(**program.columns_from_records(contexts, signals))
+
+    expected = [program.first_violation(context, signal) for signal in signals]
+    assert expected == ["invalid_amount"] * 4 + [None, "risk_ceiling", "risk_ceiling", None]
+    assert rule_ids.tolist() == expected
+    assert mask.tolist() == [rule_id is not None for rule_id in expected]
+    is_safe, rationale = program.check(context, {"amount": "99999999"})
+    assert not is_safe
+    assert rationale == "Hard Constraint: Transaction amount '99999999' is not a number."
+
+def test_non_string_regions_are_compared_as_text_in_both_modes():
+    program = hard_constraints.program_for(POLICY)
+    regions = [["COUNTRY_X"], {"code": "COUNTRY_X"}, 7, None, "COUNTRY_X"]
+    contexts = [{"user_id": "u1", "is_verified": True, "region": region} for region in regions]
+    signals = [{"amount": 10}] * len(regions)
+
+    mask, rule_ids = program.check_batch(**program.columns_from_records(contexts, signals))
+
+    expected = [program.first_violation(context, signal) for context, signal in zip(contexts, signals)]
+    assert expected == [None, None, None, None, "restricted_region"]
+    assert rule_ids.tolist() == expected
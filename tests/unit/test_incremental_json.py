@@ -0,0 +1,41 @@
+import json
+import pytest
+from app.core.utils import IncrementalJSONParser, extract_json
+
+BODY = {
+    "decision": "ACT",
+    "confidence": 0.92,
+    "risk_factors": ["a", "b {not a brace}"],
+    "missing_information": [],
+    "failure_modes": [{"mode": "x", "nested": [1, 2]}],
+    "rationale": "Quoted \"text\", commas, and } braces."
+}
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1000])
+def test_fields_arrive_before_the_object_completes(chunk_size):
+    text = "```json\n" + json.dumps(BODY) + "\n```"
+    parser = IncrementalJSONParser()
+    seen_early = None
+    for i in range(0, len(text), chunk_size):
+        complete = parser.feed(text[i:i + chunk_size])
+        if seen_early is None and parser.has("decision", "confidence"):
+            seen_early = complete
+    if chunk_size < len(text):
+        assert seen_early is False
+    assert parser.complete
+    assert parser.value() == BODY
+    assert parser.fields == BODY
+
+def test_number_is_not_committed_until_delimited():
+    parser = IncrementalJSONParser()
+    parser.feed('{"confidence": 0.9')
+    assert "confidence" not in parser.fields
+    parser.feed('5, "decision": "ABSTAIN"')
+    assert parser.fields == {"confidence": 0.95, "decision": "ABSTAIN"}
+    assert not parser.complete
+
+def test_extract_json_takes_first_balanced_object():
+    # A greedy regex would span both objects and fail to parse.
+    text = 'Here you go: {"decision": "ASK"} and also {"note": 1}'
+    assert extract_json(text) == {"decision": "ASK"}
+    assert extract_json("no json here") is None
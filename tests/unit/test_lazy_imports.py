@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules that cost tens to hundreds of milliseconds to import and are only needed to serve or call out
+HEAVY_MODULES = ["anthropic", "asyncpg", "fastapi", "httpx", "jinja2", "numpy", "redis", "yaml", "prometheus_fastapi_instrumentator"]
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+
+def test_core_modules_import_without_heavy_dependencies_or_io():
+    """
+    Importing the hard constraints and the policy registry pulls in no client SDK, web framework or template
+    engine, and reads no policy files until the snapshots are first used.
+    """
+    code = f"""
+import sys
+import app.core.hard_constraints
+from app.core.policies import policy_manager
+loaded = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+assert not loaded, loaded
+assert policy_manager._snapshots is None
+assert "default" in policy_manager.snapshots
+"""
+    result = _run(code)
+
+    assert result.returncode == 0, result.stderr
+
+def test_app_import_defers_llm_sdk_until_preload():
+    """
+    The app imports without the LLM SDK; preload creates the client (importing it) ahead of the first request.
+    """
+    code = """
+import sys
+from app.main import preload
+from app.llm_gateway.client import llm_gateway
+assert "anthropic" not in sys.modules
+assert llm_gateway._client is None
+preload()
+assert "anthropic" in sys.modules
+assert llm_gateway._client is not None
+"""
+    result = _run(code)
+
+    assert result.returncode == 0, result.stderr
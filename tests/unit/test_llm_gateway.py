@@ -0,0 +1,129 @@
+import asyncio
+import json
+import pytest
+from app.core.config import settings
+from app.core.exceptions import ModelTimeoutError
+from app.llm_gateway.client import LLMGateway
+from app.llm_gateway.limits import RetryBudget
+
+@pytest.fixture(autouse=True)
+def fast_backoff(mocker):
+    mocker.patch.object(settings, "LLM_RETRY_BACKOFF_BASE_S", 0.01)
+    mocker.patch.object(settings, "LLM_RETRY_BACKOFF_MAX_S", 0.01)
+
+@pytest.mark.asyncio
+async def test_retries_overloaded_then_succeeds(fake_anthropic):
+    fake_anthropic.enqueue(status=529)
+    fake_anthropic.enqueue(status=500)
+    gateway = LLMGateway(base_url=fake_anthropic.base_url)
+
+    result = await gateway.get_structured_decision("prompt", "system", model="m")
+
+    assert fake_anthropic.requests == 3
+    assert '"ACT"' in result["raw_response"]
+
+@pytest.mark.asyncio
+async def test_non_retryable_error_is_not_retried(fake_anthropic):
+    fake_anthropic.enqueue(status=400)
+    gateway = LLMGateway(base_url=fake_anthropic.base_url)
+
+    with pytest.raises(ModelTimeoutError):
+        await gateway.get_structured_decision("prompt", "system", model="m")
+    assert fake_anthropic.requests == 1
+
+@pytest.mark.asyncio
+async def test_empty_retry_budget_stops_retries(fake_anthropic):
+    fake_anthropic.default.status = 503
+    gateway = LLMGateway(base_url=fake_anthropic.base_url)
+    gateway.retry_budget = RetryBudget(ratio=0.0, min_tokens=1)
+
+    for _ in range(2):
+        with pytest.raises(ModelTimeoutError):
+            await gateway.get_structured_decision("prompt", "system", model="m")
+
+    # One retry for the first call, then the budget is spent.
+    assert fake_anthropic.requests == 3
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped_per_model(fake_anthropic):
+    fake_anthropic.default.delay_s = 0.05
+    gateway = LLMGateway(base_url=fake_anthropic.base_url, max_concurrency=2)
+
+    await asyncio.gather(*[gateway.get_structured_decision("prompt", "system", model="m") for _ in range(6)])
+
+    assert fake_anthropic.requests == 6
+    assert fake_anthropic.max_in_flight == 2
+
+@pytest.mark.asyncio
+async def test_hedged_request_beats_slow_primary(fake_anthropic):
+    gateway = LLMGateway(base_url=fake_anthropic.base_url)
+    lane = gateway.lane("m")
+    for _ in range(settings.LLM_LATENCY_MIN_SAMPLES):
+        lane.observe(0.02)
+    fake_anthropic.enqueue(delay_s=2.0)
+
+    result = await gateway.get_structured_decision("prompt", "system", model="m", hedge=True)
+
+    assert fake_anthropic.requests == 2
+    assert result["latency_ms"] < 1000
+
+def test_adaptive_timeout_tracks_p99(fake_anthropic):
+    gateway = LLMGateway(base_url=fake_anthropic.base_url)
+    lane = gateway.lane("m")
+    assert lane.timeout_s() == settings.LLM_TIMEOUT_DEFAULT_S
+
+    for _ in range(100):
+        lane.observe(2.0)
+    assert lane.timeout_s() == 2.0 * settings.LLM_TIMEOUT_P99_MULTIPLIER
+
+    # The window slides: once the slow samples age out, the timeout drops to the floor.
+    for _ in range(lane.latencies.maxlen):
+        lane.observe(0.01)
+    assert lane.timeout_s() == settings.LLM_TIMEOUT_MIN_S
+
+@pytest.mark.asyncio
+async def test_stream_stops_once_object_is_complete(fake_anthropic):
+    body = json.dumps({"decision": "ASK", "confidence": 0.5, "rationale": "r"})
+    fake_anthropic.enqueue(text=body + "\n\nSome trailing commentary " * 20, chunk_size=8, chunk_delay_s=0.01)
+    gateway = LLMGateway(base_url=fake_anthropic.base_url)
+
+    result = await gateway.stream_structured_decision("prompt", "system", model="m")
+
+    assert result["parsed"] == json.loads(body)
+    assert result["raw_response"].rstrip().endswith("}")
+    assert fake_anthropic.chunks_sent < len(body + "\n\nSome trailing commentary " * 20) // 8
+
+@pytest.mark.asyncio
+async def test_stream_stops_early_when_callback_says_so(fake_anthropic):
+    body = json.dumps({"decision": "ABSTAIN", "confidence": 0.3, "rationale": "x" * 400})
+    fake_anthropic.enqueue(text=body, chunk_size=8, chunk_delay_s=0.01)
+    gateway = LLMGateway(base_url=fake_anthropic.base_url)
+    early = []
+
+    def on_early_fields(fields):
+        early.append(fields)
+        return fields["decision"] == "ABSTAIN"
+
+    result = await gateway.stream_structured_decision("prompt", "system", model="m", on_early_fields=on_early_fields)
+
+    assert early == [{"decision": "ABSTAIN", "confidence": 0.3}]
+    assert result["stopped_early"] is True
+    assert result["parsed"] == {"decision": "ABSTAIN", "confidence": 0.3}
+    assert result["output_tokens"] < len(body) // 4
+
+@pytest.mark.asyncio
+async def test_call_log_records_staged_calls_of_the_current_task(fake_anthropic):
+    gateway = LLMGateway(base_url=fake_anthropic.base_url)
+
+    async def request(stage):
+        calls = gateway.record_calls()
+        await gateway.get_structured_decision("prompt", "system", model="m", stage=stage)
+        await gateway.stream_structured_decision("prompt", "system", model="m", stage=stage)
+        await gateway.get_structured_decision("prompt", "system", model="m")  # no stage: not logged
+        return calls
+
+    first, second = await asyncio.gather(request("primary"), request("shadow"))
+
+    assert [(call["stage"], call["model"], call["input_tokens"]) for call in first] == [("primary", "m", 10)] * 2
+    assert [call["stage"] for call in second] == ["shadow", "shadow"]
+    assert '"ACT"' in first[1]["raw_response"]
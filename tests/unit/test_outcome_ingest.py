@@ -0,0 +1,145 @@
+import uuid
+import pytest
+from app.evaluation import ingest as ingest_module
+from app.evaluation.ingest import (
+    MISSING_TRACES_SQL,
+    OutcomeFileError,
+    OutcomeIngestor,
+    OutcomeParser,
+    OutcomeRecordError,
+    detect_format,
+    iter_body_lines,
+)
+from fake_postgres import FakeConnection
+
+TRACE_A = "6f1c1a52-8a55-4b43-9d1e-0c4c1b1f0a01"
+TRACE_B = "6f1c1a52-8a55-4b43-9d1e-0c4c1b1f0a02"
+
+def test_ndjson_record_becomes_a_staging_row_with_defaults():
+    parser = OutcomeParser("ndjson")
+
+    row = parser.parse(1, f'{{"trace_id": "{TRACE_A}", "label": "chargeback"}}\n')
+
+    line, trace_id, outcome, is_correct, ground_truth_safe, corrected = row
+    assert (line, trace_id) == (1, uuid.UUID(TRACE_A))
+    # The whole record but the id is kept; a missing is_correct stays unset (see UPSERT_OUTCOMES_SQL)
+    assert outcome == {"label": "chargeback"}
+    assert (is_correct, ground_truth_safe, corrected) == (None, False, None)
+    assert parser.parse(2, "   \n") is None
+
+def test_csv_header_booleans_and_empty_cells():
+    parser = OutcomeParser("csv")
+
+    assert parser.parse(1, "\ufefftrace_id,is_correct,ground_truth_safe,corrected_decision,source\r\n") is None
+    row = parser.parse(2, f"{TRACE_A},false,yes,ABSTAIN,\r\n")
+
+    assert row[2] == {"is_correct": False, "ground_truth_safe": True, "corrected_decision": "ABSTAIN"}
+    assert row[3:] == (False, True, "ABSTAIN")
+    with pytest.raises(OutcomeFileError):
+        OutcomeParser("csv").parse(1, "id,is_correct\n")
+
+def test_csv_quoted_fields_may_span_lines():
+    parser = OutcomeParser("csv")
+    lines = [
+        "trace_id,note,is_correct",
+        f'{TRACE_A},"chargeback',
+        "",
+        'said ""fraud""",false',
+        f"{TRACE_B},,true",
+    ]
+
+    rows = [parser.parse(number, line) for number, line in enumerate(lines, start=1)]
+
+    assert rows[:3] == [None, None, None]
+    # The record keeps its newlines and is reported at its first line
+    assert rows[3][:4] == (2, uuid.UUID(TRACE_A), {"note": 'chargeback\n\nsaid "fraud"', "is_correct": False}, False)
+    assert rows[4][:2] == (5, uuid.UUID(TRACE_B))
+    parser.finish()
+
+def test_csv_unterminated_quote_is_rejected():
+    parser = OutcomeParser("csv")
+    parser.parse(1, "trace_id,note")
+    assert parser.parse(2, f'{TRACE_A},"open') is None
+    assert parser.parse(3, "more") is None
+
+    with pytest.raises(OutcomeRecordError, match="unterminated quoted field"):
+        parser.finish()
+    assert parser.line == 2
+
+@pytest.mark.parametrize("line, reason", [
+    ('{"is_correct": true}', "missing trace_id"),
+    ('{"trace_id": "not-a-uuid"}', "not a UUID"),
+    (f'{{"trace_id": "{TRACE_A}", "is_correct": "yes"}}', "must be a boolean"),
+    (f'{{"trace_id": "{TRACE_A}", "corrected_decision": "APPROVE"}}', "corrected_decision"),
+    ('{"trace_id": ', "invalid JSON"),
+    ("[1, 2]", "JSON object"),
+])
+def test_malformed_records_are_rejected(line, reason):
+    with pytest.raises(OutcomeRecordError, match=reason):
+        OutcomeParser("ndjson").parse(1, line)
+
+def test_format_detection():
+    assert detect_format("labels.csv.gz") == "csv"
+    assert detect_format("labels.csv") == "csv"
+    assert detect_format("labels.ndjson.gz") == "ndjson"
+    assert detect_format("-") == "ndjson"
+
+@pytest.mark.asyncio
+async def test_body_lines_survive_chunk_boundaries():
+    body = 'a\n{"note": "é"}\nlast'.encode("utf-8")
+
+    async def chunks():
+        # Split inside the two-byte é and between lines
+        for i in range(0, len(body), 3):
+            yield body[i:i + 3]
+
+    assert [line async for line in iter_body_lines(chunks())] == ["a", '{"note": "é"}', "last"]
+
+class IngestConnection(FakeConnection):
+    """
+    Traces in `hot` exist in decision_trace, each outcome upsert is an insert.
+    """
+
+    def __init__(self, hot):
+        super().__init__()
+        self.hot = hot
+
+    @property
+    def batches(self):
+        return self.copied.get("outcome_staging", [])
+
+    async def fetch(self, query, *args):
+        assert query == MISSING_TRACES_SQL
+        return [{"line": row[0], "trace_id": row[1]} for row in self.batches[-1] if str(row[1]) not in self.hot]
+
+    async def fetchrow(self, query, *args):
+        known = {row[1] for row in self.batches[-1] if str(row[1]) in self.hot}
+        return {"inserted": len(known), "updated": 0}
+
+@pytest.mark.asyncio
+async def test_ingest_batches_rejects_and_reports(fake_db, mocker):
+    conn = fake_db(IngestConnection(hot={TRACE_A, TRACE_B}))
+    unknown = str(uuid.uuid4())
+    lines = [
+        f'{{"trace_id": "{TRACE_A}", "is_correct": false}}',
+        "",
+        '{"trace_id": "bad"}',
+        f'{{"trace_id": "{TRACE_A}", "is_correct": true}}',
+        f'{{"trace_id": "{unknown}"}}',
+        f'{{"trace_id": "{TRACE_B}"}}',
+    ]
+
+    async def stream():
+        for line in lines:
+            yield line
+
+    report = await OutcomeIngestor().ingest(stream(), "ndjson", batch_size=2)
+
+    assert [len(batch) for batch in conn.batches] == [2, 2]
+    assert report.rows_read == 5
+    assert report.batches == 2
+    # TRACE_A twice in the first batch: the later record supersedes the earlier one
+    assert (report.inserted, report.updated, report.duplicates) == (2, 0, 1)
+    assert (report.rejected, report.unknown_traces) == (2, 1)
+    assert [(error.line, error.reason.split(":")[0]) for error in report.errors] == [(3, "trace_id is not a UUID"), (5, f"unknown trace_id {unknown}")]
+    assert any("SHARE ROW EXCLUSIVE" in query for query in conn.executed)
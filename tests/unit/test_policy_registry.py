@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+import pytest
+from app.core.policies import PolicyManager
+
+POLICY_V1 = """
+name: "payments"
+version: "1.0.0"
+hard_constraints:
+  max_transaction_unverified: 500
+confidence_thresholds:
+  act_minimum: 0.9
+"""
+
+POLICY_V2 = POLICY_V1.replace('"1.0.0"', '"1.1.0"').replace("500", "50")
+
+@pytest.fixture
+def policies_dir(tmp_path):
+    (tmp_path / "payments.yaml").write_text(POLICY_V1)
+    return tmp_path
+
+@pytest.mark.asyncio
+async def test_reload_swaps_snapshot_and_keeps_in_flight_version(policies_dir):
+    """
+    A reload publishes a new snapshot while a request holding the old one keeps its version and artifacts.
+    """
+    manager = PolicyManager(str(policies_dir))
+    in_flight = manager.get_snapshot("payments")
+
+    (policies_dir / "payments.yaml").write_text(POLICY_V2)
+    changed = await manager.reload()
+
+    current = manager.get_snapshot("payments")
+    assert changed == ["payments"]
+    assert current.version.startswith("1.1.0+")
+    assert in_flight.version.startswith("1.0.0+")
+    assert in_flight.hard_constraints.check({"user_id": "u"}, {"amount": 100})[0] is True
+    assert current.hard_constraints.check({"user_id": "u"}, {"amount": 100})[0] is False
+
+@pytest.mark.asyncio
+async def test_unchanged_policy_keeps_its_snapshot(policies_dir):
+    manager = PolicyManager(str(policies_dir))
+    before = manager.get_snapshot("payments")
+
+    assert await manager.reload() == []
+    assert manager.get_snapshot("payments") is before
+    assert before.thresholds["act_minimum"] == 0.9
+
+@pytest.mark.asyncio
+async def test_invalid_update_keeps_last_good_version(policies_dir):
+    manager = PolicyManager(str(policies_dir))
+    before = manager.get_snapshot("payments")
+
+    (policies_dir / "payments.yaml").write_text("hard_constraints:\n  predicates: [{field: bad, op: gt}]\n")
+    await manager.reload()
+
+    assert manager.get_snapshot("payments") is before
+
+@pytest.mark.asyncio
+async def test_listeners_are_notified_of_changes(policies_dir):
+    manager = PolicyManager(str(policies_dir))
+    seen = []
+
+    async def listener(policy_id):
+        seen.append(policy_id)
+
+    manager.add_change_listener(listener)
+    (policies_dir / "payments.yaml").write_text(POLICY_V2)
+    await manager.reload()
+
+    assert seen == ["payments"]
+
+def test_policies_and_prompts_load_from_any_working_directory(tmp_path):
+    """
+    Data directories resolve against the repository, not the working directory a server is started from.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    check = "from app.core.policies import policy_manager; assert 'default' in policy_manager.snapshots, policy_manager.policies_dir"
+    env = {**os.environ, "PYTHONPATH": root}
+
+    result = subprocess.run([sys.executable, "-c", check], cwd=tmp_path, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,25 @@
+from app.core.policies import policy_manager
+from app.core.prompts import prompt_assembler
+
+def test_static_prefix_excludes_operational_policy_fields():
+    """
+    Model names, shadow settings and cost limits never reach the model.
+    """
+    prefix = prompt_assembler.static_prefix("decision_engine", policy_manager.get_policy("default"))
+
+    assert "max_transaction_unverified" in prefix
+    assert "act_minimum" in prefix
+    for operational in ("claude-3-5", "asymmetric_shadow", "cost_limits", "voi_max_usd", "response_cache"):
+        assert operational not in prefix
+
+def test_dynamic_part_is_canonical():
+    policy = policy_manager.get_policy("default")
+    _, first = prompt_assembler.render("evidence_planner", policy, input_data={"b": 1, "a": {"y": 2, "x": 1}})
+    _, second = prompt_assembler.render("evidence_planner", policy, input_data={"a": {"x": 1, "y": 2}, "b": 1})
+
+    assert first == second
+    assert '{"a":{"x":1,"y":2},"b":1}' in first
+
+def test_snapshot_precompiles_prefix_per_stage():
+    snapshot = policy_manager.get_snapshot("default")
+    assert snapshot.prompt_prefixes["evidence_planner"] == prompt_assembler.static_prefix("evidence_planner", snapshot.body)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from app.evaluation.reliability import grouped_summaries, reliability_report
+
+def _naive(confidence, correct, n_bins):
+    n = len(confidence)
+    bins = {}
+    for c, ok in zip(confidence, correct):
+        bins.setdefault(min(int(c * n_bins), n_bins - 1), []).append((c, ok))
+    gaps = [abs(sum(ok for _, ok in rows) / len(rows) - sum(c for c, _ in rows) / len(rows)) for rows in bins.values()]
+    ece = sum(len(rows) * gap for rows, gap in zip(bins.values(), gaps)) / n
+    brier = sum((c - ok) ** 2 for c, ok in zip(confidence, correct)) / n
+    return brier, ece, max(gaps)
+
+def test_matches_naive_computation():
+    rng = np.random.default_rng(7)
+    confidence = rng.random(5000)
+    correct = rng.random(5000) < confidence ** 2  # overconfident model
+
+    summary = grouped_summaries(np.zeros(5000, dtype=np.int64), 1, confidence, correct, n_bins=10)[0]
+    brier, ece, mce = _naive(confidence.tolist(), correct.tolist(), 10)
+
+    assert summary.count == 5000
+    assert summary.brier_score == pytest.approx(brier)
+    assert summary.ece == pytest.approx(ece)
+    assert summary.mce == pytest.approx(mce)
+    assert sum(b.count for b in summary.bins) == 5000
+
+def test_breakdowns_are_independent_groups():
+    columns = {
+        "confidence": [1.0, 1.0, 0.9, 0.5],
+        "is_correct": [True, True, False, True],
+        "policy_id": ["default", "default", "strict", "strict"],
+        "model": ["m1", "m1", "m2", "m2"],
+        "decision": ["ACT", "ACT", "ACT", "ABSTAIN"],
+    }
+    report = reliability_report(columns, n_bins=10)
+
+    assert report.overall.count == 4
+    assert report.by_policy["default"].ece == pytest.approx(0.0)
+    assert report.by_policy["default"].bins[-1].count == 2  # confidence 1.0 lands in the top bin
+    assert report.by_policy["strict"].brier_score == pytest.approx((0.81 + 0.25) / 2)
+    assert set(report.by_decision) == {"ACT", "ABSTAIN"}
+
+def test_empty_input():
+    columns = {name: [] for name in ("confidence", "is_correct", "policy_id", "model", "decision")}
+    report = reliability_report(columns)
+    assert report.overall.count == 0
+    assert report.by_policy == {}
+
+@pytest.mark.asyncio
+async def test_date_window_is_matched_on_utc_days(fake_db):
+    from datetime import date, datetime, timezone
+    from app.evaluation.reliability import ReliabilityEvaluator
+
+    conn = fake_db(row={name: None for name in ("confidence", "is_correct", "policy_id", "model", "decision")})
+
+    await ReliabilityEvaluator().load_columns(start=date(2024, 1, 1), end=date(2024, 1, 31))
+
+    query, params = conn.queries("fetchrow")[0]
+    # Bounds on the partition key itself, so partitions are pruned: [first UTC midnight, midnight after the last day)
+    assert "t.created_at >= COALESCE($1::timestamptz, '-infinity')" in query
+    assert "t.created_at < COALESCE($2::timestamptz, 'infinity')" in query
+    assert params[:2] == (datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 2, 1, tzinfo=timezone.utc))
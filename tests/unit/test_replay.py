@@ -0,0 +1,108 @@
+import json
+import yaml
+from datetime import datetime, timezone
+from app.replay.recorded import replay_state
+from app.replay.runner import run_replay
+
+PLANNER = {"required_evidence": [], "missing_evidence": [], "risk_assessment": "Low risk.", "recommended_path": "PROCEED"}
+
+def _verdict(decision: str, confidence: float = 0.85) -> dict:
+    return {"decision": decision, "confidence": confidence, "rationale": "Verified user, usual amount.", "risk_factors": [], "missing_information": [], "failure_modes": []}
+
+def _call(stage: str, model: str, body: dict, tokens: int) -> dict:
+    raw = json.dumps(body)
+    # Streamed calls record the gateway's output estimate (see LLMGateway._stream_attempt).
+    return {"stage": stage, "model": model, "raw_response": raw, "input_tokens": tokens, "output_tokens": len(raw) // 4}
+
+def _row(trace_id: str, region: str = "US") -> dict:
+    decision = {**_verdict("ACT"), "model": "claude-3-5-sonnet-20240620", "cost_estimate": {"tokens": 330, "latency_ms": 900}, "skipped_stages": []}
+    return {
+        "id": trace_id,
+        "created_at": datetime(2024, 5, 1, tzinfo=timezone.utc),
+        "policy_version": "1.0.0+abc",
+        "trace_data": {
+            "request": {"context": {"user_id": "u1", "is_verified": True, "region": region}, "signals": {"amount": 5000}, "policy_id": "default"},
+            "policy_version": "1.0.0+abc",
+            "evidence_planning": {**PLANNER, "vo_info_assessment": {"estimated_cost": 0.02}},
+            "decision": decision,
+            "llm_calls": [
+                _call("evidence_planner", "claude-3-5-sonnet-20240620", PLANNER, 200),
+                _call("primary", "claude-3-5-sonnet-20240620", _verdict("ACT"), 200),
+                _call("shadow", "claude-3-5-haiku-20241022", _verdict("ACT"), 100),
+            ],
+        },
+    }
+
+def _candidate(tmp_path, edit) -> str:
+    with open("policies/default.yaml") as f:
+        body = yaml.safe_load(f)
+    edit(body)
+    path = tmp_path / "default.yaml"
+    path.write_text(yaml.safe_dump(body))
+    return str(path)
+
+def test_replay_against_the_same_policy_changes_nothing():
+    report = run_replay([_row(f"t{i}") for i in range(5)], "policies").to_dict()
+
+    summary = report["summary"]
+    assert summary["replayed"] == 5
+    assert summary["flipped"] == 0
+    assert summary["transitions"] == {"ACT->ACT": 5}
+    assert summary["tokens"]["delta"] == 0
+    assert summary["missing_recordings"] == summary["stale_recordings"] == 0
+
+def test_stricter_threshold_flips_act_to_abstain(tmp_path):
+    candidate = _candidate(tmp_path, lambda body: body["confidence_thresholds"].update(act_minimum=0.9))
+
+    report = run_replay([_row("t1"), _row("t2")], candidate).to_dict()
+
+    assert report["summary"]["act_to_abstain"] == 2
+    flip = report["flips"][0]
+    assert (flip["baseline"], flip["candidate"]) == ("ACT", "ABSTAIN")
+    assert "below policy threshold 0.9" in flip["candidate_rationale"]
+
+def test_candidate_hard_constraint_blocks_before_any_llm_call(tmp_path):
+    candidate = _candidate(tmp_path, lambda body: body["hard_constraints"]["restricted_regions"].append("DE"))
+
+    report = run_replay([_row("t1", region="DE"), _row("t2")], candidate).to_dict()
+
+    assert report["summary"]["hard_constraint_blocks"] == 1
+    assert [(f["trace_id"], f["candidate_tokens"]) for f in report["flips"]] == [("t1", 0)]
+    assert report["summary"]["tokens"]["delta"] == -report["flips"][0]["baseline_tokens"]
+
+def test_model_change_is_reported_as_stale(tmp_path):
+    candidate = _candidate(tmp_path, lambda body: body["asymmetric_shadow"].update(shadow_model="claude-3-5-sonnet-20240620"))
+
+    report = run_replay([_row("t1")], candidate).to_dict()
+
+    assert report["summary"]["stale_recordings"] == 1
+    assert report["summary"]["flipped"] == 0
+
+def test_pre_recording_trace_is_reconstructed():
+    row = _row("t1")
+    trace_data = row["trace_data"]
+    del trace_data["llm_calls"]
+    trace_data["decision"].update(
+        decision="ABSTAIN",
+        rationale="Verified user, usual amount. (Overridden by Asymmetric Safety Shadow: Unilateral veto triggered.)",
+        risk_factors=["shadow_veto"]
+    )
+
+    state = replay_state(trace_data)
+    assert json.loads(state.recordings["primary"]["raw_response"])["decision"] == "ACT"
+    assert json.loads(state.recordings["primary"]["raw_response"])["rationale"] == "Verified user, usual amount."
+    assert json.loads(state.recordings["shadow"]["raw_response"])["decision"] == "ABSTAIN"
+
+    summary = run_replay([row], "policies").to_dict()["summary"]
+    assert summary["transitions"] == {"ABSTAIN->ABSTAIN": 1}
+    assert summary["reconstructed"] == 1
+
+def test_process_pool_matches_in_process_replay(tmp_path):
+    candidate = _candidate(tmp_path, lambda body: body["confidence_thresholds"].update(act_minimum=0.9))
+    rows = [_row(f"t{i}") for i in range(12)]
+
+    serial = run_replay(rows, candidate, workers=1).to_dict()
+    parallel = run_replay(rows, candidate, workers=2, chunk_size=5).to_dict()
+
+    assert parallel["summary"] == serial["summary"]
+    assert [f["trace_id"] for f in parallel["flips"]] == [f["trace_id"] for f in serial["flips"]]
@@ -0,0 +1,93 @@
+import pytest
+from types import SimpleNamespace
+from app.core.cache import LRUCache, TieredCache
+from app.llm_gateway.client import LLMGateway
+
+POLICY = {"name": "default", "response_cache": {"enabled": True, "ttl_seconds": 60}}
+
+def _fake_response(text: str):
+    return SimpleNamespace(
+        content=[SimpleNamespace(text=text)],
+        usage=SimpleNamespace(input_tokens=120, output_tokens=30)
+    )
+
+@pytest.fixture
+def memory_cache(mocker):
+    store = TieredCache(name="llm_response", max_entries=8, use_redis=False)
+    mocker.patch("app.llm_gateway.client.response_cache.store", store)
+    return store
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache("test", max_entries=2)
+    cache.set("a", 1, ttl_seconds=60)
+    cache.set("b", 2, ttl_seconds=60)
+    cache.get("a")
+    cache.set("c", 3, ttl_seconds=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_lru_expires_entries():
+    cache = LRUCache("test", max_entries=2)
+    cache.set("a", 1, ttl_seconds=-1)
+    assert cache.get("a") is None
+
+@pytest.mark.asyncio
+async def test_identical_prompts_hit_the_cache(mocker, memory_cache):
+    """
+    The second identical call is served from the cache and reports no provider tokens.
+    """
+    gateway = LLMGateway()
+    create = mocker.patch.object(gateway.client.messages, "create", new_callable=mocker.AsyncMock, return_value=_fake_response('{"decision": "ASK"}'))
+
+    first = await gateway.get_structured_decision("prompt", "system", model="m", policy=POLICY, policy_id="default")
+    second = await gateway.get_structured_decision("prompt", "system", model="m", policy=POLICY, policy_id="default")
+
+    assert create.call_count == 1
+    assert second["raw_response"] == first["raw_response"]
+    assert second["cached"] is True
+    assert second["input_tokens"] == 0
+
+@pytest.mark.asyncio
+async def test_cache_requires_policy_opt_in(mocker, memory_cache):
+    gateway = LLMGateway()
+    create = mocker.patch.object(gateway.client.messages, "create", new_callable=mocker.AsyncMock, return_value=_fake_response("{}"))
+
+    await gateway.get_structured_decision("prompt", "system", model="m", policy={"name": "default"}, policy_id="default")
+    await gateway.get_structured_decision("prompt", "system", model="m", policy={"name": "default"}, policy_id="default")
+
+    assert create.call_count == 2
+
+@pytest.mark.asyncio
+async def test_policy_invalidation_drops_cached_responses(mocker, memory_cache):
+    from app.llm_gateway.cache import response_cache
+
+    gateway = LLMGateway()
+    create = mocker.patch.object(gateway.client.messages, "create", new_callable=mocker.AsyncMock, return_value=_fake_response("{}"))
+
+    await gateway.get_structured_decision("prompt", "system", model="m", policy=POLICY, policy_id="default")
+    await response_cache.invalidate_policy("default")
+    await gateway.get_structured_decision("prompt", "system", model="m", policy=POLICY, policy_id="default")
+
+    assert create.call_count == 2
+
+@pytest.mark.asyncio
+async def test_entries_are_keyed_by_registry_id_not_policy_name(mocker, memory_cache):
+    """
+    Invalidation is by the policy file's id; a policy whose `name` differs must still be dropped.
+    """
+    from app.llm_gateway.cache import response_cache
+
+    gateway = LLMGateway()
+    create = mocker.patch.object(gateway.client.messages, "create", new_callable=mocker.AsyncMock, return_value=_fake_response("{}"))
+    policy = {**POLICY, "name": "Fraud Policy v2"}
+
+    await gateway.get_structured_decision("prompt", "system", model="m", policy=policy, policy_id="fraud")
+    await response_cache.invalidate_policy("fraud")
+    await gateway.get_structured_decision("prompt", "system", model="m", policy=policy, policy_id="fraud")
+    # Without a registry id there is nothing to invalidate by, so nothing is cached
+    await gateway.get_structured_decision("prompt", "system", model="m", policy=policy)
+    await gateway.get_structured_decision("prompt", "system", model="m", policy=policy)
+
+    assert create.call_count == 4
@@ -0,0 +1,48 @@
+import json
+from app.trace_store.codec import TraceCodec, COMPRESSED
+
+def _trace(refs=None, risk_assessment="Low risk."):
+    return {
+        "request": {"context": {"user_id": "u1"}, "signals": {"amount": 10}, "policy_id": "default"},
+        "policy_version": "1.0+abc",
+        "refs": refs,
+        "evidence_planning": {"risk_assessment": risk_assessment, "missing_evidence": []},
+        "decision": {"decision": "ACT", "confidence": 0.9, "rationale": "Verified user. " * 200, "model": "m"},
+    }
+
+def test_round_trip_compresses_only_long_free_text():
+    codec = TraceCodec(compress_min_chars=256)
+    trace = _trace(risk_assessment="Velocity anomaly across regions. " * 50)
+
+    stored = json.loads(codec.encode(trace))
+
+    assert COMPRESSED in stored["evidence_planning"]["risk_assessment"]
+    # Fields the generated columns and calibration SQL read stay plain, however long.
+    assert stored["decision"]["rationale"] == trace["decision"]["rationale"]
+    assert stored["decision"]["decision"] == "ACT"
+    assert stored["request"]["policy_id"] == "default"
+    assert codec.decode(codec.encode(trace)) == trace
+
+def test_incompressible_text_is_left_plain():
+    codec = TraceCodec(compress_min_chars=16)
+    trace = _trace(risk_assessment="q7Zk2Lp9Xw4Rt8Vb")
+    assert json.loads(codec.encode(trace))["evidence_planning"]["risk_assessment"] == "q7Zk2Lp9Xw4Rt8Vb"
+
+def test_traces_written_before_the_codec_decode_unchanged():
+    legacy = _trace()
+    assert TraceCodec().decode(json.dumps(legacy)) == legacy
+
+def test_static_content_is_referenced_by_hash_and_rehydrated():
+    codec = TraceCodec()
+    policy = {"name": "default", "hard_constraints": [{"id": "max_amount"}]}
+    refs = codec.static_refs(policy, {"decision_engine": "You are a safety-first decision engine."})
+    stored = codec.encode(_trace(refs))
+
+    assert refs == codec.static_refs(dict(policy), {"decision_engine": "You are a safety-first decision engine."})
+    assert "hard_constraints" not in stored
+
+    decoded = codec.decode(stored)
+    blobs = {digest: codec.blob(digest)[1] for digest in codec.ref_hashes(decoded)}
+    full = codec.rehydrate(decoded, blobs)
+    assert full["policy"] == policy
+    assert full["prompts"] == {"decision_engine": "You are a safety-first decision engine."}
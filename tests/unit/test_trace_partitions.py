@@ -0,0 +1,143 @@
+import json
+import uuid
+import pytest
+from datetime import date, datetime, timezone
+from app.trace_store.archive import TraceArchive
+from app.trace_store.partitions import PartitionManager, TracePartition, parse_partition, expired_partitions
+from app.evaluation.calibration import archived_trace_facts
+from app.trace_store.store import trace_store
+from fake_postgres import FakeConnection
+
+def _utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+def _row(n: int, created_at: datetime, decision: str = "ACT", policy_id: str = "default"):
+    trace_data = {"request": {"policy_id": policy_id}, "decision": {"decision": decision, "confidence": 0.8, "rationale": f"r{n}"}}
+    return {"id": uuid.UUID(int=n), "created_at": created_at, "policy_version": "1.0", "trace_data": json.dumps(trace_data)}
+
+def test_parse_partition_bounds():
+    monthly = parse_partition("decision_trace_p202401", "FOR VALUES FROM ('2024-01-01 00:00:00+00') TO ('2024-02-01 00:00:00+00')")
+    assert (monthly.lower, monthly.upper) == (_utc(2024, 1, 1), _utc(2024, 2, 1))
+
+    legacy = parse_partition("decision_trace_legacy", "FOR VALUES FROM (MINVALUE) TO ('2024-01-01 00:00:00+00')")
+    assert legacy.lower is None and legacy.upper == _utc(2024, 1, 1)
+
+    assert parse_partition("decision_trace_default", "DEFAULT").is_default
+
+def test_only_partitions_entirely_past_the_cutoff_expire():
+    partitions = [
+        TracePartition("decision_trace_default", None, None, is_default=True),
+        TracePartition("decision_trace_p202403", _utc(2024, 3, 1), _utc(2024, 4, 1)),
+        TracePartition("decision_trace_p202402", _utc(2024, 2, 1), _utc(2024, 3, 1)),
+        TracePartition("decision_trace_legacy", None, _utc(2024, 2, 1)),
+    ]
+    expired = expired_partitions(partitions, cutoff=_utc(2024, 3, 15))
+    assert [p.name for p in expired] == ["decision_trace_legacy", "decision_trace_p202402"]
+
+@pytest.mark.parametrize("fmt", ["jsonl", "parquet"])
+def test_archive_round_trip(tmp_path, fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    archive = TraceArchive(str(tmp_path))
+    for name, month in (("decision_trace_p202401", 1), ("decision_trace_p202402", 2)):
+        writer = archive.open_writer(name, fmt)
+        writer.write([_row(month * 10 + i, _utc(2024, month, 1 + i)) for i in range(3)])
+        archive.add_entry(name, _utc(2024, month, 1), _utc(2024, month + 1, 1), writer, writer.close())
+
+    found = archive.find([str(uuid.UUID(int=21)), str(uuid.UUID(int=99))], created_at=_utc(2024, 2, 2))
+    assert list(found) == [str(uuid.UUID(int=21))]
+    assert found[str(uuid.UUID(int=21))]["trace_data"]["decision"]["rationale"] == "r21"
+    assert found[str(uuid.UUID(int=21))]["created_at"] == _utc(2024, 2, 2)
+
+    # Only the partition covering created_at is read
+    assert archive.find([str(uuid.UUID(int=21))], created_at=_utc(2024, 1, 15)) == {}
+
+    window = list(archive.iter_traces(start=_utc(2024, 1, 3), end=_utc(2024, 2, 2)))
+    assert [row["id"] for row in window] == [str(uuid.UUID(int=12)), str(uuid.UUID(int=20))]
+
+def test_failed_export_leaves_no_archive_file(tmp_path):
+    archive = TraceArchive(str(tmp_path))
+    writer = archive.open_writer("decision_trace_p202401")
+    writer.write([_row(1, _utc(2024, 1, 1))])
+    writer.abort()
+    assert list(tmp_path.iterdir()) == []
+    assert archive.entries() == []
+
+def test_archived_trace_facts_match_generated_columns():
+    trace = {
+        "created_at": datetime(2024, 1, 1, 23, 30, tzinfo=timezone.utc),
+        "trace_data": {"request": {}, "decision": {"decision": "ABSTAIN", "confidence": "high"}},
+    }
+    assert archived_trace_facts(trace) == {"policy_id": "default", "bucket_date": date(2024, 1, 1), "decision": "ABSTAIN", "confidence": 0.0}
+
+@pytest.mark.asyncio
+async def test_partition_is_dropped_only_after_a_verified_export(tmp_path, mocker):
+    archive = TraceArchive(str(tmp_path))
+    mocker.patch("app.trace_store.partitions.trace_archive", archive)
+    partition = TracePartition("decision_trace_p202401", _utc(2024, 1, 1), _utc(2024, 2, 1))
+    rows = [_row(i, _utc(2024, 1, 1 + i)) for i in range(3)]
+
+    conn = FakeConnection(rows, value=len(rows))
+    assert await PartitionManager().archive_partition(conn, partition) == 3
+    assert conn.executed[0] == 'ALTER TABLE decision_trace DETACH PARTITION "decision_trace_p202401" CONCURRENTLY'
+    # Trace ids are indexed before the drop
+    assert "INSERT INTO decision_trace_archived" in conn.executed[1]
+    assert conn.queries("execute")[1][1] == ("decision_trace_p202401",)
+    assert conn.executed[2] == 'DROP TABLE "decision_trace_p202401"'
+    assert "DELETE FROM decision_trace_embedding" in conn.executed[3]
+    assert archive.entries()[0]["rows"] == 3
+
+    # Rows the export did not see: the partition is reattached and nothing is dropped.
+    conn = FakeConnection(rows, value=4)
+    with pytest.raises(RuntimeError):
+        await PartitionManager().archive_partition(conn, partition)
+    assert conn.executed[-1] == (
+        'ALTER TABLE decision_trace ATTACH PARTITION "decision_trace_p202401" '
+        "FOR VALUES FROM ('2024-01-01T00:00:00+00:00') TO ('2024-02-01T00:00:00+00:00')"
+    )
+    assert not any(q.startswith("DROP") or "decision_trace_archived" in q for q in conn.executed)
+
+    # A detach interrupted in an earlier round is finalized
+    conn = FakeConnection(rows, value=len(rows))
+    pending = TracePartition("decision_trace_p202401", _utc(2024, 1, 1), _utc(2024, 2, 1), detach_pending=True)
+    await PartitionManager().archive_partition(conn, pending)
+    assert conn.executed[0] == 'ALTER TABLE decision_trace DETACH PARTITION "decision_trace_p202401" FINALIZE'
+
+@pytest.mark.asyncio
+async def test_archives_without_an_index_are_indexed(tmp_path, mocker):
+    archive = TraceArchive(str(tmp_path))
+    mocker.patch("app.trace_store.partitions.trace_archive", archive)
+    writer = archive.open_writer("decision_trace_p202401")
+    writer.write([_row(i, _utc(2024, 1, 1 + i)) for i in range(2)])
+    archive.add_entry("decision_trace_p202401", _utc(2024, 1, 1), _utc(2024, 2, 1), writer, writer.close())
+
+    conn = FakeConnection(value=False)
+    assert await PartitionManager().index_archive(conn) == ["decision_trace_p202401"]
+    # With each trace's calibration facts, as archive_partition records them from the generated columns
+    assert conn.copied["decision_trace_archived"] == [[
+        (uuid.UUID(int=0), _utc(2024, 1, 1), "decision_trace_p202401", "default", date(2024, 1, 1), "ACT", 0.8),
+        (uuid.UUID(int=1), _utc(2024, 1, 2), "decision_trace_p202401", "default", date(2024, 1, 2), "ACT", 0.8),
+    ]]
+
+    indexed = FakeConnection(value=True)
+    assert await PartitionManager().index_archive(indexed) == []
+    assert indexed.copied == {}
+
+@pytest.mark.asyncio
+async def test_trace_lookup_reads_the_archive_only_for_indexed_ids(tmp_path, fake_db, mocker):
+    archive = TraceArchive(str(tmp_path))
+    mocker.patch("app.trace_store.store.trace_archive", archive)
+    writer = archive.open_writer("decision_trace_p202401")
+    writer.write([_row(5, _utc(2024, 1, 5))])
+    archive.add_entry("decision_trace_p202401", _utc(2024, 1, 1), _utc(2024, 2, 1), writer, writer.close())
+    find = mocker.spy(archive, "find")
+
+    # Neither hot nor archived: a 404 without opening any archive file
+    fake_db(value=None)
+    assert await trace_store.get_trace(str(uuid.UUID(int=99)), rehydrate=False) is None
+    assert find.call_count == 0
+
+    fake_db(value=_utc(2024, 1, 5))
+    trace = await trace_store.get_trace(str(uuid.UUID(int=5)), rehydrate=False)
+    assert trace["trace_data"]["decision"]["rationale"] == "r5"
+    assert find.call_args.args == ([str(uuid.UUID(int=5))], _utc(2024, 1, 5))
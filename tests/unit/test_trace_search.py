@@ -0,0 +1,48 @@
+import uuid
+import pytest
+from datetime import datetime, timezone
+from app.trace_store.search import AuditSearch, encode_cursor, decode_cursor
+
+def _row(minute: int):
+    return {
+        "id": uuid.UUID(int=minute),
+        "created_at": datetime(2024, 1, 1, 12, minute, tzinfo=timezone.utc),
+        "policy_id": "default",
+        "policy_version": "1.0+abc",
+        "decision": "ABSTAIN",
+        "confidence": 0.4,
+        "rationale": "Identity missing",
+    }
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 1, 1, 12, 0, 30, 123456, tzinfo=timezone.utc)
+    trace_id = uuid.uuid4()
+    assert decode_cursor(encode_cursor(created_at, trace_id)) == (created_at, trace_id)
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+@pytest.mark.asyncio
+async def test_keyset_page_and_filters(fake_db):
+    conn = fake_db(rows=[_row(3), _row(2), _row(1)])
+    cursor = encode_cursor(datetime(2024, 1, 1, 13, 0, tzinfo=timezone.utc), uuid.UUID(int=99))
+
+    page = await AuditSearch().search(query="50%_off", match="substring", decision="ABSTAIN", limit=2, cursor=cursor)
+
+    query, params = conn.queries("fetch")[0]
+    assert "rationale ILIKE $1" in query
+    assert params[0] == r"%50\%\_off%"
+    assert "(created_at, id) < ($3, $4)" in query
+    assert params[-1] == 3  # one extra row to detect the next page
+    assert [item["id"] for item in page["items"]] == [uuid.UUID(int=3), uuid.UUID(int=2)]
+    assert decode_cursor(page["next_cursor"]) == (_row(2)["created_at"], uuid.UUID(int=2))
+
+@pytest.mark.asyncio
+async def test_last_page_has_no_cursor(fake_db):
+    conn = fake_db(rows=[_row(1)])
+
+    page = await AuditSearch().search(query="identity", limit=2)
+
+    assert "websearch_to_tsquery('english', $1)" in conn.queries("fetch")[0][0]
+    assert page["next_cursor"] is None
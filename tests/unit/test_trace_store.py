@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from prometheus_client import REGISTRY
+from app.core.config import settings
+from app.trace_store.codec import RawJSON
+from app.trace_store import store as store_module
+from app.trace_store.store import STATEMENTS, TraceStore, decode_jsonb, encode_jsonb, init_connection
+from fake_postgres import FakeConnection
+
+def test_jsonb_codec_round_trip_and_pre_encoded_passthrough():
+    value = {"decision": {"decision": "ACT", "confidence": 0.9}, "tags": ["a"]}
+    assert decode_jsonb(encode_jsonb(value)) == value
+    # Already-encoded trace codec output is sent as-is, not as a JSON string.
+    assert encode_jsonb(RawJSON('{"a":1}')) == b'\x01{"a":1}'
+    assert decode_jsonb(encode_jsonb("plain text")) == "plain text"
+
+@pytest.mark.asyncio
+async def test_concurrent_first_use_creates_a_single_pool(mocker):
+    class FakePool:
+        def get_size(self):
+            return 5
+
+    async def create_pool(**kwargs):
+        await asyncio.sleep(0.01)
+        return FakePool()
+
+    create = mocker.patch.object(store_module.asyncpg, "create_pool", side_effect=create_pool)
+    store = TraceStore()
+
+    await asyncio.gather(*(store.connect() for _ in range(10)))
+
+    assert create.call_count == 1
+    kwargs = create.call_args.kwargs
+    assert kwargs["init"] is init_connection
+    assert kwargs["connection_class"] is store_module.TraceConnection
+
+def test_pool_size_is_a_share_of_the_connection_budget(mocker):
+    mocker.patch.multiple(settings, DB_POOL_MIN_SIZE=5, DB_POOL_MAX_SIZE=20, DB_MAX_CONNECTIONS=0, WEB_CONCURRENCY=4)
+    assert settings.db_pool_sizes() == (5, 20)
+
+    mocker.patch.object(settings, "DB_MAX_CONNECTIONS", 80)
+    assert settings.db_pool_sizes() == (5, 20)
+    mocker.patch.object(settings, "WEB_CONCURRENCY", 32)
+    assert settings.db_pool_sizes() == (2, 2)
+
+@pytest.mark.asyncio
+async def test_connections_prepare_hot_statements_and_time_them(mocker):
+    conn = FakeConnection(row={"ok": True})
+    await init_connection(conn)
+
+    assert set(conn.codecs) == {"json", "jsonb"}
+    assert set(conn.statements) == set(STATEMENTS)
+
+    # Statements registered after a connection opened are prepared on first use.
+    mocker.patch.dict(STATEMENTS, {"late_statement": "SELECT $1"})
+    before = REGISTRY.get_sample_value("decisiontrace_db_query_seconds_count", {"statement": "late_statement"}) or 0
+
+    assert await TraceStore().run(conn, "late_statement", 1, method="fetchrow") == {"ok": True}
+    assert conn.statements["late_statement"].calls == [(1,)]
+    assert REGISTRY.get_sample_value("decisiontrace_db_query_seconds_count", {"statement": "late_statement"}) == before + 1
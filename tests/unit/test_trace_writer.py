@@ -0,0 +1,168 @@
+import asyncio
+import pytest
+from app.core.exceptions import TracePersistenceError
+from app.trace_store.writer import TraceWriter
+
+@pytest.mark.asyncio
+async def test_queued_traces_are_group_committed(mocker):
+    """
+    Traces submitted while the writer is busy are flushed together, and each future resolves on commit.
+    """
+    log_traces = mocker.patch("app.trace_store.writer.trace_store.log_traces")
+    writer = TraceWriter()
+    await writer.start()
+
+    futures = [await writer.submit(f"trace-{i}", {"i": i}) for i in range(5)]
+    await asyncio.gather(*futures)
+    await writer.stop()
+
+    written = [trace_id for call in log_traces.call_args_list for trace_id, _, _ in call.args[0]]
+    assert written == [f"trace-{i}" for i in range(5)]
+    assert log_traces.call_count < 5
+
+@pytest.mark.asyncio
+async def test_flush_failure_fails_every_future_in_the_batch(mocker):
+    """
+    With the database down, the per-trace retry fails too and so does every future.
+    """
+    mocker.patch("app.trace_store.writer.trace_store.log_traces", side_effect=RuntimeError("db down"))
+    mocker.patch("app.trace_store.writer.trace_store.log_trace", side_effect=RuntimeError("db down"))
+    writer = TraceWriter()
+    await writer.start()
+
+    future = await writer.submit("trace-1", {})
+    with pytest.raises(TracePersistenceError):
+        await future
+    await writer.stop()
+
+@pytest.mark.asyncio
+async def test_stop_drains_the_queue(mocker):
+    """
+    Shutdown flushes every trace that was already queued.
+    """
+    log_traces = mocker.patch("app.trace_store.writer.trace_store.log_traces")
+    writer = TraceWriter()
+    await writer.start()
+
+    futures = [await writer.submit(f"trace-{i}", {}) for i in range(3)]
+    await writer.stop()
+
+    assert all(f.done() and f.exception() is None for f in futures)
+    assert sum(len(call.args[0]) for call in log_traces.call_args_list) == 3
+
+@pytest.mark.asyncio
+async def test_submit_writes_inline_when_not_running(mocker):
+    log_trace = mocker.patch("app.trace_store.writer.trace_store.log_trace")
+    writer = TraceWriter()
+
+    future = await writer.submit("trace-1", {"a": 1})
+
+    assert future.done()
+    log_trace.assert_called_once_with("trace-1", {"a": 1}, None)
+
+@pytest.fixture
+def gated_copy(mocker):
+    """
+    log_traces that blocks until the returned event is set, recording each batch.
+    """
+    release = asyncio.Event()
+    batches = []
+
+    async def log_traces(traces):
+        batches.append([trace_id for trace_id, _, _ in traces])
+        await release.wait()
+
+    mocker.patch("app.trace_store.writer.trace_store.log_traces", side_effect=log_traces)
+    release.batches = batches
+    return release
+
+@pytest.mark.asyncio
+async def test_submit_waits_for_queue_space(mocker, gated_copy):
+    """
+    With the queue full, submit blocks until the writer drains it, then every trace is committed.
+    """
+    mocker.patch("app.trace_store.writer.settings.TRACE_WRITER_QUEUE_SIZE", 1)
+    writer = TraceWriter()
+    await writer.start()
+
+    first = await writer.submit("trace-0", {})
+    await asyncio.sleep(0.01)  # the writer takes trace-0 and blocks in its flush
+    second = await writer.submit("trace-1", {})  # fills the queue
+    third = asyncio.create_task(writer.submit("trace-2", {}))
+    await asyncio.sleep(0.01)
+    assert not third.done()
+
+    gated_copy.set()
+    futures = [first, second, await third]
+    await asyncio.gather(*futures)
+    await writer.stop()
+
+    assert [trace_id for batch in gated_copy.batches for trace_id in batch] == ["trace-0", "trace-1", "trace-2"]
+
+@pytest.mark.asyncio
+async def test_submit_blocked_on_a_full_queue_at_shutdown_is_written_inline(mocker, gated_copy):
+    """
+    A submit still waiting for queue space when stop() begins must not land behind the shutdown sentinel,
+    where nothing would ever resolve its future: it is written inline instead.
+    """
+    mocker.patch("app.trace_store.writer.settings.TRACE_WRITER_QUEUE_SIZE", 1)
+    log_trace = mocker.patch("app.trace_store.writer.trace_store.log_trace")
+    writer = TraceWriter()
+    await writer.start()
+
+    queued = [await writer.submit("trace-0", {})]
+    await asyncio.sleep(0.01)
+    queued.append(await writer.submit("trace-1", {}))
+    late = asyncio.create_task(writer.submit("trace-late", {}))
+    await asyncio.sleep(0.01)
+    stopping = asyncio.create_task(writer.stop())
+    await asyncio.sleep(0.01)
+    gated_copy.set()
+    await stopping
+
+    late_future = await late
+    assert late_future.done() and late_future.exception() is None
+    log_trace.assert_called_once_with("trace-late", {}, None)
+    assert all(f.done() and f.exception() is None for f in queued)
+
+@pytest.mark.asyncio
+async def test_stop_fails_traces_the_writer_never_reached(mocker):
+    """
+    If the drain times out, whatever is still queued fails rather than staying pending.
+    """
+    async def hang(traces):
+        await asyncio.sleep(3600)
+
+    mocker.patch("app.trace_store.writer.trace_store.log_traces", side_effect=hang)
+    writer = TraceWriter()
+    await writer.start()
+
+    futures = [await writer.submit(f"trace-{i}", {}) for i in range(3)]
+    await writer.stop(timeout=0.05)
+
+    assert all(f.done() for f in futures)
+    for future in futures:
+        with pytest.raises(TracePersistenceError):
+            future.result()
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_per_trace(mocker):
+    """
+    One trace the database rejects fails only its own future; the rest of the batch is still written.
+    """
+    mocker.patch("app.trace_store.writer.trace_store.log_traces", side_effect=RuntimeError("bad row"))
+
+    async def log_trace(trace_id, trace_data, policy_version):
+        if trace_id == "bad":
+            raise RuntimeError("invalid input syntax")
+
+    log_trace = mocker.patch("app.trace_store.writer.trace_store.log_trace", side_effect=log_trace)
+    writer = TraceWriter()
+
+    futures = [asyncio.get_running_loop().create_future() for _ in range(3)]
+    await writer._flush([(trace_id, {}, None, future) for trace_id, future in zip(["ok-1", "bad", "ok-2"], futures)])
+
+    assert futures[0].result() is None and futures[2].result() is None
+    with pytest.raises(TracePersistenceError, match="invalid input"):
+        futures[1].result()
+    assert log_trace.call_count == 3
@@ -0,0 +1,37 @@
+import asyncio
+import pytest
+from prometheus_client import REGISTRY
+from app.observability.tracing import stage, start_timings
+
+def _stage_count(name: str) -> float:
+    return REGISTRY.get_sample_value("decisiontrace_decision_stage_seconds_count", {"stage": name}) or 0.0
+
+def test_stage_records_histogram_and_sums_repeated_stages():
+    before = _stage_count("prompt_render")
+    timings = start_timings()
+
+    with stage("prompt_render"):
+        pass
+    with stage("prompt_render"):
+        pass
+    with pytest.raises(ValueError):
+        with stage("json_extraction"):
+            raise ValueError("bad json")
+
+    assert _stage_count("prompt_render") == before + 2
+    assert set(timings) == {"prompt_render", "json_extraction"}
+    assert all(ms >= 0 for ms in timings.values())
+
+@pytest.mark.asyncio
+async def test_stages_in_child_tasks_land_in_the_decision_timings():
+    timings = start_timings()
+
+    async def shadow():
+        with stage("llm_shadow"):
+            await asyncio.sleep(0.01)
+
+    with stage("llm_primary"):
+        await asyncio.gather(shadow(), asyncio.sleep(0.01))
+
+    assert timings["llm_shadow"] >= 10
+    assert timings["llm_primary"] >= timings["llm_shadow"]